@@ -68,6 +68,7 @@ _embedding.conf
 # * **${REGRID_TO_GRID}** - Grid to remap data. Corresponds to SERIES_ANALYSIS_REGRID_TO_GRID in the METplus configuration file.
 # * **${CLIMO_MEAN_FILE}** - Optional path to climatology mean file. Corresponds to SERIES_ANALYSIS_CLIMO_MEAN_INPUT_[DIR/TEMPLATE] in the METplus configuration file.
 # * **${CLIMO_STDEV_FILE}** - Optional path to climatology standard deviation file. Corresponds to SERIES_ANALYSIS_CLIMO_STDEV_INPUT_[DIR/TEMPLATE] in the METplus configuration file.
+# * **${VERIF_MASK}** - Data mask that selects one tile of the grid. Set by METplus when SERIES_ANALYSIS_TILE_COUNT is greater than 1, otherwise an empty string.
 
 ##############################################################################
 # Running METplus
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+
+"""
+Program Name: run_benchmarks.py
+Contact(s): George McCabe
+Abstract: Time the METplus functions that are called for every run time,
+          field, and file and compare the results to stored baselines
+History Log:  Initial version
+Usage: run_benchmarks.py [--save-baseline] [--threshold T] [--filter NAME]
+                         [--skip-use-cases]
+Parameters: None
+Input Files: baselines.json, use case configuration files
+Output Files: Synthetic data, logs, and benchmark results under --work-dir
+Condition codes: 0 if all benchmarks ran and no benchmark is slower than its
+  baseline by more than the threshold, 1 otherwise
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+from synthetic_data import create_synthetic_data, START_TIME
+
+metplus_home = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.realpath(__file__))))
+sys.path.insert(0, metplus_home)
+
+from metplus.util import met_util as util
+from metplus.util import time_util
+from metplus.util.config import config_metplus
+from metplus.util.config.string_template_substitution import do_string_sub
+from metplus.util.config.string_template_substitution import parse_template
+from metplus.wrappers.command_builder import CommandBuilder
+from metplus.wrappers.stat_analysis_wrapper import StatAnalysisWrapper
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             'baselines.json')
+
+# fraction that a benchmark can be slower than its baseline before it is
+# reported as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# use cases that are run with DO_NOT_RUN_EXE for a full year and the
+# settings that point their input to the synthetic data so the runs succeed.
+# {DATA_TYPE_dir} and {DATA_TYPE_template} are replaced with the directory
+# and template of each data type. The settings are written to a
+# configuration file because values that contain curly braces cannot be
+# passed on the command line
+DRY_RUN_USE_CASES = {
+    'met_tool_wrapper/Example/Example.conf': {},
+    'met_tool_wrapper/GridStat/GridStat.conf': {
+        'dir': {
+            'FCST_GRID_STAT_INPUT_DIR': '{grib_dir}',
+            'OBS_GRID_STAT_INPUT_DIR': '{netcdf_dir}',
+        },
+        'filename_templates': {
+            'FCST_GRID_STAT_INPUT_TEMPLATE': '{grib_template}',
+            'OBS_GRID_STAT_INPUT_TEMPLATE': '{netcdf_template}',
+        },
+        'config': {
+            'OBS_GRID_STAT_FILE_WINDOW_BEGIN': '-1800',
+            'OBS_GRID_STAT_FILE_WINDOW_END': '1800',
+        },
+    },
+    'met_tool_wrapper/PCPCombine/PCPCombine_add.conf': {
+        'dir': {
+            'FCST_PCP_COMBINE_INPUT_DIR': '{grib_dir}',
+        },
+        'filename_templates': {
+            'FCST_PCP_COMBINE_INPUT_TEMPLATE': '{grib_template}',
+        },
+        'config': {
+            'FCST_PCP_COMBINE_INPUT_ACCUMS': '3H',
+            'FCST_PCP_COMBINE_OUTPUT_ACCUM': '6H',
+            'LEAD_SEQ': '6',
+        },
+    },
+    'met_tool_wrapper/PointStat/PointStat.conf': {
+        'dir': {
+            'FCST_POINT_STAT_INPUT_DIR': '{grib_dir}',
+            'OBS_POINT_STAT_INPUT_DIR': '{netcdf_dir}',
+        },
+        'filename_templates': {
+            'FCST_POINT_STAT_INPUT_TEMPLATE': '{grib_template}',
+            'OBS_POINT_STAT_INPUT_TEMPLATE': '{netcdf_template}',
+        },
+        'config': {
+            'OBS_POINT_STAT_FILE_WINDOW_BEGIN': '-1800',
+            'OBS_POINT_STAT_FILE_WINDOW_END': '1800',
+        },
+    },
+}
+
+DRY_RUN_INCREMENT = '6H'
+
+# the dry runs start after the beginning of the synthetic data so the
+# forecasts that are valid at the first run time exist
+DRY_RUN_START = START_TIME + timedelta(days=2)
+DRY_RUN_END = DRY_RUN_START + timedelta(days=365, hours=-6)
+
+# days of synthetic data read by the dry runs. Covers a full year of run
+# times plus the longest forecast lead before and after it
+DRY_RUN_DAYS = 369
+
+# list of (name, setup function, number of calls per repeat, number of
+# repeats or None to use the --repeat argument)
+BENCHMARKS = []
+
+def benchmark(name, number=1, repeat=None):
+    """!Decorator to register a benchmark. The decorated function is called
+        once with the benchmark context and returns the function to time"""
+    def register(setup_function):
+        BENCHMARKS.append((name, setup_function, number, repeat))
+        return setup_function
+    return register
+
+def create_config(context, settings=None):
+    """!Read the METplus configuration the same way master_metplus.py does,
+        using the benchmark configuration file for the paths
+        @param context dictionary with benchmark information
+        @param settings dictionary of config section to dictionary of
+         variables to set after reading the configuration
+    """
+    sys.argv = [sys.argv[0], '-c', context['conf_file']]
+    config = config_metplus.setup(util.baseinputconfs)
+    util.get_logger(config)
+    for section, values in (settings or {}).items():
+        for name, value in values.items():
+            config.set(section, name, value)
+    return config
+
+def get_time_info_list(count):
+    """!Get a list of time dictionaries for 6 hourly inits and 3 hourly
+        leads starting at START_TIME"""
+    time_info_list = []
+    for index in range(count):
+        init = START_TIME + time_util.relativedelta(hours=6 * (index // 17))
+        lead = 3 * (index % 17)
+        time_info_list.append(time_util.ti_calculate({'init': init,
+                                                      'lead_hours': lead}))
+    return time_info_list
+
+@benchmark('do_string_sub', number=5)
+def bench_do_string_sub(context):
+    template = context['data']['grib'][1]
+    time_info_list = get_time_info_list(1000)
+
+    def run():
+        for time_info in time_info_list:
+            do_string_sub(template, **time_info)
+    return run
+
+@benchmark('parse_template', number=5)
+def bench_parse_template(context):
+    template = context['data']['grib'][1]
+    time_info_list = get_time_info_list(1000)
+    filenames = [do_string_sub(template, **time_info)
+                 for time_info in time_info_list]
+
+    def run():
+        for filename in filenames:
+            parse_template(template, filename)
+    return run
+
+class WindowWrapper(CommandBuilder):
+    """!Minimal wrapper used to call find_file_in_window on the synthetic
+        observation files"""
+    def __init__(self, config, data_dir, template):
+        self.app_name = 'window'
+        self.data_dir = data_dir
+        self.template = template
+        super().__init__(config, config.logger)
+
+    def create_c_dict(self):
+        c_dict = super().create_c_dict()
+        c_dict['OBS_INPUT_DIR'] = self.data_dir
+        c_dict['OBS_INPUT_TEMPLATE'] = self.template
+        c_dict['OBS_FILE_WINDOW_BEGIN'] = -1800
+        c_dict['OBS_FILE_WINDOW_END'] = 1800
+        return c_dict
+
+@benchmark('find_file_in_window')
+def bench_find_file_in_window(context):
+    config = create_config(context)
+    data_dir, template = context['data']['netcdf']
+    wrapper = WindowWrapper(config, data_dir, template)
+    time_info_list = [
+        time_util.ti_calculate({'valid': START_TIME +
+                                         time_util.relativedelta(hours=hour),
+                                'lead_hours': 0})
+        for hour in range(0, 48, 6)
+    ]
+
+    def run():
+        for time_info in time_info_list:
+            if not wrapper.find_file_in_window('0', 'OBS_', time_info):
+                raise RuntimeError('find_file_in_window did not find a file')
+    return run
+
+@benchmark('get_lead_sequence_ti_calculate', number=5)
+def bench_get_lead_sequence(context):
+    config = create_config(context,
+                           {'config': {'LEAD_SEQ': 'begin_end_incr(0,240,1)'}})
+    input_dict = {'init': START_TIME}
+
+    def run():
+        for lead in util.get_lead_sequence(config, input_dict):
+            time_util.ti_calculate({'init': START_TIME, 'lead': lead})
+    return run
+
+@benchmark('parse_var_list', number=5)
+def bench_parse_var_list(context):
+    settings = {}
+    for index in range(1, 21):
+        settings[f'FCST_VAR{index}_NAME'] = f'VAR{index}'
+        settings[f'FCST_VAR{index}_LEVELS'] = 'P250, P500, P700, P850'
+        settings[f'FCST_VAR{index}_THRESH'] = 'gt0, ge10, ge50'
+        settings[f'OBS_VAR{index}_NAME'] = f'OBS_VAR{index}'
+        settings[f'OBS_VAR{index}_LEVELS'] = 'P250, P500, P700, P850'
+    config = create_config(context, {'config': settings})
+    time_info = get_time_info_list(1)[0]
+
+    def run():
+        util.parse_var_list(config, time_info)
+    return run
+
+@benchmark('config_loading')
+def bench_config_loading(context):
+    def run():
+        create_config(context)
+    return run
+
+@benchmark('stat_analysis_runtime_settings')
+def bench_stat_analysis(context):
+    stat_dir, _ = context['data']['stat']
+    sys.argv = [sys.argv[0], '-c', context['conf_file'],
+                '-c', os.path.join(metplus_home, 'internal_tests', 'pytests',
+                                   'stat_analysis', 'test_stat_analysis.conf')]
+    config = config_metplus.setup(util.baseinputconfs)
+    util.get_logger(config)
+    config.set('dir', 'MODEL1_STAT_ANALYSIS_LOOKIN_DIR', stat_dir)
+    config.set('config', 'FCST_LEAD_LIST',
+               ', '.join(f'{lead:02d}' for lead in range(0, 49, 3)))
+    config.set('config', 'FCST_VALID_HOUR_LIST', '00, 06, 12, 18')
+    config.set('config', 'LOOP_LIST_ITEMS',
+               'FCST_VALID_HOUR_LIST, FCST_LEAD_LIST')
+    config.set('config', 'GROUP_LIST_ITEMS', 'FCST_INIT_HOUR_LIST')
+    util.handle_tmp_dir(config)
+    wrapper = StatAnalysisWrapper(config, config.logger)
+    date_type = wrapper.c_dict['DATE_TYPE']
+    wrapper.c_dict['DATE_BEG'] = wrapper.c_dict[date_type + '_BEG']
+    wrapper.c_dict['DATE_END'] = wrapper.c_dict[date_type + '_END']
+
+    def run():
+        if not wrapper.get_runtime_settings_dict_list():
+            raise RuntimeError('get_runtime_settings_dict_list failed')
+    return run
+
+def add_use_case_benchmark(use_case, settings):
+    """!Register a benchmark that runs a use case with DO_NOT_RUN_EXE for a
+        full year of run times. The benchmark fails if the use case does not
+        finish successfully"""
+    name = 'dry_run_' + os.path.splitext(os.path.basename(use_case))[0]
+
+    def setup_use_case(context):
+        data_paths = {}
+        for data_type, (data_dir, template) in context['use_case_data'].items():
+            data_paths[f'{data_type}_dir'] = data_dir
+            data_paths[f'{data_type}_template'] = template
+
+        work_dir = os.path.dirname(context['conf_file'])
+        settings_file = os.path.join(work_dir, f'{name}.conf')
+        with open(settings_file, 'w') as file_handle:
+            for section, values in settings.items():
+                file_handle.write(f'[{section}]\n')
+                for option, value in values.items():
+                    file_handle.write(f'{option} = '
+                                      f'{value.format(**data_paths)}\n')
+
+        command = [sys.executable,
+                   os.path.join(metplus_home, 'ush', 'master_metplus.py'),
+                   '-c', os.path.join(metplus_home, 'parm', 'use_cases',
+                                      use_case),
+                   '-c', context['conf_file'],
+                   '-c', settings_file,
+                   'config.DO_NOT_RUN_EXE=True',
+                   'config.LOG_COMMAND_METRICS=False',
+                   'config.LOG_LEVEL=INFO']
+        for loop_by in ('INIT', 'VALID'):
+            command.extend([f'config.{loop_by}_TIME_FMT=%Y%m%d%H',
+                            f"config.{loop_by}_BEG="
+                            f"{DRY_RUN_START.strftime('%Y%m%d%H')}",
+                            f"config.{loop_by}_END="
+                            f"{DRY_RUN_END.strftime('%Y%m%d%H')}",
+                            f'config.{loop_by}_INCREMENT={DRY_RUN_INCREMENT}'])
+
+        def run():
+            result = subprocess.run(command, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL)
+            if result.returncode != 0:
+                raise RuntimeError(f'{use_case} failed with return code '
+                                   f'{result.returncode}. See the logs in '
+                                   f"{os.path.join(work_dir, 'output', 'logs')}")
+        return run
+
+    # dry runs take minutes so they are only run once
+    benchmark(name, repeat=1)(setup_use_case)
+
+for dry_run_use_case, dry_run_settings in DRY_RUN_USE_CASES.items():
+    add_use_case_benchmark(dry_run_use_case, dry_run_settings)
+
+def write_benchmark_conf(work_dir):
+    """!Write the configuration file that sets the paths used by the
+        benchmarks and return its path"""
+    met_install_dir = os.path.join(work_dir, 'met')
+    if not os.path.exists(met_install_dir):
+        os.makedirs(met_install_dir)
+
+    conf_file = os.path.join(work_dir, 'benchmark.conf')
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write('[dir]\n'
+                          f"INPUT_BASE = {os.path.join(work_dir, 'data')}\n"
+                          f"OUTPUT_BASE = {os.path.join(work_dir, 'output')}\n"
+                          f'MET_INSTALL_DIR = {met_install_dir}\n'
+                          '[config]\n'
+                          'LOG_LEVEL = WARNING\n'
+                          'LOG_COMMAND_METRICS = False\n')
+    return conf_file
+
+def time_benchmark(setup_function, context, number, repeat):
+    """!Call the benchmark setup function and time the function it returns
+        @returns best time of one call in seconds over all repeats
+    """
+    function = setup_function(context)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def read_baselines(baseline_file):
+    if not os.path.exists(baseline_file):
+        return {}
+
+    with open(baseline_file, 'r') as file_handle:
+        return json.load(file_handle).get('benchmarks', {})
+
+def write_baselines(baseline_file, results, baselines):
+    """!Write the results as the new baselines. Baselines of benchmarks that
+        were not run and thresholds set for individual benchmarks are kept"""
+    benchmarks = dict(baselines)
+    for name, seconds in results.items():
+        benchmarks[name] = dict(baselines.get(name, {}),
+                                seconds=round(seconds, 6))
+
+    with open(baseline_file, 'w') as file_handle:
+        json.dump({'machine': platform.node(),
+                   'python': platform.python_version(),
+                   'created': datetime.now().strftime('%Y-%m-%d'),
+                   'benchmarks': benchmarks},
+                  file_handle, indent=2, sort_keys=True)
+        file_handle.write('\n')
+
+def compare_to_baselines(results, baselines, threshold):
+    """!Print each result next to its baseline
+        @returns list of names of benchmarks that regressed
+    """
+    regressions = []
+    print(f"{'Benchmark':<36} {'Time(s)':>10} {'Baseline(s)':>12} "
+          f"{'Ratio':>7}")
+    for name, seconds in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            print(f'{name:<36} {seconds:>10.4f} {"-":>12} {"-":>7}')
+            continue
+
+        ratio = seconds / baseline['seconds']
+        allowed = 1 + baseline.get('threshold', threshold)
+        status = ''
+        if ratio > allowed:
+            status = ' REGRESSION'
+            regressions.append(name)
+        print(f"{name:<36} {seconds:>10.4f} {baseline['seconds']:>12.4f} "
+              f'{ratio:>7.2f}{status}')
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Run METplus benchmarks')
+    parser.add_argument('--work-dir',
+                        help='directory for synthetic data and output. '
+                             'A temporary directory is used if not set')
+    parser.add_argument('--baseline-file', default=BASELINE_FILE,
+                        help='file containing the stored baselines')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fraction a benchmark can be slower than its '
+                             'baseline unless a threshold is set for it in '
+                             'the baseline file')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of times to repeat each benchmark')
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks containing this string')
+    parser.add_argument('--skip-use-cases', action='store_true',
+                        help='skip the year-long use case dry runs')
+    parser.add_argument('--days', type=int, default=10,
+                        help='number of days of synthetic data to create')
+    args = parser.parse_args()
+
+    selected = [(name, setup_function, number, repeat)
+                for name, setup_function, number, repeat in BENCHMARKS
+                if args.filter in name and
+                not (args.skip_use_cases and name.startswith('dry_run_'))]
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='metplus_benchmark_')
+    data_info, count = create_synthetic_data(os.path.join(work_dir, 'data'),
+                                             args.days)
+    print(f'Wrote {count} synthetic files to {work_dir}')
+    context = {'conf_file': write_benchmark_conf(work_dir),
+               'data': data_info}
+
+    # the dry runs read a full year of forecasts and observations
+    if any(name.startswith('dry_run_') for name, _, _, _ in selected):
+        use_case_data, count = create_synthetic_data(
+            os.path.join(work_dir, 'use_case_data'), DRY_RUN_DAYS,
+            data_types=['grib', 'netcdf']
+        )
+        print(f'Wrote {count} synthetic files for the use cases')
+        context['use_case_data'] = use_case_data
+
+    results = {}
+    failures = []
+    for name, setup_function, number, repeat in selected:
+        try:
+            results[name] = time_benchmark(setup_function, context, number,
+                                           repeat or args.repeat)
+        except RuntimeError as err:
+            print(f'{name} failed: {err}')
+            failures.append(name)
+
+    baselines = read_baselines(args.baseline_file)
+    regressions = compare_to_baselines(results, baselines, args.threshold)
+
+    with open(os.path.join(work_dir, 'results.json'), 'w') as file_handle:
+        json.dump(results, file_handle, indent=2)
+
+    if args.save_baseline:
+        write_baselines(args.baseline_file, results, baselines)
+        print(f'Saved baselines to {args.baseline_file}')
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir)
+
+    if failures:
+        print(f"Failed: {', '.join(failures)}")
+
+    if regressions:
+        print(f"Slower than baseline: {', '.join(regressions)}")
+
+    if failures or regressions:
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+Program Name: synthetic_data.py
+Contact(s): George McCabe
+Abstract: Create directory trees of empty files named like the data that
+          METplus use cases read so the file searching logic can be
+          benchmarked without real data
+History Log:  Initial version
+Usage: synthetic_data.py <output_dir> [--days N]
+Parameters: None
+Input Files: None
+Output Files: Empty GRIB2, NetCDF and .stat files under output_dir
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+# directory and filename templates used by the benchmarks. The files are
+# written using strftime so the generator does not depend on the code that
+# is being benchmarked
+TEMPLATES = {
+    'grib': ('grib',
+             '{init?fmt=%Y%m%d}/gfs.t{init?fmt=%H}z.pgrb2.0p25.f{lead?fmt=%3H}'),
+    'netcdf': ('netcdf',
+               '{valid?fmt=%Y%m%d}/obs_{valid?fmt=%Y%m%d_%H%M%S}.nc'),
+    'stat': ('stat',
+             '{valid?fmt=%Y%m%d}/grid_stat_GFS_{lead?fmt=%2H}0000L_'
+             '{valid?fmt=%Y%m%d_%H%M%S}V.stat'),
+}
+
+START_TIME = datetime(2019, 1, 1)
+
+# forecast leads in hours of the GRIB2 and .stat files
+FORECAST_LEADS = list(range(0, 49, 3))
+
+# interval in minutes between observation files. Observations are not
+# written exactly on the hour so searching in a time window finds a file
+OBS_INTERVAL = 20
+
+STAT_HEADER = ('VERSION MODEL DESC FCST_LEAD FCST_VALID_BEG FCST_VALID_END '
+               'OBS_LEAD OBS_VALID_BEG OBS_VALID_END FCST_VAR FCST_UNITS '
+               'FCST_LEV OBS_VAR OBS_UNITS OBS_LEV OBTYPE VX_MASK '
+               'INTERP_MTHD INTERP_PNTS FCST_THRESH OBS_THRESH COV_THRESH '
+               'ALPHA LINE_TYPE\n')
+
+def touch(path, content=''):
+    parent = os.path.dirname(path)
+    if not os.path.exists(parent):
+        os.makedirs(parent, exist_ok=True)
+    with open(path, 'w') as file_handle:
+        file_handle.write(content)
+
+def create_synthetic_data(output_dir, days=10, data_types=None):
+    """!Write empty files for each data type covering a number of days
+        starting at START_TIME
+        @param output_dir directory to write the data
+        @param days number of days of data to create
+        @param data_types list of data types to create. All types in
+         TEMPLATES are created if not set
+        @returns dictionary of data type to (input directory, template) and
+         the number of files that were written
+    """
+    if data_types is None:
+        data_types = list(TEMPLATES)
+
+    end_time = START_TIME + timedelta(days=days)
+    count = 0
+
+    init = START_TIME
+    while init < end_time:
+        for lead in FORECAST_LEADS:
+            valid = init + timedelta(hours=lead)
+            if 'grib' in data_types:
+                touch(os.path.join(output_dir, 'grib',
+                                   init.strftime('%Y%m%d'),
+                                   init.strftime(f'gfs.t%Hz.pgrb2.0p25.f{lead:03d}')))
+                count += 1
+            if 'stat' in data_types:
+                touch(os.path.join(output_dir, 'stat',
+                                   valid.strftime('%Y%m%d'),
+                                   f'grid_stat_GFS_{lead:02d}0000L_'
+                                   f"{valid.strftime('%Y%m%d_%H%M%S')}V.stat"),
+                      STAT_HEADER)
+                count += 1
+
+        init += timedelta(hours=6)
+
+    valid = START_TIME + timedelta(minutes=OBS_INTERVAL // 2)
+    while 'netcdf' in data_types and valid < end_time:
+        touch(os.path.join(output_dir, 'netcdf',
+                           valid.strftime('%Y%m%d'),
+                           valid.strftime('obs_%Y%m%d_%H%M%S.nc')))
+        count += 1
+        valid += timedelta(minutes=OBS_INTERVAL)
+
+    data_info = {}
+    for data_type in data_types:
+        sub_dir, template = TEMPLATES[data_type]
+        data_info[data_type] = (os.path.join(output_dir, sub_dir), template)
+
+    return data_info, count
+
+def main():
+    parser = argparse.ArgumentParser(description='Create synthetic data')
+    parser.add_argument('output_dir', help='directory to write data')
+    parser.add_argument('--days', type=int, default=10,
+                        help='number of days of data to create')
+    args = parser.parse_args()
+
+    _, count = create_synthetic_data(args.output_dir, args.days)
+    print(f'Wrote {count} files to {args.output_dir}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import os
+import time
+
+import pytest
+
+import produtil.run
+from produtil.run import exe, runbg, waitprocs, BackgroundPool
+
+# run each test with process file descriptors (if available) and with
+# the waiter thread fallback
+@pytest.fixture(params=['pidfd', 'thread'])
+def pool_factory(request):
+    if request.param == 'pidfd' and not hasattr(os, 'pidfd_open'):
+        pytest.skip('os.pidfd_open is not available')
+
+    pools = []
+    def make_pool(*args, **kwargs):
+        pool = BackgroundPool(*args, **kwargs)
+        pool._use_pidfd = request.param == 'pidfd'
+        pools.append(pool)
+        return pool
+
+    yield make_pool
+    for pool in pools:
+        pool.close()
+
+def sleep_cmd(seconds):
+    return exe('sleep')[str(seconds)]
+
+def test_max_procs_limits_running_jobs(pool_factory):
+    pool = pool_factory(max_procs=2)
+    jobs = [pool.submit(sleep_cmd(0.2)) for _ in range(5)]
+    assert len(pool.running) == 2
+    assert len(pool.queued) == 3
+    assert not jobs[2].started
+
+    max_running = 0
+    while pool.running or pool.queued:
+        max_running = max(max_running, len(pool.running))
+        pool.wait_any()
+
+    assert max_running == 2
+    assert all(job.poll() == 0 for job in jobs)
+
+def test_callbacks_and_exit_status(pool_factory):
+    pool = pool_factory()
+    completed = []
+    ok = pool.submit(exe('true'), callback=completed.append)
+    bad = pool.submit(exe('false'), callback=completed.append)
+    assert pool.wait()
+    assert sorted(completed, key=id) == sorted([ok, bad], key=id)
+    assert ok.poll() == 0
+    assert bad.poll() == 1
+    assert ok.rusage() is not None
+
+def test_timeout_terminates_job(pool_factory):
+    pool = pool_factory()
+    job = pool.submit(sleep_cmd(30), timeout=0.3)
+    start = time.time()
+    assert pool.wait(timeout=10)
+    assert time.time() - start < 5
+    assert job.timed_out
+    assert job.poll() < 0
+
+def test_capture_and_instring(pool_factory):
+    pool = pool_factory()
+    echo = pool.submit(exe('echo')['hello'], capture=True)
+    cat = pool.submit(exe('cat') << 'input string', capture=True)
+    pipe = pool.submit(exe('echo')['a\nb\nc'] | exe('wc')['-l'],
+                       capture=True)
+    assert pool.wait()
+    assert echo.out == 'hello\n'
+    assert cat.out == 'input string'
+    assert pipe.out.strip() == '3'
+
+def test_wait_timeout_does_not_kill(pool_factory):
+    pool = pool_factory()
+    job = pool.submit(sleep_cmd(0.5))
+    assert not pool.wait(timeout=0.05)
+    assert not job.done
+    assert pool.wait()
+    assert job.poll() == 0
+
+def test_runbg_waitprocs():
+    procs = [runbg(sleep_cmd(0.2)) for _ in range(3)]
+    start = time.time()
+    assert waitprocs(procs)
+    # processes run at the same time
+    assert time.time() - start < 0.55
+    assert all(proc.poll() == 0 for proc in procs)
+
+def test_waitprocs_timeout_then_resume():
+    proc = runbg(sleep_cmd(0.5), capture=True)
+    assert not waitprocs(proc, timeout=0.05)
+    assert proc.poll() is None
+    assert waitprocs(proc)
+    assert proc.poll() == 0
+    assert proc.out == ''
+
+def test_adopt_completed_pipeline(pool_factory):
+    proc = runbg(exe('true'))
+    assert waitprocs(proc)
+    completed = []
+    pool = pool_factory()
+    job = pool.adopt(proc, callback=completed.append)
+    assert completed == [job]
+    assert pool.wait(timeout=0)
+    assert job.poll() == 0
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import logging
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util import command_metrics
+from metplus.util.config import config_metplus
+from metplus.wrappers.command_runner import CommandRunner
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='CommandMetrics',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='CommandMetrics')
+        produtil.log.postmsg('command_metrics test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'command_metrics test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def test_run_cmd_writes_metrics():
+    config = metplus_config()
+    out_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'command_metrics')
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    metrics_file = os.path.join(out_dir, 'metrics.jsonl')
+    if os.path.exists(metrics_file):
+        os.remove(metrics_file)
+    config.set('config', 'COMMAND_METRICS_FILE', metrics_file)
+    config.set('config', 'LOG_COMMAND_METRICS', True)
+
+    input_file = os.path.join(out_dir, 'input.txt')
+    output_file = os.path.join(out_dir, 'output.txt')
+    with open(input_file, 'w') as file_handle:
+        file_handle.write('x' * 1000)
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    runner = CommandRunner(config, logger=config.logger, wrapper_name='Test')
+    ret, _ = runner.run_cmd(f'cp {input_file} {output_file}', ismetcmd=False)
+    assert ret == 0
+    ret, _ = runner.run_cmd('false', ismetcmd=False)
+    assert ret != 0
+
+    with open(metrics_file) as file_handle:
+        records = [json.loads(line) for line in file_handle]
+
+    assert len(records) == 2
+    assert records[0]['wrapper'] == 'Test'
+    assert records[0]['app'] == 'cp'
+    assert records[0]['exit_status'] == 0
+    assert records[0]['input_bytes'] == 1000
+    assert records[0]['output_bytes'] == 1000
+    assert records[0]['max_rss_kb'] > 0
+    assert records[0]['wall_time'] >= 0
+    assert records[1]['exit_status'] == 1
+    assert config.command_metrics == records
+
+def test_run_cmd_metrics_off_by_default(caplog):
+    config = metplus_config()
+    metrics_file = os.path.join(config.getdir('OUTPUT_BASE'),
+                                'command_metrics', 'default_off.jsonl')
+    if os.path.exists(metrics_file):
+        os.remove(metrics_file)
+    config.set('config', 'COMMAND_METRICS_FILE', metrics_file)
+
+    logger = logging.getLogger('test_command_metrics')
+    runner = CommandRunner(config, logger=config.logger, wrapper_name='Test')
+    with caplog.at_level(logging.INFO, logger='test_command_metrics'):
+        ret, _ = runner.run_cmd('sh -c "exit 3"', ismetcmd=False,
+                                logger=logger)
+
+    assert ret == 3
+    assert '  - exit status 3' in caplog.messages
+    assert not os.path.exists(metrics_file)
+    assert not getattr(config, 'command_metrics', [])
+
+def test_summarize_command_metrics():
+    records = [
+        {'wrapper': 'GridStat', 'app': 'grid_stat', 'exit_status': 0,
+         'wall_time': 2., 'user_time': 1.5, 'sys_time': .5,
+         'max_rss_kb': 2048, 'input_bytes': 10, 'output_bytes': 5},
+        {'wrapper': 'GridStat', 'app': 'grid_stat', 'exit_status': 1,
+         'wall_time': 1., 'user_time': .5, 'sys_time': .5,
+         'max_rss_kb': 1024, 'input_bytes': 10, 'output_bytes': 0},
+        {'wrapper': 'PCPCombine', 'app': 'pcp_combine', 'exit_status': 0,
+         'wall_time': 4., 'user_time': 3., 'sys_time': 1.,
+         'max_rss_kb': 512, 'input_bytes': 1, 'output_bytes': 1},
+    ]
+    summary = command_metrics.summarize_command_metrics(records)
+    assert [group['wrapper'] for group in summary] == ['PCPCombine',
+                                                       'GridStat',
+                                                       'TOTAL']
+    grid_stat = summary[1]
+    assert grid_stat['count'] == 2
+    assert grid_stat['failed'] == 1
+    assert grid_stat['wall_time'] == 3.
+    assert grid_stat['max_rss_kb'] == 2048
+    assert grid_stat['input_bytes'] == 20
+    assert summary[2]['count'] == 3
+    assert summary[2]['wall_time'] == 7.
+
+    lines = command_metrics.format_summary_table(summary)
+    assert len(lines) == 4
+    assert lines[0].split() == [column[0] for column in
+                                command_metrics.SUMMARY_COLUMNS]
+    assert len(set(len(line) for line in lines)) == 1
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import json
+import shutil
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util import command_plan
+from metplus.util.config import config_metplus
+from metplus.wrappers.command_runner import CommandRunner
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='CommandPlan',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='CommandPlan')
+        produtil.log.postmsg('command_plan test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'command_plan test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def get_plan_config(skip_input_checks=False):
+    config = metplus_config()
+    out_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'command_plan')
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    config.set('config', 'PLAN_COMMANDS', True)
+    config.set('config', 'PLAN_SKIP_INPUT_CHECKS', skip_input_checks)
+    config.set('config', 'PLAN_OUTPUT_FILE',
+               os.path.join(out_dir, 'plan.jsonl'))
+    config.set('config', 'PLAN_COMMAND_FILE',
+               os.path.join(out_dir, 'commands.txt'))
+    config.set('dir', 'STAGING_DIR', os.path.join(out_dir, 'stage'))
+    command_plan.start_command_plan(config)
+    return config, out_dir
+
+def read_plan(config):
+    with open(config.getstr('config', 'PLAN_OUTPUT_FILE')) as file_handle:
+        return [json.loads(line) for line in file_handle]
+
+def test_command_plan_dependencies(tmpdir):
+    plan_file = os.path.join(str(tmpdir), 'plan.jsonl')
+    command_file = os.path.join(str(tmpdir), 'commands.txt')
+    plan = command_plan.CommandPlan(plan_file, command_file)
+    plan.add('app_a in.nc /out/a/a.nc', env={'VAR': 'a b'}, app='app_a',
+             inputs=['in.nc'], outputs=['/out/a/a.nc'])
+    plan.add('app_b in.nc /out/b.nc', app='app_b',
+             inputs=['in.nc'], outputs=['/out/b.nc'])
+    record = plan.add('app_c /out/a/a.nc /out/b.nc /out/c.nc', app='app_c',
+                      inputs=['/out/a/a.nc', '/out/b.nc'],
+                      outputs=['/out/c.nc'])
+    assert record['id'] == 2
+    assert record['dependencies'] == [0, 1]
+
+    with open(plan_file) as file_handle:
+        records = [json.loads(line) for line in file_handle]
+    assert [item['dependencies'] for item in records] == [[], [], [0, 1]]
+    assert records[0]['env'] == {'VAR': 'a b'}
+
+    with open(command_file) as file_handle:
+        lines = file_handle.read().splitlines()
+    assert lines[0] == ("mkdir -p /out/a && VAR='a b' "
+                        "sh -c 'app_a in.nc /out/a/a.nc'")
+
+def test_run_cmd_adds_command_to_plan():
+    config, out_dir = get_plan_config()
+    output_file = os.path.join(out_dir, 'output.txt')
+    runner = CommandRunner(config, logger=config.logger, wrapper_name='Test')
+    ret, _ = runner.run_cmd(f'touch {output_file}', ismetcmd=False,
+                            outputs=[output_file])
+    assert ret == 0
+    assert not os.path.exists(output_file)
+
+    records = read_plan(config)
+    assert len(records) == 1
+    assert records[0]['wrapper'] == 'Test'
+    assert records[0]['app'] == 'touch'
+    assert records[0]['outputs'] == [output_file]
+
+@pytest.mark.parametrize(
+    'skip_input_checks', [
+        False,
+        True,
+    ]
+)
+def test_plan_compressed_input(skip_input_checks):
+    config, out_dir = get_plan_config(skip_input_checks)
+    input_file = os.path.join(out_dir, 'input', 'file.txt')
+    os.makedirs(os.path.dirname(input_file))
+    with gzip.open(input_file + '.gz', 'wb') as file_handle:
+        file_handle.write(b'data')
+
+    staged_file = util.preprocess_file(input_file, '', config)
+    assert staged_file == config.getdir('STAGING_DIR') + input_file
+    assert not os.path.exists(config.getdir('STAGING_DIR'))
+
+    records = read_plan(config)
+    assert len(records) == 1
+    assert records[0]['app'] == 'gzip'
+    assert records[0]['inputs'] == [input_file + '.gz']
+    assert records[0]['outputs'] == [staged_file]
+    assert util.preprocess_file(input_file + '.missing', '', config) is None
+    assert command_plan.skip_input_checks(config) == skip_input_checks
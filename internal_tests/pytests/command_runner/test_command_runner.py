@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util.config import config_metplus
+from metplus.wrappers.command_runner import CommandRunner
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='CommandRunner',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='CommandRunner')
+        produtil.log.postmsg('command_runner test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        config.set('config', 'LOG_COMMAND_METRICS', False)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'command_runner test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+@pytest.mark.parametrize(
+    'backend', [
+        'PRODUTIL',
+        'ASYNCIO',
+    ]
+)
+def test_run_cmd_return_codes(backend):
+    config = metplus_config()
+    config.set('config', 'COMMAND_RUNNER_BACKEND', backend)
+    runner = CommandRunner(config, logger=config.logger)
+    assert runner.run_cmd('true', ismetcmd=False) == (0, 'true')
+    ret, cmd = runner.run_cmd('false', ismetcmd=False)
+    assert ret != 0 and cmd == 'false'
+    assert runner.run_cmd('exit 3', ismetcmd=False, run_inshell=True)[0] == 3
+
+def test_run_cmd_async_writes_met_log():
+    config = metplus_config()
+    config.set('config', 'COMMAND_RUNNER_BACKEND', 'ASYNCIO')
+    config.set('config', 'LOG_MET_OUTPUT_TO_METPLUS', False)
+    runner = CommandRunner(config, logger=config.logger)
+    log_file = runner.cmdlog_destination(cmdlog='echo_app.log')
+    if os.path.exists(log_file):
+        os.remove(log_file)
+
+    ret, _ = runner.run_cmd('echo hello', app_name='echo_app',
+                            env={'PATH': os.environ['PATH']})
+    assert ret == 0
+    with open(log_file) as file_handle:
+        content = file_handle.read()
+    assert 'COMMAND:\necho hello' in content
+    assert content.endswith('MET OUTPUT:\nhello\n')
+
+@pytest.mark.parametrize(
+    'backend, max_concurrent', [
+        ('PRODUTIL', 4),
+        ('ASYNCIO', 4),
+        ('ASYNCIO', 1),
+    ]
+)
+def test_submit_and_wait_for_cmds(backend, max_concurrent):
+    config = metplus_config()
+    config.set('config', 'COMMAND_RUNNER_BACKEND', backend)
+    config.set('config', 'COMMAND_RUNNER_MAX_CONCURRENT', max_concurrent)
+    runner = CommandRunner(config, logger=config.logger)
+    cmds = ['sleep 0.5', 'sleep 0.5', 'false', 'sleep 0.5']
+
+    start_time = time.time()
+    for cmd in cmds:
+        runner.submit_cmd(cmd, ismetcmd=False)
+    results = runner.wait_for_cmds()
+    elapsed = time.time() - start_time
+
+    assert [cmd for _, cmd in results] == cmds
+    assert [ret == 0 for ret, _ in results] == [True, True, False, True]
+    assert runner.wait_for_cmds() == []
+    if backend == 'ASYNCIO' and max_concurrent > 1:
+        assert elapsed < 1.
+    else:
+        assert elapsed >= 1.5
+
+@pytest.mark.parametrize(
+    'max_concurrent', [
+        1, 3,
+    ]
+)
+def test_wait_for_cmds_max_concurrent(max_concurrent):
+    config = metplus_config()
+    config.set('config', 'COMMAND_RUNNER_BACKEND', 'ASYNCIO')
+    config.set('config', 'COMMAND_RUNNER_MAX_CONCURRENT', 4)
+    runner = CommandRunner(config, logger=config.logger)
+
+    start_time = time.time()
+    for _ in range(3):
+        runner.submit_cmd('sleep 0.5', ismetcmd=False)
+    results = runner.wait_for_cmds(max_concurrent=max_concurrent)
+    elapsed = time.time() - start_time
+
+    assert [ret for ret, _ in results] == [0, 0, 0]
+    if max_concurrent == 1:
+        assert elapsed >= 1.5
+    else:
+        assert elapsed < 1.
+
+@pytest.mark.parametrize(
+    'backend', [
+        'PRODUTIL',
+        'ASYNCIO',
+    ]
+)
+def test_run_cmd_met_error_output_to_tty(backend, tmp_path):
+    config = metplus_config()
+    config.set('config', 'COMMAND_RUNNER_BACKEND', backend)
+    config.set('config', 'LOG_METPLUS', '')
+    runner = CommandRunner(config, logger=config.logger)
+
+    # send the output and error output of this process to files while the
+    # command runs. The output is not in the command string, so the logged
+    # command is not found in the files
+    out_file = tmp_path / 'out.txt'
+    err_file = tmp_path / 'err.txt'
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = os.dup(1), os.dup(2)
+    with open(out_file, 'w') as out_handle, open(err_file, 'w') as err_handle:
+        os.dup2(out_handle.fileno(), 1)
+        os.dup2(err_handle.fileno(), 2)
+        try:
+            ret, _ = runner.run_cmd('sh -c "expr 6 \\* 7 >&2"',
+                                    app_name='expr_app',
+                                    env={'PATH': os.environ['PATH']})
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            os.close(saved_fds[0])
+            os.close(saved_fds[1])
+
+    assert ret == 0
+    assert '42' in out_file.read_text()
+    assert '42' not in err_file.read_text()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util.config import config_metplus
+from metplus.wrappers.cyclone_plotter_wrapper import CyclonePlotterWrapper
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='CyclonePlotter',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='CyclonePlotter')
+        produtil.log.postmsg('cyclone_plotter test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'cyclone_plotter test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+HEADER = ('VERSION AMODEL BMODEL STORM_ID BASIN CYCLONE INIT LEAD VALID '
+          'ALAT ALON BLAT BLON AMSLP BMSLP\n')
+
+LINES = [
+    'GFSO ML01 20150301_120000 000000 20150301_120000 30.0 -70.0',
+    'GFSO ML01 20150301_120000 060000 20150301_180000 31.0 -69.0',
+    'GFSO ML02 20150301_120000 000000 20150301_120000 NA NA',
+    'GFSO ML02 20150301_120000 120000 20150302_000000 40.0 150.0',
+    'GFSO ML03 20150302_120000 000000 20150302_120000 10.0 10.0',
+    'OTHER ML04 20150301_120000 000000 20150301_120000 10.0 10.0',
+]
+
+def cyclone_plotter_wrapper(tmp_path):
+    config = metplus_config()
+    input_dir = tmp_path / 'tc_pairs'
+    input_dir.mkdir()
+    with open(input_dir / 'tracks.tcst', 'w') as file_handle:
+        file_handle.write(HEADER)
+        for line in LINES:
+            model, storm_id, init, lead, valid, lat, lon = line.split()
+            file_handle.write(f'V9.0 {model} BEST {storm_id} ML 01 {init} '
+                              f'{lead} {valid} {lat} {lon} NA NA NA NA\n')
+
+    config.set('dir', 'CYCLONE_PLOTTER_INPUT_DIR', str(input_dir))
+    config.set('dir', 'CYCLONE_PLOTTER_OUTPUT_DIR', str(tmp_path / 'out'))
+    config.set('config', 'CYCLONE_PLOTTER_INIT_DATE', '20150301, 20150302')
+    config.set('config', 'CYCLONE_PLOTTER_INIT_HR', '12')
+    config.set('config', 'CYCLONE_PLOTTER_MODEL', 'GFSO')
+    config.set('config', 'CYCLONE_PLOTTER_PLOT_TITLE', 'Tracks')
+    config.set('config', 'CYCLONE_PLOTTER_GENERATE_TRACK_ASCII', True)
+    config.set('config', 'CYCLONE_PLOTTER_CIRCLE_MARKER_SIZE', 41)
+    config.set('config', 'CYCLONE_PLOTTER_CROSS_MARKER_SIZE', 51)
+    config.set('config', 'CYCLONE_PLOTTER_MAX_WORKERS', 2)
+    return CyclonePlotterWrapper(config, config.logger)
+
+def test_get_storm_tracks(tmp_path):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('cartopy')
+    wrapper = cyclone_plotter_wrapper(tmp_path)
+    assert(wrapper.init_dates == ['20150301', '20150302'])
+
+    # track files are read once for all init dates
+    wrapper.retrieve_data()
+    assert(len(wrapper.track_table) == 5)
+
+    tracks = wrapper.get_storm_tracks('20150301')
+    assert(list(tracks.keys()) == ['ML01', 'ML02'])
+    assert([(point['lon'], point['first_point'], point['valid_dd'],
+             point['valid_hh'], point['lead_group'])
+            for point in tracks['ML01']] == [(-70.0, True, '01', '12', '0'),
+                                             (-69.0, False, '', '', '6')])
+    assert(tracks['ML02'][0]['valid_hh'] == '00')
+
+    tracks = wrapper.get_storm_tracks('20150302')
+    assert(list(tracks.keys()) == ['ML03'])
+
+def test_display_not_required(tmp_path, monkeypatch):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('cartopy')
+    # plots are drawn with the Agg backend, which does not use a display
+    monkeypatch.delenv('DISPLAY', raising=False)
+    wrapper = cyclone_plotter_wrapper(tmp_path)
+    assert(wrapper.isOK)
+
+def test_create_plots_reuses_background(tmp_path):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('cartopy')
+    import numpy as np
+    import matplotlib.image as mpimg
+    from metplus.wrappers.cyclone_plotter_wrapper import get_background_path
+
+    wrapper = cyclone_plotter_wrapper(tmp_path)
+    wrapper.background_dir = str(tmp_path / 'background')
+    assert(wrapper.max_workers == 2)
+
+    # create the background before the plots so it should not be drawn again
+    settings = wrapper.get_plot_settings()
+    background = get_background_path(settings)
+    os.makedirs(os.path.dirname(background))
+    mpimg.imsave(background, np.zeros((10, 10, 4)), format='png')
+    with open(background, 'rb') as file_handle:
+        background_bytes = file_handle.read()
+
+    wrapper.retrieve_data()
+    assert(wrapper.create_plots())
+
+    # one plot and one track file for each init date
+    output_dir = str(tmp_path / 'out')
+    assert(sorted(os.listdir(output_dir)) == ['20150301.png', '20150301.txt',
+                                             '20150302.png', '20150302.txt'])
+    assert(os.listdir(os.path.dirname(background)) ==
+           [os.path.basename(background)])
+    with open(background, 'rb') as file_handle:
+        assert(file_handle.read() == background_bytes)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import re
+import time
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util.config import config_metplus
+from metplus.util.directory_walker import (DirectoryWalker,
+                                           get_directory_walker)
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='DirectoryWalker',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='DirectoryWalker')
+        produtil.log.postmsg('directory_walker test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'directory_walker test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def make_tree(top, age=3600):
+    """! Create files under top. The modification times of the directories
+         are set to age seconds ago so the walks of the tree can be reused"""
+    for path in ['a.tcst', 'b.txt', 'sub1/c.tcst', 'sub1/deep/d.tcst',
+                 'sub2/e.tcst', 'sub2/f.grb2', 'sub3/g.tcst']:
+        path = os.path.join(top, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+
+    old_time = time.time() - age
+    for root, _, _ in os.walk(top):
+        os.utime(root, (old_time, old_time))
+
+def walk_files(top, regex):
+    """! Files found by os.walk, which the walker replaces"""
+    return [os.path.join(root, filename)
+            for root, _, files in os.walk(top)
+            for filename in files
+            if re.match(regex, filename)]
+
+@pytest.mark.parametrize(
+    'max_workers', [1, 3]
+)
+def test_find_files_matches_os_walk(tmp_path, max_workers):
+    top = str(tmp_path)
+    make_tree(top)
+    os.symlink(os.path.join(top, 'sub1'), os.path.join(top, 'link'))
+    walker = DirectoryWalker(max_workers=max_workers)
+    for regex in ['.*.tcst', r'.*(grib|grb|grib2|grb2)$', '.*']:
+        assert(walker.find_files(top, regex) == walk_files(top, regex))
+
+def test_find_files_cache(tmp_path, monkeypatch):
+    top = str(tmp_path)
+    make_tree(top)
+    walker = DirectoryWalker()
+
+    scanned = []
+    scan = DirectoryWalker._scan
+    monkeypatch.setattr(DirectoryWalker, '_scan',
+                        staticmethod(lambda dirname:
+                                     scanned.append(dirname) or scan(dirname)))
+
+    first = walker.find_files(top, '.*.tcst')
+    assert(len(scanned) == 5)
+
+    # the stored walk is used for the same and other expressions
+    assert(walker.find_files(top, '.*.tcst') == first)
+    assert(len(walker.find_files(top, '.*.grb2')) == 1)
+    assert(len(scanned) == 5)
+
+    # the tree is walked again after a file is added to a subdirectory
+    open(os.path.join(top, 'sub1', 'deep', 'h.tcst'), 'w').close()
+    files = walker.find_files(top, '.*.tcst')
+    assert(os.path.join(top, 'sub1', 'deep', 'h.tcst') in files)
+    assert(len(files) == len(first) + 1)
+    assert(len(scanned) == 10)
+
+def test_find_files_missing_dir(tmp_path):
+    top = str(tmp_path / 'missing')
+    walker = DirectoryWalker()
+    assert(walker.find_files(top, '.*') == [])
+
+    # files are found once the directory is created
+    make_tree(top)
+    assert(len(walker.find_files(top, '.*.tcst')) == 5)
+
+def test_find_files_returns_copy(tmp_path):
+    top = str(tmp_path)
+    make_tree(top)
+    walker = DirectoryWalker()
+    files = walker.find_files(top, '.*.tcst')
+    files.clear()
+    assert(len(walker.find_files(top, '.*.tcst')) == 5)
+
+def test_find_files_recently_modified(tmp_path, monkeypatch):
+    top = str(tmp_path)
+    make_tree(top)
+    walker = DirectoryWalker()
+
+    scanned = []
+    scan = DirectoryWalker._scan
+    monkeypatch.setattr(DirectoryWalker, '_scan',
+                        staticmethod(lambda dirname:
+                                     scanned.append(dirname) or scan(dirname)))
+
+    # a directory that was modified right before it was listed could change
+    # again without changing its modification time
+    sub1 = os.path.join(top, 'sub1')
+    recent_ns = int(time.time() * 10**9)
+    os.utime(sub1, ns=(recent_ns, recent_ns))
+    first = walker.find_files(top, '.*.tcst')
+    assert(len(scanned) == 5)
+
+    open(os.path.join(sub1, 'h.tcst'), 'w').close()
+    os.utime(sub1, ns=(recent_ns, recent_ns))
+    files = walker.find_files(top, '.*.tcst')
+    assert(os.path.join(sub1, 'h.tcst') in files)
+    assert(len(files) == len(first) + 1)
+    assert(len(scanned) == 10)
+
+    # the walk is reused once the directory is older than the granularity
+    old_ns = recent_ns - 2 * DirectoryWalker.MTIME_GRANULARITY
+    os.utime(sub1, ns=(old_ns, old_ns))
+    walker.find_files(top, '.*.tcst')
+    assert(len(scanned) == 15)
+    assert(walker.find_files(top, '.*.tcst') == files)
+    assert(len(scanned) == 15)
+
+def test_get_directory_walker():
+    config = metplus_config()
+    config.set('config', 'DIRECTORY_WALKER_MAX_WORKERS', 4)
+    config.set('config', 'DIRECTORY_WALKER_CACHE', False)
+    walker = get_directory_walker(config)
+    assert(walker is get_directory_walker(config))
+    assert(walker.max_workers == 4)
+    assert(not walker.use_cache)
+
+    # each run has its own walker
+    assert(get_directory_walker(metplus_config()) is not walker)
+
+def test_get_files_shared_walker(tmp_path):
+    top = str(tmp_path)
+    make_tree(top)
+    config = metplus_config()
+    assert(util.get_files(top, '.*.tcst', None, config) ==
+           walk_files(top, '.*.tcst'))
+    assert(util.get_filepaths_for_grbfiles(top, config) ==
+           [os.path.join(top, 'sub2', 'f.grb2')])
+    assert(list(get_directory_walker(config).walks) == [top])
+
+    # the tree is walked without storing the walk if there is no config
+    assert(util.get_files(top, '.*.tcst', None) ==
+           walk_files(top, '.*.tcst'))
+
+def test_input_file_index_uses_walker(tmp_path):
+    top = str(tmp_path)
+    for name in ['20190101/file_2019010100.nc', '20190101/file_2019010106.nc',
+                 '20190102/file_2019010200.nc', '20190102/other.txt']:
+        path = os.path.join(top, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+    old_time = time.time() - 3600
+    for root, _, _ in os.walk(top):
+        os.utime(root, (old_time, old_time))
+
+    config = metplus_config()
+    index = util.InputFileIndex(config)
+    template = '{valid?fmt=%Y%m%d}/file_{valid?fmt=%Y%m%d%H}.nc'
+    file_times = index.get_file_times(top, template)
+    assert(sorted(os.path.relpath(path, top) for path, _ in file_times) ==
+           sorted(['20190101/file_2019010100.nc',
+                   '20190101/file_2019010106.nc',
+                   '20190102/file_2019010200.nc']))
+
+    # the walk is shared with the walker of the run
+    walker = get_directory_walker(config)
+    assert(list(walker.walks) == [top])
+    assert(not index.refresh())
+
+    # the files are found again after a directory changes
+    open(os.path.join(top, '20190102', 'file_2019010206.nc'), 'w').close()
+    assert(index.refresh())
+    assert(len(index.get_file_times(top, template)) == 4)
+
+def test_get_updated_init_times_shared_walker(tmp_path):
+    top = str(tmp_path)
+    for init in ['20141214_00', '20141215_12']:
+        path = os.path.join(top, init, f'filter_{init}.tcst')
+        os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+
+    config = metplus_config()
+    assert(util.get_updated_init_times(top, config.logger, config) ==
+           ['20141214_00', '20141215_12'])
+    assert(list(get_directory_walker(config).walks) == [top])
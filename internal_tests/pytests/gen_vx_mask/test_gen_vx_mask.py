@@ -3,15 +3,17 @@
 import os
 import sys
 import re
+import socket
 import logging
 from collections import namedtuple
 import produtil
 import pytest
 import datetime
-import config_metplus
-from gen_vx_mask_wrapper import GenVxMaskWrapper
-import met_util as util
-import time_util
+
+from metplus.util.config import config_metplus
+from metplus.wrappers.gen_vx_mask_wrapper import GenVxMaskWrapper
+from metplus.util import met_util as util
+from metplus.util import time_util
 
 # --------------------TEST CONFIGURATION and FIXTURE SUPPORT -------------
 #
@@ -116,8 +118,11 @@ def test_run_gen_vx_mask_twice():
 
     wrap.run_at_time_all(time_info)
 
-    expected_cmds = [f"{wrap.app_path} 2018020100_ZENITH LAT {wrap.config.getdir('OUTPUT_BASE')}/stage/gen_vx_mask/temp_0.nc {cmd_args[0]} -v 2",
-                     f"{wrap.app_path} {wrap.config.getdir('OUTPUT_BASE')}/stage/gen_vx_mask/temp_0.nc LON {wrap.config.getdir('OUTPUT_BASE')}/GenVxMask_test/2018020100_ZENITH_LAT_LON_MASK.nc {cmd_args[1]} -v 2"]
+    # temporary files are written to a directory unique to the call
+    temp_dir = (f"{wrap.config.getdir('OUTPUT_BASE')}/stage/gen_vx_mask/"
+                f"{socket.gethostname()}_{os.getpid()}_0")
+    expected_cmds = [f"{wrap.app_path} 2018020100_ZENITH LAT {temp_dir}/temp_0.nc {cmd_args[0]} -v 2",
+                     f"{wrap.app_path} {temp_dir}/temp_0.nc LON {wrap.config.getdir('OUTPUT_BASE')}/GenVxMask_test/2018020100_ZENITH_LAT_LON_MASK.nc {cmd_args[1]} -v 2"]
 
     test_passed = True
 
@@ -133,3 +138,50 @@ def test_run_gen_vx_mask_twice():
 
     assert(test_passed)
 
+
+def test_run_gen_vx_mask_cache(tmp_path):
+    input_dict = {'valid': datetime.datetime.strptime("201802010000",'%Y%m%d%H%M'),
+                  'lead': 0}
+    time_info = time_util.ti_calculate(input_dict)
+
+    config = metplus_config()
+    config.set('config', 'GEN_VX_MASK_CACHE', True)
+    config.set('dir', 'GEN_VX_MASK_CACHE_DIR', str(tmp_path / 'cache'))
+    wrap = GenVxMaskWrapper(config, config.logger)
+
+    # script that writes its arguments to the output file
+    app_path = tmp_path / 'gen_vx_mask'
+    app_path.write_text('#!/bin/sh\necho "$@" > "$3"\n')
+    app_path.chmod(0o755)
+    wrap.app_path = str(app_path)
+
+    grid_file = tmp_path / 'grid.nc'
+    grid_file.write_text('grid')
+    wrap.c_dict['INPUT_TEMPLATE'] = str(grid_file)
+    wrap.c_dict['MASK_INPUT_TEMPLATES'] = ['LAT', 'LON']
+    wrap.c_dict['OUTPUT_DIR'] = str(tmp_path / 'out')
+    wrap.c_dict['OUTPUT_TEMPLATE'] = '{valid?fmt=%Y%m%d%H}_MASK.nc'
+    wrap.c_dict['COMMAND_OPTIONS'] = ["-type lat -thresh 'ge30&&le50'",
+                                      "-type lon -thresh 'le-70&&ge-130' -intersection"]
+
+    wrap.run_at_time_all(time_info)
+    assert(len(wrap.all_commands) == 2)
+    output_file = tmp_path / 'out' / '2018020100_MASK.nc'
+    assert(output_file.exists())
+
+    # masks are reused from the cache for the next run time
+    output_file.unlink()
+    time_info = time_util.ti_calculate({'valid': datetime.datetime(2018, 2, 1, 6),
+                                        'lead': 0})
+    wrap.run_at_time_all(time_info)
+    assert(len(wrap.all_commands) == 2)
+    assert((tmp_path / 'out' / '2018020106_MASK.nc').exists())
+
+    # changing the grid file generates the masks again
+    grid_file.write_text('new grid')
+    wrap.run_at_time_all(time_info)
+    assert(len(wrap.all_commands) == 4)
+
+    # temporary directories are removed
+    assert(not os.listdir(os.path.join(config.getdir('STAGING_DIR'),
+                                       'gen_vx_mask')))
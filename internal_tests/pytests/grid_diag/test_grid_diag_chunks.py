@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import datetime
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util import time_util
+from metplus.util import histogram_merge
+from metplus.util.mpmd_batch import MPMDBatch
+from metplus.util.config import config_metplus
+from metplus.wrappers.grid_diag_wrapper import GridDiagWrapper
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='GridDiag',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='GridDiag')
+        produtil.log.postmsg('grid_diag test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'grid_diag test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def grid_diag_wrapper(chunk_size=None, max_memory=None):
+    config = metplus_config()
+    config.set('config', 'GRID_DIAG_CONFIG_FILE', 'GridDiagConfig')
+    config.set('config', 'GRID_DIAG_REGRID_WIDTH', 1)
+    config.set('config', 'GRID_DIAG_REGRID_VLD_THRESH', 0.5)
+    config.set('filename_templates', 'GRID_DIAG_INPUT_TEMPLATE', 'a.nc, b.nc')
+    config.set('filename_templates', 'GRID_DIAG_OUTPUT_TEMPLATE', 'out.nc')
+    if chunk_size is not None:
+        config.set('config', 'GRID_DIAG_CHUNK_SIZE', chunk_size)
+    if max_memory is not None:
+        config.set('config', 'GRID_DIAG_CHUNK_MAX_MEMORY_MB', max_memory)
+    return GridDiagWrapper(config, config.logger)
+
+def test_chunks_disabled():
+    wrapper = grid_diag_wrapper()
+    assert(wrapper.isOK)
+    wrapper.c_dict['INPUT_FILE_GROUPS'] = [{0: ['a0'], 1: ['a1']},
+                                           {0: ['b0'], 1: ['b1']}]
+    assert(wrapper.get_chunks() == [[0, 1]])
+
+def test_chunk_size_negative():
+    wrapper = grid_diag_wrapper(-1)
+    assert(not wrapper.isOK)
+
+@pytest.mark.parametrize(
+    'chunk_size, expected_chunks', [
+        (1, [[0], [1], [2], [4]]),
+        (2, [[0, 1], [2, 4]]),
+        (3, [[0, 1, 2], [4]]),
+        (10, [[0, 1, 2, 4]]),
+    ]
+)
+def test_get_chunks(chunk_size, expected_chunks):
+    wrapper = grid_diag_wrapper()
+    wrapper.c_dict['CHUNK_SIZE'] = chunk_size
+    # lead 3 is skipped because the second template has no files for it
+    wrapper.c_dict['INPUT_FILE_GROUPS'] = [
+        {index: [f'a{index}'] for index in range(5)},
+        {index: [f'b{index}'] for index in (0, 1, 2, 4)},
+    ]
+    assert(wrapper.get_chunks() == expected_chunks)
+
+def test_no_chunks_if_commands_are_not_run():
+    wrapper = grid_diag_wrapper()
+    wrapper.c_dict['CHUNK_SIZE'] = 1
+    wrapper.c_dict['INPUT_FILE_GROUPS'] = [{0: ['a0'], 1: ['a1']}]
+    assert(wrapper.get_chunks() == [[0], [1]])
+
+    # histograms cannot be summed if the commands do not run
+    wrapper.config.set('config', 'DO_NOT_RUN_EXE', True)
+    assert(wrapper.get_chunks() == [[0, 1]])
+    wrapper.config.set('config', 'DO_NOT_RUN_EXE', False)
+
+    # or are deferred to an MPMD batch
+    wrapper.cmdrunner.mpmd_batch = MPMDBatch(wrapper.config)
+    assert(wrapper.get_chunks() == [[0, 1]])
+
+def test_run_chunks_env_per_job():
+    wrapper = grid_diag_wrapper(chunk_size=1)
+    wrapper.c_dict['INPUT_FILE_GROUPS'] = [{0: ['a0'], 1: ['a1']}]
+    wrapper.c_dict['VAR_LIST_TEMP'] = []
+    time_info = time_util.ti_calculate({'valid': datetime.datetime(2020, 1, 1),
+                                        'lead': 0})
+    wrapper.set_output_path('out.nc')
+
+    captured_jobs = []
+    def run_commands_in_parallel(jobs, max_workers):
+        captured_jobs.extend(jobs)
+        # change the environment like the next run time would
+        wrapper.env['DATA_FIELD'] = 'changed'
+        return False
+    wrapper.run_commands_in_parallel = run_commands_in_parallel
+
+    wrapper.run_chunks(time_info, [[0], [1]])
+    envs = [job[1] for job in captured_jobs]
+    assert(len(envs) == 2)
+    assert(envs[0] is not envs[1])
+    assert(all(env is not wrapper.env for env in envs))
+    assert(all(env.get('DATA_FIELD') != 'changed' for env in envs))
+
+def test_get_chunk_size_memory(tmp_path):
+    wrapper = grid_diag_wrapper()
+    wrapper.c_dict['CHUNK_MAX_MEMORY_MB'] = 1
+    file_groups = {}
+    for index in range(8):
+        path = tmp_path / f'in{index}.nc'
+        path.write_bytes(b'\0' * 256 * 1024)
+        file_groups[index] = [str(path)]
+    wrapper.c_dict['INPUT_FILE_GROUPS'] = [file_groups]
+
+    # 4 files of 256 KB fit in 1 MB
+    assert(wrapper.get_chunk_size(list(range(8))) == 4)
+
+    # chunk size is used if it is smaller
+    wrapper.c_dict['CHUNK_SIZE'] = 3
+    assert(wrapper.get_chunk_size(list(range(8))) == 3)
+
+def test_sum_histograms(tmp_path):
+    numpy = pytest.importorskip('numpy')
+    netCDF4 = pytest.importorskip('netCDF4')
+
+    paths = []
+    for index in range(3):
+        path = str(tmp_path / f'out_chunk{index}.nc')
+        with netCDF4.Dataset(path, 'w') as dataset:
+            dataset.createDimension('TMP_Z2', 4)
+            dataset.createVariable('TMP_Z2_mid', 'f8', ('TMP_Z2',))[:] = \
+                [1., 2., 3., 4.]
+            dataset.createVariable('hist_TMP_Z2', 'i4', ('TMP_Z2',))[:] = \
+                [index, 1, 2, 3]
+        paths.append(path)
+
+    out_path = str(tmp_path / 'out.nc')
+    histogram_merge.sum_histograms(paths, out_path)
+    with netCDF4.Dataset(out_path, 'r') as dataset:
+        assert(list(dataset.variables['hist_TMP_Z2'][:]) == [3, 3, 6, 9])
+        assert(list(dataset.variables['TMP_Z2_mid'][:]) == [1., 2., 3., 4.])
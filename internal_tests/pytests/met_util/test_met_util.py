@@ -6,6 +6,8 @@ import datetime
 import os
 import subprocess
 import shutil
+import gzip
+import time
 from dateutil.relativedelta import relativedelta
 from csv import reader
 
@@ -14,6 +16,7 @@ import produtil
 from metplus.util import met_util as util
 from metplus.util import time_util
 from metplus.util.config import config_metplus
+from metplus.util.directory_walker import DirectoryWalker
 
 #@pytest.fixture
 def metplus_config():
@@ -161,6 +164,183 @@ def test_preprocess_file_none():
     outpath = util.preprocess_file(None, None, conf)
     assert(outpath is None)
 
+def test_preprocess_files_parallel(tmp_path):
+    conf = metplus_config()
+    conf.set('config', 'STAGING_MAX_WORKERS', 4)
+    stage_dir = conf.getdir('STAGING_DIR')
+    filepaths = []
+    for index in range(6):
+        filepath = str(tmp_path / f'member{index}.txt')
+        with gzip.open(filepath + '.gz', 'wb') as file_handle:
+            file_handle.write(f'member {index}'.encode())
+        filepaths.append(filepath)
+    missing = str(tmp_path / 'missing.txt')
+
+    outpaths = util.preprocess_files(filepaths + [missing, filepaths[0]],
+                                     None, conf)
+    assert(outpaths[:-2] == [stage_dir + filepath for filepath in filepaths])
+    assert(outpaths[-2] is None)
+    assert(outpaths[-1] == outpaths[0])
+    for index, outpath in enumerate(outpaths[:-2]):
+        with open(outpath) as file_handle:
+            assert(file_handle.read() == f'member {index}')
+
+    # staged files are reused if the file they were staged from is removed
+    os.remove(filepaths[0] + '.gz')
+    assert(util.preprocess_file(filepaths[0], None, conf) == outpaths[0])
+
+    # file is staged again if the file it was staged from changed
+    with gzip.open(filepaths[1] + '.gz', 'wb') as file_handle:
+        file_handle.write(b'updated member 1')
+    source_stat = os.stat(filepaths[1] + '.gz')
+    os.utime(filepaths[1] + '.gz', ns=(source_stat.st_atime_ns,
+                                       source_stat.st_mtime_ns + 10**9))
+    assert(util.preprocess_file(filepaths[1], None, conf) == outpaths[1])
+    with open(outpaths[1]) as file_handle:
+        assert(file_handle.read() == 'updated member 1')
+
+def test_write_through_tmp(tmp_path):
+    outpath = str(tmp_path / 'sub' / 'out.txt')
+    with util.write_through_tmp(outpath) as tmp_file:
+        assert(not os.path.exists(outpath))
+        with open(tmp_file, 'w') as file_handle:
+            file_handle.write('first')
+    with open(outpath) as file_handle:
+        assert(file_handle.read() == 'first')
+
+    # existing file is kept and the temporary file is removed on failure
+    with pytest.raises(ValueError):
+        with util.write_through_tmp(outpath) as tmp_file:
+            with open(tmp_file, 'w') as file_handle:
+                file_handle.write('partial')
+            raise ValueError('failed')
+    with open(outpath) as file_handle:
+        assert(file_handle.read() == 'first')
+    assert(os.listdir(os.path.dirname(outpath)) == ['out.txt'])
+
+    copied = str(tmp_path / 'copy' / 'out.txt')
+    assert(util.copy_file(outpath, copied) == copied)
+    with open(copied) as file_handle:
+        assert(file_handle.read() == 'first')
+
+def set_dir_age(dirname, age):
+    """! Set the modification time of a directory to age seconds ago.
+         Listings of directories that were modified less than
+         DirectoryWalker.MTIME_GRANULARITY before they were listed are
+         not reused"""
+    old_time = time.time() - age
+    os.utime(dirname, (old_time, old_time))
+
+def test_input_file_index(tmp_path):
+    conf = metplus_config()
+    for name in ('mem01.nc', 'mem02.nc.gz', 'mem03.grd', '.hidden.nc',
+                 'other.txt'):
+        (tmp_path / name).write_text('')
+    set_dir_age(tmp_path, 20)
+
+    index = util.InputFileIndex(conf)
+    assert(index.exists(str(tmp_path / 'mem01.nc')))
+    assert(index.exists(str(tmp_path / 'mem02.nc')))
+    assert(index.exists(str(tmp_path / 'mem03.nc')))
+    assert(not index.exists(str(tmp_path / 'mem04.nc')))
+    assert(not index.exists(str(tmp_path / 'missing' / 'mem01.nc')))
+    assert(index.glob(str(tmp_path / 'mem*.nc*')) ==
+           [str(tmp_path / name) for name in ('mem01.nc', 'mem02.nc.gz')])
+
+    # listing is reused until refresh finds a change
+    (tmp_path / 'mem04.nc').write_text('')
+    assert(not index.exists(str(tmp_path / 'mem04.nc')))
+    set_dir_age(tmp_path, 10)
+    assert(index.refresh())
+    assert(index.exists(str(tmp_path / 'mem04.nc')))
+    assert(not index.refresh())
+
+def test_input_file_index_racy_mtime(tmp_path):
+    conf = metplus_config()
+    (tmp_path / 'mem01.nc').write_text('')
+    recent_ns = int(time.time() * 10**9)
+    os.utime(tmp_path, ns=(recent_ns, recent_ns))
+
+    # directory was modified right before it was listed, so a file added
+    # without changing its modification time is still found
+    index = util.InputFileIndex(conf)
+    assert(index.exists(str(tmp_path / 'mem01.nc')))
+    (tmp_path / 'mem02.nc').write_text('')
+    os.utime(tmp_path, ns=(recent_ns, recent_ns))
+    assert(index.exists(str(tmp_path / 'mem02.nc')))
+    assert(index.refresh())
+
+    # listing is reused once the directory is older than the granularity
+    old_ns = recent_ns - 2 * DirectoryWalker.MTIME_GRANULARITY
+    os.utime(tmp_path, ns=(old_ns, old_ns))
+    assert(index.exists(str(tmp_path / 'mem02.nc')))
+    assert(not index.refresh())
+    (tmp_path / 'mem03.nc').write_text('')
+    os.utime(tmp_path, ns=(old_ns, old_ns))
+    assert(not index.exists(str(tmp_path / 'mem03.nc')))
+    assert(not index.refresh())
+
+    # the file catalog lists racy directories again in the same way
+    catalog = util.FileCatalog(conf)
+    os.utime(tmp_path, ns=(recent_ns, recent_ns))
+    assert(catalog.isfile(str(tmp_path / 'mem03.nc')))
+    (tmp_path / 'mem04.nc').write_text('')
+    os.utime(tmp_path, ns=(recent_ns, recent_ns))
+    assert(catalog.isfile(str(tmp_path / 'mem04.nc')))
+
+def test_input_file_index_max_listings(tmp_path):
+    conf = metplus_config()
+    dirs = []
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'file.nc').write_text('')
+        dirs.append(str(tmp_path / name))
+
+    index = util.InputFileIndex(conf)
+    index.MAX_LISTINGS = 2
+    assert(index.exists(os.path.join(dirs[0], 'file.nc')))
+    assert(index.exists(os.path.join(dirs[1], 'file.nc')))
+    # use the first listing again so the second is removed first
+    assert(index.exists(os.path.join(dirs[0], 'file.nc')))
+    assert(index.exists(os.path.join(dirs[2], 'file.nc')))
+    assert(list(index.listings) == [dirs[0], dirs[2]])
+
+def test_file_catalog(tmp_path):
+    conf = metplus_config()
+    assert(util.get_file_catalog(conf) is None)
+    conf.set('config', 'USE_FILE_CATALOG', True)
+    catalog = util.get_file_catalog(conf)
+    assert(catalog is util.get_file_catalog(conf))
+
+    (tmp_path / 'sub').mkdir()
+    with gzip.open(str(tmp_path / 'sub' / 'in.nc.gz'), 'wb') as file_handle:
+        file_handle.write(b'CDF\x01\x00\x00\x00\x00')
+    (tmp_path / 'file.txt').write_text('data')
+
+    assert(catalog.isfile(str(tmp_path / 'file.txt')))
+    assert(catalog.isdir(str(tmp_path / 'sub')))
+    assert(not catalog.isfile(str(tmp_path / 'sub')))
+    assert(not catalog.path_exists(str(tmp_path / 'missing')))
+    assert(catalog.stat(str(tmp_path / 'file.txt')).st_size == 4)
+    assert(catalog.exists(str(tmp_path / 'sub' / 'in.nc')))
+
+    # staged file is found by the catalog after it is written
+    conf.set('dir', 'STAGING_DIR', str(tmp_path / 'stage'))
+    staged = util.preprocess_file(str(tmp_path / 'sub' / 'in.nc'), None, conf)
+    assert(staged == str(tmp_path / 'stage') + str(tmp_path / 'sub' / 'in.nc'))
+    assert(catalog.isfile(staged))
+    assert(catalog.get_filetype(staged) == util.get_filetype(staged))
+    assert(len(catalog.filetypes) == 1)
+
+    # listing is updated when a file is written by a command
+    set_dir_age(tmp_path, 20)
+    assert(catalog.isfile(str(tmp_path / 'file.txt')))
+    new_file = tmp_path / 'new.txt'
+    new_file.write_text('')
+    assert(not catalog.isfile(str(new_file)))
+    catalog.invalidate(str(new_file))
+    assert(catalog.isfile(str(new_file)))
+
 def test_getlist():
     l = 'gt2.7, >3.6, eq42'
     test_list = util.getlist(l)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util.mpmd_batch import MPMDBatch
+from metplus.util.config import config_metplus
+from metplus.wrappers.command_builder import CommandBuilder
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='MPMDBatch',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='MPMDBatch')
+        produtil.log.postmsg('mpmd_batch test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'mpmd_batch test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+class FailOddHoursWrapper(CommandBuilder):
+    """!Wrapper that runs one command per run time. The command fails for
+        odd hours"""
+    mpmd_supported = True
+
+    def __init__(self, config, logger):
+        self.app_name = 'fail_odd_hours'
+        super().__init__(config, logger)
+
+    def run_at_time(self, input_dict):
+        hour = input_dict['init'].hour
+        ret, _ = self.cmdrunner.run_cmd(f'sh -c "echo hour {hour}; exit {hour % 2}"',
+                                        self.env, app_name=self.app_name)
+        if ret != 0:
+            self.log_error('command failed')
+
+class ReadsOutputWrapper(FailOddHoursWrapper):
+    """!Wrapper that reads the output of its command in the same run time,
+        so its commands cannot be deferred"""
+    mpmd_supported = False
+
+    def run_at_time(self, input_dict):
+        assert self.cmdrunner.mpmd_batch is None
+        out_file = os.path.join(self.config.getdir('OUTPUT_BASE'),
+                                'mpmd_reads_output.txt')
+        ret, _ = self.cmdrunner.run_cmd(f'sh -c "echo done > {out_file}"',
+                                        self.env, app_name=self.app_name)
+        if ret != 0 or not os.path.exists(out_file):
+            self.log_error('output was not written')
+        os.remove(out_file)
+
+def test_mpmd_batch_statuses_and_logs():
+    config = metplus_config()
+    batch = MPMDBatch(config)
+    env = os.environ.copy()
+    env['MPMD_TEST_VAR'] = 'it works'
+    log_dest = os.path.join(config.getdir('OUTPUT_BASE'), 'mpmd_test.log')
+    if os.path.exists(log_dest):
+        os.remove(log_dest)
+
+    batch.add('sh -c "echo $MPMD_TEST_VAR"', env, log_dest)
+    batch.add('sh -c "exit 3"')
+    batch.add('/this/does/not/exist')
+
+    failed = batch.run()
+    assert [command['status'] for command in failed] == [3, 127]
+    assert batch.commands[0]['status'] == 0
+    with open(batch.commands[0]['log_file']) as rank_log:
+        assert rank_log.read() == 'it works\n'
+
+    # only changed environment variables are written to the rank script
+    assert batch.commands[0]['env'] == {'MPMD_TEST_VAR': 'it works'}
+    with open(log_dest) as log_file:
+        assert 'it works' in log_file.read()
+
+@pytest.mark.parametrize(
+    'batch_size, max_ranks', [
+        (0, 0),
+        (2, 0),
+        (0, 1),
+    ]
+)
+def test_loop_over_mpmd_batches(batch_size, max_ranks):
+    config = metplus_config()
+    config.set('config', 'USE_MPMD', True)
+    config.set('config', 'MPMD_BATCH_SIZE', batch_size)
+    config.set('config', 'MPMD_MAX_RANKS', max_ranks)
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2020010100')
+    config.set('config', 'INIT_END', '2020010103')
+    config.set('config', 'INIT_INCREMENT', '1H')
+
+    wrapper = FailOddHoursWrapper(config, config.logger)
+    wrapper.run_all_times()
+
+    # commands were deferred, so the wrapper did not see any failures itself.
+    # the two odd hours are counted once the batch has run
+    assert wrapper.errors == 2
+    assert wrapper.cmdrunner.mpmd_batch is None
+
+def test_loop_over_mpmd_batches_not_supported():
+    config = metplus_config()
+    config.set('config', 'USE_MPMD', True)
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2020010100')
+    config.set('config', 'INIT_END', '2020010101')
+    config.set('config', 'INIT_INCREMENT', '1H')
+
+    wrapper = ReadsOutputWrapper(config, config.logger)
+    wrapper.run_all_times()
+
+    # the command ran right away so its output could be read
+    assert wrapper.errors == 0
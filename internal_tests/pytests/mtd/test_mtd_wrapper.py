@@ -13,6 +13,7 @@ import produtil
 from metplus.util.config import config_metplus
 from metplus.wrappers.mtd_wrapper import MTDWrapper
 from metplus.util import met_util as util
+from metplus.util import ti_calculate
 
 # --------------------TEST CONFIGURATION and FIXTURE SUPPORT -------------
 #
@@ -231,3 +232,56 @@ def test_mtd_single():
            single_list[1] == os.path.join(fcst_dir,'20170510', '20170510_i03_f002_HRRRTLE_PHPT.grb2') and
            single_list[2] == os.path.join(fcst_dir,'20170510', '20170510_i03_f003_HRRRTLE_PHPT.grb2')
            )
+
+def test_mtd_find_data_batch():
+    mw = mtd_wrapper('3, 6, 9, 12')
+    fcst_dir = mw.config.getdir('METPLUS_BASE')+"/internal_tests/data/fcst"
+    mw.c_dict['FCST_INPUT_DIR'] = fcst_dir
+    mw.c_dict['FCST_INPUT_TEMPLATE'] = "{init?fmt=%Y%m%d}/{init?fmt=%Y%m%d}_i{init?fmt=%H}_f{lead?fmt=%.3H}_HRRRTLE_PHPT.grb2"
+    input_dict = {'init' : datetime.datetime.strptime("201705100300", '%Y%m%d%H%M') }
+    time_infos = []
+    for lead in [3, 6, 9, 12]:
+        input_dict['lead'] = lead * 3600
+        time_infos.append(ti_calculate(input_dict))
+
+    file_index = util.InputFileIndex(mw.config)
+    found = mw.find_data_batch(time_infos, data_type='FCST', mandatory=False,
+                               file_index=file_index)
+
+    expected = [mw.find_model(time_info, mandatory=False)
+                for time_info in time_infos]
+    assert found == expected
+    assert found[2] is None
+    assert found[3] == os.path.join(fcst_dir, '20170510',
+                                    '20170510_i03_f012_HRRRTLE_PHPT.grb2')
+    # the input directory was only listed once for all leads. The staging
+    # directory is also checked for the file that was not found
+    stage_dir = mw.config.getdir('STAGING_DIR')
+    assert sorted(file_index.listings) == sorted(
+        [os.path.join(fcst_dir, '20170510'),
+         stage_dir + os.path.join(fcst_dir, '20170510')]
+    )
+
+def test_mtd_find_data_batch_window():
+    mw = mtd_wrapper('1, 2, 3')
+    obs_dir = mw.config.getdir('METPLUS_BASE')+"/internal_tests/data/obs"
+    mw.c_dict['OBS_INPUT_DIR'] = obs_dir
+    mw.c_dict['OBS_INPUT_TEMPLATE'] = "{valid?fmt=%Y%m%d}/qpe_{valid?fmt=%Y%m%d%H}_A{level?fmt=%.2H}.nc"
+    mw.c_dict['OBS_FILE_WINDOW_BEGIN'] = -3600
+    mw.c_dict['OBS_FILE_WINDOW_END'] = 3600
+    input_dict = {'init' : datetime.datetime.strptime("201705100300", '%Y%m%d%H%M') }
+    time_infos = []
+    for lead in [1, 2, 3]:
+        input_dict['lead'] = lead * 3600
+        time_infos.append(ti_calculate(input_dict))
+
+    file_index = util.InputFileIndex(mw.config)
+    found = mw.find_data_batch(time_infos, data_type='OBS', mandatory=False,
+                               file_index=file_index)
+
+    expected = [mw.find_obs(time_info, mandatory=False)
+                for time_info in time_infos]
+    assert found == expected
+    assert found[0] == os.path.join(obs_dir, '20170510', 'qpe_2017051004_A06.nc')
+    # the directory tree was only walked once for all leads
+    assert len(file_index.file_times) == 1
@@ -4,6 +4,8 @@ import os
 import sys
 import re
 import logging
+import shutil
+import time
 from collections import namedtuple
 import pytest
 import datetime
@@ -214,3 +216,74 @@ def test_find_input_files(offsets, offset_to_find):
         assert result is None
     else:
         assert result['offset_hours'] == offset_to_find
+
+# test that offsets are checked with listings that are shared by each call
+# and that files written after the directory was listed are found
+def test_find_input_files_offset_index():
+    pb = pb2nc_wrapper()
+    input_dict = { 'valid' : datetime.datetime(2019, 2, 2, 12) }
+    fake_input_dir = os.path.join(pb.config.getdir('OUTPUT_BASE'),
+                                  'pbin_index')
+    if os.path.exists(fake_input_dir):
+        shutil.rmtree(fake_input_dir)
+    os.makedirs(fake_input_dir)
+
+    pb.c_dict['OBS_INPUT_DIR'] = fake_input_dir
+    pb.c_dict['OFFSETS'] = [2, 3]
+
+    def create_offset_file(offset):
+        time_info = time_util.ti_calculate(dict(input_dict,
+                                                offset=int(offset * 3600)))
+        create_file = do_string_sub(pb.c_dict['OBS_INPUT_TEMPLATE'],
+                                    **time_info)
+        open(os.path.join(fake_input_dir, create_file), 'a').close()
+
+    create_offset_file(3)
+    result = pb.find_input_files(dict(input_dict))
+    assert result['offset_hours'] == 3
+    assert os.path.join(fake_input_dir, '') in \
+        [os.path.join(dirname, '') for dirname in pb.input_index.listings]
+
+    # make sure the modification time of the directory changes
+    time.sleep(0.01)
+    create_offset_file(2)
+    result = pb.find_input_files(dict(input_dict))
+    assert result['offset_hours'] == 2
+
+# test that the listings are only checked for changes once per run time
+def test_find_input_files_offset_index_run_time():
+    pb = pb2nc_wrapper()
+    fake_input_dir = os.path.join(pb.config.getdir('OUTPUT_BASE'),
+                                  'pbin_index_run_time')
+    if os.path.exists(fake_input_dir):
+        shutil.rmtree(fake_input_dir)
+    os.makedirs(fake_input_dir)
+
+    pb.c_dict['OBS_INPUT_DIR'] = fake_input_dir
+    pb.c_dict['OFFSETS'] = [2, 3]
+
+    first_run = time_util.ti_calculate({'valid': datetime.datetime(2019, 2, 2, 12)})
+    second_run = time_util.ti_calculate({'valid': datetime.datetime(2019, 2, 2, 18)})
+
+    def create_offset_file(run_time, offset):
+        time_info = time_util.ti_calculate(dict(run_time,
+                                                offset_hours=offset))
+        create_file = do_string_sub(pb.c_dict['OBS_INPUT_TEMPLATE'],
+                                    **time_info)
+        open(os.path.join(fake_input_dir, create_file), 'a').close()
+
+    # directories modified right before they are listed are listed again
+    create_offset_file(first_run, 3)
+    old_time = time.time() - 20
+    os.utime(fake_input_dir, (old_time, old_time))
+    result = pb.find_input_files(dict(first_run))
+    assert result['offset_hours'] == 3
+
+    # files written during the same run time are found at the next run time
+    create_offset_file(first_run, 2)
+    create_offset_file(second_run, 2)
+    result = pb.find_input_files(dict(first_run))
+    assert result['offset_hours'] == 3
+
+    result = pb.find_input_files(dict(second_run))
+    assert result['offset_hours'] == 2
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import os
+import datetime
+import pytest
+
+from metplus.util import pcp_accumulation
+from metplus.util.pcp_accumulation import (AccumulationError, Field,
+                                           FieldCache, parse_field_info,
+                                           get_level_index, combine_fields)
+
+numpy = pytest.importorskip('numpy')
+
+def make_field(values, path='file.nc'):
+    data = numpy.ma.masked_equal(numpy.array(values, dtype='float64'),
+                                 pcp_accumulation.FILL_VALUE)
+    return Field(path, 'APCP_01', data, {}, ('lat', 'lon'))
+
+@pytest.mark.parametrize(
+    'addon, expected', [
+        ("'name=\"APCP_01\";'", ('APCP_01', None, None)),
+        ("'name=\"APCP_01\"; level=\"(0,*,*)\";'", ('APCP_01', '(0,*,*)', None)),
+        ('01', (None, None, 3600)),
+        ('010000', (None, None, 3600)),
+        ('003000', (None, None, 1800)),
+    ]
+)
+def test_parse_field_info(addon, expected):
+    assert parse_field_info(addon) == expected
+
+@pytest.mark.parametrize(
+    'addon', [
+        "'name=\"APCP_01\"; censor_thresh=[lt0];'",
+        "'level=\"(*,*)\";'",
+    ]
+)
+def test_parse_field_info_unsupported(addon):
+    with pytest.raises(AccumulationError):
+        parse_field_info(addon)
+
+@pytest.mark.parametrize(
+    'level, num_dims, expected', [
+        (None, 2, (slice(None), slice(None))),
+        ('(*,*)', 2, (slice(None), slice(None))),
+        ('(3,*,*)', 3, (3, slice(None), slice(None))),
+    ]
+)
+def test_get_level_index(level, num_dims, expected):
+    assert get_level_index(level, num_dims) == expected
+
+@pytest.mark.parametrize(
+    'level, num_dims', [
+        ('(*,*)', 3),
+        ('(*,*,*)', 3),
+        ('(0,0)', 2),
+        ('P500', 2),
+    ]
+)
+def test_get_level_index_unsupported(level, num_dims):
+    with pytest.raises(AccumulationError):
+        get_level_index(level, num_dims)
+
+def test_combine_fields_add_masks_missing():
+    fields = [make_field([[1., 2.], [3., -9999.]]),
+              make_field([[1., 1.], [1., 1.]]),
+              make_field([[0.5, 0.], [0., 1.]])]
+    result = combine_fields(fields, 'ADD')
+    assert result.tolist() == [[2.5, 3.], [4., None]]
+    # inputs are not modified
+    assert fields[0].data[0, 0] == 1.
+
+def test_combine_fields_subtract():
+    fields = [make_field([[6., 4.]]), make_field([[2., 1.]])]
+    assert combine_fields(fields, 'SUBTRACT').tolist() == [[4., 3.]]
+
+def test_combine_fields_grid_mismatch():
+    fields = [make_field([[1., 2.]]), make_field([[1.], [2.]])]
+    with pytest.raises(AccumulationError):
+        combine_fields(fields, 'ADD')
+
+def test_field_cache_reads_once(tmp_path, monkeypatch):
+    paths = []
+    for hour in range(3):
+        path = tmp_path / f'file{hour}.nc'
+        path.write_text('')
+        paths.append(str(path))
+
+    read = []
+    def fake_read(path, name, level=None, accum=None):
+        read.append(path)
+        return make_field([[1.]], path)
+    monkeypatch.setattr(pcp_accumulation, 'read_field', fake_read)
+
+    cache = FieldCache(max_fields=2)
+    # rolling 2 file sums re-use the file shared by both windows
+    for window in (paths[0:2], paths[1:3]):
+        for path in window:
+            cache.get_field(path, 'APCP_01')
+    assert read == paths
+    assert cache.reads == 3
+    assert len(cache.fields) == 2
+
+def test_compute_accumulation_netcdf(tmp_path):
+    netCDF4 = pytest.importorskip('netCDF4')
+
+    infiles = []
+    for hour in range(3):
+        path = str(tmp_path / f'in{hour}.nc')
+        with netCDF4.Dataset(path, 'w') as dataset:
+            dataset.setncattr('Projection', 'LatLon')
+            dataset.createDimension('lat', 2)
+            dataset.createDimension('lon', 2)
+            lat = dataset.createVariable('lat', 'f4', ('lat',))
+            lat[:] = [40., 41.]
+            var = dataset.createVariable('APCP_01', 'f4', ('lat', 'lon'),
+                                         fill_value=-9999.)
+            var.setncatts({'units': 'kg/m^2', 'accum_time_sec': 3600})
+            var[:] = [[hour, 1.], [2., -9999. if hour == 2 else 0.]]
+        infiles.append(path)
+
+    out_path = str(tmp_path / 'out' / 'out.nc')
+    time_info = {'init': datetime.datetime(2019, 1, 1, 0),
+                 'valid': datetime.datetime(2019, 1, 1, 3)}
+    cache = FieldCache()
+    name = pcp_accumulation.compute_accumulation(
+        cache, 'ADD', infiles, ["'name=\"APCP_01\";'", '01', '010000'],
+        time_info, 10800, out_path
+    )
+    assert name == 'APCP_03'
+
+    with netCDF4.Dataset(out_path) as dataset:
+        assert dataset.getncattr('Projection') == 'LatLon'
+        assert 'lat' in dataset.variables
+        var = dataset.variables['APCP_03']
+        assert var.getncattr('accum_time') == '030000'
+        assert var.getncattr('valid_time') == '20190101_030000'
+        assert var.getncattr('units') == 'kg/m^2'
+        data = var[:]
+        assert data[0, 0] == 3.
+        assert data[0, 1] == 3.
+        assert data.mask[1, 1]
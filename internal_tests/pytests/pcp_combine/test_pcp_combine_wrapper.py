@@ -282,3 +282,60 @@ def test_setup_subtract_method():
     out_file = pcw.get_output_path()    
     assert(len(in_files) == 2)
 
+
+def test_forecast_file_index_refresh(tmp_path):
+    dtype = "FCST"
+    pcw = pcp_combine_wrapper(dtype)
+    valid_time = datetime.datetime.strptime("2018020121", '%Y%m%d%H')
+    template = "file.{init?fmt=%Y%m%d%H}f{lead?fmt=%HHH}.nc"
+    pcw.input_dir = str(tmp_path)
+    pcw.build_input_accum_list(dtype, {'valid': valid_time})
+
+    # compressed files are found using the directory listing
+    (tmp_path / "file.2018020115f006.nc.gz").write_bytes(b'')
+    out_file, fcst = pcw.getLowestForecastFile(valid_time, dtype, template)
+    assert(fcst == 21600)
+    assert(out_file.endswith("file.2018020115f006.nc"))
+
+    # stored result is used until the directory changes
+    (tmp_path / "file.2018020118f003.nc").write_text('')
+    out_file, fcst = pcw.getLowestForecastFile(valid_time, dtype, template)
+    assert(fcst == 21600)
+
+    pcw.file_index.refresh()
+    out_file, fcst = pcw.getLowestForecastFile(valid_time, dtype, template)
+    assert(out_file == str(tmp_path / "file.2018020118f003.nc"))
+    assert(fcst == 10800)
+
+def test_forecast_file_index_missing_dir(tmp_path):
+    dtype = "FCST"
+    pcw = pcp_combine_wrapper(dtype)
+    valid_time = datetime.datetime.strptime("2018020121", '%Y%m%d%H')
+    template = "{init?fmt=%Y%m%d}/file.{init?fmt=%Y%m%d%H}f{lead?fmt=%HHH}.nc"
+    pcw.input_dir = str(tmp_path)
+    pcw.build_input_accum_list(dtype, {'valid': valid_time})
+    assert(pcw.getLowestForecastFile(valid_time, dtype, template) == (None, 0))
+
+    sub_dir = tmp_path / "20180201"
+    sub_dir.mkdir()
+    (sub_dir / "file.2018020120f001.nc").write_text('')
+    pcw.file_index.refresh()
+    out_file, fcst = pcw.getLowestForecastFile(valid_time, dtype, template)
+    assert(out_file == str(sub_dir / "file.2018020120f001.nc"))
+    assert(fcst == 3600)
+
+def test_invalid_backend():
+    conf = metplus_config()
+    conf.set('config', 'FCST_PCP_COMBINE_RUN', True)
+    conf.set('config', 'PCP_COMBINE_BACKEND', 'FORTRAN')
+    pcw = PCPCombineWrapper(conf, conf.logger)
+    assert(not pcw.isOK)
+
+def test_numpy_backend_skips_grib():
+    dtype = "FCST"
+    pcw = pcp_combine_wrapper(dtype)
+    pcw.c_dict['BACKEND'] = 'NUMPY'
+    pcw.c_dict['FCST_INPUT_DATATYPE'] = 'GRIB'
+    pcw.method = 'ADD'
+    pcw.accum_seconds = 3600
+    assert(not pcw.run_numpy_backend({}, dtype, 'pcp_combine'))
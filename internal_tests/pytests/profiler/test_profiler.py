@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import shutil
+import pstats
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util import profiler
+from metplus.util.config import config_metplus
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='Profiler',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='Profiler')
+        produtil.log.postmsg('profiler test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'profiler test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def test_nested_sections_are_exclusive():
+    config = metplus_config()
+    config.command_metrics = []
+    metplus_profiler = profiler.METplusProfiler(config)
+    metplus_profiler.start()
+    with metplus_profiler.section('Outer'):
+        with metplus_profiler.section('Inner'):
+            config.command_metrics.append({'wall_time': 1.5})
+        with metplus_profiler.section('Outer'):
+            pass
+    metplus_profiler.stop()
+
+    assert set(metplus_profiler.sections) == {'METplus', 'Outer', 'Inner'}
+    assert not metplus_profiler.stack
+    inner = metplus_profiler.sections['Inner']
+    assert inner.command_count == 1
+    assert inner.child_wall_time == 1.5
+    assert metplus_profiler.sections['Outer'].command_count == 0
+
+@pytest.mark.parametrize(
+    'loop_order', [
+        'times',
+        'processes',
+    ]
+)
+def test_profile_run_metplus(loop_order):
+    config = metplus_config()
+    config.set('config', 'PROFILE_METPLUS', True)
+    config.set('config', 'DO_NOT_RUN_EXE', True)
+    config.set('config', 'LOOP_ORDER', loop_order)
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2020010100')
+    config.set('config', 'INIT_END', '2020010112')
+    config.set('config', 'INIT_INCREMENT', '12H')
+    config.set('config', 'LEAD_SEQ', '3')
+    output_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'profile_test')
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    config.set('dir', 'PROFILE_OUTPUT_DIR', output_dir)
+
+    assert profiler.start_profiling(config) is not None
+    assert util.run_metplus(config, ['Example']) == 0
+    profiler.write_profile_reports(config)
+
+    assert config.profiler is None
+    for name in ('METplus', 'Example'):
+        for extension in ('pstats', 'txt'):
+            assert os.path.exists(os.path.join(output_dir,
+                                               f'profile_{name}.{extension}'))
+
+    stats = pstats.Stats(os.path.join(output_dir, 'profile_Example.pstats'))
+    assert any(function == 'run_at_time'
+               for _, _, function in stats.stats)
+
+def test_profiling_disabled():
+    config = metplus_config()
+    assert profiler.start_profiling(config) is None
+    with profiler.profile_section(config, 'Example') as section:
+        assert section is None
+    profiler.write_profile_reports(config)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import shutil
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util import py_embed_cache
+from metplus.util.config import config_metplus
+from metplus.wrappers.py_embed_ingest_wrapper import PyEmbedIngestWrapper
+from metplus.wrappers.series_analysis_wrapper import SeriesAnalysisWrapper
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='PyEmbedCache',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='PyEmbedCache')
+        produtil.log.postmsg('py_embed_cache test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'py_embed_cache test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def get_cache_config():
+    config = metplus_config()
+    test_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'py_embed_cache_test')
+    if os.path.exists(test_dir):
+        shutil.rmtree(test_dir)
+    os.makedirs(test_dir)
+    config.set('config', 'PY_EMBED_CACHE', True)
+    config.set('dir', 'PY_EMBED_CACHE_DIR', os.path.join(test_dir, 'cache'))
+    return config, test_dir
+
+def write_file(path, contents):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file_handle:
+        file_handle.write(contents)
+
+def test_get_script_path():
+    assert(py_embed_cache.get_script_path('/a/read.py /b/in.nc x') ==
+           '/a/read.py')
+    assert(py_embed_cache.get_script_path('/a/in.nc') is None)
+
+def test_cache_key_changes():
+    config, test_dir = get_cache_config()
+    script = os.path.join(test_dir, 'read.py')
+    input_file = os.path.join(test_dir, 'in.nc')
+    write_file(script, 'print(1)\n')
+    write_file(input_file, 'data')
+
+    command = f'{script} {input_file}'
+    key = py_embed_cache.get_cache_key(command, 'PYTHON_NUMPY')
+    assert(key == py_embed_cache.get_cache_key(command, 'PYTHON_NUMPY'))
+
+    # arguments, data type and extra values are part of the key
+    assert(key != py_embed_cache.get_cache_key(f'{command} 2', 'PYTHON_NUMPY'))
+    assert(key != py_embed_cache.get_cache_key(command, 'PYTHON_XARRAY'))
+    assert(key != py_embed_cache.get_cache_key(command, 'PYTHON_NUMPY',
+                                               ['G002']))
+
+    # changing the input file changes the key
+    write_file(input_file, 'more data')
+    key2 = py_embed_cache.get_cache_key(command, 'PYTHON_NUMPY')
+    assert(key != key2)
+
+    # changing the script contents changes the key
+    write_file(script, 'print(2)\n')
+    assert(key2 != py_embed_cache.get_cache_key(command, 'PYTHON_NUMPY'))
+
+def test_cache_path_and_copy():
+    config, test_dir = get_cache_config()
+    key = 'ab' + '0' * 62
+    cache_path = py_embed_cache.get_cache_path(config, key)
+    assert(cache_path == os.path.join(test_dir, 'cache', 'ab', f'{key}.nc'))
+
+    src = os.path.join(test_dir, 'src.nc')
+    write_file(src, 'data')
+    util.copy_file(src, cache_path)
+    with open(cache_path) as file_handle:
+        assert(file_handle.read() == 'data')
+
+    # cached file is a copy so overwriting the source does not change it
+    write_file(src, 'new')
+    with open(cache_path) as file_handle:
+        assert(file_handle.read() == 'data')
+    assert(not [name for name in os.listdir(os.path.dirname(cache_path))
+                if '.tmp' in name])
+
+def test_py_embed_ingest_uses_cache():
+    config, test_dir = get_cache_config()
+    script = os.path.join(test_dir, 'read.py')
+    write_file(script, 'print(1)\n')
+    output_dir = os.path.join(test_dir, 'out')
+    config.set('config', 'PY_EMBED_INGEST_1_SCRIPT', f'{script} arg')
+    config.set('config', 'PY_EMBED_INGEST_1_TYPE', 'NUMPY')
+    config.set('config', 'PY_EMBED_INGEST_1_OUTPUT_GRID', 'G002')
+    config.set('config', 'PY_EMBED_INGEST_1_OUTPUT_FIELD_NAME', 'ivt')
+    config.set('dir', 'PY_EMBED_INGEST_1_OUTPUT_DIR', output_dir)
+    config.set('filename_templates', 'PY_EMBED_INGEST_1_OUTPUT_TEMPLATE',
+               'ivt.nc')
+
+    wrapper = PyEmbedIngestWrapper(config, config.logger)
+    assert(wrapper.isOK)
+
+    # add result to the cache so RegridDataPlane is not run
+    key = py_embed_cache.get_cache_key(f'{script} arg', 'PYTHON_NUMPY',
+                                       ['G002', 'ivt'])
+    write_file(py_embed_cache.get_cache_path(config, key), 'cached')
+
+    assert(wrapper.run_at_time_lead({}))
+    assert(wrapper.errors == 0)
+    assert(not wrapper.c_dict['regrid_data_plane'].all_commands)
+    with open(os.path.join(output_dir, 'ivt.nc')) as file_handle:
+        assert(file_handle.read() == 'cached')
+
+@pytest.mark.parametrize(
+    'input_type, names', [
+        ('FCST', ['fcst']),
+        ('BOTH', ['fcst', 'obs']),
+    ]
+)
+def test_check_for_python_embedding_cache(input_type, names):
+    config, test_dir = get_cache_config()
+    script = os.path.join(test_dir, 'read.py')
+    write_file(script, 'print(1)\n')
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2020010100')
+    config.set('config', 'INIT_END', '2020010100')
+    config.set('config', 'INIT_INCREMENT', '6H')
+    config.set('config', 'SERIES_ANALYSIS_CONFIG_FILE', 'SeriesAnalysisConfig')
+    wrapper = SeriesAnalysisWrapper(config, config.logger)
+    wrapper.c_dict[f'{input_type}_INPUT_DATATYPE'] = 'PYTHON_NUMPY'
+
+    file_list = [os.path.join(test_dir, f'in{index}.nc') for index in range(2)]
+    expected_files = []
+    for input_file in file_list:
+        key = py_embed_cache.get_cache_key(f'{script} {input_file}',
+                                           'PYTHON_NUMPY', ['py_embed_data'])
+        cache_path = py_embed_cache.get_cache_path(config, key)
+        write_file(cache_path, 'cached')
+        expected_files.append(cache_path)
+
+    var_info = {'fcst_name': f'{script} MET_PYTHON_INPUT_ARG',
+                'obs_name': f'{script} MET_PYTHON_INPUT_ARG',
+                'fcst_level': '', 'obs_level': ''}
+    assert(wrapper.check_for_python_embedding(input_type, var_info,
+                                              file_list) == 'py_embed_data')
+    assert(file_list == expected_files)
+    assert(wrapper.c_dict[f'{input_type}_FILE_TYPE'] == '')
+    for name in names:
+        assert(var_info[f'{name}_name'] == 'py_embed_data')
+        assert(var_info[f'{name}_level'] == '(*,*)')
+
+@pytest.mark.parametrize(
+    'exit_code', [0, 1]
+)
+def test_get_python_embedding_cache_file(exit_code):
+    config, test_dir = get_cache_config()
+    bin_dir = os.path.join(test_dir, 'bin')
+    # fake pcp_combine writes the path it was given to the output file
+    write_file(os.path.join(bin_dir, 'pcp_combine'),
+               '#!/bin/sh\n'
+               'for arg; do out=$arg; done\n'
+               'echo $out > $out\n'
+               f'exit {exit_code}\n')
+    os.chmod(os.path.join(bin_dir, 'pcp_combine'), 0o755)
+    config.set('dir', 'MET_BIN_DIR', bin_dir)
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2020010100')
+    config.set('config', 'INIT_END', '2020010100')
+    config.set('config', 'INIT_INCREMENT', '6H')
+    config.set('config', 'SERIES_ANALYSIS_CONFIG_FILE', 'SeriesAnalysisConfig')
+    wrapper = SeriesAnalysisWrapper(config, config.logger)
+
+    command = f'{test_dir}/read.py in.nc'
+    key = py_embed_cache.get_cache_key(command, 'PYTHON_NUMPY',
+                                       ['py_embed_data'])
+    cache_path = py_embed_cache.get_cache_path(config, key)
+    result = wrapper.get_python_embedding_cache_file('PYTHON_NUMPY', command)
+    if exit_code:
+        assert(result is None)
+        assert(not os.path.exists(cache_path))
+    else:
+        assert(result == cache_path)
+        # pcp_combine wrote a temporary file that was renamed
+        with open(cache_path) as file_handle:
+            assert(file_handle.read() == f'{cache_path}.tmp{os.getpid()}\n')
+
+    # the temporary file is never left in the cache
+    assert(not [name for name in os.listdir(os.path.dirname(cache_path))
+                if '.tmp' in name])
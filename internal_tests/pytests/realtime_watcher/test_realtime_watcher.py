@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import shutil
+import pytest
+from datetime import datetime
+
+import produtil
+from produtil.datastore import Datastore, COMPLETED
+
+from metplus.util import met_util as util
+from metplus.util import realtime_watcher
+from metplus.util.config import config_metplus
+from metplus.wrappers.example_wrapper import ExampleWrapper
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='RealtimeWatcher',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='RealtimeWatcher')
+        produtil.log.postmsg('realtime_watcher test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+
+        config.set('config', 'LOOP_BY', 'INIT')
+        config.set('config', 'LEAD_SEQ', '3, 6')
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'realtime_watcher test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def get_test_dir(config, name):
+    test_dir = os.path.join(config.getdir('OUTPUT_BASE'), 'realtime_watcher',
+                            name)
+    if os.path.exists(test_dir):
+        shutil.rmtree(test_dir)
+    os.makedirs(test_dir)
+    return test_dir
+
+@pytest.mark.parametrize(
+    'template, filename, loop_by, expected', [
+        # init and lead in filename
+        ('{init?fmt=%Y%m%d%H}/file_{lead?fmt=%3H}.nc',
+         '2020010100/file_006.nc', 'init',
+         [(datetime(2020, 1, 1, 0), '21600S')]),
+        ('{init?fmt=%Y%m%d%H}/file_{lead?fmt=%3H}.nc',
+         '2020010100/file_006.nc', 'valid',
+         [(datetime(2020, 1, 1, 6), '21600S')]),
+        # init and valid in filename
+        ('{init?fmt=%Y%m%d%H}/file_{valid?fmt=%Y%m%d%H}.nc',
+         '2020010100/file_2020010103.nc', 'init',
+         [(datetime(2020, 1, 1, 0), '10800S')]),
+        # only run time in filename, run all leads
+        ('file_{init?fmt=%Y%m%d%H}.nc', 'file_2020010100.nc', 'init',
+         [(datetime(2020, 1, 1, 0), '')]),
+        # only valid time in filename, find init time for each lead
+        ('obs_{valid?fmt=%Y%m%d%H}.nc', 'obs_2020010112.nc', 'init',
+         [(datetime(2020, 1, 1, 9), '10800S'),
+          (datetime(2020, 1, 1, 6), '21600S')]),
+        # file does not match template
+        ('obs_{valid?fmt=%Y%m%d%H}.nc', 'fcst_2020010112.nc', 'init', []),
+    ]
+)
+def test_get_file_tasks(template, filename, loop_by, expected):
+    config = metplus_config()
+    source = realtime_watcher.WatchSource('Example', '', '/data', [template])
+    path = os.path.join('/data', filename)
+    assert realtime_watcher.get_file_tasks(config, source, path,
+                                           loop_by) == expected
+
+@pytest.mark.parametrize(
+    'watcher_class', [
+        realtime_watcher.PollingWatcher,
+        realtime_watcher.InotifyWatcher,
+    ]
+)
+def test_watcher_finds_new_files(watcher_class):
+    if (watcher_class is realtime_watcher.InotifyWatcher and
+            not watcher_class.is_available()):
+        pytest.skip('inotify is not available')
+
+    config = metplus_config()
+    test_dir = get_test_dir(config, watcher_class.__name__)
+    existing = os.path.join(test_dir, 'existing.txt')
+    open(existing, 'w').close()
+    missing_dir = os.path.join(test_dir, 'later')
+
+    watcher = watcher_class([test_dir, missing_dir])
+    assert watcher.start(scan_existing=True) == [existing]
+    assert watcher.poll(0) == []
+
+    new_files = [os.path.join(test_dir, 'sub', 'new.txt'),
+                 os.path.join(missing_dir, 'late.txt')]
+    for new_file in new_files:
+        os.makedirs(os.path.dirname(new_file))
+        with open(new_file, 'w') as file_handle:
+            file_handle.write('data')
+
+    found = []
+    for _ in range(5):
+        found.extend(watcher.poll(0.1))
+    watcher.close()
+    assert sorted(found) == sorted(new_files)
+
+def test_realtime_watcher_runs_tasks_once():
+    config = metplus_config()
+    test_dir = get_test_dir(config, 'tasks')
+    config.set('config', 'EXAMPLE_INPUT_DIR', os.path.join(test_dir, 'input'))
+    config.set('filename_templates', 'EXAMPLE_INPUT_TEMPLATE',
+               '{init?fmt=%Y%m%d%H}/file_{lead?fmt=%3H}.nc')
+    config.set('config', 'REALTIME_WATCH_MAX_AGE', '100000D')
+    wrapper = ExampleWrapper(config, config.logger)
+    dstore = Datastore(os.path.join(test_dir, 'state.db'))
+
+    realtime = realtime_watcher.RealtimeWatcher(config, ['Example'],
+                                                {'Example': wrapper}, dstore)
+    assert realtime.get_directories() == [os.path.join(test_dir, 'input')]
+
+    path = os.path.join(test_dir, 'input', '2020010100', 'file_003.nc')
+    assert realtime.handle_file(path) == 1
+    assert realtime.handle_file(os.path.join(test_dir, 'input',
+                                             'unknown.nc')) == 0
+    # task does not run until the settle time passes
+    assert realtime.run_ready_tasks() == 0
+    assert realtime.run_ready_tasks(force=True) == 1
+    assert realtime.errors == 0
+
+    task = realtime.get_task('Example', datetime(2020, 1, 1), '10800S')
+    assert task is None
+    with dstore.transaction() as t:
+        rows = t.query('SELECT available FROM products WHERE type = ?',
+                       ('QueueTask',))
+    assert rows == [(COMPLETED,)]
+
+    # file for a completed task does not add it again
+    assert realtime.handle_file(path) == 0
+
+def test_realtime_watcher_reruns_completed_tasks():
+    config = metplus_config()
+    test_dir = get_test_dir(config, 'rerun')
+    config.set('config', 'EXAMPLE_INPUT_DIR', os.path.join(test_dir, 'input'))
+    config.set('filename_templates', 'EXAMPLE_INPUT_TEMPLATE',
+               '{init?fmt=%Y%m%d%H}/file_{valid?fmt=%Y%m%d%H}.nc, '
+               '{init?fmt=%Y%m%d%H}/extra_{valid?fmt=%Y%m%d%H}.nc')
+    config.set('config', 'LEAD_SEQ', '3')
+    config.set('config', 'REALTIME_WATCH_MAX_AGE', '100000D')
+    wrapper = ExampleWrapper(config, config.logger)
+    dstore = Datastore(os.path.join(test_dir, 'state.db'))
+    realtime = realtime_watcher.RealtimeWatcher(config, ['Example'],
+                                                {'Example': wrapper}, dstore)
+
+    def write_file(name, mtime):
+        path = os.path.join(test_dir, 'input', '2020010100', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def get_inputs():
+        task = realtime_watcher.QueueTask(dstore,
+                                          'Example_20200101000000_10800S')
+        return json.loads(task['inputs'])
+
+    # files and modification times that the task ran with are stored
+    first = write_file('file_2020010103.nc', 1000)
+    assert realtime.handle_file(first) == 1
+    assert realtime.run_ready_tasks(force=True) == 1
+    assert get_inputs() == {first: 1000 * 10**9}
+
+    # same file is not run again unless it was modified
+    assert realtime.handle_file(first) == 0
+    write_file('file_2020010103.nc', 2000)
+    assert realtime.handle_file(first) == 1
+    assert realtime.run_ready_tasks(force=True) == 1
+
+    # another file for the same completed task runs it again
+    second = write_file('extra_2020010103.nc', 1000)
+    assert realtime.handle_file(second) == 1
+    assert realtime.run_ready_tasks(force=True) == 1
+    assert get_inputs() == {first: 2000 * 10**9, second: 1000 * 10**9}
+    assert realtime.handle_file(first) == 0
+    assert realtime.handle_file(second) == 0
+    assert realtime.errors == 0
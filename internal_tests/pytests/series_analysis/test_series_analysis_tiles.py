@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util import grid_tiles
+from metplus.util.mpmd_batch import MPMDBatch
+from metplus.util.config import config_metplus
+from metplus.wrappers.series_analysis_wrapper import SeriesAnalysisWrapper
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='SeriesAnalysis',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='SeriesAnalysis')
+        produtil.log.postmsg('series_analysis test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'series_analysis test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def series_analysis_wrapper(tile_count=None, config_text=None):
+    config = metplus_config()
+    # MET config file that selects each tile with the data mask
+    config_file = os.path.join(config.getdir('OUTPUT_BASE'),
+                               'series_analysis_tiles', 'SeriesAnalysisConfig')
+    os.makedirs(os.path.dirname(config_file), exist_ok=True)
+    with open(config_file, 'w') as file_handle:
+        if config_text is None:
+            config_text = 'mask = { grid = ""; poly = ${VERIF_MASK}; }\n'
+        file_handle.write(config_text)
+
+    config.set('config', 'LOOP_BY', 'INIT')
+    config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+    config.set('config', 'INIT_BEG', '2020010100')
+    config.set('config', 'INIT_END', '2020010100')
+    config.set('config', 'INIT_INCREMENT', '6H')
+    config.set('config', 'SERIES_ANALYSIS_CONFIG_FILE', config_file)
+    config.set('filename_templates', 'BOTH_SERIES_ANALYSIS_INPUT_TEMPLATE',
+               'in.nc')
+    config.set('filename_templates', 'SERIES_ANALYSIS_OUTPUT_TEMPLATE',
+               'out.nc')
+    if tile_count is not None:
+        config.set('config', 'SERIES_ANALYSIS_TILE_COUNT', tile_count)
+    return SeriesAnalysisWrapper(config, config.logger)
+
+def test_tile_count_default():
+    wrapper = series_analysis_wrapper()
+    assert(wrapper.isOK)
+    assert(wrapper.c_dict['TILE_COUNT'] == 1)
+    assert(not wrapper.use_tiles())
+
+def test_tile_count_invalid():
+    wrapper = series_analysis_wrapper(0)
+    assert(not wrapper.isOK)
+
+def test_tile_count_set():
+    wrapper = series_analysis_wrapper(4)
+    assert(wrapper.isOK)
+    if grid_tiles.is_available():
+        assert(wrapper.c_dict['TILE_COUNT'] == 4)
+        assert(wrapper.use_tiles())
+
+        # grid cannot be read from Python embedding input
+        wrapper.c_dict['FCST_FILE_TYPE'] = 'file_type = PYTHON_NUMPY;'
+        assert(not wrapper.use_tiles())
+    else:
+        assert(wrapper.c_dict['TILE_COUNT'] == 1)
+
+def test_no_tiles_if_commands_are_not_run():
+    wrapper = series_analysis_wrapper(4)
+    # set the count in case NumPy or netCDF4 are not available
+    wrapper.c_dict['TILE_COUNT'] = 4
+    assert(wrapper.use_tiles())
+
+    # tile output cannot be merged if the commands do not run
+    wrapper.config.set('config', 'DO_NOT_RUN_EXE', True)
+    assert(not wrapper.use_tiles())
+    wrapper.config.set('config', 'DO_NOT_RUN_EXE', False)
+
+    # or are deferred to an MPMD batch
+    wrapper.cmdrunner.mpmd_batch = MPMDBatch(wrapper.config)
+    assert(not wrapper.use_tiles())
+
+def test_no_tiles_without_verif_mask():
+    wrapper = series_analysis_wrapper(4, 'mask = { grid = ""; poly = ""; }\n')
+    wrapper.c_dict['TILE_COUNT'] = 4
+    assert(not wrapper.use_tiles())
+    assert(wrapper.tile_mask_configs == {wrapper.c_dict['CONFIG_FILE']: False})
+
+    # config file that cannot be read is not tiled
+    wrapper.c_dict['CONFIG_FILE'] = wrapper.c_dict['CONFIG_FILE'] + '_missing'
+    assert(not wrapper.use_tiles())
+
+@pytest.mark.parametrize(
+    'shape, count, expected_count', [
+        ((10, 4), 3, 3),
+        ((10, 4), 1, 1),
+        ((2, 4), 5, 2),
+    ]
+)
+def test_get_tile_ids(shape, count, expected_count):
+    numpy = pytest.importorskip('numpy')
+    tile_ids = grid_tiles.get_tile_ids(shape, count)
+    assert(tile_ids.shape == shape)
+    assert(sorted(set(tile_ids.flatten())) == list(range(expected_count)))
+    # each row is in one tile and tiles have nearly the same number of rows
+    rows = [numpy.count_nonzero(tile_ids[:, 0] == index)
+            for index in range(expected_count)]
+    assert(max(rows) - min(rows) <= 1)
+
+def test_get_tile_mask():
+    assert(grid_tiles.get_tile_mask('/tmp/tiles.nc', 2) ==
+           '/tmp/tiles.nc {name="tile_id";level="(*,*)";} ==2')
+
+def test_merge_tiles(tmp_path):
+    numpy = pytest.importorskip('numpy')
+    netCDF4 = pytest.importorskip('netCDF4')
+
+    shape = (6, 3)
+    grid_file = str(tmp_path / 'grid.nc')
+    with netCDF4.Dataset(grid_file, 'w') as dataset:
+        dataset.Projection = 'LatLon'
+        dataset.createDimension('lat', shape[0])
+        dataset.createDimension('lon', shape[1])
+        dataset.createVariable('tile_id', 'f4', ('lat', 'lon'))[:] = 0
+
+    tile_file = str(tmp_path / 'tiles.nc')
+    count = grid_tiles.write_tile_file(tile_file, grid_file, 'tile_id', 3)
+    assert(count == 3)
+    tile_ids = grid_tiles.read_tile_ids(tile_file)
+
+    # each tile only has values in its own rows
+    tile_paths = []
+    for index in range(count):
+        path = str(tmp_path / f'out_tile{index}.nc')
+        with netCDF4.Dataset(path, 'w') as dataset:
+            dataset.createDimension('lat', shape[0])
+            dataset.createDimension('lon', shape[1])
+            var = dataset.createVariable('series_cnt_ME', 'f4', ('lat', 'lon'),
+                                         fill_value=-9999.)
+            var.set_auto_mask(False)
+            var[:] = numpy.where(tile_ids == index, index + 1.0, -9999.)
+            dataset.createVariable('n_series', 'i4', ())[:] = 5
+        tile_paths.append(path)
+
+    out_path = str(tmp_path / 'out.nc')
+    grid_tiles.merge_tiles(tile_paths, tile_file, out_path)
+    with netCDF4.Dataset(out_path, 'r') as dataset:
+        data = dataset.variables['series_cnt_ME'][:]
+        assert(numpy.array_equal(data, tile_ids + 1.0))
+        assert(int(dataset.variables['n_series'][:]) == 5)
@@ -4,6 +4,7 @@ import os
 import datetime
 import sys
 import logging
+import shutil
 import pytest
 import datetime
 
@@ -804,3 +805,438 @@ def test_get_level_list(data_type, config_list, expected_list):
     saw = StatAnalysisWrapper(config, config.logger)
 
     assert(saw.get_level_list(data_type) == expected_list)
+
+def write_stat_file(path, model, valid_time, lead='120000'):
+    with open(path, 'w') as file_handle:
+        file_handle.write('VERSION MODEL DESC FCST_LEAD FCST_VALID_BEG '
+                          'FCST_VALID_END OBS_LEAD OBS_VALID_BEG '
+                          'OBS_VALID_END FCST_VAR LINE_TYPE\n')
+        file_handle.write(f'V8.1 {model} NA {lead} {valid_time} {valid_time} '
+                          f'000000 {valid_time} {valid_time} TMP SL1L2\n')
+
+def test_get_lookin_paths_index():
+    st = stat_analysis_wrapper()
+    lookin_dir = os.path.join(st.config.getdir('OUTPUT_BASE'),
+                              'stat_lookin_index')
+    if os.path.exists(lookin_dir):
+        shutil.rmtree(lookin_dir)
+    os.makedirs(lookin_dir)
+    write_stat_file(os.path.join(lookin_dir, 'a.stat'), 'GFS',
+                    '20190101_120000')
+    write_stat_file(os.path.join(lookin_dir, 'b.stat'), 'GFS',
+                    '20190105_120000')
+    write_stat_file(os.path.join(lookin_dir, 'c.stat'), 'ECM',
+                    '20190101_120000')
+
+    st.c_dict['LOOKIN_INDEX'] = True
+    st.c_dict['LOOKIN_INDEX_FILE'] = os.path.join(lookin_dir, 'index.json')
+    stat_file_index = st.get_stat_file_index()
+
+    settings = {'LOOKIN_DIR': lookin_dir,
+                'MODEL': '"GFS"',
+                'FCST_VALID_BEG': '20190101_000000',
+                'FCST_VALID_END': '20190101_235959',
+                'FCST_INIT_BEG': '',
+                'FCST_INIT_END': '',
+                'OBS_VALID_BEG': '',
+                'OBS_VALID_END': '',
+                }
+    assert (st.get_lookin_paths(settings, stat_file_index) ==
+            os.path.join(lookin_dir, 'a.stat'))
+
+    # init time is the valid time minus the 12 hour lead
+    settings['FCST_VALID_BEG'] = settings['FCST_VALID_END'] = ''
+    settings['FCST_INIT_BEG'] = '20190105_000000'
+    settings['FCST_INIT_END'] = '20190105_000000'
+    assert (st.get_lookin_paths(settings, stat_file_index) ==
+            os.path.join(lookin_dir, 'b.stat'))
+
+    # pass the directory if every file in it matches
+    settings['MODEL'] = '"GFS", "ECM"'
+    settings['FCST_INIT_BEG'] = settings['FCST_INIT_END'] = ''
+    assert st.get_lookin_paths(settings, stat_file_index) == lookin_dir
+
+    # index is reused by the next run
+    stat_file_index.save()
+    assert os.path.exists(st.c_dict['LOOKIN_INDEX_FILE'])
+    new_index = st.get_stat_file_index()
+    assert len(new_index.entries) == 3
+    assert not new_index.changed
+    new_index.get_entry(os.path.join(lookin_dir, 'a.stat'))
+    assert not new_index.changed
+
+STAT_HEADER = ('VERSION MODEL DESC FCST_LEAD FCST_VALID_BEG FCST_VALID_END '
+               'OBS_LEAD OBS_VALID_BEG OBS_VALID_END FCST_VAR FCST_UNITS '
+               'FCST_LEV OBS_VAR OBS_UNITS OBS_LEV OBTYPE VX_MASK '
+               'INTERP_MTHD INTERP_PNTS FCST_THRESH OBS_THRESH COV_THRESH '
+               'ALPHA LINE_TYPE')
+
+def get_engine_wrapper(test_name):
+    st = stat_analysis_wrapper()
+    st.c_dict['PYTHON_ENGINE'] = True
+    test_dir = os.path.join(st.config.getdir('OUTPUT_BASE'), test_name)
+    if os.path.exists(test_dir):
+        shutil.rmtree(test_dir)
+    os.makedirs(os.path.join(test_dir, 'lookin'))
+    st.lookindir = os.path.join(test_dir, 'lookin')
+    return st, test_dir
+
+def read_out_stat(path):
+    with open(path) as file_handle:
+        lines = [line.split() for line in file_handle]
+    return [dict(zip(lines[0], line)) for line in lines[1:]]
+
+def test_python_engine_sl1l2_to_cnt():
+    np = pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_cnt')
+
+    # write SL1L2 partial sums for subsets of forecast/observation pairs
+    rng = np.random.RandomState(7)
+    obs = rng.normal(280, 5, 600)
+    fcst = obs + rng.normal(0.5, 2, 600)
+    subsets = [(0, 250), (250, 400), (400, 600)]
+    with open(os.path.join(st.lookindir, 'grid_stat.stat'), 'w') as file_handle:
+        file_handle.write(STAT_HEADER + ' TOTAL FBAR OBAR FOBAR FFBAR OOBAR '
+                          'MAE\n')
+        for index, (beg, end) in enumerate(subsets):
+            f_sub = fcst[beg:end]
+            o_sub = obs[beg:end]
+            sums = [f_sub.mean(), o_sub.mean(), (f_sub * o_sub).mean(),
+                    (f_sub * f_sub).mean(), (o_sub * o_sub).mean(),
+                    np.abs(f_sub - o_sub).mean()]
+            file_handle.write(
+                f'V9.0 GFS NA 120000 2019010{index+1}_120000 '
+                f'2019010{index+1}_120000 000000 2019010{index+1}_120000 '
+                f'2019010{index+1}_120000 TMP K Z2 TMP K Z2 ANL FULL NEAREST '
+                f'1 NA NA NA NA SL1L2 {end - beg} ' +
+                ' '.join(f'{value:.10f}' for value in sums) + '\n'
+            )
+        # line that does not match the model filter
+        file_handle.write('V9.0 ECM NA 120000 20190101_120000 20190101_120000 '
+                          '000000 20190101_120000 20190101_120000 TMP K Z2 '
+                          'TMP K Z2 ANL FULL NEAREST 1 NA NA NA NA SL1L2 10 '
+                          '1 1 1 1 1 0\n')
+
+    out_stat = os.path.join(test_dir, 'out.stat')
+    dump_row = os.path.join(test_dir, 'dump.stat')
+    settings = {'MODEL': '"GFS"',
+                'FCST_VALID_BEG': '20190101_000000',
+                'FCST_VALID_END': '20190103_235959',
+                'JOB': ('-job aggregate_stat -line_type SL1L2 '
+                        f'-out_line_type CNT -dump_row {dump_row} '
+                        f'-out_stat {out_stat}'),
+                }
+    assert st.run_python_engine(settings)
+
+    with open(dump_row) as file_handle:
+        assert len(file_handle.readlines()) == 4
+
+    cnt = read_out_stat(out_stat)
+    assert len(cnt) == 1
+    cnt = cnt[0]
+    assert cnt['LINE_TYPE'] == 'CNT'
+    assert cnt['MODEL'] == 'GFS'
+    assert cnt['FCST_VALID_BEG'] == '20190101_120000'
+    assert cnt['FCST_VALID_END'] == '20190103_120000'
+
+    # compare to statistics computed from all of the pairs
+    error = fcst - obs
+    expected = {
+        'TOTAL': 600,
+        'FBAR': fcst.mean(),
+        'FSTDEV': fcst.std(ddof=1),
+        'OBAR': obs.mean(),
+        'OSTDEV': obs.std(ddof=1),
+        'PR_CORR': np.corrcoef(fcst, obs)[0, 1],
+        'ME': error.mean(),
+        'ESTDEV': error.std(ddof=1),
+        'MBIAS': fcst.mean() / obs.mean(),
+        'MAE': np.abs(error).mean(),
+        'MSE': (error * error).mean(),
+        'BCMSE': (error * error).mean() - error.mean() ** 2,
+        'RMSE': np.sqrt((error * error).mean()),
+        'ME2': error.mean() ** 2,
+    }
+    for column, value in expected.items():
+        assert float(cnt[column]) == pytest.approx(value, rel=1e-4), column
+
+    assert cnt['SP_CORR'] == 'NA'
+    assert cnt['FBAR_NCL'] == 'NA'
+
+def test_python_engine_ctc_to_cts():
+    np = pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_cts')
+
+    counts = {'GFS': [(10, 5, 3, 82), (20, 4, 6, 70)],
+              'ECM': [(7, 2, 1, 90)]}
+    with open(os.path.join(st.lookindir, 'point_stat.stat'), 'w') as file_handle:
+        file_handle.write(STAT_HEADER + ' TOTAL FY_OY FY_ON FN_OY FN_ON\n')
+        for model, model_counts in counts.items():
+            for fy_oy, fy_on, fn_oy, fn_on in model_counts:
+                total = fy_oy + fy_on + fn_oy + fn_on
+                file_handle.write(
+                    f'V9.0 {model} NA 120000 20190101_120000 20190101_120000 '
+                    '000000 20190101_120000 20190101_120000 APCP mm A06 APCP '
+                    'mm A06 ANL FULL NEAREST 1 >5.0 >5.0 NA NA CTC '
+                    f'{total} {fy_oy} {fy_on} {fn_oy} {fn_on}\n'
+                )
+
+    out_stat = os.path.join(test_dir, 'out.stat')
+    settings = {'JOB': ('-job aggregate_stat -line_type CTC -out_line_type '
+                        f'CTS -by MODEL -out_stat {out_stat}')}
+    assert st.run_python_engine(settings)
+
+    cts = {line['MODEL']: line for line in read_out_stat(out_stat)}
+    assert sorted(cts) == ['ECM', 'GFS']
+
+    # GFS counts added together
+    a, b, c, d = 30, 9, 9, 152
+    n = a + b + c + d
+    hits_random = (a + b) * (a + c) / n
+    correct_random = ((a + b) * (a + c) + (c + d) * (b + d)) / n
+    expected = {
+        'TOTAL': n,
+        'BASER': (a + c) / n,
+        'FMEAN': (a + b) / n,
+        'ACC': (a + d) / n,
+        'FBIAS': (a + b) / (a + c),
+        'PODY': a / (a + c),
+        'PODN': d / (b + d),
+        'POFD': b / (b + d),
+        'FAR': b / (a + b),
+        'CSI': a / (a + b + c),
+        'GSS': (a - hits_random) / (a + b + c - hits_random),
+        'HK': a / (a + c) - b / (b + d),
+        'HSS': (a + d - correct_random) / (n - correct_random),
+        'ODDS': (a * d) / (b * c),
+        'ORSS': (a * d - b * c) / (a * d + b * c),
+    }
+    for column, value in expected.items():
+        assert float(cts['GFS'][column]) == pytest.approx(value, rel=1e-4), column
+
+    assert cts['ECM']['TOTAL'] == '100'
+    assert cts['ECM']['FCST_THRESH'] == '>5.0'
+
+def test_python_engine_met_output():
+    pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_met')
+
+    # read the SL1L2 line written by MET
+    met_file = os.path.join(st.config.getdir('METPLUS_BASE'),
+                            'internal_tests', 'data', 'stat_data',
+                            'test_20190101.stat')
+    with open(met_file) as file_handle:
+        header = file_handle.readline().split()
+        met_line = file_handle.readline().split()
+    assert met_line[header.index('LINE_TYPE')] == 'SL1L2'
+    sl1l2_index = header.index('LINE_TYPE') + 1
+    sl1l2_columns = ['TOTAL', 'FBAR', 'OBAR', 'FOBAR', 'FFBAR', 'OOBAR',
+                     'MAE']
+    met_sums = dict(zip(sl1l2_columns,
+                        [float(value) for value in met_line[sl1l2_index:]]))
+
+    # write the MET line and two more lines for later valid times in the
+    # same format. The pairs of the later lines are the pairs of the MET
+    # line with the forecast and observation values shifted
+    lines = []
+    for day, total, f_shift, o_shift, mae in [(1, 10512, 0, 0, None),
+                                              (2, 5000, 1.5, 0.5, 12.0),
+                                              (3, 8000, -2.0, 1.0, 9.5)]:
+        fbar = met_sums['FBAR'] + f_shift
+        obar = met_sums['OBAR'] + o_shift
+        sums = {
+            'TOTAL': total,
+            'FBAR': fbar,
+            'OBAR': obar,
+            'FOBAR': (met_sums['FOBAR'] + f_shift * met_sums['OBAR'] +
+                      o_shift * met_sums['FBAR'] + f_shift * o_shift),
+            'FFBAR': (met_sums['FFBAR'] + 2 * f_shift * met_sums['FBAR'] +
+                      f_shift * f_shift),
+            'OOBAR': (met_sums['OOBAR'] + 2 * o_shift * met_sums['OBAR'] +
+                      o_shift * o_shift),
+            'MAE': met_sums['MAE'] if mae is None else mae,
+        }
+        lines.append(sums)
+        valid = f'2019010{day}_000000'
+        items = list(met_line[:sl1l2_index])
+        for column in ('FCST_VALID_BEG', 'FCST_VALID_END', 'OBS_VALID_BEG',
+                       'OBS_VALID_END'):
+            items[header.index(column)] = valid
+        items.extend(f'{sums[column]:.5f}' if column != 'TOTAL'
+                     else str(total) for column in sl1l2_columns)
+        lines[-1]['items'] = items
+
+    with open(os.path.join(st.lookindir, 'grid_stat.stat'), 'w') as file_handle:
+        file_handle.write(' '.join(header + sl1l2_columns) + '\n')
+        for line in lines:
+            file_handle.write(' '.join(line['items']) + '\n')
+
+    # aggregating by valid time reproduces the partial sums of each line
+    out_stat = os.path.join(test_dir, 'out.stat')
+    settings = {'JOB': ('-job aggregate -line_type SL1L2 -by FCST_VALID_BEG '
+                        f'-out_stat {out_stat}')}
+    assert st.run_python_engine(settings)
+
+    out_lines = read_out_stat(out_stat)
+    assert len(out_lines) == len(lines)
+    for out_line, line in zip(out_lines, lines):
+        assert out_line['FCST_VALID_BEG'] == line['items'][header.index('FCST_VALID_BEG')]
+        for column in sl1l2_columns:
+            assert (float(out_line[column]) ==
+                    pytest.approx(float(line[column]), rel=1e-5)), column
+
+    # the CNT statistics of all lines are computed from the partial sums
+    # weighted by the number of pairs of each line
+    cnt_stat = os.path.join(test_dir, 'cnt.stat')
+    settings = {'JOB': ('-job aggregate_stat -line_type SL1L2 '
+                        f'-out_line_type CNT -out_stat {cnt_stat}')}
+    assert st.run_python_engine(settings)
+
+    cnt_lines = read_out_stat(cnt_stat)
+    assert len(cnt_lines) == 1
+    cnt = cnt_lines[0]
+    assert cnt['LINE_TYPE'] == 'CNT'
+    assert cnt['FCST_VALID_BEG'] == '20190101_000000'
+    assert cnt['FCST_VALID_END'] == '20190103_000000'
+
+    total = sum(line['TOTAL'] for line in lines)
+    def mean(column):
+        return sum(float(line['items'][sl1l2_index + sl1l2_columns.index(column)])
+                   * line['TOTAL'] for line in lines) / total
+
+    fbar, obar, fobar, ffbar, oobar = [mean(column) for column in
+                                       ('FBAR', 'OBAR', 'FOBAR', 'FFBAR',
+                                        'OOBAR')]
+    mse = ffbar + oobar - 2 * fobar
+    expected = {
+        'TOTAL': total,
+        'FBAR': fbar,
+        'OBAR': obar,
+        'FSTDEV': ((ffbar - fbar * fbar) * total / (total - 1)) ** 0.5,
+        'OSTDEV': ((oobar - obar * obar) * total / (total - 1)) ** 0.5,
+        'PR_CORR': ((fobar - fbar * obar) /
+                    ((ffbar - fbar * fbar) * (oobar - obar * obar)) ** 0.5),
+        'ME': fbar - obar,
+        'ESTDEV': ((mse - (fbar - obar) ** 2) * total / (total - 1)) ** 0.5,
+        'MBIAS': fbar / obar,
+        'MAE': mean('MAE'),
+        'MSE': mse,
+        'BCMSE': mse - (fbar - obar) ** 2,
+        'RMSE': mse ** 0.5,
+    }
+    for column, value in expected.items():
+        assert float(cnt[column]) == pytest.approx(value, rel=1e-4), column
+
+@pytest.mark.parametrize(
+    'input_file, job, reference_file', [
+        ('grid_stat_sl1l2.stat',
+         '-job aggregate_stat -line_type SL1L2 -out_line_type CNT',
+         'cnt.stat'),
+        ('point_stat_ctc.stat',
+         '-job aggregate_stat -line_type CTC -out_line_type CTS -by MODEL',
+         'cts.stat'),
+    ]
+)
+def test_python_engine_matches_reference(input_file, job, reference_file):
+    pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_reference')
+
+    # the reference -out_stat lines in internal_tests/data/stat_data/aggregate
+    # hold the statistics of the stat_analysis job in MET 9.0 format. They
+    # were computed from the statistic formulas in the MET User's Guide
+    # because stat_analysis was not available when they were written.
+    # Output from stat_analysis for the same job can replace them as is.
+    data_dir = os.path.join(st.config.getdir('METPLUS_BASE'),
+                            'internal_tests', 'data', 'stat_data',
+                            'aggregate')
+    shutil.copy(os.path.join(data_dir, input_file), st.lookindir)
+
+    out_stat = os.path.join(test_dir, 'out.stat')
+    settings = {'JOB': f'{job} -out_stat {out_stat}'}
+    assert st.run_python_engine(settings)
+
+    out_lines = read_out_stat(out_stat)
+    reference_lines = read_out_stat(os.path.join(data_dir, reference_file))
+    assert len(out_lines) == len(reference_lines)
+    for out_line, reference_line in zip(out_lines, reference_lines):
+        assert list(out_line) == list(reference_line)
+        columns = list(reference_line)
+        stat_columns = columns[columns.index('LINE_TYPE') + 1:]
+        for column, reference_value in reference_line.items():
+            out_value = out_line[column]
+            # statistics that the engine does not compute are written as NA
+            if column in stat_columns:
+                assert ((out_value == 'NA') ==
+                        (reference_value == 'NA')), column
+            if column == 'VERSION' or out_value == 'NA':
+                continue
+            assert reference_value != 'NA', column
+            try:
+                reference_number = float(reference_value)
+            except ValueError:
+                assert out_value == reference_value, column
+                continue
+            assert (float(out_value) ==
+                    pytest.approx(reference_number, rel=1e-5, abs=1e-5)), column
+
+@pytest.mark.parametrize(
+    'job', [
+        '-job summary -line_type SL1L2 -column FBAR -out_stat out.stat',
+        '-job aggregate_stat -line_type SL1L2 -out_line_type VCNT -out_stat out.stat',
+        '-job aggregate -line_type SL1L2 -dump_row dump.stat',
+        '-job aggregate -line_type SL1L2 -out_alpha 0.01 -out_stat out.stat',
+    ]
+)
+def test_python_engine_unsupported(job):
+    pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_unsupported')
+    settings = {'JOB': job}
+    assert not st.run_python_engine(settings)
+
+    # threshold filters are run by stat_analysis
+    settings = {'JOB': '-job aggregate -line_type CTC -out_stat out.stat',
+                'FCST_THRESH': '>5.0'}
+    assert not st.run_python_engine(settings)
+
+def test_python_engine_bad_by_column():
+    pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_bad_by')
+    with open(os.path.join(st.lookindir, 'grid_stat.stat'), 'w') as file_handle:
+        file_handle.write(STAT_HEADER + ' TOTAL FBAR OBAR FOBAR FFBAR OOBAR '
+                          'MAE\n')
+        file_handle.write('V9.0 GFS NA 120000 20190101_120000 '
+                          '20190101_120000 000000 20190101_120000 '
+                          '20190101_120000 TMP K Z2 TMP K Z2 ANL FULL NEAREST '
+                          '1 NA NA NA NA SL1L2 10 1 1 1 1 1 0\n')
+
+    # the -by columns are checked before any output is written
+    dump_row = os.path.join(test_dir, 'dump.stat')
+    out_stat = os.path.join(test_dir, 'out.stat')
+    settings = {'JOB': ('-job aggregate -line_type SL1L2 -by BAD_COLUMN '
+                        f'-dump_row {dump_row} -out_stat {out_stat}')}
+    assert not st.run_python_engine(settings)
+    assert not os.path.exists(dump_row)
+    assert not os.path.exists(out_stat)
+
+def test_python_engine_output_in_file_catalog():
+    pytest.importorskip('numpy')
+    st, test_dir = get_engine_wrapper('python_engine_catalog')
+    st.config.set('config', 'USE_FILE_CATALOG', True)
+    with open(os.path.join(st.lookindir, 'grid_stat.stat'), 'w') as file_handle:
+        file_handle.write(STAT_HEADER + ' TOTAL FBAR OBAR FOBAR FFBAR OOBAR '
+                          'MAE\n')
+        file_handle.write('V9.0 GFS NA 120000 20190101_120000 '
+                          '20190101_120000 000000 20190101_120000 '
+                          '20190101_120000 TMP K Z2 TMP K Z2 ANL FULL NEAREST '
+                          '1 NA NA NA NA SL1L2 10 1 1 1 1 1 0\n')
+
+    # list the output directory before the output is written
+    catalog = util.get_file_catalog(st.config)
+    out_stat = os.path.join(test_dir, 'out.stat')
+    assert not catalog.isfile(out_stat)
+
+    settings = {'JOB': f'-job aggregate -line_type SL1L2 -out_stat {out_stat}'}
+    assert st.run_python_engine(settings)
+
+    # the next lookup finds the file written by the Python engine
+    assert catalog.isfile(out_stat)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pytest
+
+import produtil
+from produtil.datastore import UNSTARTED, RUNNING, COMPLETED, FAILED
+
+from metplus.util import met_util as util
+from metplus.util import task_queue
+from metplus.util.config import config_metplus
+from metplus.wrappers.example_wrapper import ExampleWrapper
+
+#@pytest.fixture
+def metplus_config(db_name):
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='TaskQueue',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='TaskQueue')
+        produtil.log.postmsg('task_queue test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+
+        config.set('config', 'LOOP_BY', 'INIT')
+        config.set('config', 'INIT_TIME_FMT', '%Y%m%d%H')
+        config.set('config', 'INIT_BEG', '2020010100')
+        config.set('config', 'INIT_END', '2020010112')
+        config.set('config', 'INIT_INCREMENT', '12H')
+        config.set('config', 'LEAD_SEQ', '3, 6')
+        config.set('config', 'LOOP_ORDER', 'times')
+        db_path = os.path.join(config.getdir('OUTPUT_BASE'), 'task_queue',
+                               db_name)
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        config.set('config', 'TASK_QUEUE_DB', db_path)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'task_queue test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def plan_two_processes(config, split_by_lead):
+    config.set('config', 'TASK_QUEUE_SPLIT_BY_LEAD', split_by_lead)
+    wrapper = ExampleWrapper(config, config.logger)
+    wrappers = {'Example': wrapper, 'ExampleTwo': wrapper}
+    dstore = task_queue.get_task_queue(config)
+    names = task_queue.plan_tasks(config, ['Example', 'ExampleTwo'], dstore,
+                                  wrappers)
+    return dstore, names
+
+@pytest.mark.parametrize(
+    'split_by_lead, expected_count', [
+        (False, 4),
+        (True, 8),
+    ]
+)
+def test_plan_tasks(split_by_lead, expected_count):
+    config = metplus_config(f'plan_{split_by_lead}.db')
+    dstore, names = plan_two_processes(config, split_by_lead)
+    assert len(names) == expected_count
+    assert len(set(names)) == expected_count
+    if split_by_lead:
+        assert 'Example_20200101000000_10800S' in names
+    else:
+        assert 'Example_20200101120000' in names
+
+    # planning again must not add or reset tasks
+    plan_two_processes(config, split_by_lead)
+    assert task_queue.get_task_state_counts(dstore) == {UNSTARTED: expected_count}
+
+def test_claim_task_respects_dependencies():
+    config = metplus_config('claim.db')
+    dstore, _ = plan_two_processes(config, False)
+
+    # both Example tasks can run before either ExampleTwo task
+    first = task_queue.claim_task(dstore, 'one', 600, 3)
+    second = task_queue.claim_task(dstore, 'two', 600, 3)
+    assert first['process'] == 'Example'
+    assert second['process'] == 'Example'
+    assert task_queue.claim_task(dstore, 'three', 600, 3) is None
+
+    # completing the first Example task releases ExampleTwo at the same time
+    first.state = COMPLETED
+    third = task_queue.claim_task(dstore, 'three', 600, 3)
+    assert third['process'] == 'ExampleTwo'
+    assert third['run_time'] == first['run_time']
+    assert third['worker'] == 'three'
+    assert task_queue.claim_task(dstore, 'four', 600, 3) is None
+
+@pytest.mark.parametrize(
+    'max_attempts, expected_state', [
+        (3, RUNNING),
+        (1, FAILED),
+    ]
+)
+def test_recover_stale_tasks(max_attempts, expected_state):
+    config = metplus_config(f'stale_{max_attempts}.db')
+    dstore, _ = plan_two_processes(config, False)
+    claimed = [task_queue.claim_task(dstore, 'dead', 600, max_attempts)
+               for _ in range(2)]
+
+    # make the heartbeat of the first task look like its worker died
+    claimed[0]['heartbeat'] = '0'
+    task = task_queue.claim_task(dstore, 'alive', 600, max_attempts)
+    if expected_state == RUNNING:
+        assert task.did == claimed[0].did
+        assert task['attempts'] == '2'
+        assert task['worker'] == 'alive'
+    else:
+        assert task is None
+        assert claimed[0].state == FAILED
+
+def test_run_task_queue_worker():
+    config = metplus_config('worker.db')
+    config.set('config', 'TASK_QUEUE_SPLIT_BY_LEAD', True)
+    config.set('config', 'TASK_QUEUE_HEARTBEAT_INTERVAL', 1)
+    assert task_queue.run_task_queue_worker(config, ['Example']) == 0
+
+    dstore = task_queue.get_task_queue(config)
+    assert task_queue.get_task_state_counts(dstore) == {COMPLETED: 4}
+    # LEAD_SEQ is restored after each task
+    assert config.getstr('config', 'LEAD_SEQ') == '3, 6'
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import datetime
+import pytest
+
+import produtil
+
+from metplus.util.config import config_metplus
+from metplus.wrappers.tcrmw_wrapper import TCRMWWrapper
+from metplus.util import met_util as util
+from metplus.util import time_util
+
+# -----------------FIXTURES THAT CAN BE USED BY ALL TESTS----------------
+#@pytest.fixture
+def tc_rmw_wrapper(lead_seq=None):
+    """! Returns a default TCRMWWrapper with /path/to entries in the
+         metplus_system.conf and metplus_runtime.conf configuration
+         files.  Subsequent tests can customize the final METplus configuration
+         to over-ride these /path/to values."""
+
+    config = metplus_config()
+    config.set('config', 'DO_NOT_RUN_EXE', True)
+    config.set('config', 'LOOP_BY', 'INIT')
+    if lead_seq:
+        config.set('config', 'LEAD_SEQ', lead_seq)
+
+    return TCRMWWrapper(config, config.logger)
+
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='TCRMWWrapper',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='TCRMWWrapper')
+        produtil.log.postmsg('tc_rmw_wrapper  is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'tc_rmw_wrapper failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+
+# ------------------------ TESTS GO HERE --------------------------
+
+def test_find_input_files_valid_template(tmp_path):
+    wrapper = tc_rmw_wrapper('0, 6, 12')
+    input_dir = str(tmp_path / 'input')
+    deck_dir = str(tmp_path / 'deck')
+    init = datetime.datetime(2020, 8, 10, 0)
+
+    # input files are named by valid time, so each lead needs its own time
+    expected_files = []
+    for lead in [0, 6, 12]:
+        valid = init + datetime.timedelta(hours=lead)
+        filename = os.path.join(input_dir, init.strftime('%Y%m%d%H'),
+                                f"{valid.strftime('%Y%m%d%H')}.nc")
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        open(filename, 'w').close()
+        expected_files.append(filename)
+
+    deck_file = os.path.join(deck_dir, 'aal142020.dat')
+    os.makedirs(deck_dir)
+    open(deck_file, 'w').close()
+
+    wrapper.c_dict['INPUT_DIR'] = input_dir
+    wrapper.c_dict['INPUT_TEMPLATE'] = (
+        '{init?fmt=%Y%m%d%H}/{valid?fmt=%Y%m%d%H}.nc'
+    )
+    wrapper.c_dict['DECK_INPUT_DIR'] = deck_dir
+    wrapper.c_dict['DECK_INPUT_TEMPLATE'] = 'aal14{date?fmt=%Y}.dat'
+
+    time_info = time_util.ti_calculate({'init': init, 'lead': 0,
+                                        'date': init})
+    run_time_info = dict(time_info)
+
+    assert wrapper.find_input_files(time_info) == expected_files
+    assert wrapper.c_dict['DECK_FILE'] == deck_file
+    assert wrapper.c_dict['LEAD_LIST'] == 'lead = ["00", "06", "12"];'
+
+    # finding the files for each lead does not change the run time
+    assert time_info == run_time_info
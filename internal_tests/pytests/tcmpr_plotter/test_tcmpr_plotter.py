@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import stat
+import pytest
+
+import produtil
+
+from metplus.util import met_util as util
+from metplus.util.config import config_metplus
+from metplus.wrappers.tcmpr_plotter_wrapper import TCMPRPlotterWrapper
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='TCMPRPlotter',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='TCMPRPlotter')
+        produtil.log.postmsg('tcmpr_plotter test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'tcmpr_plotter test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+OPTIONS = ['CONFIG_FILE', 'PREFIX', 'TITLE', 'SUBTITLE', 'XLAB', 'YLAB',
+           'XLIM', 'YLIM', 'FILTER', 'FILTERED_TCST_DATA_FILE', 'DEP_VARS',
+           'SCATTER_X', 'SCATTER_Y', 'SKILL_REF', 'SERIES', 'SERIES_CI',
+           'LEGEND', 'LEAD', 'PLOT_TYPES', 'RP_DIFF', 'DEMO_YR',
+           'HFIP_BASELINE', 'FOOTNOTE_FLAG', 'PLOT_CONFIG_OPTS', 'SAVE_DATA']
+
+def tcmpr_plotter_wrapper(tmp_path, input_files, settings, rscript=''):
+    """! Create a wrapper that reads tcst files from a temporary directory
+         and uses a plot_tcmpr.R script in a temporary MET install dir"""
+    config = metplus_config()
+    met_install_dir = tmp_path / 'met'
+    script_dir = met_install_dir / 'share' / 'met' / 'Rscripts'
+    script_dir.mkdir(parents=True)
+    (script_dir / 'plot_tcmpr.R').write_text(rscript)
+    config.set('dir', 'MET_INSTALL_DIR', str(met_install_dir))
+
+    input_dir = tmp_path / 'tc_pairs'
+    input_dir.mkdir()
+    for input_file in input_files:
+        (input_dir / input_file).write_text('VERSION\n')
+
+    config.set('dir', 'TCMPR_PLOTTER_TCMPR_DATA_DIR', str(input_dir))
+    config.set('dir', 'TCMPR_PLOTTER_PLOT_OUTPUT_DIR', str(tmp_path / 'out'))
+    for option in OPTIONS:
+        config.set('config', f'TCMPR_PLOTTER_{option}', '')
+    for flag in ['NO_EE', 'NO_LOG', 'SAVE']:
+        config.set('config', f'TCMPR_PLOTTER_{flag}', False)
+    for key, value in settings.items():
+        config.set('config', key, value)
+
+    return TCMPRPlotterWrapper(config, config.logger)
+
+def test_get_fan_out_jobs(tmp_path):
+    settings = {'TCMPR_PLOTTER_MAX_WORKERS': 4,
+                'TCMPR_PLOTTER_PLOT_TYPES': 'MEAN, MEDIAN',
+                'TCMPR_PLOTTER_DEP_VARS': 'TK_ERR, AMSLP-BMSLP',
+                'TCMPR_PLOTTER_TITLE': 'Track Error',
+                'TCMPR_PLOTTER_FILTERED_TCST_DATA_FILE': '/tmp/filtered.tcst'}
+    wrapper = tcmpr_plotter_wrapper(tmp_path,
+                                    ['a.tcst', 'b.tcst', 'other.txt'],
+                                    settings)
+    tcst_files = wrapper.get_tcst_files()
+    assert([os.path.basename(item) for item in tcst_files] ==
+           ['a.tcst', 'b.tcst'])
+
+    jobs = wrapper.get_fan_out_jobs(wrapper.retrieve_optionals(), tcst_files)
+    assert(len(jobs) == 8)
+
+    out_dirs = [job['out_dir'] for job in jobs]
+    assert(len(set(out_dirs)) == len(jobs))
+
+    out_base = str(tmp_path / 'out')
+    job = jobs[1]
+    expected_dir = os.path.join(out_base, 'a', 'MEAN', 'AMSLP-BMSLP')
+    assert(job['out_dir'] == expected_dir)
+    assert(job['args'] == [wrapper.tcmpr_script,
+                           '-lookin', tcst_files[0],
+                           '-title', '"Track Error"',
+                           '-tcst', os.path.join(expected_dir,
+                                                 'filtered.tcst'),
+                           '-dep', 'AMSLP-BMSLP',
+                           '-plot', 'MEAN',
+                           '-outdir', expected_dir])
+
+def test_get_fan_out_jobs_no_plot_types(tmp_path):
+    wrapper = tcmpr_plotter_wrapper(tmp_path, ['a.tcst'],
+                                    {'TCMPR_PLOTTER_MAX_WORKERS': 2})
+    jobs = wrapper.get_fan_out_jobs(wrapper.retrieve_optionals(),
+                                    wrapper.get_tcst_files())
+    expected_dir = str(tmp_path / 'out' / 'a')
+    assert(len(jobs) == 1)
+    assert(jobs[0]['out_dir'] == expected_dir)
+    assert('-plot' not in jobs[0]['args'])
+    assert('-dep' not in jobs[0]['args'])
+
+def test_run_fan_out_report(tmp_path, monkeypatch):
+    # fake Rscript that fails for one of the input files
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    rscript = bin_dir / 'Rscript'
+    rscript.write_text('#!/bin/sh\n'
+                       'case "$*" in *b.tcst*) exit 3;; esac\n'
+                       'exit 0\n')
+    rscript.chmod(rscript.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    settings = {'TCMPR_PLOTTER_MAX_WORKERS': 3,
+                'TCMPR_PLOTTER_PLOT_TYPES': 'MEAN, MEDIAN'}
+    wrapper = tcmpr_plotter_wrapper(tmp_path, ['a.tcst', 'b.tcst'], settings)
+    errors = wrapper.errors
+    assert(not wrapper.run_fan_out(wrapper.retrieve_optionals()))
+    assert(len(wrapper.all_commands) == 4)
+    # failures of all commands are reported in a single error
+    assert(wrapper.errors == errors + 1)
+    for plot_type in ['MEAN', 'MEDIAN']:
+        assert(os.path.isdir(tmp_path / 'out' / 'a' / plot_type))
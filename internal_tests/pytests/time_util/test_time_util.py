@@ -88,4 +88,90 @@ def test_get_relativedelta(key, value):
 def test_time_string_to_met_time(time_string, default_unit, met_time):
   assert(time_util.time_string_to_met_time(time_string, default_unit) == met_time)
 
-# write tests for ti_calculate
+@pytest.mark.parametrize(
+    'input_dict, expected', [
+        ({'init': datetime.datetime(2019, 2, 1, 6), 'lead': 10800},
+         {'valid': datetime.datetime(2019, 2, 1, 9), 'lead': 10800,
+          'loop_by': 'init', 'init_fmt': '20190201060000',
+          'valid_fmt': '20190201090000', 'lead_string': '3 hours',
+          'lead_hours': 3}),
+        ({'valid': datetime.datetime(2019, 2, 1, 6),
+          'lead': relativedelta(hours=30), 'offset_hours': 1},
+         {'init': datetime.datetime(2019, 1, 31, 0), 'lead': 108000,
+          'loop_by': 'valid', 'da_init': datetime.datetime(2019, 2, 1, 7),
+          'da_init_fmt': '20190201070000', 'lead_string': '1 day 6 hours',
+          'offset': 3600, 'offset_hours': 1}),
+        ({'init': datetime.datetime(2019, 2, 1), 'lead': relativedelta(months=1)},
+         {'valid': datetime.datetime(2019, 3, 1), 'lead': relativedelta(months=1),
+          'lead_string': '1 month', 'lead_seconds': 2419200}),
+        ({'da_init': datetime.datetime(2019, 2, 1), 'lead_hours': 6,
+          'now': datetime.datetime(2019, 2, 2)},
+         {'init': datetime.datetime(2019, 1, 31, 18), 'today': '20190202',
+          'lead_string': '6 hours', 'cycle': datetime.datetime(2019, 2, 1)}),
+    ]
+)
+def test_ti_calculate(input_dict, expected):
+    time_info = time_util.ti_calculate(input_dict)
+    for key, value in expected.items():
+        assert time_info[key] == value
+
+def test_time_info_formats_are_computed_from_original_times():
+    time_info = time_util.ti_calculate({'init': datetime.datetime(2019, 2, 1),
+                                        'lead': 3600})
+    # changing a time keeps the formatted values that were computed before
+    time_info['init'] = datetime.datetime(2020, 1, 1)
+    time_info['custom'] = 'abc'
+    assert time_info['init_fmt'] == '20190201000000'
+    assert time_info.get('valid_fmt') == '20190201010000'
+    assert 'lead_string' in time_info
+    assert time_info.get('level') is None
+
+    # the items can be passed as keyword arguments like a dictionary
+    as_dict = dict(**time_info)
+    assert as_dict == time_info
+    assert as_dict['custom'] == 'abc'
+    assert len(as_dict) == len(time_info)
+
+    copied = time_info.copy()
+    copied['level'] = 1
+    assert 'level' not in time_info
+
+@pytest.mark.parametrize(
+    'use_numpy', [
+        True,
+        False,
+    ]
+)
+@pytest.mark.parametrize(
+    'loop_by', [
+        'init',
+        'valid',
+    ]
+)
+def test_run_time_grid_matches_ti_calculate(monkeypatch, use_numpy, loop_by):
+    if not use_numpy:
+        monkeypatch.setattr(time_util, 'numpy', None)
+    elif time_util.numpy is None:
+        pytest.skip('NumPy is not available')
+
+    now = datetime.datetime(2020, 1, 1)
+    run_times = [datetime.datetime(2019, 2, 1) + datetime.timedelta(hours=6 * index)
+                 for index in range(8)]
+    leads = [relativedelta(hours=hour) for hour in range(0, 48, 3)]
+    leads.append(relativedelta(months=1))
+    grid = time_util.RunTimeGrid(run_times, leads, loop_by=loop_by, now=now)
+
+    for run_time in run_times:
+        for lead in leads[:-1]:
+            input_dict = {'now': now, loop_by: run_time, 'lead': lead}
+            expected = time_util.ti_calculate(dict(input_dict))
+            assert grid.get_time_info(input_dict) == expected
+
+    # leads with months, times outside of the grid, and other items are
+    # not handled by the grid
+    assert grid.get_time_info({'now': now, loop_by: run_times[0],
+                               'lead': leads[-1]}) is None
+    assert grid.get_time_info({'now': now, loop_by: datetime.datetime(2000, 1, 1),
+                               'lead': 0}) is None
+    assert grid.get_time_info({'now': now, loop_by: run_times[0],
+                               'lead': 0, 'offset_hours': 1}) is None
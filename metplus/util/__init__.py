@@ -5,3 +5,8 @@ from .config.config_launcher import *
 from .config.config_metplus import *
 from .config.string_template_substitution import *
 from .feature_util import *
+from .task_queue import *
+from .profiler import *
+from .command_plan import *
+from .realtime_watcher import *
+from .directory_walker import *
@@ -0,0 +1,208 @@
+"""
+Program Name: command_metrics.py
+Contact(s): George McCabe
+Abstract: Record resource usage of each command run by METplus and
+          summarize it at the end of the run
+History Log:  Initial version
+Usage: Enabled by LOG_COMMAND_METRICS (default False unless
+       PROFILE_METPLUS is True)
+Parameters: None
+Input Files: N/A
+Output Files: COMMAND_METRICS_FILE (JSON lines)
+"""
+
+import os
+import json
+import shlex
+
+'''!@namespace command_metrics
+@brief Per-command resource metrics.
+CommandRunner calls get_command_metrics after each command completes to
+build a record with the wall time, user and system CPU time, maximum
+resident set size, total size of the input and output files and exit
+status of the command. Records are appended to a JSON lines file and kept
+in memory so post_run_cleanup can log a summary table grouped by wrapper
+and application.
+'''
+
+# summary table columns: header, record key, width, number of decimals
+# (None for text), and divisor to convert the value to the header units
+SUMMARY_COLUMNS = [
+    ('Wrapper', 'wrapper', 20, None, 1),
+    ('App', 'app', 20, None, 1),
+    ('Count', 'count', 6, 0, 1),
+    ('Failed', 'failed', 6, 0, 1),
+    ('Wall(s)', 'wall_time', 10, 2, 1),
+    ('User(s)', 'user_time', 10, 2, 1),
+    ('Sys(s)', 'sys_time', 9, 2, 1),
+    ('MaxRSS(MB)', 'max_rss_kb', 10, 1, 1024),
+    ('In(MB)', 'input_bytes', 10, 1, 1048576),
+    ('Out(MB)', 'output_bytes', 10, 1, 1048576),
+]
+
+def get_file_stats(cmd):
+    """!Get the size and modification time of each argument of a command that
+        is an existing file
+        @param cmd command string
+        @returns dictionary of path to (size, mtime)
+    """
+    try:
+        args = shlex.split(cmd)[1:]
+    except ValueError:
+        args = cmd.split()[1:]
+
+    stats = {}
+    for arg in args:
+        try:
+            stat = os.stat(arg)
+        except (OSError, ValueError):
+            continue
+
+        if os.path.isfile(arg):
+            stats[arg] = (stat.st_size, stat.st_mtime)
+
+    return stats
+
+def get_command_metrics(cmd, exit_status, start_time, end_time, rusage_list,
+                        stats_before, wrapper=None, app=None):
+    """!Build the metrics record for a command that has finished running.
+        Arguments that were files before the command ran and were not
+        modified are counted as input. Arguments that were created or modified
+        while the command ran are counted as output.
+        Args:
+          @param cmd command string that was run
+          @param exit_status exit status of the command
+          @param start_time datetime when the command started
+          @param end_time datetime when the command finished
+          @param rusage_list list of resource usage objects from os.wait4 for
+           each process that was run or None if not available
+          @param stats_before output of get_file_stats before the command ran
+          @param wrapper name of the wrapper that ran the command
+          @param app name of the application that was run
+          @returns dictionary containing the metrics
+    """
+    start_timestamp = start_time.timestamp()
+    input_bytes = 0
+    output_bytes = 0
+    for path, (size, mtime) in get_file_stats(cmd).items():
+        if path not in stats_before or mtime >= start_timestamp:
+            output_bytes += size
+        else:
+            input_bytes += stats_before[path][0]
+
+    if not rusage_list:
+        rusage_list = []
+
+    return {
+        'start_time': start_time.isoformat(),
+        'wrapper': wrapper,
+        'app': app,
+        'command': cmd,
+        'exit_status': exit_status,
+        'wall_time': (end_time - start_time).total_seconds(),
+        'user_time': sum(usage.ru_utime for usage in rusage_list),
+        'sys_time': sum(usage.ru_stime for usage in rusage_list),
+        'max_rss_kb': max([usage.ru_maxrss for usage in rusage_list],
+                          default=0),
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+    }
+
+def is_command_metrics_enabled(config):
+    """!Return True if metrics should be recorded for each command. They are
+        recorded by default if METplus is profiled because the profiler
+        compares the time spent in each wrapper to the time spent running
+        its commands"""
+    return config.getbool('config', 'LOG_COMMAND_METRICS',
+                          config.getbool('config', 'PROFILE_METPLUS', False))
+
+def get_metrics_file(config):
+    """!Get path to file to write command metrics. Includes the log
+        timestamp so each run writes to its own file by default"""
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP', '')
+    filename = 'command_metrics'
+    if log_timestamp:
+        filename += f'.{log_timestamp}'
+    filename += '.jsonl'
+    return config.getstr('config', 'COMMAND_METRICS_FILE',
+                         os.path.join(config.getdir('LOG_DIR'), filename))
+
+def write_command_metrics(config, metrics):
+    """!Append metrics for a command to the metrics file and store them in
+        the config object so they can be summarized at the end of the run
+        @param config METplusConfig object
+        @param metrics dictionary from get_command_metrics
+    """
+    if not hasattr(config, 'command_metrics'):
+        config.command_metrics = []
+    config.command_metrics.append(metrics)
+
+    metrics_file = get_metrics_file(config)
+    metrics_dir = os.path.dirname(metrics_file)
+    if metrics_dir and not os.path.exists(metrics_dir):
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    with open(metrics_file, 'a') as file_handle:
+        file_handle.write(json.dumps(metrics) + '\n')
+
+def summarize_command_metrics(metrics_list):
+    """!Aggregate command metrics per wrapper and application
+        @param metrics_list list of dictionaries from get_command_metrics
+        @returns list of dictionaries, one for each wrapper/app combination,
+         sorted by total wall time (largest first) followed by the total
+         of all commands
+    """
+    groups = {}
+    total = {'wrapper': 'TOTAL', 'app': '', 'count': 0, 'failed': 0,
+             'wall_time': 0., 'user_time': 0., 'sys_time': 0.,
+             'max_rss_kb': 0, 'input_bytes': 0, 'output_bytes': 0}
+    for metrics in metrics_list:
+        key = (metrics['wrapper'] or '', metrics['app'] or '')
+        if key not in groups:
+            groups[key] = dict(total, wrapper=key[0], app=key[1])
+
+        for group in (groups[key], total):
+            group['count'] += 1
+            if metrics['exit_status'] != 0:
+                group['failed'] += 1
+            for name in ('wall_time', 'user_time', 'sys_time',
+                         'input_bytes', 'output_bytes'):
+                group[name] += metrics[name]
+            group['max_rss_kb'] = max(group['max_rss_kb'],
+                                      metrics['max_rss_kb'])
+
+    summary = sorted(groups.values(), key=lambda group: -group['wall_time'])
+    summary.append(total)
+    return summary
+
+def format_summary_table(summary):
+    """!Format the output of summarize_command_metrics as lines of a table
+        @returns list of strings
+    """
+    header = []
+    for name, _, width, decimals, _ in SUMMARY_COLUMNS:
+        align = '<' if decimals is None else '>'
+        header.append(f'{name:{align}{width}}')
+
+    lines = [' '.join(header)]
+    for group in summary:
+        row = []
+        for _, key, width, decimals, divisor in SUMMARY_COLUMNS:
+            if decimals is None:
+                row.append(f'{group[key]:<{width}}')
+            else:
+                row.append(f'{group[key] / divisor:>{width}.{decimals}f}')
+        lines.append(' '.join(row))
+
+    return lines
+
+def log_command_metrics_summary(config):
+    """!Log a table of command metrics aggregated per wrapper and app for
+        the commands run during this execution"""
+    metrics_list = getattr(config, 'command_metrics', None)
+    if not metrics_list:
+        return
+
+    config.logger.info(f"Command metrics written to {get_metrics_file(config)}")
+    for line in format_summary_table(summarize_command_metrics(metrics_list)):
+        config.logger.info(line)
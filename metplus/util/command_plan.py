@@ -0,0 +1,173 @@
+"""
+Program Name: command_plan.py
+Contact(s): George McCabe
+Abstract: Write the commands that a METplus run would execute to a file
+          instead of running them so they can be executed by another tool
+History Log:  Initial version
+Usage: Enabled by running master_metplus.py with --plan or by setting
+       PLAN_COMMANDS = True
+Parameters: None
+Input Files: N/A
+Output Files: PLAN_OUTPUT_FILE (JSON lines) and optionally PLAN_COMMAND_FILE
+"""
+
+import os
+import json
+import shlex
+
+__all__ = ['CommandPlan', 'start_command_plan', 'get_command_plan',
+           'skip_input_checks', 'finish_command_plan']
+
+'''!@namespace command_plan
+@brief Plan mode: enumerate commands without running them.
+While a CommandPlan is stored in the config object, CommandRunner adds each
+command to the plan instead of running it and METplus avoids touching the
+filesystem where it can: output directories are not created and compressed
+input files are not decompressed. Instead, a shell command that decompresses
+the file is added to the plan. If PLAN_SKIP_INPUT_CHECKS is True, input files
+that are found by filename template are not checked for existence.
+Each command is written as one JSON object per line containing a sequential
+id, the wrapper and application names, the command, the environment
+variables that differ from the environment METplus was started in, the
+expected input and output files, and the ids of earlier commands that
+write one of the inputs. Output directories are not created, so the tool
+that runs the commands must create the parent directory of each output.
+If PLAN_COMMAND_FILE is set, a command file with one shell command per line
+that sets the environment and creates the output directories is also
+written. It can be passed to an MPMD launcher such as produtil CMDFGen.
+'''
+
+class CommandPlan:
+    """!Collection of commands that are written to the plan files"""
+    def __init__(self, plan_file, command_file=None):
+        self.plan_file = plan_file
+        self.command_file = command_file
+        self.count = 0
+
+        # id of the command that writes each output file
+        self.output_ids = {}
+
+        for path in (plan_file, command_file):
+            if not path:
+                continue
+            parent_dir = os.path.dirname(path)
+            if parent_dir and not os.path.exists(parent_dir):
+                os.makedirs(parent_dir, exist_ok=True)
+            # start with an empty file
+            open(path, 'w').close()
+
+    def add(self, cmd, env=None, wrapper=None, app=None, inputs=None,
+            outputs=None):
+        """!Add a command to the plan
+            Args:
+              @param cmd command string. It can be run through a shell
+              @param env environment to run the command with. Only variables
+               that differ from the current environment are written
+              @param wrapper name of the wrapper that generated the command
+              @param app name of the application that is run
+              @param inputs list of files read by the command
+              @param outputs list of files written by the command
+              @returns dictionary that was written to the plan file
+        """
+        if env is None:
+            env = {}
+
+        inputs = [path for path in inputs or [] if path]
+        outputs = [path for path in outputs or [] if path]
+
+        dependencies = sorted(set(self.output_ids[path] for path in inputs
+                                  if path in self.output_ids))
+        record = {
+            'id': self.count,
+            'wrapper': wrapper,
+            'app': app,
+            'command': cmd,
+            'env': {key: value for key, value in env.items()
+                    if os.environ.get(key) != value},
+            'inputs': inputs,
+            'outputs': outputs,
+            'dependencies': dependencies,
+        }
+        self.count += 1
+        for path in outputs:
+            self.output_ids[path] = record['id']
+
+        with open(self.plan_file, 'a') as file_handle:
+            file_handle.write(json.dumps(record) + '\n')
+
+        if self.command_file:
+            with open(self.command_file, 'a') as file_handle:
+                file_handle.write(self.get_shell_command(record) + '\n')
+
+        return record
+
+    @staticmethod
+    def get_shell_command(record):
+        """!Get a single line shell command that creates the output
+            directories and runs the command of a plan record with its
+            environment"""
+        parts = []
+        out_dirs = sorted(set(os.path.dirname(path)
+                              for path in record['outputs']
+                              if os.path.dirname(path)))
+        if out_dirs:
+            parts.append('mkdir -p ' +
+                         ' '.join(shlex.quote(path) for path in out_dirs))
+
+        env_prefix = ''.join(f'{key}={shlex.quote(value)} '
+                             for key, value in sorted(record['env'].items()))
+        # commands that use shell syntax must be run through a shell to
+        # apply the environment to the whole command
+        parts.append(f"{env_prefix}sh -c {shlex.quote(record['command'])}")
+        return ' && '.join(parts)
+
+def start_command_plan(config):
+    """!Create a command plan and store it in the config object if
+        PLAN_COMMANDS is True
+        @returns CommandPlan or None if plan mode is not enabled
+    """
+    if not config.getbool('config', 'PLAN_COMMANDS', False):
+        return None
+
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP', '')
+    filename = 'command_plan'
+    if log_timestamp:
+        filename += f'.{log_timestamp}'
+    filename += '.jsonl'
+    plan_file = config.getstr('config', 'PLAN_OUTPUT_FILE',
+                              os.path.join(config.getdir('OUTPUT_BASE'),
+                                           filename))
+    command_file = config.getstr('config', 'PLAN_COMMAND_FILE', '')
+
+    # read value so it is logged at the beginning of the run
+    skip_input_checks(config)
+
+    config.command_plan = CommandPlan(plan_file, command_file)
+    config.logger.info(f"Plan mode: commands will be written to {plan_file} "
+                       "instead of being run")
+    return config.command_plan
+
+def get_command_plan(config):
+    """!Get the command plan of the run or None if plan mode is not enabled"""
+    return getattr(config, 'command_plan', None)
+
+def skip_input_checks(config):
+    """!Check if input files should be used without checking that they exist.
+        Only applies in plan mode"""
+    if get_command_plan(config) is None and \
+            not config.getbool('config', 'PLAN_COMMANDS', False):
+        return False
+
+    return config.getbool('config', 'PLAN_SKIP_INPUT_CHECKS', False)
+
+def finish_command_plan(config):
+    """!Log the number of commands that were planned if plan mode is enabled"""
+    plan = get_command_plan(config)
+    if plan is None:
+        return
+
+    config.command_plan = None
+    config.logger.info(f"Wrote {plan.count} planned command(s) to "
+                       f"{plan.plan_file}")
+    if plan.command_file:
+        config.logger.info(f"Wrote command file {plan.command_file}")
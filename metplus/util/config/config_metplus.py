@@ -46,6 +46,15 @@ def usage(filename=None, logger=None):
 Usage: %s [ -c /path/to/additional/file.conf]...[] [options]
     -c|--config <arg0>      Specify custom configuration file to use
     -h|--help               Display this usage statement
+    --worker                Run as a task queue worker: claim and run tasks
+                            from the shared TASK_QUEUE_DB until none remain
+    --profile               Profile the METplus Python code and write a
+                            report for each wrapper to PROFILE_OUTPUT_DIR
+    --watch                 Watch the input directories of the wrappers and
+                            run them for each file that arrives
+    --plan                  Write the commands that would be run to
+                            PLAN_OUTPUT_FILE as JSON lines instead of
+                            running them
 
 Optional arguments: [options]
 section.option=value -- override conf options on the command line
@@ -85,7 +94,11 @@ def setup(baseinputconfs, filename=None, logger=None):
     short_opts = "c:h"
     # Note: r: runtime= option is not being used. remove it ?
     long_opts = ["config=",
-                 "help"]
+                 "help",
+                 "worker",
+                 "profile",
+                 "plan",
+                 "watch"]
 
     # All command line input, get options and arguments
     try:
@@ -101,6 +114,10 @@ def setup(baseinputconfs, filename=None, logger=None):
 
     opts_conf_files = list()
     opts_conf_file = None
+    run_as_worker = False
+    run_profiler = False
+    run_plan = False
+    run_watcher = False
     for k, v in opts:
         if k in ('-c', '--config'):
             opts_conf_files.extend(v.split(","))
@@ -108,6 +125,14 @@ def setup(baseinputconfs, filename=None, logger=None):
             if logger:
                 logger.info('Help, printing Usage statement')
             usage(filename=filename)
+        elif k == '--worker':
+            run_as_worker = True
+        elif k == '--profile':
+            run_profiler = True
+        elif k == '--plan':
+            run_plan = True
+        elif k == '--watch':
+            run_watcher = True
         else:
             assert False, "UNHANDLED OPTION"
 
@@ -144,6 +169,22 @@ def setup(baseinputconfs, filename=None, logger=None):
     # save list of user configuration files in a variable
     conf.set('config', 'METPLUS_CONFIG_FILES', ','.join(opts_conf_list))
 
+    # run as a task queue worker if requested on the command line
+    if run_as_worker:
+        conf.set('config', 'TASK_QUEUE_WORKER', True)
+
+    # profile the run if requested on the command line
+    if run_profiler:
+        conf.set('config', 'PROFILE_METPLUS', True)
+
+    # write commands to a plan file instead of running them if requested
+    if run_plan:
+        conf.set('config', 'PLAN_COMMANDS', True)
+
+    # run as a daemon that watches for input files if requested
+    if run_watcher:
+        conf.set('config', 'REALTIME_WATCH', True)
+
     logger.info('Completed METplus configuration setup.')
 
     return conf
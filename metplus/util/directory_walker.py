@@ -0,0 +1,247 @@
+"""
+Program Name: directory_walker.py
+Contact(s): George McCabe
+Abstract: Walk directory trees once and reuse the list of files for each
+          search of the same tree until a directory in it changes
+History Log:  Initial version
+Usage: Used by get_files and the other functions that search a directory
+       tree for files that match a regular expression
+Parameters: None
+Input Files: N/A
+Output Files: N/A
+"""
+
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ['DirectoryWalker', 'get_directory_walker', 'find_files',
+           'get_mtime']
+
+'''!@namespace directory_walker
+@brief Cached traversal of directory trees shared by all wrappers of a run.
+Each tree is walked with os.scandir in the same order as os.walk, so
+symbolic links to directories are listed but not followed. The names of the
+files in each directory and the modification time of each directory are
+stored. A search of a tree that was already walked checks the modification
+time of each directory instead of listing it again, and the tree is walked
+again if any directory was created, removed or changed. The files that match
+each regular expression are also stored until the tree changes. Directories
+that cannot be read are skipped like os.walk does. The top level
+subdirectories of a tree can be walked at the same time, which is faster on
+network file systems that have a high latency for each directory listing.
+A directory that was modified shortly before it was listed may change again
+without changing its modification time, so a walk that contains one is
+walked again the next time it is used.
+'''
+
+def get_mtime(dirname):
+    """!Get the modification time of a directory in nanoseconds
+        @returns modification time or None if the directory does not exist
+    """
+    try:
+        return os.stat(dirname).st_mtime_ns
+    except OSError:
+        return None
+
+class DirectoryWalker:
+    """!Walks directory trees and stores the results so trees that did not
+        change are not walked again
+    """
+    # a directory modified less than this many nanoseconds before a walk
+    # started could change again without changing its modification time
+    MTIME_GRANULARITY = 2 * 10**9
+
+    def __init__(self, max_workers=1, use_cache=True):
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        # walks keyed by top directory. Each walk is a tuple of a dictionary
+        # of the modification time of each directory, a list of tuples of
+        # each directory and the names of the files in it, and the time the
+        # walk started in nanoseconds
+        self.walks = {}
+        # files that match a regular expression keyed by top directory and
+        # expression. The walk that was searched is stored with the files
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        """!Remove all stored walks and results"""
+        with self.lock:
+            self.walks.clear()
+            self.results.clear()
+
+    @staticmethod
+    def _scan(dirname):
+        """!List a directory with os.scandir
+            @returns tuple of list of subdirectories and list of files, or None
+             if the directory cannot be read
+        """
+        dirs = []
+        files = []
+        try:
+            with os.scandir(dirname) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if not is_dir:
+                        files.append(entry.name)
+                    # like os.walk, do not follow links to directories
+                    elif not entry.is_symlink():
+                        dirs.append(entry.name)
+        except OSError:
+            return None
+
+        return dirs, files
+
+    def _add_dir(self, dirname, mtimes, listing):
+        """!List one directory, adding its modification time to mtimes and
+            the directory and its files to listing
+            @returns list of the paths of the subdirectories
+        """
+        # get the time before listing so changes during the walk are found
+        mtimes[dirname] = get_mtime(dirname)
+        scanned = self._scan(dirname)
+        if scanned is None:
+            return []
+
+        dirs, files = scanned
+        listing.append((dirname, files))
+        return [os.path.join(dirname, name) for name in dirs]
+
+    def _walk_subtree(self, top):
+        mtimes = {}
+        listing = []
+        pending = [top]
+        while pending:
+            subdirs = self._add_dir(pending.pop(), mtimes, listing)
+            # reverse so the first subdirectory is listed next
+            pending.extend(reversed(subdirs))
+        return mtimes, listing
+
+    def walk(self, top):
+        """!Walk a tree without using the stored walks
+            @param top directory to walk
+            @returns tuple of dictionary of modification time of each
+             directory, list of tuples of each directory and the names of
+             the files in it in the order they are found by os.walk, and the
+             time the walk started in nanoseconds
+        """
+        walk_time = int(time.time() * 10**9)
+        mtimes = {}
+        listing = []
+        subdirs = self._add_dir(top, mtimes, listing)
+
+        if self.max_workers > 1 and len(subdirs) > 1:
+            max_workers = min(self.max_workers, len(subdirs))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                subtrees = list(executor.map(self._walk_subtree, subdirs))
+        else:
+            subtrees = [self._walk_subtree(subdir) for subdir in subdirs]
+
+        # add the subtrees in order so the result matches a serial walk
+        for sub_mtimes, sub_listing in subtrees:
+            mtimes.update(sub_mtimes)
+            listing.extend(sub_listing)
+
+        return mtimes, listing, walk_time
+
+    def is_current(self, walk):
+        """!Check if a walk can be reused. It cannot if any directory in it
+            was modified since it was listed or within MTIME_GRANULARITY
+            before the walk started, because a change made right after it was
+            listed may not have changed its modification time
+            @param walk tuple returned by walk
+            @returns True if no directory changed, False if not
+        """
+        mtimes, _, walk_time = walk
+        racy_time = walk_time - self.MTIME_GRANULARITY
+        return all(mtime is None or mtime < racy_time
+                   for mtime in mtimes.values()) and \
+            all(get_mtime(dirname) == mtime
+                for dirname, mtime in mtimes.items())
+
+    def get_walk(self, top):
+        """!Get the stored walk of a tree or walk it if it was not walked
+            yet or any of its directories changed. See walk
+        """
+        if not self.use_cache:
+            return self.walk(top)
+
+        with self.lock:
+            walk = self.walks.get(top)
+
+        if walk is not None and self.is_current(walk):
+            return walk
+
+        walk = self.walk(top)
+        with self.lock:
+            self.walks[top] = walk
+        return walk
+
+    def find_files(self, top, filename_regex):
+        """!Get all files under a directory whose names match a regular
+            expression
+            @param top directory to search
+            @param filename_regex regular expression that must match the
+             beginning of the filename (re.match)
+            @returns list of full paths in the order they are found by
+             os.walk
+        """
+        walk = self.get_walk(top)
+        key = (top, filename_regex)
+        with self.lock:
+            result = self.results.get(key)
+        if result is not None and result[0] is walk:
+            return list(result[1])
+
+        pattern = re.compile(filename_regex)
+        file_paths = [os.path.join(dirname, filename)
+                      for dirname, files in walk[1]
+                      for filename in files
+                      if pattern.match(filename)]
+
+        if self.use_cache:
+            with self.lock:
+                self.results[key] = (walk, file_paths)
+        return list(file_paths)
+
+def get_directory_walker(config):
+    """!Get the directory walker of the run. It is stored in the config
+        object so it is shared by all wrappers, like the file catalog, and
+        its options are read from the config the first time it is requested
+        @param config METplusConfig object
+        @returns DirectoryWalker
+    """
+    if getattr(config, 'directory_walker', None) is None:
+        config.directory_walker = DirectoryWalker(
+            max_workers=config.getint('config',
+                                      'DIRECTORY_WALKER_MAX_WORKERS', 1),
+            use_cache=config.getbool('config', 'DIRECTORY_WALKER_CACHE',
+                                     True),
+        )
+
+    return config.directory_walker
+
+def find_files(top, filename_regex, config=None):
+    """!Get all files under a directory whose names match a regular
+        expression. See DirectoryWalker.find_files
+        @param top directory to search
+        @param filename_regex regular expression that must match the
+         beginning of the filename
+        @param config optional METplusConfig object. The walker of the run is
+         used if it is set. Otherwise the tree is walked without storing the
+         results
+        @returns list of full paths in the order they are found by os.walk
+    """
+    if config is None:
+        walker = DirectoryWalker(use_cache=False)
+    else:
+        walker = get_directory_walker(config)
+
+    return walker.find_files(top, filename_regex)
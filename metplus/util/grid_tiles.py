@@ -0,0 +1,142 @@
+"""
+Program Name: grid_tiles.py
+Contact(s): George McCabe
+Abstract: Split a grid into tiles that are processed separately and merge
+          the NetCDF output of each tile back into one file
+History Log:  Initial version
+Usage: Used by SeriesAnalysis when SERIES_ANALYSIS_TILE_COUNT is greater
+       than 1
+Parameters: None
+Input Files: MET NetCDF file on the verification grid
+Output Files: MET NetCDF tile mask file and merged output file
+"""
+
+import shutil
+
+# NumPy and netCDF4 are optional. Tiling is disabled if they are not
+# available
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+from .pcp_accumulation import write_field
+from .met_util import write_through_tmp
+
+'''!@namespace grid_tiles
+@brief Domain decomposition of gridded MET output.
+The rows of a grid are split into bands with nearly the same number of
+points. A MET NetCDF file that contains the index of the tile of each grid
+point is written on the verification grid, so each tile can be selected in
+a MET config file with a data mask (see get_tile_mask). After each tile is
+processed, the values of every grid variable are taken from the output of
+the tile that contains each point, so the merged file has the same
+variables, dimensions and attributes as the output of a single run over the
+whole grid.
+'''
+
+# name of the variable in the tile file
+TILE_VARIABLE = 'tile_id'
+
+class TileError(Exception):
+    """!Raised if a grid cannot be split or tile output cannot be merged"""
+    pass
+
+def is_available():
+    """!Check if the packages needed to split and merge tiles are installed"""
+    return numpy is not None and netCDF4 is not None
+
+def get_tile_ids(shape, count):
+    """!Get the tile index of every point of a grid. The rows are split into
+        bands with nearly the same number of rows
+        @param shape shape of the grid (rows, columns)
+        @param count number of tiles. It is reduced to the number of rows if
+         the grid has fewer rows
+        @returns integer array with the shape of the grid
+    """
+    count = max(1, min(count, shape[0]))
+    tile_ids = numpy.empty(shape, dtype='int32')
+    for index, rows in enumerate(numpy.array_split(numpy.arange(shape[0]),
+                                                   count)):
+        tile_ids[rows, ...] = index
+    return tile_ids
+
+def write_tile_file(path, template_path, var_name, count):
+    """!Write a MET NetCDF file containing the tile index of each grid point
+        @param path output file
+        @param template_path MET NetCDF file on the verification grid
+        @param var_name name of a 2D variable in the template file
+        @param count number of tiles
+        @returns number of tiles that were written
+        @throws TileError if the variable is not found or is not 2D
+    """
+    with netCDF4.Dataset(template_path, 'r') as template:
+        variable = template.variables.get(var_name)
+        if variable is None or len(variable.dimensions) < 2:
+            raise TileError(f'Could not read 2D variable {var_name} from '
+                            f'{template_path}')
+        dims = variable.dimensions[-2:]
+        shape = variable.shape[-2:]
+
+    tile_ids = get_tile_ids(shape, count)
+    write_field(path, template_path, TILE_VARIABLE,
+                numpy.ma.masked_array(tile_ids),
+                {'long_name': 'tile index'}, dims, origin='SeriesAnalysis')
+    return int(tile_ids.max()) + 1
+
+def get_tile_mask(path, index):
+    """!Get the MET data mask string that selects the points of one tile
+        @param path tile file written by write_tile_file
+        @param index tile index
+        @returns string to use as the poly entry of a mask dictionary
+    """
+    return f'{path} {{name="{TILE_VARIABLE}";level="(*,*)";}} =={index}'
+
+def read_tile_ids(path):
+    """!Read the tile index of every grid point from a tile file"""
+    with netCDF4.Dataset(path, 'r') as dataset:
+        return numpy.asarray(dataset.variables[TILE_VARIABLE][:]).astype('int32')
+
+def merge_tiles(tile_paths, tile_file, out_path, catalog=None):
+    """!Merge the output of each tile into one file. The output of the first
+        tile is copied and the values of every variable on the grid are
+        replaced with the values of the tile that contains each point
+        @param tile_paths output file of each tile in tile order
+        @param tile_file tile file written by write_tile_file
+        @param out_path merged output file
+        @param catalog FileCatalog to remove the merged file from after it is
+         written so it is found by later lookups, or None
+        @throws TileError if the output of a tile is missing a variable
+    """
+    tile_ids = read_tile_ids(tile_file)
+
+    # write to a temporary file so a partial file is never left behind
+    tiles = [netCDF4.Dataset(path, 'r') for path in tile_paths[1:]]
+    try:
+        with write_through_tmp(out_path, catalog) as tmp_path:
+            shutil.copyfile(tile_paths[0], tmp_path)
+            with netCDF4.Dataset(tmp_path, 'a') as output:
+                for name, variable in output.variables.items():
+                    if variable.shape[-2:] != tile_ids.shape:
+                        continue
+
+                    variable.set_auto_mask(False)
+                    data = variable[:]
+                    for index, tile in enumerate(tiles, start=1):
+                        if name not in tile.variables:
+                            raise TileError(f'Variable {name} not found in '
+                                            f'{tile.filepath()}')
+                        tile_var = tile.variables[name]
+                        tile_var.set_auto_mask(False)
+                        in_tile = numpy.broadcast_to(tile_ids == index,
+                                                     data.shape)
+                        data[in_tile] = tile_var[:][in_tile]
+                    variable[:] = data
+    finally:
+        for tile in tiles:
+            tile.close()
@@ -0,0 +1,84 @@
+"""
+Program Name: histogram_merge.py
+Contact(s): George McCabe
+Abstract: Sum the histograms written by grid_diag for separate groups of
+          input files into one file
+History Log:  Initial version
+Usage: Used by GridDiag when the input files are split into chunks
+Parameters: None
+Input Files: grid_diag NetCDF output files
+Output Files: grid_diag NetCDF output file
+"""
+
+import shutil
+
+# NumPy and netCDF4 are optional. GridDiag runs grid_diag once on all of the
+# input files if they are not available
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+from .met_util import write_through_tmp
+
+'''!@namespace histogram_merge
+@brief Merge grid_diag output.
+grid_diag writes one marginal histogram for each field and one joint
+histogram for each pair of fields. The counts in each bin are the number of
+grid points across all input files that fall in the bin, so the histograms
+of separate groups of files add up to the histograms of all the files. The
+bin variables and attributes are copied from the first file.
+'''
+
+# prefix of the histogram variables in grid_diag output
+HISTOGRAM_PREFIX = 'hist_'
+
+class HistogramError(Exception):
+    """!Raised if grid_diag output files cannot be merged"""
+    pass
+
+def is_available():
+    """!Check if the packages needed to merge histograms are installed"""
+    return numpy is not None and netCDF4 is not None
+
+def sum_histograms(paths, out_path, prefix=HISTOGRAM_PREFIX, catalog=None):
+    """!Sum the histograms of grid_diag output files
+        @param paths list of grid_diag output files
+        @param out_path merged output file
+        @param prefix prefix of the names of the variables to sum
+        @param catalog FileCatalog to remove the merged file from after it is
+         written so it is found by later lookups, or None
+        @throws HistogramError if the files do not have the same histograms
+    """
+    # write to a temporary file so a partial file is never left behind
+    with write_through_tmp(out_path, catalog) as tmp_path:
+        shutil.copyfile(paths[0], tmp_path)
+        with netCDF4.Dataset(tmp_path, 'a') as output:
+            names = [name for name in output.variables
+                     if name.startswith(prefix)]
+            totals = {}
+            for name in names:
+                variable = output.variables[name]
+                variable.set_auto_mask(False)
+                totals[name] = numpy.array(variable[:], dtype='float64')
+
+            for path in paths[1:]:
+                with netCDF4.Dataset(path, 'r') as dataset:
+                    for name in names:
+                        variable = dataset.variables.get(name)
+                        if variable is None or \
+                                variable.shape != totals[name].shape:
+                            raise HistogramError(f'Histogram {name} in {path} '
+                                                 'does not match '
+                                                 f'{paths[0]}')
+                        variable.set_auto_mask(False)
+                        totals[name] += variable[:]
+
+            for name, total in totals.items():
+                variable = output.variables[name]
+                variable[:] = total.astype(variable.dtype)
@@ -11,7 +11,14 @@ import gzip
 import bz2
 import zipfile
 import struct
+import shlex
 import getpass
+import threading
+import fnmatch
+import glob
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from os import stat
 from pwd import getpwuid
 from csv import reader
@@ -29,6 +36,12 @@ from .config.string_template_substitution import get_tags
 from . import time_util as time_util
 from .config import config_metplus
 from . import metplus_check
+from .mpmd_batch import MPMDBatch
+from .command_metrics import log_command_metrics_summary
+from .profiler import profile_section, write_profile_reports
+from .command_plan import get_command_plan, finish_command_plan
+from .directory_walker import (DirectoryWalker, find_files,
+                               get_directory_walker, get_mtime)
 
 """!@namespace met_util
  @brief Provides  Utility functions for METplus.
@@ -37,6 +50,13 @@ from . import metplus_check
 # list of compression extensions that are handled by METplus
 VALID_EXTENSIONS = ['.gz', '.bz2', '.zip']
 
+# shell commands used to decompress files in plan mode
+PLAN_DECOMPRESS_COMMANDS = {
+    '.gz': 'gzip -dc {infile} > {outfile}',
+    '.bz2': 'bzip2 -dc {infile} > {outfile}',
+    '.zip': 'unzip -p {infile} {name} > {outfile}',
+}
+
 baseinputconfs = ['metplus_config/metplus_system.conf',
                   'metplus_config/metplus_data.conf',
                   'metplus_config/metplus_runtime.conf',
@@ -159,9 +179,10 @@ def run_metplus(config, process_list):
             try:
                 logger = config.log(item)
                 package_name = 'metplus.wrappers.' + camel_to_underscore(item) + '_wrapper'
-                module = import_module(package_name)
-                command_builder = getattr(module,
-                                          item + "Wrapper")(config, logger)
+                with profile_section(config, item):
+                    module = import_module(package_name)
+                    command_builder = getattr(module,
+                                              item + "Wrapper")(config, logger)
 
                 # if Usage specified in PROCESS_LIST, print usage and exit
                 if item == 'Usage':
@@ -189,7 +210,9 @@ def run_metplus(config, process_list):
 
         if loop_order == "processes":
             for process in processes:
-                process.run_all_times()
+                process_name = process.__class__.__name__.replace('Wrapper', '')
+                with profile_section(config, process_name):
+                    process.run_all_times()
 
         elif loop_order == "times":
             loop_over_times_and_call(config, processes)
@@ -225,6 +248,15 @@ def post_run_cleanup(config, app_name, total_errors):
         logger.info("Scrubbing staging dir: %s", staging_dir)
         shutil.rmtree(staging_dir)
 
+    # log resource usage of the commands that were run
+    log_command_metrics_summary(config)
+
+    # write profile reports if running with --profile
+    write_profile_reports(config)
+
+    # log location of the command plan if running with --plan
+    finish_command_plan(config)
+
     # rewrite final conf so it contains all of the default values used
     write_final_conf(config, logger)
 
@@ -916,30 +948,135 @@ def loop_over_times_and_call(config, processes):
         config.logger.error("Could not get [INIT/VALID] time information from configuration file")
         return None
 
+    if not isinstance(processes, list):
+        processes = [processes]
+
+    run_times = []
     while loop_time <= end_time:
-        run_time = loop_time.strftime("%Y%m%d%H%M")
-        config.logger.info("****************************************")
-        config.logger.info("* Running METplus")
-        if use_init:
-            config.logger.info("*  at init time: " + run_time)
-        else:
-            config.logger.info("*  at valid time: " + run_time)
-        config.logger.info("****************************************")
-        if not isinstance(processes, list):
-            processes = [processes]
+        run_times.append(loop_time)
+        loop_time += time_interval
+
+    # compute the times of every run time and forecast lead once
+    config.time_grid = get_run_time_grid(config, run_times, use_init,
+                                         clock_time_obj)
+
+    if config.getbool('config', 'USE_MPMD', False):
+        return loop_over_mpmd_batches(config, processes, run_times,
+                                      use_init, clock_time_obj)
+
+    file_catalog = get_file_catalog(config)
+    for run_time in run_times:
+        log_run_time(config, run_time, use_init)
+        # find files that were written by other processes
+        if file_catalog:
+            file_catalog.refresh()
         for process in processes:
-            input_dict = {}
-            input_dict['now'] = clock_time_obj
+            run_process_at_time(process, run_time, use_init, clock_time_obj)
+
+def get_run_time_grid(config, run_times, use_init, clock_time_obj):
+    """!Create the grid of init and valid times for each run time and each
+        forecast lead in LEAD_SEQ. Returns None if the forecast leads depend
+        on the run time because INIT_SEQ is used instead of LEAD_SEQ"""
+    if not config.has_option('config', 'LEAD_SEQ') and \
+            config.has_option('config', 'INIT_SEQ'):
+        return None
 
-            if use_init:
-                input_dict['init'] = loop_time
-            else:
-                input_dict['valid'] = loop_time
+    return time_util.RunTimeGrid(run_times, get_lead_sequence(config),
+                                 loop_by='init' if use_init else 'valid',
+                                 now=clock_time_obj)
+
+def get_time_info(config, input_dict):
+    """!Get the time information for the run time and forecast lead set in
+        input_dict. The information is read from the run time grid created
+        by loop_over_times_and_call if possible. Otherwise ti_calculate is
+        called to compute it.
+        @param config METplusConfig object
+        @param input_dict dictionary containing time information
+        @returns TimeInfo object
+    """
+    time_grid = getattr(config, 'time_grid', None)
+    if time_grid is not None:
+        time_info = time_grid.get_time_info(input_dict)
+        if time_info is not None:
+            return time_info
+
+    return time_util.ti_calculate(input_dict)
+
+def log_run_time(config, run_time, use_init):
+    """!Log banner that shows which run time is being processed"""
+    run_time_str = run_time.strftime("%Y%m%d%H%M")
+    config.logger.info("****************************************")
+    config.logger.info("* Running METplus")
+    if use_init:
+        config.logger.info("*  at init time: " + run_time_str)
+    else:
+        config.logger.info("*  at valid time: " + run_time_str)
+    config.logger.info("****************************************")
 
-            process.clear()
-            process.run_at_time(input_dict)
+def run_process_at_time(process, run_time, use_init, clock_time_obj):
+    """!Call run_at_time for a wrapper with the init or valid time set"""
+    input_dict = {}
+    input_dict['now'] = clock_time_obj
 
-        loop_time += time_interval
+    if use_init:
+        input_dict['init'] = run_time
+    else:
+        input_dict['valid'] = run_time
+
+    process_name = process.__class__.__name__.replace('Wrapper', '')
+    with profile_section(process.config, process_name):
+        process.clear()
+        process.run_at_time(input_dict)
+
+def loop_over_mpmd_batches(config, processes, run_times, use_init,
+                           clock_time_obj):
+    """!Split the run times into batches of MPMD_BATCH_SIZE times. For each
+        batch, collect the commands that each wrapper generates for all of the
+        times in the batch and launch them as one MPMD job. The batch of a
+        wrapper completes before the next wrapper in the list runs so that
+        outputs of earlier wrappers are available to later wrappers.
+        Failed commands are added to the error count of the wrapper.
+        Wrappers that do not set mpmd_supported run their commands right
+        away because they may read the output of a command before the
+        batch would be launched.
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrappers to run
+            @param run_times list of init or valid times to process
+            @param use_init True if looping by init time, False for valid
+            @param clock_time_obj datetime of the clock time of the run
+    """
+    batch_size = config.getint('config', 'MPMD_BATCH_SIZE', 0)
+    if batch_size <= 0:
+        batch_size = len(run_times)
+
+    for index in range(0, len(run_times), batch_size):
+        batch_times = run_times[index:index + batch_size]
+        for process in processes:
+            if not getattr(process, 'mpmd_supported', False):
+                process.logger.debug(f"{process.__class__.__name__} does not "
+                                     "support MPMD. Running commands "
+                                     "one at a time")
+                for run_time in batch_times:
+                    log_run_time(config, run_time, use_init)
+                    run_process_at_time(process, run_time, use_init,
+                                        clock_time_obj)
+                continue
+
+            batch = MPMDBatch(config, process.logger)
+            process.cmdrunner.mpmd_batch = batch
+            try:
+                for run_time in batch_times:
+                    log_run_time(config, run_time, use_init)
+                    run_process_at_time(process, run_time, use_init,
+                                        clock_time_obj)
+            finally:
+                process.cmdrunner.mpmd_batch = None
+
+            for command in batch.run():
+                process.log_error("MPMD command returned a non-zero return "
+                                  f"code ({command['status']}): "
+                                  f"{command['cmd']}. See {command['log_file']}")
 
 def get_lead_sequence(config, input_dict=None):
     """!Get forecast lead list from LEAD_SEQ or compute it from INIT_SEQ.
@@ -1379,7 +1516,7 @@ def grep(pattern, infile):
     return matching_lines
 
 
-def get_filepaths_for_grbfiles(base_dir):
+def get_filepaths_for_grbfiles(base_dir, config=None):
     """! Generates the grb2 file names in a directory tree
        by walking the tree either top-down or bottom-up.
        For each directory in the tree rooted at
@@ -1393,32 +1530,15 @@ def get_filepaths_for_grbfiles(base_dir):
     Args:
         @param base_dir: The base directory from which we
                       begin the search for grib2 filenames.
+        @param config: optional METplusConfig object used to get the
+                       directory walker of the run
     Returns:
         file_paths (list): A list of the full filepaths
                            of the data to be processed.
     """
 
-    # Create an empty list which will eventually store
-    # all the full filenames
-    file_paths = []
-
-    # pylint:disable=unused-variable
-    # os.walk returns tuple, we don't need to utilize all the returned
-    # values in the tuple.
-
-    # Walk the tree
-    for root, directories, files in os.walk(base_dir):
-        for filename in files:
-            # add it to the list only if it is a grib file
-            match = re.match(r'.*(grib|grb|grib2|grb2)$', filename)
-            if match:
-                # Join the two strings to form the full
-                # filepath.
-                filepath = os.path.join(root, filename)
-                file_paths.append(filepath)
-            else:
-                continue
-    return file_paths
+    # Walk the tree, adding only grib files
+    return find_files(base_dir, r'.*(grib|grb|grib2|grb2)$', config)
 
 
 def get_storm_ids(filter_filename, logger):
@@ -1453,7 +1573,7 @@ def get_storm_ids(filter_filename, logger):
     return sorted_storms
 
 
-def get_files(filedir, filename_regex, logger):
+def get_files(filedir, filename_regex, logger=None, config=None):
     """! Get all the files (with a particular
         naming format) by walking
         through the directories.
@@ -1463,30 +1583,16 @@ def get_files(filedir, filename_regex, logger):
           @param filename_regex:  The regular expression that
                                   defines the naming format
                                   of the files of interest.
+          @param config:  optional METplusConfig object. If it is set, the
+                          tree is walked once and reused until a directory
+                          in it changes. See directory_walker
        Returns:
           file_paths (string): a list of filenames (with full filepath)
     """
-    file_paths = []
-
-    # pylint:disable=unused-variable
-    # os.walk returns a tuple. Not all returned values are needed.
-
-    # Walk the tree
-    for root, directories, files in os.walk(filedir):
-        for filename in files:
-            # add it to the list only if it is a match
-            # to the specified format
-            match = re.match(filename_regex, filename)
-            if match:
-                # Join the two strings to form the full
-                # filepath.
-                filepath = os.path.join(root, filename)
-                file_paths.append(filepath)
-            else:
-                continue
-    return file_paths
+    return find_files(filedir, filename_regex, config)
 
-def check_for_tiles(tile_dir, fcst_file_regex, anly_file_regex, logger):
+def check_for_tiles(tile_dir, fcst_file_regex, anly_file_regex, logger,
+                    config=None):
     """! Checks for the presence of forecast and analysis
         tiles that were created by extract_tiles
         Args:
@@ -1498,11 +1604,13 @@ def check_for_tiles(tile_dir, fcst_file_regex, anly_file_regex, logger):
                                     analysis tile file.
             @param logger:    The logger to which all log messages
                                 should be directed.
+            @param config:    optional METplusConfig object used to get the
+                              directory walker of the run
         Returns:
             None  raises OSError if expected files are missing
     """
-    anly_tiles = get_files(tile_dir, anly_file_regex, logger)
-    fcst_tiles = get_files(tile_dir, fcst_file_regex, logger)
+    anly_tiles = get_files(tile_dir, anly_file_regex, logger, config)
+    fcst_tiles = get_files(tile_dir, fcst_file_regex, logger, config)
 
     num_anly_tiles = len(anly_tiles)
     num_fcst_tiles = len(fcst_tiles)
@@ -1782,13 +1890,15 @@ def create_filter_tmp_files(filtered_files_list, filter_output_dir, logger=None)
             anly_tmpfile.write(anly + "\n")
 
 
-def get_updated_init_times(input_dir, config=None):
+def get_updated_init_times(input_dir, logger=None, config=None):
     """ Get a list of init times, derived by the .tcst files in the
         input_dir (and below).
         Args:
             @param input_dir:  The topmost directory from which our search for
                                filter.tcst files begins.
-            @param config:  Reference to metplus.conf configuration instance.
+            @param logger:  The logger to which all log messages are directed.
+            @param config:  Reference to metplus.conf configuration instance
+                            used to get the directory walker of the run.
         Returns:
             updated_init_times_list : A list of the init times represented by
                                       the forecast.tcst files found in the
@@ -1796,7 +1906,7 @@ def get_updated_init_times(input_dir, config=None):
     """
     updated_init_times_list = []
     init_times_list = []
-    filter_list = get_files(input_dir, ".*.tcst", config)
+    filter_list = get_files(input_dir, ".*.tcst", logger, config)
     if filter_list:
         for filter_file in filter_list:
             match = re.match(r'.*/filter_([0-9]{8}_[0-9]{2,3})', filter_file)
@@ -2737,18 +2847,172 @@ def get_time_from_file(filepath, template, logger=None):
 
     return None
 
+def get_staged_files(config):
+    """!Get the dictionary of files that were decompressed or converted to
+        the staging directory during this run. It is stored in the config
+        object so every wrapper in the PROCESS_LIST reuses the staged files
+        @returns dictionary of (input path, data type) to tuple of staged
+         path and the modification time and size of the file it was staged
+         from (see get_staging_source)
+    """
+    if getattr(config, 'staged_files', None) is None:
+        config.staged_files = {}
+    return config.staged_files
+
+def get_staging_source(filename):
+    """!Get the file that would be staged to read filename, i.e. the
+        compressed or Gempak equivalent of the file
+        @param filename path to file without zip extensions
+        @returns tuple of path, modification time and size of the first
+         file that exists or None if none of them exist
+    """
+    candidates = [filename] + [filename + ext for ext in VALID_EXTENSIONS]
+    if filename.endswith('.nc'):
+        candidates.append(filename[:-2] + 'grd')
+
+    for path in candidates:
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            continue
+        if os.path.isdir(path):
+            continue
+        return path, file_stat.st_mtime_ns, file_stat.st_size
+
+    return None
+
 def preprocess_file(filename, data_type, config, allow_dir=False):
     """ Decompress gzip, bzip, or zip files or convert Gempak files to NetCDF
+        Files that were already staged during this run are returned without
+        staging them again unless the file they were staged from changed
         Args:
             @param filename: Path to file without zip extensions
             @param config: Config object
         Returns:
             Path to staged unzipped file or original file if already unzipped
     """
+    staged_files = get_staged_files(config)
+    key = (filename, data_type)
+    staged = staged_files.get(key)
+    if staged is not None:
+        staged_path, source = staged
+        current_source = get_staging_source(filename)
+        # keep using the staged file if its source was removed
+        if current_source is None or current_source == source:
+            return staged_path
+
+        # the source changed after it was staged, so remove the old staged
+        # file so it is staged again
+        config.logger.debug(f"{current_source[0]} changed since it was "
+                            f"staged. Staging it again")
+        del staged_files[key]
+        try:
+            os.remove(staged_path)
+        except OSError:
+            pass
+        catalog = get_file_catalog(config)
+        if catalog:
+            catalog.invalidate(staged_path)
+
+    path = _preprocess_file(filename, data_type, config, allow_dir)
+
+    # only store files that were written to the staging directory
+    if path and path != filename and \
+            path.startswith(config.getdir('STAGING_DIR')):
+        staged_files[key] = (path, get_staging_source(filename))
+
+    return path
+
+def preprocess_files(filenames, data_type, config):
+    """!Call preprocess_file on a list of files using a pool of threads so
+        compressed files are decompressed at the same time. The number of
+        threads is set by STAGING_MAX_WORKERS
+        Args:
+            @param filenames list of paths to files without zip extensions
+            @param data_type type of data passed to preprocess_file
+            @param config Config object
+        Returns:
+            list of paths (or None if not found) in the same order as the input
+    """
+    max_workers = config.getint('config', 'STAGING_MAX_WORKERS',
+                                min(8, os.cpu_count() or 1))
+
+    # only process each file once
+    unique_files = list(dict.fromkeys(filenames))
+
+    if max_workers <= 1 or len(unique_files) <= 1:
+        results = [preprocess_file(filename, data_type, config)
+                   for filename in unique_files]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda filename: preprocess_file(filename, data_type, config),
+                unique_files)
+            )
+
+    found = dict(zip(unique_files, results))
+    return [found[filename] for filename in filenames]
+
+@contextmanager
+def write_through_tmp(outpath, catalog=None):
+    """!Context manager that provides a temporary path to write a file to.
+        The temporary file is renamed to outpath if the block succeeds so that
+        a partial file is never read by another thread or process, and it is
+        removed if the block raises an exception. The parent directory is
+        created if it does not exist
+        @param outpath path of the file to write
+        @param catalog FileCatalog to remove outpath from after it is written
+         so it is found by later lookups, or None
+    """
+    parent_dir = os.path.dirname(outpath)
+    if parent_dir and not os.path.exists(parent_dir):
+        os.makedirs(parent_dir, exist_ok=True)
+
+    tmp_path = f'{outpath}.tmp{os.getpid()}_{threading.get_ident()}'
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, outpath)
+    if catalog:
+        catalog.invalidate(outpath)
+
+def copy_file(src, dest, catalog=None):
+    """!Copy a file through a temporary path (see write_through_tmp). Files
+        are not hard linked because MET tools overwrite existing output files
+        in place, which would also change the copy
+        @param src file to copy
+        @param dest path to write
+        @param catalog FileCatalog to remove dest from after it is written, or
+         None
+        @returns dest
+    """
+    with write_through_tmp(dest, catalog) as tmp_path:
+        shutil.copyfile(src, tmp_path)
+    return dest
+
+def _write_staged_file(outpath, data, catalog=None):
+    """!Write data to a staged file through a temporary path (see
+        write_through_tmp)"""
+    with write_through_tmp(outpath, catalog) as tmp_path:
+        with open(tmp_path, 'wb') as outfile:
+            outfile.write(data)
+    return outpath
+
+def _preprocess_file(filename, data_type, config, allow_dir=False):
+    """!Decompress or convert a file. Called by preprocess_file"""
     if not filename:
         return None
 
-    if allow_dir and os.path.isdir(filename):
+    # use the file catalog to check if files exist if it is enabled
+    catalog = get_file_catalog(config)
+    isfile = catalog.isfile if catalog else os.path.isfile
+
+    if allow_dir and (catalog.isdir(filename) if catalog
+                      else os.path.isdir(filename)):
         return filename
 
     # if using python embedding for input, return the keyword
@@ -2757,7 +3021,7 @@ def preprocess_file(filename, data_type, config, allow_dir=False):
 
     stage_dir = config.getdir('STAGING_DIR')
 
-    if os.path.isfile(filename):
+    if isfile(filename):
         # if filename provided ends with a valid compression extension,
         # remove the extension and call function again so the
         # file will be uncompressed properly. This is done so that
@@ -2773,13 +3037,16 @@ def preprocess_file(filename, data_type, config, allow_dir=False):
                 stagefile = stage_dir + filename[:-3]+"nc"
             else:
                 stagefile = stage_dir + filename+".nc"
-            if os.path.isfile(stagefile):
+            if isfile(stagefile):
                 return stagefile
             # if it does not exist, run GempakToCF and return staged nc file
             # Create staging area if it does not exist
+            # (not created in plan mode)
             outdir = os.path.dirname(stagefile)
-            if not os.path.exists(outdir):
+            if get_command_plan(config) is None and not os.path.exists(outdir):
                 os.makedirs(outdir, mode=0o0775)
+                if catalog:
+                    catalog.invalidate(outdir)
 
             # only import GempakToCF if needed
             from ..wrappers import GempakToCFWrapper
@@ -2799,48 +3066,356 @@ def preprocess_file(filename, data_type, config, allow_dir=False):
         return filename
 
     # nc file requested and the Gempak equivalent exists
-    if os.path.isfile(filename[:-2]+'grd'):
+    if isfile(filename[:-2]+'grd'):
         return preprocess_file(filename[:-2]+'grd', data_type, config)
 
     # if file exists in the staging area, return that path
     outpath = stage_dir + filename
-    if os.path.isfile(outpath):
+    if isfile(outpath):
         return outpath
 
+    # in plan mode, add a command to decompress the file to the plan
+    # instead of decompressing it
+    command_plan = get_command_plan(config)
+    if command_plan is not None:
+        for ext in VALID_EXTENSIONS:
+            if not isfile(filename+ext):
+                continue
+
+            cmd = PLAN_DECOMPRESS_COMMANDS[ext].format(
+                infile=shlex.quote(filename+ext),
+                outfile=shlex.quote(outpath),
+                name=shlex.quote(os.path.basename(filename))
+            )
+            command_plan.add(cmd, app=cmd.split()[0],
+                             inputs=[filename+ext], outputs=[outpath])
+            return outpath
+
+        return None
+
     # Create staging area if it does not exist
     outdir = os.path.dirname(outpath)
     if not os.path.exists(outdir):
-        os.makedirs(outdir, mode=0o0775)
+        os.makedirs(outdir, mode=0o0775, exist_ok=True)
+        if catalog:
+            catalog.invalidate(outdir)
 
     # uncompress gz, bz2, or zip file
-    if os.path.isfile(filename+".gz"):
+    if isfile(filename+".gz"):
         if config.logger:
             config.logger.debug("Uncompressing gz file to {}".format(outpath))
         with gzip.open(filename+".gz", 'rb') as infile:
-            with open(outpath, 'wb') as outfile:
-                outfile.write(infile.read())
-                infile.close()
-                outfile.close()
-                return outpath
-    elif os.path.isfile(filename+".bz2"):
+            return _write_staged_file(outpath, infile.read(), catalog)
+    elif isfile(filename+".bz2"):
         if config.logger:
             config.logger.debug("Uncompressing bz2 file to {}".format(outpath))
         with open(filename+".bz2", 'rb') as infile:
-            with open(outpath, 'wb') as outfile:
-                outfile.write(bz2.decompress(infile.read()))
-                infile.close()
-                outfile.close()
-                return outpath
-    elif os.path.isfile(filename+".zip"):
+            return _write_staged_file(outpath, bz2.decompress(infile.read()),
+                                      catalog)
+    elif isfile(filename+".zip"):
         if config.logger:
             config.logger.debug("Uncompressing zip file to {}".format(outpath))
         with zipfile.ZipFile(filename+".zip") as z:
-            with open(outpath, 'wb') as f:
-                f.write(z.read(os.path.basename(filename)))
-                return outpath
+            return _write_staged_file(outpath,
+                                      z.read(os.path.basename(filename)),
+                                      catalog)
 
     return None
 
+class InputFileIndex:
+    """!Listings of input directories that are shared by all run times so
+        checking if an input file exists is a set lookup instead of several
+        os.path.isfile calls. Each directory is listed the first time a file
+        in it is checked. Call refresh before each run time to re-list
+        directories that changed. Like the walks of DirectoryWalker, a
+        directory that was modified within MTIME_GRANULARITY before it was
+        listed is listed again because a change made right after it was
+        listed may not have changed its modification time. The listings and
+        walks that were used
+        least recently are removed when there are more than MAX_LISTINGS
+        listings or MAX_FILE_TIMES walks.
+    """
+    MAX_LISTINGS = 1000
+    MAX_FILE_TIMES = 100
+
+    def __init__(self, config):
+        self.stage_dir = config.getdir('STAGING_DIR', '')
+        self.listings = OrderedDict()
+        # walks of directory trees are shared with the other wrappers
+        self.walker = get_directory_walker(config)
+        # files found in a walk of a directory tree, keyed by directory and
+        # filename template. The walk is stored with the files
+        self.file_times = OrderedDict()
+
+    def refresh(self):
+        """!Remove the listings of directories that were modified since they
+            were listed
+            @returns True if any directory changed, False if not
+        """
+        changed = [dirname for dirname, listing in self.listings.items()
+                   if self._is_racy(listing) or
+                   get_mtime(dirname) != listing[0]]
+        for dirname in changed:
+            self.remove_listing(dirname)
+
+        walks_changed = [key for key, (walk, _) in self.file_times.items()
+                         if not self.walker.is_current(walk)]
+        for key in walks_changed:
+            del self.file_times[key]
+
+        return bool(changed or walks_changed)
+
+    def remove_listing(self, dirname):
+        """!Remove the listing of a directory so it is listed again the next
+            time a file in it is checked"""
+        self.listings.pop(dirname, None)
+
+    def get_names(self, dirname):
+        """!Get the set of names in a directory. The set is empty if the
+            directory does not exist"""
+        listing = self.listings.get(dirname)
+        if listing is not None and not self._is_racy(listing):
+            self._mark_used(self.listings, dirname)
+            return listing[1]
+
+        listed_at = int(time.time() * 10**9)
+        mtime = get_mtime(dirname)
+        try:
+            names = self._list_dir(dirname) if mtime is not None else set()
+        except OSError:
+            names = set()
+        listing = (mtime, names, listed_at)
+        self.listings[dirname] = listing
+        self._mark_used(self.listings, dirname)
+
+        while len(self.listings) > self.MAX_LISTINGS:
+            self.remove_listing(next(iter(self.listings)))
+
+        return listing[1]
+
+    @staticmethod
+    def _is_racy(listing):
+        """!Check if a directory was modified too close to the time it was
+            listed to tell if it changed since then. See
+            DirectoryWalker.is_current
+            @param listing tuple of the modification time of the directory,
+             the names in it and the time it was listed in nanoseconds
+            @returns True if the directory must be listed again
+        """
+        mtime, _, listed_at = listing
+        return (mtime is not None and
+                mtime >= listed_at - DirectoryWalker.MTIME_GRANULARITY)
+
+    @staticmethod
+    def _mark_used(items, key):
+        """!Move an item to the end of the items that are removed first"""
+        try:
+            items.move_to_end(key)
+        except KeyError:
+            # another thread removed it
+            pass
+
+    @staticmethod
+    def _list_dir(dirname):
+        return set(os.listdir(dirname))
+
+    def contains(self, path):
+        """!Check if a path is in the listing of its directory"""
+        return os.path.basename(path) in self.get_names(os.path.dirname(path))
+
+    def exists(self, path):
+        """!Check if preprocess_file can find a file for a path. The file
+            may be compressed, a GEMPAK file, or already in the staging
+            directory
+            @param path path to file without compression extension
+            @returns True if a file was found, False if not
+        """
+        if os.path.basename(path) in PYTHON_EMBEDDING_TYPES:
+            return True
+
+        if self.contains(path):
+            return True
+
+        if any(self.contains(path + ext) for ext in VALID_EXTENSIONS):
+            return True
+
+        if self.contains(path[:-2] + 'grd'):
+            return True
+
+        return self.contains(self.stage_dir + path)
+
+    def glob(self, pattern):
+        """!Get the sorted list of paths that match a wildcard expression.
+            The listing is used if the directory does not contain wildcards
+            @param pattern path that may contain * or ? in the filename
+            @returns sorted list of paths that match
+        """
+        dirname, basename = os.path.split(pattern)
+        if glob.has_magic(dirname):
+            return sorted(glob.glob(pattern))
+
+        names = fnmatch.filter(self.get_names(dirname), basename)
+        # glob does not match hidden files unless the pattern starts with .
+        if not basename.startswith('.'):
+            names = [name for name in names if not name.startswith('.')]
+        return sorted(os.path.join(dirname, name) for name in names)
+
+    def get_file_times(self, data_dir, template, logger=None):
+        """!Get the valid time of each file under a directory that matches a
+            filename template. The walk of the directory tree is shared
+            with the directory walker of the run and the times are extracted
+            the first time a directory and template are used
+            @param data_dir directory to search
+            @param template filename template relative to data_dir
+            @param logger optional logger passed to get_time_from_file
+            @returns list of tuples containing the full path and valid time
+             (datetime) of each file in the order they are found by os.walk
+             with the files in each directory sorted by name
+        """
+        key = (data_dir, template)
+        cached = self.file_times.get(key)
+        if cached is not None:
+            self._mark_used(self.file_times, key)
+            return cached[1]
+
+        walk = self.walker.get_walk(data_dir)
+        file_times = []
+        for dirpath, all_files in walk[1]:
+            for filename in sorted(all_files):
+                fullpath = os.path.join(dirpath, filename)
+
+                # remove input data directory to get relative path
+                rel_path = fullpath.replace(f'{data_dir}/', "")
+                file_time_info = get_time_from_file(rel_path, template,
+                                                    logger)
+                if file_time_info is None or not file_time_info['valid']:
+                    continue
+
+                file_times.append((fullpath, file_time_info['valid']))
+
+        self.file_times[key] = (walk, file_times)
+        while len(self.file_times) > self.MAX_FILE_TIMES:
+            self.file_times.popitem(last=False)
+
+        return file_times
+
+class FileCatalog(InputFileIndex):
+    """!Catalog of the files that are read and written by all wrappers in a
+        run. Each directory is listed once with os.scandir, which also
+        records if each item is a file or a directory, so checking if a file
+        exists does not require a stat call. The size, modification time and
+        file type of a file are read the first time they are requested.
+        CommandRunner removes the listings of the directories of the output
+        files of each command it runs and refresh is called before each run
+        time so files written by other processes are found.
+        Use get_file_catalog to get the catalog of the run.
+    """
+    FILE = 'file'
+    DIR = 'dir'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.stats = {}
+        self.filetypes = {}
+
+    @staticmethod
+    def _list_dir(dirname):
+        items = {}
+        with os.scandir(dirname) as entries:
+            for entry in entries:
+                # symbolic links are followed, broken links are neither
+                if entry.is_dir():
+                    items[entry.name] = FileCatalog.DIR
+                elif entry.is_file():
+                    items[entry.name] = FileCatalog.FILE
+                else:
+                    items[entry.name] = None
+        return items
+
+    def get_names(self, dirname):
+        """!Get the dictionary of the names in a directory. The value of each
+            is FILE, DIR or None. The dictionary is empty if the directory
+            does not exist"""
+        return super().get_names(os.path.abspath(dirname)) or {}
+
+    def remove_listing(self, dirname):
+        super().remove_listing(dirname)
+        for path in [path for path in self.stats
+                     if os.path.dirname(path) == dirname]:
+            del self.stats[path]
+
+    def invalidate(self, path):
+        """!Remove the listings that may have changed after a file was
+            written, i.e. its directory and any parent directories that
+            were created to contain it
+            @param path file or directory that was written
+        """
+        path = os.path.abspath(path)
+        while True:
+            dirname = os.path.dirname(path)
+            if dirname == path:
+                break
+            self.remove_listing(dirname)
+            self.remove_listing(path)
+            path = dirname
+
+    def _get_kind(self, path):
+        path = os.path.abspath(path)
+        dirname, basename = os.path.split(path)
+        if not basename:
+            return self.DIR if os.path.isdir(path) else None
+        return self.get_names(dirname).get(basename)
+
+    def isfile(self, path):
+        """!Equivalent of os.path.isfile that uses the catalog"""
+        return self._get_kind(path) == self.FILE
+
+    def isdir(self, path):
+        """!Equivalent of os.path.isdir that uses the catalog"""
+        return self._get_kind(path) == self.DIR
+
+    def path_exists(self, path):
+        """!Equivalent of os.path.exists that uses the catalog"""
+        return self._get_kind(path) is not None
+
+    def stat(self, path):
+        """!Get the os.stat_result of a file or directory or None if it does
+            not exist. The result is kept until the directory changes"""
+        if not self.path_exists(path):
+            return None
+
+        path = os.path.abspath(path)
+        if path not in self.stats:
+            try:
+                self.stats[path] = os.stat(path)
+            except OSError:
+                return None
+        return self.stats[path]
+
+    def get_filetype(self, path, logger=None):
+        """!Get the file type (see get_filetype) of a file. The result is
+            reused until the file is modified"""
+        stat = self.stat(path)
+        if stat is None or not self.isfile(path):
+            return None
+
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self.filetypes:
+            self.filetypes[key] = get_filetype(path, logger)
+        return self.filetypes[key]
+
+def get_file_catalog(config):
+    """!Get the file catalog of the run if USE_FILE_CATALOG is True. It is
+        stored in the config object so it is shared by all wrappers
+        @returns FileCatalog or None if the catalog is not used
+    """
+    if not config.getbool('config', 'USE_FILE_CATALOG', False):
+        return None
+
+    if getattr(config, 'file_catalog', None) is None:
+        config.file_catalog = FileCatalog(config)
+    return config.file_catalog
+
 def run_stand_alone(filename, app_name):
     """ Used to allow MET tool wrappers to be run without using
     master_metplus.py
@@ -0,0 +1,166 @@
+"""
+Program Name: mpmd_batch.py
+Contact(s): George McCabe
+Abstract: Collect the commands generated for a batch of run times and
+          launch them together as one MPMD job through produtil.mpi_impl
+History Log:  Initial version
+Usage: Enabled by setting USE_MPMD = True
+Parameters: None
+Input Files: N/A
+Output Files: One script, log, and status file per MPI rank
+"""
+
+import os
+import shlex
+import tempfile
+
+from produtil.run import exe, run, mpirun, mpiserial, detect_mpi, make_mpi
+
+'''!@namespace mpmd_batch
+@brief Run the commands of many run times as a single MPMD job.
+While a batch is attached to a CommandRunner, commands are recorded instead
+of being run. Each recorded command is written to a small shell script that
+redirects the output to a per-rank log file and writes the exit status of the
+command to a per-rank status file. The scripts are launched as serial ranks
+of one mpiserial command file job using the MPI implementation detected by
+produtil. If no MPI implementation is available, the scripts are run one
+after another on the local host so the same logs and statuses are produced.
+'''
+
+class MPMDBatch:
+    """!Collection of commands that are launched together as one MPMD job"""
+    def __init__(self, config, logger=None):
+        self.config = config
+        self.logger = logger if logger else config.logger
+        self.commands = []
+
+    def add(self, cmd, env=None, log_dest=None):
+        """!Record a command to run when the batch is launched
+            Args:
+              @param cmd command string to run. It is run through a shell
+              @param env environment to run the command with. Only variables
+               that differ from the current environment are written to the
+               rank script
+              @param log_dest file to append the output of the command to after
+               the batch has run or None to only keep the rank log
+        """
+        if env is None:
+            env = {}
+
+        changed_env = {key: value for key, value in env.items()
+                       if os.environ.get(key) != value}
+        self.commands.append({'cmd': cmd,
+                              'env': changed_env,
+                              'log_dest': log_dest})
+
+    def get_mpi_implementation(self):
+        """!Get the MPI implementation named by MPMD_IMPLEMENTATION or the
+            one detected by produtil if it is not set"""
+        mpi_name = self.config.getstr('config', 'MPMD_IMPLEMENTATION', '')
+        if mpi_name:
+            return make_mpi(mpi_name)
+
+        return detect_mpi()
+
+    def run(self):
+        """!Write a script for each command and launch them as MPMD jobs of at
+            most MPMD_MAX_RANKS ranks.
+            @returns list of dictionaries describing each command that failed.
+             The status key is None if the rank did not report a status
+        """
+        if not self.commands:
+            return []
+
+        mpmd_dir = self.config.getdir('MPMD_OUTPUT_DIR',
+                                      os.path.join(self.config.getdir('LOG_DIR'),
+                                                   'mpmd'))
+        if not os.path.exists(mpmd_dir):
+            os.makedirs(mpmd_dir, exist_ok=True)
+
+        batch_dir = tempfile.mkdtemp(prefix='batch_', dir=mpmd_dir)
+        for rank, command in enumerate(self.commands):
+            self.write_rank_script(batch_dir, rank, command)
+
+        max_ranks = self.config.getint('config', 'MPMD_MAX_RANKS', 0)
+        if max_ranks <= 0:
+            max_ranks = len(self.commands)
+
+        mpi_impl = self.get_mpi_implementation()
+        for index in range(0, len(self.commands), max_ranks):
+            self.launch(self.commands[index:index + max_ranks], mpi_impl)
+
+        failed = []
+        for rank, command in enumerate(self.commands):
+            command['status'] = self.read_status(command['status_file'])
+            self.logger.debug(f"MPMD rank {rank} exited with status "
+                              f"{command['status']}: {command['cmd']}")
+            self.append_rank_log(command)
+            if command['status'] != 0:
+                failed.append(command)
+
+        self.logger.info(f"Ran {len(self.commands)} command(s) in MPMD batch "
+                         f"{batch_dir}: {len(failed)} failed")
+        return failed
+
+    @staticmethod
+    def write_rank_script(batch_dir, rank, command):
+        """!Write the shell script that runs a command for one rank and set
+            the script, log_file, and status_file keys of the command"""
+        base = os.path.join(batch_dir, f'rank_{rank:05d}')
+        command['script'] = f'{base}.sh'
+        command['log_file'] = f'{base}.log'
+        command['status_file'] = f'{base}.status'
+
+        lines = ['#!/bin/sh']
+        for key, value in sorted(command['env'].items()):
+            lines.append(f'export {key}={shlex.quote(value)}')
+        lines.append(f"{command['cmd']} > {shlex.quote(command['log_file'])} 2>&1")
+        lines.append(f"echo $? > {shlex.quote(command['status_file'])}")
+
+        with open(command['script'], 'w') as file_handle:
+            file_handle.write('\n'.join(lines) + '\n')
+
+    def launch(self, commands, mpi_impl):
+        """!Run the rank scripts of the commands as a single MPMD job or one by
+            one if the MPI implementation cannot run MPI programs"""
+        if not mpi_impl.can_run_mpi():
+            self.logger.info(f"MPI is not available ({mpi_impl.name()}). "
+                             f"Running {len(commands)} MPMD rank(s) serially")
+            for command in commands:
+                run(exe('/bin/sh')[command['script']])
+            return
+
+        ranks = [mpiserial(exe('/bin/sh')[command['script']])
+                 for command in commands]
+        mpmd_program = ranks[0]
+        for rank in ranks[1:]:
+            mpmd_program = mpmd_program + rank
+
+        self.logger.info(f"Launching {len(ranks)} command(s) as one MPMD job "
+                         f"with {mpi_impl.name()}")
+        try:
+            run(mpirun(mpmd_program, mpiimpl=mpi_impl))
+        except Exception as err:
+            # ranks that did not write a status file are reported as failed
+            self.logger.error(f"MPMD job failed to launch: {err}")
+
+    @staticmethod
+    def read_status(status_file):
+        try:
+            with open(status_file, 'r') as file_handle:
+                return int(file_handle.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def append_rank_log(command):
+        """!Add the output of a rank to the log file the command would have
+            written to if it was run on its own"""
+        if not command['log_dest'] or not os.path.exists(command['log_file']):
+            return
+
+        with open(command['log_dest'], 'a+') as log_file_handle:
+            log_file_handle.write(f"COMMAND:\n{command['cmd']}\n\n")
+            log_file_handle.write("MET OUTPUT:\n")
+            with open(command['log_file'], 'r') as rank_log:
+                log_file_handle.write(rank_log.read())
@@ -0,0 +1,378 @@
+"""
+Program Name: pcp_accumulation.py
+Contact(s): George McCabe
+Abstract: Add and subtract NetCDF precipitation accumulations in Python
+          instead of running pcp_combine
+History Log:  Initial version
+Usage: Enabled by setting PCP_COMBINE_BACKEND = NUMPY
+Parameters: None
+Input Files: MET NetCDF files
+Output Files: MET NetCDF files
+"""
+
+import os
+import re
+import datetime
+from collections import OrderedDict
+
+# NumPy and netCDF4 are optional. PCPCombine runs pcp_combine if they are
+# not available
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+from . import time_util
+from .met_util import write_through_tmp
+
+'''!@namespace pcp_accumulation
+@brief In-process ADD and SUBTRACT of NetCDF precipitation fields.
+PCPCombine uses this module instead of running pcp_combine when
+PCP_COMBINE_BACKEND is NUMPY and every input file is NetCDF. Each field that
+is read is stored in a FieldCache that is shared by all run times, so input
+files that are used by more than one output accumulation (i.e. rolling 6
+hour sums built from 1 hour files) are only read once. Any input that
+cannot be handled (GRIB files, python embedding, field options other than
+name and level, grids that do not match) raises AccumulationError and
+PCPCombine runs pcp_combine instead. The output file contains the grid
+variables and global attributes of the first input file and one variable
+with the time attributes that MET expects.
+'''
+
+# MET bad data value
+FILL_VALUE = -9999.
+
+# first bytes of NetCDF classic and NetCDF4/HDF5 files
+NETCDF_SIGNATURES = (b'CDF\x01', b'CDF\x02', b'CDF\x05', b'\x89HDF')
+
+# variables that describe the grid in MET NetCDF files
+GRID_VARIABLES = ('lat', 'lon')
+
+# attributes of the field variable that are not copied to the output
+TIME_ATTRIBUTES = ('name', 'long_name', 'level', 'init_time', 'init_time_ut',
+                   'valid_time', 'valid_time_ut', 'accum_time',
+                   'accum_time_sec', '_FillValue')
+
+class AccumulationError(Exception):
+    """!Raised when an accumulation cannot be computed in Python"""
+
+def is_available():
+    """!Check if the packages needed to compute accumulations are installed"""
+    return numpy is not None and netCDF4 is not None
+
+def is_netcdf(path):
+    """!Check if a file is NetCDF by reading its first bytes"""
+    try:
+        with open(path, 'rb') as file_handle:
+            return file_handle.read(4) in NETCDF_SIGNATURES
+    except OSError:
+        return False
+
+def parse_field_info(addon):
+    """!Get the field name and level from the field information that
+        PCPCombine passes to pcp_combine for an input file
+        @param addon field information, i.e. 'name="APCP_01"; level="(*,*)";'
+         or an accumulation in MET time format, i.e. 01 or 010000
+        @returns tuple of field name (None if only an accumulation was given),
+         level (None if not set), and accumulation in seconds (None if a name
+         was given)
+        @throws AccumulationError if field information cannot be handled
+    """
+    addon = addon.strip().strip("'").strip()
+    if re.match(r'^\d+$', addon):
+        return None, None, get_met_time_seconds(addon)
+
+    items = [item.strip() for item in addon.split(';') if item.strip()]
+    info = {}
+    for item in items:
+        match = re.match(r'^(\w+)\s*=\s*"(.*)"$', item)
+        if not match or match.group(1) not in ('name', 'level'):
+            raise AccumulationError(f'Unsupported field information: {item}')
+        info[match.group(1)] = match.group(2)
+
+    if 'name' not in info:
+        raise AccumulationError(f'No field name found in {addon}')
+
+    return info['name'], info.get('level'), None
+
+def get_met_time_seconds(met_time):
+    """!Convert a time in MET format (HH or HHMMSS) to seconds"""
+    if len(met_time) < 6:
+        return int(met_time) * 3600
+    hours, minutes, seconds = met_time[:-4], met_time[-4:-2], met_time[-2:]
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+
+def get_level_index(level, num_dims):
+    """!Get the index of a NetCDF variable from a MET level string
+        @param level level string, i.e. (*,*) or (0,*,*). None or an empty
+         string selects all dimensions of a 2 dimensional variable
+        @param num_dims number of dimensions of the variable
+        @returns tuple that can be used to index the variable
+        @throws AccumulationError if level is not supported
+    """
+    if not level:
+        level = '(' + ','.join(['*'] * num_dims) + ')'
+
+    match = re.match(r'^\((.*)\)$', level.strip())
+    if not match:
+        raise AccumulationError(f'Unsupported level: {level}')
+
+    items = [item.strip() for item in match.group(1).split(',')]
+    if len(items) != num_dims:
+        raise AccumulationError(f'Level {level} does not match the '
+                                f'{num_dims} dimensions of the variable')
+
+    index = []
+    for item in items:
+        if item == '*':
+            index.append(slice(None))
+        elif item.isdigit():
+            index.append(int(item))
+        else:
+            raise AccumulationError(f'Unsupported level: {level}')
+
+    # MET reads the last two dimensions as the grid
+    if any(not isinstance(item, slice) for item in index[-2:]) or \
+            any(isinstance(item, slice) for item in index[:-2]):
+        raise AccumulationError(f'Level {level} must select one 2D field')
+
+    return tuple(index)
+
+class Field:
+    """!Data and metadata of a field read from a NetCDF file"""
+    def __init__(self, path, name, data, attrs, dims):
+        self.path = path
+        self.name = name
+        self.data = data
+        self.attrs = attrs
+        self.dims = dims
+
+class FieldCache:
+    """!Least recently used cache of fields read from NetCDF files. Fields are
+        keyed by path, modification time, name and level so a file that is
+        rewritten is read again"""
+    def __init__(self, max_fields=24):
+        self.max_fields = max_fields
+        self.fields = OrderedDict()
+        self.reads = 0
+
+    def get_field(self, path, name, level=None, accum=None):
+        """!Read a field or get it from the cache
+            @param path NetCDF file to read
+            @param name name of variable to read or None to find the variable
+             with the accumulation
+            @param level MET level string used to index the variable
+            @param accum accumulation in seconds to find if name is None
+            @returns Field object
+            @throws AccumulationError if the field cannot be read
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            raise AccumulationError(f'Could not read {path}')
+
+        key = (path, mtime, name, level, accum)
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            return field
+
+        field = read_field(path, name, level, accum)
+        self.reads += 1
+        self.fields[key] = field
+        while len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return field
+
+def read_field(path, name, level=None, accum=None):
+    """!Read a 2D field from a NetCDF file
+        @param path NetCDF file to read
+        @param name name of variable to read or None to find the variable
+         with the accumulation
+        @param level MET level string used to index the variable
+        @param accum accumulation in seconds to find if name is None
+        @returns Field object with missing data masked
+        @throws AccumulationError if the field cannot be read
+    """
+    if not is_netcdf(path):
+        raise AccumulationError(f'{path} is not a NetCDF file')
+
+    with netCDF4.Dataset(path, 'r') as dataset:
+        if name is None:
+            name = find_accum_variable(dataset, accum)
+            if name is None:
+                raise AccumulationError('Could not find '
+                                        f'{time_util.ti_get_lead_string(accum, False)}'
+                                        f' accumulation in {path}')
+
+        if name not in dataset.variables:
+            raise AccumulationError(f'Variable {name} not found in {path}')
+
+        variable = dataset.variables[name]
+        variable.set_auto_mask(True)
+        index = get_level_index(level, len(variable.dimensions))
+        data = numpy.ma.masked_invalid(variable[index].astype('float64'))
+        data = numpy.ma.masked_equal(data, FILL_VALUE)
+        attrs = {attr: variable.getncattr(attr)
+                 for attr in variable.ncattrs()}
+        dims = variable.dimensions[-2:]
+
+    return Field(path, name, data, attrs, dims)
+
+def find_accum_variable(dataset, accum):
+    """!Find the variable in a MET NetCDF file with an accumulation
+        @returns name of variable or None if not found
+    """
+    for name, variable in dataset.variables.items():
+        if 'accum_time_sec' not in variable.ncattrs():
+            continue
+        if int(variable.getncattr('accum_time_sec')) == accum:
+            return name
+    return None
+
+def combine_fields(fields, method):
+    """!Add or subtract fields. The result is missing where any input is
+        missing, like pcp_combine
+        @param fields list of Field objects
+        @param method ADD or SUBTRACT. SUBTRACT requires two fields
+        @returns masked array with the result
+        @throws AccumulationError if fields cannot be combined
+    """
+    if not fields:
+        raise AccumulationError('No input fields')
+
+    shape = fields[0].data.shape
+    for field in fields[1:]:
+        if field.data.shape != shape:
+            raise AccumulationError(f'Grid of {field.path} '
+                                    f'{field.data.shape} does not match '
+                                    f'{fields[0].path} {shape}')
+
+    if method == 'ADD':
+        result = fields[0].data.copy()
+        for field in fields[1:]:
+            result += field.data
+        return result
+
+    if method == 'SUBTRACT':
+        if len(fields) != 2:
+            raise AccumulationError('SUBTRACT requires 2 input fields')
+        return fields[0].data - fields[1].data
+
+    raise AccumulationError(f'Unsupported method: {method}')
+
+def get_time_attributes(time_info, accum):
+    """!Get the time attributes that MET writes for a field
+        @param time_info time dictionary of the run time
+        @param accum accumulation in seconds
+        @returns dictionary of attributes
+    """
+    attrs = {}
+    for key in ('init', 'valid'):
+        attrs[f'{key}_time'] = time_info[key].strftime('%Y%m%d_%H%M%S')
+        attrs[f'{key}_time_ut'] = str(int(
+            (time_info[key] - datetime.datetime(1970, 1, 1))
+            .total_seconds()))
+    attrs['accum_time'] = time_util.seconds_to_met_time(accum).zfill(6)
+    attrs['accum_time_sec'] = numpy.int32(accum)
+    return attrs
+
+def write_field(path, template_path, name, data, attrs, dims, command=None,
+                origin='PCPCombine', catalog=None):
+    """!Write a field to a MET NetCDF file. Dimensions, grid variables and
+        global attributes are copied from a template file
+        @param path output file
+        @param template_path input file to copy the grid from
+        @param name name of output variable
+        @param data masked array to write
+        @param attrs attributes of the output variable
+        @param dims names of the 2 grid dimensions
+        @param command text to write to the RunCommand global attribute
+        @param origin name of the wrapper written to the FileOrigins
+         global attribute
+        @param catalog FileCatalog to remove the file from after it is
+         written so it is found by later lookups, or None
+    """
+    # write to a temporary file so a partial file is never left behind
+    with write_through_tmp(path, catalog) as tmp_path, \
+            netCDF4.Dataset(template_path, 'r') as template, \
+            netCDF4.Dataset(tmp_path, 'w', format='NETCDF4') as output:
+        global_attrs = {attr: template.getncattr(attr)
+                        for attr in template.ncattrs()}
+        if command:
+            global_attrs['RunCommand'] = command
+        global_attrs['FileOrigins'] = 'File ' + os.path.basename(path) + \
+                                      f' generated by METplus {origin}'
+        output.setncatts(global_attrs)
+
+        # copy the grid dimensions and the lat and lon variables
+        for dim in dims:
+            output.createDimension(dim, len(template.dimensions[dim]))
+
+        for var_name in GRID_VARIABLES:
+            variable = template.variables.get(var_name)
+            if variable is None or \
+                    not set(variable.dimensions).issubset(dims):
+                continue
+            new_var = output.createVariable(var_name, variable.dtype,
+                                            variable.dimensions)
+            new_var.setncatts({attr: variable.getncattr(attr)
+                               for attr in variable.ncattrs()})
+            new_var[:] = variable[:]
+
+        out_var = output.createVariable(name, 'f4', dims,
+                                        fill_value=numpy.float32(FILL_VALUE),
+                                        zlib=True)
+        out_var.setncatts(attrs)
+        out_var[:] = numpy.ma.filled(data.astype('float32'),
+                                     numpy.float32(FILL_VALUE))
+
+def compute_accumulation(cache, method, infiles, inaddons, time_info, accum,
+                         out_path, out_name=None, command=None,
+                         catalog=None):
+    """!Compute an accumulation from input files and write it to a MET
+        NetCDF file
+        @param cache FieldCache used to read the inputs
+        @param method ADD or SUBTRACT
+        @param infiles list of input files
+        @param inaddons list of field information for each input file
+        @param time_info time dictionary of the run time
+        @param accum output accumulation in seconds
+        @param out_path output file
+        @param out_name name of the output variable. If not set, the name of
+         the first input without an accumulation suffix is used with the
+         output accumulation in hours, i.e. APCP_06
+        @param command text to write to the RunCommand global attribute
+        @param catalog FileCatalog to update after the file is written
+        @returns name of the variable that was written
+        @throws AccumulationError if the accumulation cannot be computed
+    """
+    if not is_available():
+        raise AccumulationError('NumPy and netCDF4 are required')
+
+    fields = []
+    for path, addon in zip(infiles, inaddons):
+        name, level, field_accum = parse_field_info(addon)
+        fields.append(cache.get_field(path, name, level, field_accum))
+
+    data = combine_fields(fields, method)
+
+    if not out_name:
+        base_name = re.sub(r'_\d+$', '', fields[0].name)
+        out_name = f'{base_name}_{time_util.seconds_to_met_time(accum)}'
+
+    attrs = {attr: value for attr, value in fields[0].attrs.items()
+             if attr not in TIME_ATTRIBUTES}
+    attrs['name'] = out_name
+    attrs['long_name'] = fields[0].attrs.get('long_name', out_name)
+    attrs['level'] = f'A{time_util.seconds_to_met_time(accum)}'
+    attrs.update(get_time_attributes(time_info, accum))
+
+    write_field(out_path, fields[0].path, out_name, data, attrs,
+                fields[0].dims, command, catalog=catalog)
+    return out_name
@@ -0,0 +1,210 @@
+"""
+Program Name: profiler.py
+Contact(s): George McCabe
+Abstract: Profile the Python code of METplus separately for each wrapper
+History Log:  Initial version
+Usage: Enabled by running master_metplus.py with --profile or by setting
+       PROFILE_METPLUS = True
+Parameters: None
+Input Files: N/A
+Output Files: PROFILE_OUTPUT_DIR/profile_<name>.pstats and .txt
+"""
+
+import os
+import time
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+__all__ = ['METplusProfiler', 'start_profiling', 'profile_section',
+           'write_profile_reports']
+
+'''!@namespace profiler
+@brief Per-wrapper cProfile reports of METplus Python overhead.
+A METplusProfiler keeps one cProfile.Profile for each section of the run.
+Only one profile is enabled at a time: entering a section pauses the profile
+of the enclosing section so the time spent in each wrapper is reported only
+by the profile of that wrapper. Code that runs outside of a wrapper is
+reported in the METplus section. The wall time of each section is compared
+to the wall time of the commands it ran (from the command metrics) and to the
+CPU time used by child processes to separate the time spent running MET
+applications from the time spent in Python. Run with DO_NOT_RUN_EXE = True to
+get a profile of the Python overhead only.
+'''
+
+DEFAULT_SECTION = 'METplus'
+
+# number of functions to include in each text report
+REPORT_FUNCTION_COUNT = 40
+
+class ProfileSection:
+    """!Profile and timing totals for one section of the run"""
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.wall_time = 0.
+        self.child_wall_time = 0.
+        self.child_cpu_time = 0.
+        self.command_count = 0
+
+    def get_python_time(self):
+        """!Wall time of the section that was not spent waiting for commands"""
+        return max(self.wall_time - self.child_wall_time, 0.)
+
+class METplusProfiler:
+    """!Collection of profiled sections. Use section() to profile code as part
+        of a named section"""
+    def __init__(self, config):
+        self.config = config
+        self.sections = {}
+        self.stack = []
+        self._resume_marks = None
+
+    def start(self):
+        """!Start profiling the default section"""
+        self._push(DEFAULT_SECTION)
+
+    def stop(self):
+        """!Stop profiling all sections"""
+        while self.stack:
+            self._pop()
+
+    @contextmanager
+    def section(self, name):
+        """!Context manager that profiles the code it wraps as part of the
+            named section until it exits"""
+        self._push(name)
+        try:
+            yield self.sections[name]
+        finally:
+            self._pop()
+
+    def _push(self, name):
+        if self.stack:
+            self._pause(self.stack[-1])
+
+        if name not in self.sections:
+            self.sections[name] = ProfileSection(name)
+
+        self.stack.append(self.sections[name])
+        self._resume(self.stack[-1])
+
+    def _pop(self):
+        self._pause(self.stack.pop())
+        if self.stack:
+            self._resume(self.stack[-1])
+
+    def _get_marks(self):
+        times = os.times()
+        return (time.perf_counter(),
+                times.children_user + times.children_system,
+                len(getattr(self.config, 'command_metrics', [])))
+
+    def _resume(self, section):
+        self._resume_marks = self._get_marks()
+        section.profile.enable()
+
+    def _pause(self, section):
+        section.profile.disable()
+        wall, child_cpu, metrics_count = self._get_marks()
+        start_wall, start_child_cpu, start_metrics_count = self._resume_marks
+        section.wall_time += wall - start_wall
+        section.child_cpu_time += child_cpu - start_child_cpu
+
+        # metrics of the commands that were run since the section resumed
+        new_metrics = self.config.command_metrics[start_metrics_count:] \
+            if metrics_count > start_metrics_count else []
+        section.command_count += len(new_metrics)
+        section.child_wall_time += sum(metrics['wall_time']
+                                       for metrics in new_metrics)
+
+    def write_reports(self, output_dir):
+        """!Write a .pstats file and text report for each section and a
+            summary of all sections
+            @param output_dir directory to write files
+            @returns list of lines of the summary table
+        """
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+        for section in self.sections.values():
+            base = os.path.join(output_dir, f'profile_{section.name}')
+            section.profile.dump_stats(f'{base}.pstats')
+            with open(f'{base}.txt', 'w') as file_handle:
+                file_handle.write('\n'.join(format_section_header(section)))
+                file_handle.write('\n\n')
+                stats = pstats.Stats(section.profile, stream=file_handle)
+                stats.sort_stats('cumulative')
+                stats.print_stats(REPORT_FUNCTION_COUNT)
+
+        summary = format_summary_table(self.sections.values())
+        with open(os.path.join(output_dir, 'profile_summary.txt'),
+                  'w') as file_handle:
+            file_handle.write('\n'.join(summary) + '\n')
+
+        return summary
+
+def format_section_header(section):
+    """!Get lines describing the timing totals of a section"""
+    return [
+        f'Section: {section.name}',
+        f'Wall time (s): {section.wall_time:.3f}',
+        f'Commands run: {section.command_count}',
+        f'Command wall time (s): {section.child_wall_time:.3f}',
+        f'Child process CPU time (s): {section.child_cpu_time:.3f}',
+        f'Python time (s): {section.get_python_time():.3f}',
+    ]
+
+def format_summary_table(sections):
+    """!Format the timing totals of each section as lines of a table"""
+    lines = [f"{'Section':<24} {'Wall(s)':>10} {'Commands':>8} "
+             f"{'Cmd(s)':>10} {'ChildCPU(s)':>11} {'Python(s)':>10}"]
+    for section in sorted(sections, key=lambda item: -item.wall_time):
+        lines.append(f'{section.name:<24} {section.wall_time:>10.3f} '
+                     f'{section.command_count:>8} '
+                     f'{section.child_wall_time:>10.3f} '
+                     f'{section.child_cpu_time:>11.3f} '
+                     f'{section.get_python_time():>10.3f}')
+    return lines
+
+def start_profiling(config):
+    """!Create a profiler, store it in the config object and start profiling
+        if PROFILE_METPLUS is True
+        @returns METplusProfiler or None if profiling is not enabled
+    """
+    if not config.getbool('config', 'PROFILE_METPLUS', False):
+        return None
+
+    config.profiler = METplusProfiler(config)
+    config.profiler.start()
+    return config.profiler
+
+@contextmanager
+def profile_section(config, name):
+    """!Profile the wrapped code as part of the named section if profiling
+        is enabled. Does nothing otherwise"""
+    profiler = getattr(config, 'profiler', None)
+    if profiler is None:
+        yield None
+        return
+
+    with profiler.section(name) as section:
+        yield section
+
+def write_profile_reports(config):
+    """!Stop profiling and write the reports to PROFILE_OUTPUT_DIR if
+        profiling was enabled"""
+    profiler = getattr(config, 'profiler', None)
+    if profiler is None:
+        return
+
+    profiler.stop()
+    config.profiler = None
+
+    output_dir = config.getdir('PROFILE_OUTPUT_DIR',
+                               os.path.join(config.getdir('OUTPUT_BASE'),
+                                            'profile'))
+    summary = profiler.write_reports(output_dir)
+    config.logger.info(f"Profile reports written to {output_dir}")
+    for line in summary:
+        config.logger.info(line)
@@ -0,0 +1,78 @@
+"""
+Program Name: py_embed_cache.py
+Contact(s): George McCabe
+Abstract: Store the data read by Python embedding scripts in NetCDF files so
+          each script is only run once for each set of arguments
+History Log:  Initial version
+Usage: Enabled by setting PY_EMBED_CACHE = True
+Parameters: None
+Input Files: Python embedding scripts and the files they read
+Output Files: PY_EMBED_CACHE_DIR/<hash>.nc
+"""
+
+import os
+import hashlib
+
+__all__ = ['is_cache_enabled', 'get_cache_dir', 'get_script_path',
+           'get_cache_key', 'get_cache_path']
+
+'''!@namespace py_embed_cache
+@brief Cache of Python embedding results keyed by script and arguments.
+The key of each result is a SHA-256 hash of the contents of the Python script,
+the full command (script and arguments), the Python embedding type, and the
+size and modification time of every argument that is an existing file. A
+result is reused until the script, its arguments or the files it reads
+change. Modules that are imported by the script are not part of the key, so
+remove PY_EMBED_CACHE_DIR after changing them. Results are stored in
+PY_EMBED_CACHE_DIR, which is not removed between runs so reruns reuse them.
+'''
+
+def is_cache_enabled(config):
+    """!Check if Python embedding results should be cached"""
+    return config.getbool('config', 'PY_EMBED_CACHE', False)
+
+def get_cache_dir(config):
+    """!Get the directory that stores cached Python embedding results"""
+    return config.getdir('PY_EMBED_CACHE_DIR',
+                         os.path.join(config.getdir('OUTPUT_BASE'),
+                                      'py_embed_cache'))
+
+def get_script_path(command):
+    """!Get the path of the Python script from a Python embedding command
+        @param command script and arguments, i.e. /path/read.py /path/file
+        @returns path to script or None if no item ends with .py
+    """
+    for item in command.split():
+        if item.endswith('.py'):
+            return item
+    return None
+
+def get_cache_key(command, data_type, extra=()):
+    """!Get the key of a Python embedding result
+        @param command script and arguments
+        @param data_type Python embedding type, i.e. PYTHON_NUMPY
+        @param extra list of other values that change the result, i.e. the
+         output grid
+        @returns hexadecimal SHA-256 hash
+    """
+    hasher = hashlib.sha256()
+    script = get_script_path(command)
+    if script and os.path.isfile(script):
+        with open(script, 'rb') as file_handle:
+            hasher.update(file_handle.read())
+
+    for item in [command, data_type] + list(extra):
+        hasher.update(str(item).encode('utf-8') + b'\0')
+
+    # include the state of any input files that are passed as arguments
+    for item in command.split()[1:]:
+        if os.path.isfile(item):
+            stat = os.stat(item)
+            hasher.update(f'{item}:{stat.st_size}:{stat.st_mtime_ns}'
+                          .encode('utf-8') + b'\0')
+
+    return hasher.hexdigest()
+
+def get_cache_path(config, key):
+    """!Get the path of the cached result for a key"""
+    return os.path.join(get_cache_dir(config), key[:2], f'{key}.nc')
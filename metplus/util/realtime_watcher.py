@@ -0,0 +1,599 @@
+"""
+Program Name: realtime_watcher.py
+Contact(s): George McCabe
+Abstract: Watch the input directories of the wrappers in the PROCESS_LIST
+          and run the wrappers for the times of the files that arrive
+History Log:  Initial version
+Usage: master_metplus.py --watch -c <conf> or set REALTIME_WATCH = True
+Parameters: None
+Input Files: Files that arrive in the input directories of the wrappers
+Output Files: REALTIME_WATCH_STATE_DB datastore
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import select
+import datetime
+import ctypes
+import ctypes.util
+
+from produtil.datastore import Datastore, UNSTARTED, COMPLETED, FAILED
+
+from . import time_util
+from .met_util import getlist, get_lead_sequence, is_loop_by_init
+from .config.string_template_substitution import populate_match_dict
+from .config.string_template_substitution import populate_output_dict
+from .task_queue import QueueTask, RUN_TIME_FMT, ALL_GROUPS
+from .task_queue import create_wrapper, loops_over_times, run_task
+from .task_queue import get_lead_string
+
+'''!@namespace realtime_watcher
+@brief Daemon that runs wrappers as their input files arrive.
+The input directories and filename templates of each wrapper are read from
+the *INPUT_DIR and *INPUT_TEMPLATE values of the wrapper. New files are
+detected with inotify on Linux or by polling the modification time of each
+directory otherwise, so only directories that changed are listed. The time
+information of each new file is extracted using the filename template to
+find the run time and forecast lead of the task(s) that use the file.
+Each (wrapper, run time, forecast lead) task is stored in a produtil
+Datastore so that tasks that already completed are not run again when the
+watcher is restarted. A task runs after no new files for it have arrived
+for REALTIME_WATCH_SETTLE_TIME seconds so that files that arrive together
+are processed by one run. The path and modification time of each file that
+triggered a task are stored with the task, so a completed task is run again
+if a file that it uses arrives that it was not run with or that was
+modified after it ran. Tasks that fail are run again when another file that
+they use arrives, up to REALTIME_WATCH_MAX_ATTEMPTS times.
+'''
+
+__all__ = ['WatchSource', 'PollingWatcher', 'InotifyWatcher',
+           'get_watch_sources', 'get_file_watcher', 'get_file_tasks',
+           'get_file_mtime', 'RealtimeWatcher', 'run_realtime_watcher']
+
+class WatchSource:
+    """!Input directory and filename templates of a wrapper"""
+    def __init__(self, process, data_type, input_dir, templates):
+        self.process = process
+        self.data_type = data_type
+        self.input_dir = os.path.abspath(input_dir)
+        self.templates = templates
+
+    def get_relative_path(self, path):
+        """!Get path relative to the input directory or None if the path is
+            not under the input directory"""
+        if not path.startswith(self.input_dir + os.path.sep):
+            return None
+        return path[len(self.input_dir) + 1:]
+
+def get_watch_sources(wrappers):
+    """!Get the input directories and templates of each wrapper
+        @param wrappers dictionary of process name to wrapper instance
+        @returns list of WatchSource objects
+    """
+    sources = []
+    for process, wrapper in wrappers.items():
+        for key, value in wrapper.c_dict.items():
+            if not key.endswith('INPUT_DIR') or not value:
+                continue
+
+            data_type = key[:-len('INPUT_DIR')]
+            templates = wrapper.c_dict.get(f'{data_type}INPUT_TEMPLATE')
+            if not templates or not isinstance(templates, str):
+                continue
+
+            sources.append(WatchSource(process, data_type.rstrip('_'), value,
+                                       getlist(templates)))
+    return sources
+
+class PollingWatcher:
+    """!Find new files by listing the directories whose modification time
+        changed since the previous poll"""
+
+    # directories modified within this many seconds are listed again on the
+    # next poll in case a file was added within the resolution of the
+    # modification time
+    RECENT_SECONDS = 2
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.dir_mtimes = {}
+        self.known_files = set()
+
+    def start(self, scan_existing=False):
+        """!Record the files that already exist
+            @param scan_existing if True, return the existing files
+            @returns list of existing files if scan_existing is True or an
+             empty list
+        """
+        new_files = self._scan()
+        return new_files if scan_existing else []
+
+    def poll(self, timeout):
+        """!Get files that arrived since the previous poll. Waits for the
+            timeout if no new files were found
+            @param timeout number of seconds to wait
+            @returns list of paths of new files
+        """
+        new_files = self._scan()
+        if not new_files:
+            time.sleep(timeout)
+        return new_files
+
+    def close(self):
+        pass
+
+    def _scan(self):
+        new_files = []
+        for directory in self.directories:
+            self._scan_dir(directory, new_files)
+        return new_files
+
+    def _scan_dir(self, directory, new_files):
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            self.dir_mtimes.pop(directory, None)
+            return
+
+        changed = (self.dir_mtimes.get(directory) != mtime or
+                   time.time() - mtime < self.RECENT_SECONDS)
+        self.dir_mtimes[directory] = mtime
+
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+
+        for entry in entries:
+            if entry.is_dir():
+                self._scan_dir(entry.path, new_files)
+            elif changed and entry.path not in self.known_files:
+                self.known_files.add(entry.path)
+                new_files.append(entry.path)
+
+class InotifyWatcher:
+    """!Find new files using inotify. Only available on Linux"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+
+    EVENT_FORMAT = 'iIII'
+    EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.watches = {}
+        self.libc = self.get_libc()
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # directories that do not exist yet are checked on each poll
+        self.missing = list(directories)
+
+    @staticmethod
+    def get_libc():
+        """!Get the C library if it provides inotify or None"""
+        if not sys.platform.startswith('linux'):
+            return None
+
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            return None
+
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            return None
+
+        return libc
+
+    @classmethod
+    def is_available(cls):
+        return cls.get_libc() is not None
+
+    def start(self, scan_existing=False):
+        """!Watch the directories that exist
+            @param scan_existing if True, return the existing files
+            @returns list of existing files if scan_existing is True or an
+             empty list
+        """
+        new_files = self._watch_missing()
+        return new_files if scan_existing else []
+
+    def poll(self, timeout):
+        """!Get files that were written or moved into a watched directory
+            @param timeout maximum number of seconds to wait for a file
+            @returns list of paths of new files
+        """
+        new_files = self._watch_missing()
+        if new_files:
+            return new_files
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from(self.EVENT_FORMAT, data,
+                                                     offset)
+            offset += self.EVENT_SIZE
+            name = data[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+
+            if mask & (self.IN_IGNORED | self.IN_DELETE_SELF):
+                self.watches.pop(wd, None)
+                if directory in self.directories:
+                    self.missing.append(directory)
+                continue
+
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                # watch the new directory and report files that were
+                # written to it before the watch was added
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    new_files.extend(self._add_watch(path))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                new_files.append(path)
+
+        # a file written to a new directory can be found when the directory
+        # is added and reported by an event
+        return list(dict.fromkeys(new_files))
+
+    def close(self):
+        os.close(self.fd)
+
+    def _watch_missing(self):
+        new_files = []
+        for directory in list(self.missing):
+            if os.path.isdir(directory):
+                self.missing.remove(directory)
+                new_files.extend(self._add_watch(directory))
+        return new_files
+
+    def _add_watch(self, directory):
+        """!Watch a directory and its subdirectories
+            @returns list of files that exist in the directories
+        """
+        files = []
+        for dirpath, _, filenames in os.walk(directory):
+            wd = self.libc.inotify_add_watch(self.fd, dirpath.encode(),
+                                             self.WATCH_MASK)
+            # files in directories that were already watched were reported
+            if wd in self.watches:
+                continue
+            if wd >= 0:
+                self.watches[wd] = dirpath
+            files.extend(os.path.join(dirpath, filename)
+                         for filename in filenames)
+        return files
+
+def get_file_watcher(config, directories):
+    """!Get the watcher to use to find new files. Uses inotify if it is
+        available unless REALTIME_WATCH_USE_POLLING is True"""
+    if (not config.getbool('config', 'REALTIME_WATCH_USE_POLLING', False) and
+            InotifyWatcher.is_available()):
+        try:
+            return InotifyWatcher(directories)
+        except OSError as err:
+            config.logger.warning(f"Could not use inotify: {err}. "
+                                  "Polling directories instead")
+
+    return PollingWatcher(directories)
+
+def get_file_tasks(config, source, path, loop_by):
+    """!Get the run times and forecast leads of the tasks that use a file
+        Args:
+          @param config METplusConfig object
+          @param source WatchSource that the file belongs to
+          @param path full path of the file
+          @param loop_by init or valid
+          @returns list of tuples of run time (datetime) and forecast lead
+           (string that can be set as LEAD_SEQ, or empty string to run all
+           forecast leads). An empty list is returned if the file does not
+           match the templates of the source
+    """
+    rel_path = source.get_relative_path(path)
+    if rel_path is None:
+        return []
+
+    for template in source.templates:
+        match_dict, valid_shift = populate_match_dict(template, rel_path)
+        if match_dict is None:
+            continue
+
+        time_dict = populate_output_dict(match_dict, valid_shift)
+        if not time_dict:
+            continue
+
+        # get the types of time information found in the filename
+        found = set(key.split('+')[0] for key in match_dict)
+        other = 'valid' if loop_by == 'init' else 'init'
+
+        # file contains the run time and the forecast lead, or the
+        # run time can be computed from the valid and init times
+        if 'lead' in found or (loop_by in found and other in found):
+            # time utility cannot be passed both init and valid times
+            if 'init' in time_dict and 'valid' in time_dict:
+                if 'lead' not in found:
+                    lead = time_dict['valid'] - time_dict['init']
+                    time_dict['lead'] = int(lead.total_seconds())
+                del time_dict['valid']
+            time_info = time_util.ti_calculate(time_dict)
+            return [(time_info[loop_by],
+                     get_lead_string(time_info['lead']))]
+
+        # file only contains the run time, so run all forecast leads
+        if loop_by in found:
+            return [(time_dict[loop_by], '')]
+
+        # file only contains the other time, so run each forecast lead that
+        # results in the time of the file
+        tasks = []
+        sign = -1 if loop_by == 'init' else 1
+        for lead in get_lead_sequence(config, {other: time_dict[other]}):
+            run_time = time_dict[other] + sign * lead
+            tasks.append((run_time, get_lead_string(lead)))
+        return tasks
+
+    return []
+
+def get_file_mtime(path):
+    """!Get the modification time of a file in nanoseconds or None if it
+        does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+class RealtimeWatcher:
+    """!Run wrappers for the tasks that use files as they arrive"""
+    def __init__(self, config, process_list, wrappers, dstore):
+        self.config = config
+        self.logger = config.logger
+        self.process_list = process_list
+        self.wrappers = wrappers
+        self.dstore = dstore
+        self.loop_by = 'init' if is_loop_by_init(config) else 'valid'
+        self.settle_time = config.getseconds('config',
+                                             'REALTIME_WATCH_SETTLE_TIME', 30)
+        self.max_age = config.getseconds('config', 'REALTIME_WATCH_MAX_AGE',
+                                         172800)
+        self.max_attempts = config.getint('config',
+                                          'REALTIME_WATCH_MAX_ATTEMPTS', 3)
+
+        self.sources = []
+        for source in get_watch_sources(wrappers):
+            if not loops_over_times(wrappers[source.process]):
+                self.logger.warning(f"{source.process} cannot be run for "
+                                    "one time at a time. Not watching "
+                                    f"{source.input_dir}")
+                continue
+            self.sources.append(source)
+
+        # time that the last file was received for each pending task
+        self.pending = {}
+        # modification time of the files received for each pending task
+        self.pending_inputs = {}
+        self.errors = 0
+
+    def get_directories(self):
+        """!Get the unique input directories to watch"""
+        directories = []
+        for source in self.sources:
+            if source.input_dir not in directories:
+                directories.append(source.input_dir)
+        return directories
+
+    def handle_file(self, path):
+        """!Add the tasks that use a new file to the pending tasks
+            @param path full path to the file
+            @returns number of tasks that were added
+        """
+        now = datetime.datetime.now()
+        count = 0
+        for source in self.sources:
+            for run_time, lead in get_file_tasks(self.config, source, path,
+                                                 self.loop_by):
+                if (now - run_time).total_seconds() > self.max_age:
+                    self.logger.debug(f"Skipping {path} for {run_time}: "
+                                      "older than REALTIME_WATCH_MAX_AGE")
+                    continue
+
+                task = self.get_task(source.process, run_time, lead, path)
+                if task is None:
+                    continue
+
+                self.logger.info(f"Found {path} for task {task.taskname}")
+                self.pending[task.taskname] = time.time()
+                self.pending_inputs.setdefault(task.taskname, {})[path] = \
+                    get_file_mtime(path)
+                count += 1
+        return count
+
+    def get_task(self, process, run_time, lead, path=None):
+        """!Get the task for a wrapper, run time, and forecast lead. The task
+            is created if it does not exist yet. A completed task is run
+            again if the file was not one of its inputs or was modified
+            after the task used it
+            Args:
+              @param process name of the wrapper
+              @param run_time run time (datetime) of the task
+              @param lead forecast lead of the task or empty string
+              @param path file that arrived for the task or None
+              @returns QueueTask that should be run or None if the task
+               already completed with the file or failed too many times
+        """
+        run_time_str = run_time.strftime(RUN_TIME_FMT)
+        name = f'{process}_{run_time_str}'
+        if lead:
+            name += f'_{lead}'
+
+        task = QueueTask(self.dstore, name,
+                         meta={'process': process,
+                               'order': str(self.process_list.index(process)),
+                               'group': ALL_GROUPS,
+                               'loop_by': self.loop_by,
+                               'run_time': run_time_str,
+                               'lead': lead,
+                               'attempts': '0'})
+        if task.state == COMPLETED:
+            if path is None or not self.is_new_input(task, path):
+                return None
+            self.logger.info(f"Running completed task {task.taskname} again "
+                             f"because {path} is new or changed")
+            task['attempts'] = '0'
+            task.state = UNSTARTED
+            return task
+
+        if task.state == FAILED:
+            if int(task['attempts']) >= self.max_attempts:
+                return None
+            task.state = UNSTARTED
+
+        return task
+
+    @staticmethod
+    def is_new_input(task, path):
+        """!Check if a file is new or was modified after a task ran with it.
+            Tasks that were run before their inputs were stored are not run
+            again
+            @param task QueueTask to check
+            @param path file that arrived for the task
+            @returns True if the task should be run again
+        """
+        inputs = task.get('inputs')
+        if inputs is None:
+            return False
+
+        inputs = json.loads(inputs)
+        if path not in inputs:
+            return True
+
+        mtime = get_file_mtime(path)
+        return mtime is not None and (inputs[path] is None or
+                                      mtime > inputs[path])
+
+    def run_ready_tasks(self, force=False):
+        """!Run the pending tasks that have not received a new file within
+            the settle time
+            @param force if True, run all pending tasks
+            @returns number of tasks that were run
+        """
+        cutoff = time.time() - self.settle_time
+        ready = [name for name, received in self.pending.items()
+                 if force or received <= cutoff]
+
+        # run tasks in PROCESS_LIST order, then by time
+        tasks = [QueueTask(self.dstore, name, logger=self.logger)
+                 for name in ready]
+        tasks.sort(key=lambda item: (int(item['order']), item['run_time'],
+                                     item.get('lead', '')))
+        for task in tasks:
+            del self.pending[task.taskname]
+            # store the files that the task is run with
+            inputs = json.loads(task.get('inputs') or '{}')
+            inputs.update(self.pending_inputs.pop(task.taskname, {}))
+            task['inputs'] = json.dumps(inputs)
+            task['attempts'] = str(int(task['attempts']) + 1)
+            self.errors += run_task(task, self.wrappers[task['process']],
+                                     self.config, self.dstore, None, None)
+
+        return len(tasks)
+
+    def run(self, watcher, duration=0):
+        """!Watch for files and run tasks until the duration has passed
+            @param watcher PollingWatcher or InotifyWatcher
+            @param duration number of seconds to run or 0 to run until the
+             process is stopped
+            @returns number of errors that occurred
+        """
+        poll_interval = self.config.getseconds('config',
+                                               'REALTIME_WATCH_POLL_INTERVAL',
+                                               10)
+        scan_existing = self.config.getbool('config',
+                                            'REALTIME_WATCH_SCAN_EXISTING',
+                                            True)
+        end_time = time.time() + duration if duration > 0 else None
+        for path in watcher.start(scan_existing):
+            self.handle_file(path)
+
+        try:
+            while end_time is None or time.time() < end_time:
+                timeout = poll_interval
+                if self.pending:
+                    timeout = min(timeout, self.settle_time)
+                if end_time is not None:
+                    timeout = max(min(timeout, end_time - time.time()), 0)
+
+                for path in watcher.poll(timeout):
+                    self.handle_file(path)
+                self.run_ready_tasks()
+        except KeyboardInterrupt:
+            self.logger.info("Stopping realtime watcher")
+        finally:
+            watcher.close()
+
+        return self.errors
+
+def run_realtime_watcher(config, process_list):
+    """!Watch the input directories of the wrappers in the process list and
+        run the wrappers for each file that arrives until the process is
+        stopped or REALTIME_WATCH_DURATION has passed
+        Args:
+          @param config METplusConfig object
+          @param process_list list of wrapper names from PROCESS_LIST
+          @returns number of errors that occurred
+    """
+    logger = config.logger
+    wrappers = {}
+    for process in process_list:
+        try:
+            wrappers[process] = create_wrapper(config, process)
+        except AttributeError:
+            raise NameError("There was a problem loading %s wrapper." % process)
+
+        if not wrappers[process].isOK:
+            logger.error(f"{process} was not initialized properly")
+            return 1
+
+    db_path = config.getstr('config', 'REALTIME_WATCH_STATE_DB',
+                            os.path.join(config.getdir('OUTPUT_BASE'),
+                                         'metplus_realtime.db'))
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
+    dstore = Datastore(db_path, logger=logger)
+    logger.info(f"Using realtime state: {db_path}")
+
+    realtime = RealtimeWatcher(config, process_list, wrappers, dstore)
+    directories = realtime.get_directories()
+    if not directories:
+        logger.error("No input directories to watch were found for the "
+                     "wrappers in PROCESS_LIST")
+        return 1
+
+    watcher = get_file_watcher(config, directories)
+    logger.info(f"Watching {len(directories)} directories with "
+                f"{watcher.__class__.__name__}: {', '.join(directories)}")
+    duration = config.getseconds('config', 'REALTIME_WATCH_DURATION', 0)
+    return realtime.run(watcher, duration)
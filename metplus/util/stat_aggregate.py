@@ -0,0 +1,585 @@
+"""
+Program Name: stat_aggregate.py
+Contact(s): George McCabe
+Abstract: Run common stat_analysis aggregation jobs in Python instead of
+          calling the MET stat_analysis application
+History Log:  Initial version
+Usage: Enabled by setting STAT_ANALYSIS_PYTHON_ENGINE = True
+Parameters: None
+Input Files: MET .stat files
+Output Files: -dump_row and -out_stat files of each job
+"""
+
+import os
+import math
+import shlex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .stat_file_index import (StatFileIndex, parse_stat_time,
+                              lead_to_seconds, subtract_lead)
+
+__all__ = ['StatAggregateError', 'is_available', 'parse_job',
+           'get_filters', 'run_job']
+
+'''!@namespace stat_aggregate
+@brief In-process engine for aggregate and aggregate_stat jobs.
+Supported jobs are -job aggregate with -line_type SL1L2, SAL1L2, VL1L2,
+VAL1L2 or CTC and -job aggregate_stat with -line_type SL1L2 -out_line_type
+CNT or -line_type CTC -out_line_type CTS. The only other options that are
+supported are -by, -dump_row and -out_stat, which is required.
+StatAggregateError is raised for any other job so the caller can run
+stat_analysis instead.
+The lines that match the job are grouped by the -by columns and summed with
+NumPy. Partial sums are averaged using TOTAL as the weight and contingency
+table counts are added. CNT and CTS lines contain the statistics that can
+be derived from the aggregated lines. Confidence intervals and statistics
+that require the matched pairs, i.e. rank correlations and percentiles of
+the error, are written as NA.
+'''
+
+# columns of the line types that can be read. VL1L2 lines from MET versions
+# before 7.0 only contain the first 8 columns
+LINE_TYPE_COLUMNS = {
+    'SL1L2': ['TOTAL', 'FBAR', 'OBAR', 'FOBAR', 'FFBAR', 'OOBAR', 'MAE'],
+    'SAL1L2': ['TOTAL', 'FABAR', 'OABAR', 'FOABAR', 'FFABAR', 'OOABAR',
+               'MAE'],
+    'VL1L2': ['TOTAL', 'UFBAR', 'VFBAR', 'UOBAR', 'VOBAR', 'UVFOBAR',
+              'UVFFBAR', 'UVOOBAR', 'F_SPEED_BAR', 'O_SPEED_BAR'],
+    'VAL1L2': ['TOTAL', 'UFABAR', 'VFABAR', 'UOABAR', 'VOABAR', 'UVFOABAR',
+               'UVFFABAR', 'UVOOABAR'],
+    'CTC': ['TOTAL', 'FY_OY', 'FY_ON', 'FN_OY', 'FN_ON'],
+}
+
+# line types that contain counts that are added instead of averaged
+COUNT_LINE_TYPES = ['CTC']
+
+# columns of the statistics line types in the MET 9.0 format
+CNT_COLUMNS = [
+    'TOTAL',
+    'FBAR', 'FBAR_NCL', 'FBAR_NCU', 'FBAR_BCL', 'FBAR_BCU',
+    'FSTDEV', 'FSTDEV_NCL', 'FSTDEV_NCU', 'FSTDEV_BCL', 'FSTDEV_BCU',
+    'OBAR', 'OBAR_NCL', 'OBAR_NCU', 'OBAR_BCL', 'OBAR_BCU',
+    'OSTDEV', 'OSTDEV_NCL', 'OSTDEV_NCU', 'OSTDEV_BCL', 'OSTDEV_BCU',
+    'PR_CORR', 'PR_CORR_NCL', 'PR_CORR_NCU', 'PR_CORR_BCL', 'PR_CORR_BCU',
+    'SP_CORR', 'KT_CORR', 'RANKS', 'FRANK_TIES', 'ORANK_TIES',
+    'ME', 'ME_NCL', 'ME_NCU', 'ME_BCL', 'ME_BCU',
+    'ESTDEV', 'ESTDEV_NCL', 'ESTDEV_NCU', 'ESTDEV_BCL', 'ESTDEV_BCU',
+    'MBIAS', 'MBIAS_BCL', 'MBIAS_BCU',
+    'MAE', 'MAE_BCL', 'MAE_BCU',
+    'MSE', 'MSE_BCL', 'MSE_BCU',
+    'BCMSE', 'BCMSE_BCL', 'BCMSE_BCU',
+    'RMSE', 'RMSE_BCL', 'RMSE_BCU',
+    'E10', 'E10_BCL', 'E10_BCU', 'E25', 'E25_BCL', 'E25_BCU',
+    'E50', 'E50_BCL', 'E50_BCU', 'E75', 'E75_BCL', 'E75_BCU',
+    'E90', 'E90_BCL', 'E90_BCU', 'EIQR', 'EIQR_BCL', 'EIQR_BCU',
+    'MAD', 'MAD_BCL', 'MAD_BCU',
+    'ANOM_CORR', 'ANOM_CORR_NCL', 'ANOM_CORR_NCU', 'ANOM_CORR_BCL',
+    'ANOM_CORR_BCU',
+    'ME2', 'ME2_BCL', 'ME2_BCU',
+    'MSESS', 'MSESS_BCL', 'MSESS_BCU',
+    'RMSFA', 'RMSFA_BCL', 'RMSFA_BCU',
+    'RMSOA', 'RMSOA_BCL', 'RMSOA_BCU',
+    'ANOM_CORR_UNCNTR', 'ANOM_CORR_UNCNTR_BCL', 'ANOM_CORR_UNCNTR_BCU',
+]
+
+CTS_COLUMNS = ['TOTAL']
+for _stat in ['BASER', 'FMEAN', 'ACC']:
+    CTS_COLUMNS.extend([_stat] + [f'{_stat}_{ci}' for ci in
+                                  ['NCL', 'NCU', 'BCL', 'BCU']])
+CTS_COLUMNS.extend(['FBIAS', 'FBIAS_BCL', 'FBIAS_BCU'])
+for _stat in ['PODY', 'PODN', 'POFD', 'FAR', 'CSI']:
+    CTS_COLUMNS.extend([_stat] + [f'{_stat}_{ci}' for ci in
+                                  ['NCL', 'NCU', 'BCL', 'BCU']])
+CTS_COLUMNS.extend(['GSS', 'GSS_BCL', 'GSS_BCU'])
+CTS_COLUMNS.extend(['HK', 'HK_NCL', 'HK_NCU', 'HK_BCL', 'HK_BCU'])
+CTS_COLUMNS.extend(['HSS', 'HSS_BCL', 'HSS_BCU'])
+for _stat in ['ODDS', 'LODDS', 'ORSS', 'EDS', 'SEDS', 'EDI', 'SEDI']:
+    CTS_COLUMNS.extend([_stat] + [f'{_stat}_{ci}' for ci in
+                                  ['NCL', 'NCU', 'BCL', 'BCU']])
+CTS_COLUMNS.extend(['BAGSS', 'BAGSS_BCL', 'BAGSS_BCU'])
+
+OUTPUT_VERSION = 'V9.0'
+
+SUPPORTED_JOBS = {
+    'aggregate': {line_type: None for line_type in LINE_TYPE_COLUMNS},
+    'aggregate_stat': {'SL1L2': 'CNT', 'CTC': 'CTS'},
+}
+
+SUPPORTED_OPTIONS = ['job', 'line_type', 'out_line_type', 'by', 'dump_row',
+                     'out_stat']
+
+# settings of a StatAnalysis job that filter by the value of a column
+LIST_FILTERS = {
+    'MODEL': 'MODEL',
+    'DESC': 'DESC',
+    'FCST_VAR': 'FCST_VAR',
+    'OBS_VAR': 'OBS_VAR',
+    'FCST_UNITS': 'FCST_UNITS',
+    'OBS_UNITS': 'OBS_UNITS',
+    'FCST_LEVEL': 'FCST_LEV',
+    'OBS_LEVEL': 'OBS_LEV',
+    'OBTYPE': 'OBTYPE',
+    'VX_MASK': 'VX_MASK',
+    'INTERP_MTHD': 'INTERP_MTHD',
+    'INTERP_PNTS': 'INTERP_PNTS',
+    'LINE_TYPE': 'LINE_TYPE',
+}
+
+# settings that are compared numerically by stat_analysis
+UNSUPPORTED_FILTERS = ['FCST_THRESH', 'OBS_THRESH', 'COV_THRESH', 'ALPHA']
+
+class StatAggregateError(Exception):
+    """!Raised if a job cannot be run by the Python engine"""
+
+def is_available():
+    """!Check if NumPy, which is required to run jobs, is installed"""
+    return np is not None
+
+def parse_job(job):
+    """!Read the options of a stat_analysis job
+        @param job job string, i.e. -job aggregate -line_type CTC
+        @returns dictionary of options. The value of by is a list of columns
+        @throws StatAggregateError if the job is not supported
+    """
+    tokens = shlex.split(job)
+    options = {}
+    for index in range(0, len(tokens), 2):
+        name = tokens[index]
+        if not name.startswith('-') or index + 1 >= len(tokens):
+            raise StatAggregateError(f"Cannot parse job argument {name}")
+
+        name = name[1:]
+        value = tokens[index + 1]
+        if name not in SUPPORTED_OPTIONS:
+            raise StatAggregateError(f"Job option -{name} is not supported")
+
+        if name == 'by':
+            options.setdefault('by', []).extend(
+                column.strip().upper() for column in value.split(',')
+            )
+        elif name in options:
+            raise StatAggregateError(f"Job option -{name} can only be set "
+                                     "once")
+        else:
+            options[name] = value
+
+    out_line_types = SUPPORTED_JOBS.get(options.get('job'))
+    if out_line_types is None:
+        raise StatAggregateError(f"Job type {options.get('job')} is not "
+                                 "supported")
+
+    line_type = options.get('line_type', '').upper()
+    out_line_type = options.get('out_line_type', '').upper() or None
+    if (line_type not in out_line_types or
+            out_line_types[line_type] != out_line_type):
+        raise StatAggregateError(f"Job {options['job']} is not supported "
+                                 f"for line type {line_type} and output "
+                                 f"line type {out_line_type}")
+
+    if 'out_stat' not in options:
+        raise StatAggregateError("Job option -out_stat must be set")
+
+    options['line_type'] = line_type
+    options['out_line_type'] = out_line_type or line_type
+    options.setdefault('by', [])
+    return options
+
+def _get_list(value):
+    return [item.strip().strip('"') for item in value.split(',')
+            if item.strip().strip('"')]
+
+def get_filters(settings):
+    """!Get the filters of a job from the settings that StatAnalysis sets
+        in the environment for the MET configuration file
+        @param settings dictionary of runtime settings of a job
+        @returns dictionary with the keys columns (column name to list of
+         values), leads (FCST_LEAD and OBS_LEAD to list of seconds), hours
+         (i.e. FCST_VALID_HOUR to list of HHMMSS), and windows (i.e.
+         FCST_VALID to beginning and end)
+        @throws StatAggregateError if a filter that is not supported is set
+    """
+    for name in UNSUPPORTED_FILTERS:
+        if _get_list(settings.get(name, '')):
+            raise StatAggregateError(f"Filtering by {name} is not supported")
+
+    filters = {'columns': {}, 'leads': {}, 'hours': {}, 'windows': {}}
+    for name, column in LIST_FILTERS.items():
+        values = _get_list(settings.get(name, ''))
+        if values:
+            filters['columns'][column] = values
+
+    for name in ['FCST_LEAD', 'OBS_LEAD']:
+        values = _get_list(settings.get(name, ''))
+        if values:
+            filters['leads'][name] = [lead_to_seconds(value)
+                                      for value in values]
+
+    for data_type in ['FCST', 'OBS']:
+        for time_type in ['VALID', 'INIT']:
+            name = f'{data_type}_{time_type}'
+            hours = _get_list(settings.get(f'{name}_HOUR', ''))
+            if hours:
+                filters['hours'][name] = [hour.zfill(6) for hour in hours]
+
+            window = [parse_stat_time(settings.get(f'{name}_{edge}', ''))
+                      for edge in ['BEG', 'END']]
+            if any(window):
+                filters['windows'][name] = window
+
+    return filters
+
+def _get_times(header):
+    """!Get the valid and init times of a line. The init times are the
+        valid times minus the lead"""
+    times = {}
+    for data_type in ['FCST', 'OBS']:
+        lead = header[f'{data_type}_LEAD']
+        valid_beg = header[f'{data_type}_VALID_BEG']
+        valid_end = header[f'{data_type}_VALID_END']
+        times[f'{data_type}_VALID'] = (valid_beg, valid_end)
+        times[f'{data_type}_INIT'] = (subtract_lead(valid_beg, lead),
+                                      subtract_lead(valid_end, lead))
+    return times
+
+def _matches(header, filters):
+    for column, values in filters['columns'].items():
+        if header.get(column) not in values:
+            return False
+
+    for name, leads in filters['leads'].items():
+        if lead_to_seconds(header[name]) not in leads:
+            return False
+
+    if not filters['hours'] and not filters['windows']:
+        return True
+
+    times = _get_times(header)
+    for name, hours in filters['hours'].items():
+        if times[name][0].split('_')[1] not in hours:
+            return False
+
+    for name, (window_beg, window_end) in filters['windows'].items():
+        time_beg, time_end = times[name]
+        if window_beg and time_beg < window_beg:
+            return False
+        if window_end and time_end > window_end:
+            return False
+
+    return True
+
+def read_lines(lookin_paths, line_type, filters, config=None):
+    """!Read the lines of a line type that match the filters of a job
+        @param lookin_paths list of .stat files and directories
+        @param line_type line type to read
+        @param filters dictionary from get_filters
+        @param config optional METplusConfig object used to get the
+         directory walker of the run
+        @returns tuple of the list of header column names (up to LINE_TYPE),
+         the list of line type column names, and a list of tuples containing
+         the header values and the line type values of each line
+        @throws StatAggregateError if the lines cannot be read
+    """
+    header_names = None
+    line_columns = None
+    lines = []
+    for lookin in lookin_paths:
+        for stat_file in StatFileIndex.get_stat_files(lookin, config):
+            names = None
+            with open(stat_file, 'r') as file_handle:
+                for line in file_handle:
+                    items = line.split()
+                    if not items:
+                        continue
+
+                    if items[0] == 'VERSION':
+                        if 'LINE_TYPE' not in items:
+                            raise StatAggregateError("No LINE_TYPE column in "
+                                                     f"{stat_file}")
+                        names = items[:items.index('LINE_TYPE') + 1]
+                        continue
+
+                    if names is None:
+                        raise StatAggregateError("No header line in "
+                                                 f"{stat_file}")
+
+                    if items[len(names) - 1] != line_type:
+                        continue
+
+                    header = dict(zip(names, items[:len(names)]))
+                    if not _matches(header, filters):
+                        continue
+
+                    values = items[len(names):]
+                    columns = LINE_TYPE_COLUMNS[line_type][:len(values)]
+                    if len(columns) != len(values):
+                        raise StatAggregateError(f"Unexpected number of "
+                                                 f"{line_type} columns in "
+                                                 f"{stat_file}")
+
+                    if header_names is None:
+                        header_names = names
+                        line_columns = columns
+                    elif names != header_names or columns != line_columns:
+                        raise StatAggregateError("Lines with different "
+                                                 "columns cannot be "
+                                                 "aggregated")
+
+                    lines.append((items[:len(names)], values))
+
+    if header_names is None:
+        header_names = []
+        line_columns = LINE_TYPE_COLUMNS[line_type]
+
+    return header_names, line_columns, lines
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+def aggregate(line_type, line_columns, values, group_index, num_groups):
+    """!Add the lines of each group
+        @param line_type line type of the lines
+        @param line_columns names of the columns of the values
+        @param values 2D array of values with one row per line
+        @param group_index array of the group of each line
+        @param num_groups number of groups
+        @returns dictionary of column name to array of aggregated values
+         with one value per group
+    """
+    total = np.bincount(group_index, weights=values[:, 0],
+                        minlength=num_groups)
+    aggregated = {'TOTAL': total}
+    for index, column in enumerate(line_columns[1:], start=1):
+        if line_type in COUNT_LINE_TYPES:
+            aggregated[column] = np.bincount(group_index,
+                                             weights=values[:, index],
+                                             minlength=num_groups)
+            continue
+
+        # average the partial sums using the number of pairs as the weight
+        with np.errstate(invalid='ignore', divide='ignore'):
+            aggregated[column] = (
+                np.bincount(group_index, weights=values[:, 0] * values[:, index],
+                            minlength=num_groups) / total
+            )
+    return aggregated
+
+def _stdev(mean, mean_sq, total):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (mean_sq - mean * mean) * total / (total - 1)
+        return np.where(variance < 0, 0.0, np.sqrt(np.abs(variance)))
+
+def compute_cnt(sums):
+    """!Compute continuous statistics from aggregated SL1L2 partial sums
+        @param sums dictionary from aggregate
+        @returns dictionary of CNT column name to array of values
+    """
+    total = sums['TOTAL']
+    fbar = sums['FBAR']
+    obar = sums['OBAR']
+    fobar = sums['FOBAR']
+    ffbar = sums['FFBAR']
+    oobar = sums['OOBAR']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mse = ffbar + oobar - 2.0 * fobar
+        me = fbar - obar
+        stats = {
+            'TOTAL': total,
+            'FBAR': fbar,
+            'FSTDEV': _stdev(fbar, ffbar, total),
+            'OBAR': obar,
+            'OSTDEV': _stdev(obar, oobar, total),
+            'PR_CORR': ((fobar - fbar * obar) /
+                        np.sqrt((ffbar - fbar * fbar) *
+                                (oobar - obar * obar))),
+            'ME': me,
+            'ESTDEV': _stdev(me, mse, total),
+            'MBIAS': np.where(obar == 0, np.nan, fbar / obar),
+            'MAE': sums['MAE'] if 'MAE' in sums else np.full_like(total,
+                                                                 np.nan),
+            'MSE': mse,
+            'BCMSE': mse - me * me,
+            'RMSE': np.sqrt(mse),
+            'ME2': me * me,
+        }
+    return stats
+
+def compute_cts(counts):
+    """!Compute categorical statistics from aggregated CTC counts
+        @param counts dictionary from aggregate
+        @returns dictionary of CTS column name to array of values
+    """
+    total = counts['TOTAL']
+    fy_oy = counts['FY_OY']
+    fy_on = counts['FY_ON']
+    fn_oy = counts['FN_OY']
+    fn_on = counts['FN_ON']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pody = fy_oy / (fy_oy + fn_oy)
+        pofd = fy_on / (fy_on + fn_on)
+        hits_random = (fy_oy + fy_on) * (fy_oy + fn_oy) / total
+        correct_random = ((fy_oy + fy_on) * (fy_oy + fn_oy) +
+                          (fn_oy + fn_on) * (fy_on + fn_on)) / total
+        log_hits = np.log(fy_oy / total)
+        stats = {
+            'TOTAL': total,
+            'BASER': (fy_oy + fn_oy) / total,
+            'FMEAN': (fy_oy + fy_on) / total,
+            'ACC': (fy_oy + fn_on) / total,
+            'FBIAS': (fy_oy + fy_on) / (fy_oy + fn_oy),
+            'PODY': pody,
+            'PODN': fn_on / (fy_on + fn_on),
+            'POFD': pofd,
+            'FAR': fy_on / (fy_oy + fy_on),
+            'CSI': fy_oy / (fy_oy + fy_on + fn_oy),
+            'GSS': ((fy_oy - hits_random) /
+                    (fy_oy + fy_on + fn_oy - hits_random)),
+            'HK': pody - pofd,
+            'HSS': ((fy_oy + fn_on - correct_random) /
+                    (total - correct_random)),
+            'ODDS': (fy_oy * fn_on) / (fy_on * fn_oy),
+            'LODDS': (np.log(fy_oy) + np.log(fn_on) -
+                      np.log(fy_on) - np.log(fn_oy)),
+            'ORSS': ((fy_oy * fn_on - fy_on * fn_oy) /
+                     (fy_oy * fn_on + fy_on * fn_oy)),
+            'EDS': 2.0 * np.log((fy_oy + fn_oy) / total) / log_hits - 1.0,
+            'SEDS': ((np.log((fy_oy + fy_on) / total) +
+                      np.log((fy_oy + fn_oy) / total)) / log_hits - 1.0),
+            'EDI': ((np.log(pofd) - np.log(pody)) /
+                    (np.log(pofd) + np.log(pody))),
+            'SEDI': ((np.log(pofd) - np.log(pody) -
+                      np.log(1 - pofd) + np.log(1 - pody)) /
+                     (np.log(pofd) + np.log(pody) +
+                      np.log(1 - pofd) + np.log(1 - pody))),
+        }
+    return stats
+
+def _format_value(column, value):
+    if value is None or isinstance(value, str):
+        return value or 'NA'
+    if math.isnan(value) or math.isinf(value):
+        return 'NA'
+    if column == 'TOTAL' or column.startswith(('FY_', 'FN_')):
+        return str(int(round(value)))
+    return f'{value:.5f}'
+
+def _merge_header(names, headers, out_line_type):
+    """!Get the header columns of an aggregated line. Columns that differ
+        between the lines are set to the earliest beginning time, the
+        latest end time and lead, or a comma separated list of the values"""
+    merged = []
+    for index, name in enumerate(names):
+        values = sorted(set(header[index] for header in headers))
+        if name == 'VERSION':
+            merged.append(OUTPUT_VERSION)
+        elif name == 'LINE_TYPE':
+            merged.append(out_line_type)
+        elif len(values) == 1:
+            merged.append(values[0])
+        elif name.endswith('_BEG'):
+            merged.append(values[0])
+        elif name.endswith('_END'):
+            merged.append(values[-1])
+        elif name.endswith('_LEAD'):
+            merged.append(max(values, key=lead_to_seconds))
+        else:
+            merged.append(','.join(values))
+    return merged
+
+def _write_lines(path, lines, catalog=None):
+    parent_dir = os.path.dirname(path)
+    if parent_dir and not os.path.exists(parent_dir):
+        os.makedirs(parent_dir, exist_ok=True)
+    with open(path, 'w') as file_handle:
+        for line in lines:
+            file_handle.write(' '.join(line) + '\n')
+    if catalog:
+        catalog.invalidate(path)
+
+def run_job(job, lookin_paths, filters, logger=None, catalog=None,
+            config=None):
+    """!Run an aggregate or aggregate_stat job
+        @param job job string containing -dump_row and -out_stat paths
+        @param lookin_paths list of .stat files and directories
+        @param filters dictionary from get_filters
+        @param logger optional logger
+        @param catalog FileCatalog to remove the output files from after they
+         are written so they are found by later lookups, or None
+        @param config optional METplusConfig object used to get the
+         directory walker of the run
+        @returns list of output lines written to the -out_stat file. Each
+         line is a list of strings
+        @throws StatAggregateError if the job is not supported
+    """
+    if not is_available():
+        raise StatAggregateError("NumPy is required")
+
+    options = parse_job(job)
+    line_type = options['line_type']
+    out_line_type = options['out_line_type']
+
+    names, line_columns, lines = read_lines(lookin_paths, line_type, filters,
+                                            config)
+    if logger:
+        logger.debug(f"Python engine found {len(lines)} {line_type} lines")
+
+    for column in options['by']:
+        if names and column not in names:
+            raise StatAggregateError(f"Cannot group by column {column}")
+
+    if 'dump_row' in options:
+        dump_header = ((names or ['VERSION']) + line_columns)
+        _write_lines(options['dump_row'],
+                     [dump_header] + [header + values
+                                      for header, values in lines],
+                     catalog)
+
+    out_columns = {'CNT': CNT_COLUMNS, 'CTS': CTS_COLUMNS}.get(out_line_type,
+                                                               line_columns)
+    out_lines = [(names or ['VERSION', 'LINE_TYPE']) + out_columns]
+    if lines:
+        headers = [header for header, _ in lines]
+        values = np.array([[_to_float(value) for value in line_values]
+                           for _, line_values in lines], dtype=float)
+
+        # find the group of each line from the values of the -by columns
+        by_indices = [names.index(column) for column in options['by']]
+        keys = np.array([[header[index] for index in by_indices]
+                         for header in headers], dtype=str)
+        if by_indices:
+            _, group_index = np.unique(keys, axis=0, return_inverse=True)
+            group_index = group_index.reshape(-1)
+        else:
+            group_index = np.zeros(len(lines), dtype=int)
+        num_groups = int(group_index.max()) + 1
+
+        sums = aggregate(line_type, line_columns, values, group_index,
+                         num_groups)
+        if out_line_type == 'CNT':
+            stats = compute_cnt(sums)
+        elif out_line_type == 'CTS':
+            stats = compute_cts(sums)
+        else:
+            stats = sums
+
+        group_headers = [[] for _ in range(num_groups)]
+        for header, group in zip(headers, group_index):
+            group_headers[group].append(header)
+
+        for group in range(num_groups):
+            out_lines.append(
+                _merge_header(names, group_headers[group], out_line_type) +
+                [_format_value(column,
+                               stats[column][group] if column in stats
+                               else None)
+                 for column in out_columns]
+            )
+
+    _write_lines(options['out_stat'], out_lines, catalog)
+    return out_lines[1:]
@@ -0,0 +1,231 @@
+"""
+Program Name: stat_file_index.py
+Contact(s): George McCabe
+Abstract: Index of MET .stat files containing the range of times and the
+          models found in each file so StatAnalysis can pass only the files
+          that can match a job to stat_analysis
+History Log:  Initial version
+Usage: Enabled by setting STAT_ANALYSIS_LOOKIN_INDEX = True
+Parameters: None
+Input Files: MET .stat files
+Output Files: STAT_ANALYSIS_LOOKIN_INDEX_FILE (JSON)
+"""
+
+import os
+import json
+from datetime import datetime, timedelta
+
+from .directory_walker import find_files
+from .met_util import write_through_tmp
+
+__all__ = ['StatFileIndex', 'parse_stat_time', 'lead_to_seconds',
+           'subtract_lead', 'read_stat_file']
+
+'''!@namespace stat_file_index
+@brief Prune the -lookin argument of stat_analysis using an index of files.
+Each .stat file is read once to find the earliest and latest forecast valid,
+forecast initialization and observation valid times and the names in the
+MODEL column. The result is stored in a JSON file with the size and
+modification time of the .stat file so it is only read again after it
+changes. Files that cannot be read are always passed to stat_analysis.
+'''
+
+STAT_TIME_FORMAT = '%Y%m%d_%H%M%S'
+
+# formats that are accepted for the beginning and end of a time window
+WINDOW_TIME_FORMATS = ['%Y%m%d_%H%M%S', '%Y%m%d_%H%M', '%Y%m%d_%H',
+                       '%Y%m%d%H%M%S', '%Y%m%d%H%M', '%Y%m%d%H', '%Y%m%d']
+
+def parse_stat_time(value):
+    """!Convert a time from a stat file or a window of a StatAnalysis job to
+        the format used in stat files
+        @param value time string, i.e. 20190101_000000 or 20190101
+        @returns time string in YYYYMMDD_HHMMSS format or None if the value
+         could not be parsed
+    """
+    value = value.strip().strip('"')
+    for time_format in WINDOW_TIME_FORMATS:
+        try:
+            return datetime.strptime(value, time_format).strftime(STAT_TIME_FORMAT)
+        except ValueError:
+            continue
+    return None
+
+def lead_to_seconds(lead):
+    """!Convert a lead from a stat file, i.e. 720000 or 1200000, to seconds"""
+    negative = lead.startswith('-')
+    lead = lead.lstrip('-').zfill(6)
+    seconds = int(lead[:-4]) * 3600 + int(lead[-4:-2]) * 60 + int(lead[-2:])
+    return -seconds if negative else seconds
+
+def subtract_lead(valid, lead):
+    """!Get the init time of a stat file valid time and lead"""
+    valid_dt = datetime.strptime(valid, STAT_TIME_FORMAT)
+    init_dt = valid_dt - timedelta(seconds=lead_to_seconds(lead))
+    return init_dt.strftime(STAT_TIME_FORMAT)
+
+def read_stat_file(path):
+    """!Read the range of times and the models found in a .stat file
+        @param path .stat file to read
+        @returns dictionary with keys fcst_valid, fcst_init and obs_valid
+         containing a list of the earliest and latest time and models
+         containing the sorted list of model names. None is returned if the
+         file could not be read
+    """
+    columns = ['MODEL', 'FCST_LEAD', 'FCST_VALID_BEG', 'FCST_VALID_END',
+               'OBS_VALID_BEG', 'OBS_VALID_END']
+    ranges = {'fcst_valid': [], 'fcst_init': [], 'obs_valid': []}
+    models = set()
+    indices = None
+    try:
+        with open(path, 'r') as file_handle:
+            for line in file_handle:
+                items = line.split()
+                if not items:
+                    continue
+
+                # read column positions from each header line
+                if items[0] == 'VERSION':
+                    if any(column not in items for column in columns):
+                        return None
+                    indices = [items.index(column) for column in columns]
+                    continue
+
+                if indices is None:
+                    return None
+
+                (model, fcst_lead, fcst_beg, fcst_end,
+                 obs_beg, obs_end) = [items[index] for index in indices]
+                models.add(model)
+                ranges['fcst_valid'].extend([fcst_beg, fcst_end])
+                ranges['fcst_init'].extend([subtract_lead(fcst_beg, fcst_lead),
+                                            subtract_lead(fcst_end, fcst_lead)])
+                ranges['obs_valid'].extend([obs_beg, obs_end])
+    except (OSError, UnicodeDecodeError, IndexError, ValueError):
+        return None
+
+    entry = {key: [min(values), max(values)] if values else None
+             for key, values in ranges.items()}
+    entry['models'] = sorted(models)
+    return entry
+
+class StatFileIndex:
+    """!Index of .stat files that is read from and written to a JSON file so
+        files that did not change are not read again in later runs
+    """
+    def __init__(self, index_file=None, logger=None, config=None):
+        self.index_file = index_file
+        self.logger = logger
+        self.config = config
+        self.entries = {}
+        self.changed = False
+        if index_file and os.path.exists(index_file):
+            try:
+                with open(index_file, 'r') as file_handle:
+                    self.entries = json.load(file_handle)
+            except (OSError, ValueError):
+                if logger:
+                    logger.warning(f"Could not read stat file index "
+                                   f"{index_file}. Creating a new index")
+
+    def get_entry(self, path):
+        """!Get the index entry of a .stat file, reading the file if it is
+            not in the index or it changed since it was read
+            @param path .stat file
+            @returns dictionary from read_stat_file or None if the file could
+             not be read
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = [stat.st_size, stat.st_mtime_ns]
+        cached = self.entries.get(path)
+        if cached is not None and cached['key'] == key:
+            return cached['entry']
+
+        entry = read_stat_file(path)
+        self.entries[path] = {'key': key, 'entry': entry}
+        self.changed = True
+        return entry
+
+    @staticmethod
+    def get_stat_files(lookin, config=None):
+        """!Get all .stat files that stat_analysis reads from a -lookin path
+            @param lookin file or directory
+            @param config optional METplusConfig object used to get the
+             directory walker of the run
+            @returns sorted list of files
+        """
+        if os.path.isfile(lookin):
+            return [lookin]
+
+        return sorted(find_files(lookin, r'.*\.stat$', config))
+
+    @staticmethod
+    def _overlaps(time_range, window):
+        if time_range is None:
+            return False
+
+        window_beg, window_end = window
+        if window_beg and time_range[1] < window_beg:
+            return False
+        if window_end and time_range[0] > window_end:
+            return False
+        return True
+
+    def matches(self, path, windows, models=None):
+        """!Check if a .stat file may contain lines that match a job
+            @param path .stat file
+            @param windows dictionary with keys fcst_valid, fcst_init or
+             obs_valid containing the beginning and end of the window in the
+             YYYYMMDD_HHMMSS format. Either may be None to leave it open
+            @param models list of model names or None to match any model
+            @returns True if the file may contain matching lines
+        """
+        entry = self.get_entry(path)
+        # pass files that could not be read to stat_analysis
+        if entry is None:
+            return True
+
+        if models and not set(models).intersection(entry['models']):
+            return False
+
+        return all(self._overlaps(entry[key], window)
+                   for key, window in windows.items())
+
+    def filter_lookin(self, lookin_list, windows, models=None):
+        """!Get the paths to pass to -lookin for a job. A directory is passed
+            unchanged if every .stat file under it may match the job
+            @param lookin_list list of files and directories
+            @param windows time windows of the job. See matches
+            @param models list of model names or None to match any model
+            @returns list of files and directories
+        """
+        paths = []
+        for lookin in lookin_list:
+            stat_files = self.get_stat_files(lookin, self.config)
+            matched = [stat_file for stat_file in stat_files
+                       if self.matches(stat_file, windows, models)]
+            if matched and len(matched) == len(stat_files):
+                paths.append(lookin)
+            else:
+                paths.extend(matched)
+
+            if self.logger:
+                self.logger.debug(f"{len(matched)} of {len(stat_files)} stat "
+                                  f"files in {lookin} match the job")
+
+        return paths
+
+    def save(self):
+        """!Write the index to the index file if any entries changed"""
+        if not self.index_file or not self.changed:
+            return
+
+        with write_through_tmp(self.index_file) as tmp_path:
+            with open(tmp_path, 'w') as file_handle:
+                json.dump(self.entries, file_handle)
+        self.changed = False
@@ -0,0 +1,458 @@
+"""
+Program Name: task_queue.py
+Contact(s): George McCabe
+Abstract: Distributed execution of METplus wrappers through a task queue
+          stored in a produtil.datastore sqlite3 database
+History Log:  Initial version
+Usage: master_metplus.py --worker -c <conf> (run on as many nodes as desired)
+Parameters: None
+Input Files: TASK_QUEUE_DB datastore on a shared filesystem
+Output Files: N/A
+"""
+
+import os
+import json
+import socket
+import threading
+import time
+import datetime
+from importlib import import_module
+
+from produtil.datastore import Datastore, Task, Product
+from produtil.datastore import UNSTARTED, RUNNING, COMPLETED, FAILED
+
+from . import time_util
+from .met_util import camel_to_underscore, get_lead_sequence
+from .met_util import get_start_end_interval_times, is_loop_by_init
+
+'''!@namespace task_queue
+@brief Multi-node work queue for METplus wrappers.
+Each (wrapper, run time[, forecast lead]) combination is stored as a Task
+in a shared produtil Datastore. Any number of worker processes claim
+tasks atomically under the datastore file lock, run them, and record the
+commands and output of each task as a Product. Workers refresh a heartbeat
+while a task runs so that tasks claimed by a worker that died can be
+returned to the queue by the remaining workers.
+'''
+
+__all__ = ['QueueTask', 'get_task_queue', 'plan_tasks', 'claim_task',
+           'recover_stale_tasks', 'get_task_state_counts',
+           'run_task_queue_worker', 'create_wrapper', 'loops_over_times',
+           'run_task', 'get_lead_string']
+
+# format of run times stored in the task metadata
+RUN_TIME_FMT = '%Y%m%d%H%M%S'
+
+# group used for tasks that must wait on every earlier task
+ALL_GROUPS = '*'
+
+# category of the Product records that describe what each task produced
+PRODUCT_CATEGORY = 'metplus'
+
+# select the first unstarted task whose dependencies have all completed.
+# a task depends on every task with a lower order value in the same group
+# or in the group that applies to all run times
+CLAIMABLE_TASK_QUERY = f'''
+SELECT p.id FROM products p
+  JOIN metadata o ON o.id = p.id AND o.key = 'order'
+  JOIN metadata g ON g.id = p.id AND g.key = 'group'
+WHERE p.type = 'QueueTask' AND p.available = {UNSTARTED}
+  AND NOT EXISTS (
+    SELECT 1 FROM products p2
+      JOIN metadata o2 ON o2.id = p2.id AND o2.key = 'order'
+      JOIN metadata g2 ON g2.id = p2.id AND g2.key = 'group'
+    WHERE p2.type = 'QueueTask' AND p2.available != {COMPLETED}
+      AND CAST(o2.value AS INTEGER) < CAST(o.value AS INTEGER)
+      AND (g2.value = g.value OR g2.value = '{ALL_GROUPS}'
+           OR g.value = '{ALL_GROUPS}'))
+ORDER BY CAST(o.value AS INTEGER), p.id
+LIMIT 1
+'''
+
+STALE_TASK_QUERY = f'''
+SELECT p.id, a.value FROM products p
+  JOIN metadata h ON h.id = p.id AND h.key = 'heartbeat'
+  JOIN metadata a ON a.id = p.id AND a.key = 'attempts'
+WHERE p.type = 'QueueTask' AND p.available = {RUNNING}
+  AND CAST(h.value AS INTEGER) < ?
+'''
+
+class QueueTask(Task):
+    """!Task stored in the METplus task queue. The metadata describes which
+        wrapper to run (process), the run time and loop type (run_time,
+        loop_by), the forecast lead to restrict the run to (lead) and the
+        ordering information used to resolve dependencies (order, group).
+        An empty run_time means the wrapper is run over all times at once.
+    """
+    def run_wrapper(self, wrapper, config):
+        """!Run the wrapper for the run time and lead described by this task
+            Args:
+              @param wrapper instance of the wrapper named by the process
+               metadata
+              @param config METplusConfig object
+        """
+        run_time = self.get('run_time', '')
+        if not run_time:
+            wrapper.run_all_times()
+            return
+
+        clock_time = datetime.datetime.strptime(config.getstr('config',
+                                                              'CLOCK_TIME'),
+                                                '%Y%m%d%H%M%S')
+        input_dict = {'now': clock_time,
+                      self['loop_by']: datetime.datetime.strptime(run_time,
+                                                                  RUN_TIME_FMT)}
+
+        lead = self.get('lead', '')
+        if not lead:
+            wrapper.clear()
+            wrapper.run_at_time(input_dict)
+            return
+
+        # restrict the forecast lead list to the lead of this task
+        lead_seq = config.getstr('config', 'LEAD_SEQ')
+        config.set('config', 'LEAD_SEQ', lead)
+        try:
+            wrapper.clear()
+            wrapper.run_at_time(input_dict)
+        finally:
+            config.set('config', 'LEAD_SEQ', lead_seq)
+
+class _Heartbeat(threading.Thread):
+    """!Thread that periodically records that a worker is still alive
+        while it runs a task"""
+    def __init__(self, dstore, worker_id, task_id, interval):
+        super().__init__(name='metplus-heartbeat', daemon=True)
+        self.dstore = dstore
+        self.worker_id = worker_id
+        self.task_id = task_id
+        self.interval = interval
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            _beat(self.dstore, self.worker_id, self.task_id)
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+def _beat(dstore, worker_id, task_id=None):
+    now = int(time.time())
+    with dstore.transaction() as t:
+        t.mutate('UPDATE workers SET lastseen=? WHERE rowid=?',
+                 (now, worker_id))
+        if task_id is not None:
+            t.mutate('INSERT OR REPLACE INTO metadata VALUES (?,?,?)',
+                     (task_id, 'heartbeat', str(now)))
+
+def get_lead_string(lead):
+    """!Convert a forecast lead to a string that can be read by
+        get_lead_sequence. Leads that contain months or years are kept in
+        months because they cannot be converted to seconds"""
+    if isinstance(lead, int):
+        return f'{lead}S'
+
+    if lead.years or lead.months:
+        return f'{lead.years * 12 + lead.months}m'
+
+    return f'{time_util.ti_get_seconds_from_relativedelta(lead)}S'
+
+def loops_over_times(wrapper):
+    """!Return True if the wrapper uses the default time looping logic, so it
+        can be run one time at a time with run_at_time. Wrappers that
+        override run_all_times process every time in a single call"""
+    from ..wrappers.command_builder import CommandBuilder
+    return type(wrapper).run_all_times is CommandBuilder.run_all_times
+
+def create_wrapper(config, process):
+    """!Create an instance of a wrapper
+        Args:
+          @param config METplusConfig object
+          @param process name of the wrapper from PROCESS_LIST
+          @returns instance of the wrapper
+    """
+    logger = config.log(process)
+    package_name = 'metplus.wrappers.' + camel_to_underscore(process) + '_wrapper'
+    module = import_module(package_name)
+    return getattr(module, process + 'Wrapper')(config, logger)
+
+def get_task_queue(config, logger=None):
+    """!Open (and create if necessary) the datastore that holds the task queue
+        Args:
+          @param config METplusConfig object to read TASK_QUEUE_DB
+          @param logger optional logger passed to the datastore
+          @returns produtil.datastore.Datastore object
+    """
+    db_path = config.getstr('config', 'TASK_QUEUE_DB',
+                            os.path.join(config.getdir('OUTPUT_BASE'),
+                                         'metplus_task_queue.db'))
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
+
+    return Datastore(db_path, logger=logger)
+
+def plan_tasks(config, process_list, dstore, wrappers=None):
+    """!Add a task for each wrapper, run time, and (optionally) forecast lead
+        to the datastore. Tasks that already exist are left untouched, so
+        every worker can safely call this function when it starts.
+        Args:
+          @param config METplusConfig object
+          @param process_list list of wrapper names from PROCESS_LIST
+          @param dstore Datastore to add tasks to
+          @param wrappers optional dictionary of wrapper instances keyed by
+           process name. Wrappers are created if not provided
+          @returns list of QueueTask names that were planned or None if the
+           time information could not be read from the configuration
+    """
+    loop_by = 'init' if is_loop_by_init(config) else 'valid'
+    start_time, end_time, time_interval = (
+        get_start_end_interval_times(config) or (None, None, None)
+    )
+    if not start_time:
+        config.logger.error("Could not get [INIT/VALID] time information "
+                            "from configuration file")
+        return None
+
+    run_times = []
+    loop_time = start_time
+    while loop_time <= end_time:
+        run_times.append(loop_time)
+        loop_time += time_interval
+
+    split_leads = (config.getbool('config', 'TASK_QUEUE_SPLIT_BY_LEAD', False)
+                   and config.has_option('config', 'LEAD_SEQ'))
+    loop_by_times = config.getstr('config', 'LOOP_ORDER', '') == 'times'
+
+    if wrappers is None:
+        wrappers = {process: create_wrapper(config, process)
+                    for process in process_list}
+
+    task_names = []
+    with dstore.transaction():
+        for order, process in enumerate(process_list):
+            if not loops_over_times(wrappers[process]):
+                task_names.append(
+                    _add_task(dstore, process, order, ALL_GROUPS,
+                              loop_by=loop_by)
+                )
+                continue
+
+            for run_time in run_times:
+                run_time_str = run_time.strftime(RUN_TIME_FMT)
+                leads = ['']
+                if split_leads:
+                    leads = [get_lead_string(lead) for lead in
+                             get_lead_sequence(config, {loop_by: run_time})]
+
+                for lead in leads:
+                    group = ALL_GROUPS
+                    if loop_by_times:
+                        group = run_time_str
+                        if lead:
+                            group += f'_{lead}'
+
+                    task_names.append(
+                        _add_task(dstore, process, order, group,
+                                  loop_by=loop_by, run_time=run_time_str,
+                                  lead=lead)
+                    )
+
+    return task_names
+
+def _add_task(dstore, process, order, group, loop_by, run_time='', lead=''):
+    name = f"{process}_{run_time or 'all_times'}"
+    if lead:
+        name += f'_{lead}'
+
+    QueueTask(dstore, name,
+              meta={'process': process,
+                    'order': str(order),
+                    'group': group,
+                    'loop_by': loop_by,
+                    'run_time': run_time,
+                    'lead': lead,
+                    'attempts': '0'})
+    return name
+
+def recover_stale_tasks(transaction, heartbeat_timeout, max_attempts,
+                        logger=None):
+    """!Return running tasks whose worker has not reported a heartbeat within
+        the timeout to the queue, or mark them as failed if they have
+        already been attempted the maximum number of times. Must be called
+        inside a datastore transaction.
+        Args:
+          @param transaction active produtil.datastore.Transaction
+          @param heartbeat_timeout seconds without a heartbeat before a task
+           is considered abandoned
+          @param max_attempts maximum number of times to run a task
+          @param logger optional logger to report recovered tasks
+          @returns number of tasks that were recovered
+    """
+    cutoff = int(time.time()) - heartbeat_timeout
+    stale = transaction.query(STALE_TASK_QUERY, (cutoff,))
+    for did, attempts in stale:
+        state = UNSTARTED if int(attempts) < max_attempts else FAILED
+        transaction.mutate('UPDATE products SET available=? WHERE id=?',
+                           (state, did))
+        if logger:
+            logger.warning(f"Task {did} was abandoned by its worker after "
+                           f"{attempts} attempt(s). "
+                           f"{'Requeued' if state == UNSTARTED else 'Failed'}")
+
+    return len(stale)
+
+def claim_task(dstore, worker_info, heartbeat_timeout, max_attempts,
+               logger=None):
+    """!Atomically claim the next task that is ready to run. Abandoned tasks
+        are recovered first.
+        Args:
+          @param dstore Datastore containing the task queue
+          @param worker_info string that identifies the claiming worker
+          @param heartbeat_timeout seconds before a running task is
+           considered abandoned
+          @param max_attempts maximum number of times to run a task
+          @param logger optional logger
+          @returns QueueTask that is now RUNNING or None if no task is ready
+    """
+    now = str(int(time.time()))
+    with dstore.transaction() as t:
+        recover_stale_tasks(t, heartbeat_timeout, max_attempts, logger)
+        rows = t.query(CLAIMABLE_TASK_QUERY)
+        if not rows:
+            return None
+
+        did = rows[0][0]
+        attempts = t.query('SELECT value FROM metadata WHERE id=? AND key=?',
+                           (did, 'attempts'))
+        attempts = int(attempts[0][0]) + 1 if attempts else 1
+        t.mutate('UPDATE products SET available=? WHERE id=?', (RUNNING, did))
+        for key, value in (('worker', worker_info),
+                           ('heartbeat', now),
+                           ('attempts', str(attempts))):
+            t.mutate('INSERT OR REPLACE INTO metadata VALUES (?,?,?)',
+                     (did, key, value))
+
+        return QueueTask(dstore, did.split('::', 1)[1], logger=logger,
+                         cache=False)
+
+def get_task_state_counts(dstore):
+    """!Get the number of queued tasks in each state
+        @param dstore Datastore containing the task queue
+        @returns dictionary of task state (i.e. RUNNING) to count
+    """
+    with dstore.transaction() as t:
+        rows = t.query('SELECT available, COUNT(*) FROM products '
+                       'WHERE type = ? GROUP BY available', ('QueueTask',))
+    return {state: count for state, count in rows}
+
+def run_task_queue_worker(config, process_list):
+    """!Plan the tasks for the wrappers in the process list, then claim and
+        run tasks from the task queue until none remain.
+        Args:
+          @param config METplusConfig object
+          @param process_list list of wrapper names from PROCESS_LIST
+          @returns number of errors that occurred in tasks run by this worker
+    """
+    logger = config.logger
+    heartbeat_interval = config.getseconds('config',
+                                           'TASK_QUEUE_HEARTBEAT_INTERVAL', 60)
+    heartbeat_timeout = config.getseconds('config',
+                                          'TASK_QUEUE_HEARTBEAT_TIMEOUT', 600)
+    max_attempts = config.getint('config', 'TASK_QUEUE_MAX_ATTEMPTS', 3)
+    poll_interval = config.getseconds('config', 'TASK_QUEUE_POLL_INTERVAL', 30)
+
+    if heartbeat_timeout <= heartbeat_interval:
+        logger.error('TASK_QUEUE_HEARTBEAT_TIMEOUT must be greater than '
+                     'TASK_QUEUE_HEARTBEAT_INTERVAL')
+        return 1
+
+    wrappers = {}
+    for process in process_list:
+        try:
+            wrappers[process] = create_wrapper(config, process)
+        except AttributeError:
+            raise NameError("There was a problem loading %s wrapper." % process)
+
+    all_ok = True
+    for process, wrapper in wrappers.items():
+        if not wrapper.isOK:
+            all_ok = False
+            logger.error(f"{process} was not initialized properly")
+
+    if not all_ok:
+        logger.info("Refer to ERROR messages above to resolve issues.")
+        return 1
+
+    dstore = get_task_queue(config, logger)
+    logger.info(f"Using task queue: {dstore.filename}")
+    if plan_tasks(config, process_list, dstore, wrappers) is None:
+        return 1
+
+    worker_info = f'{socket.gethostname()}:{os.getpid()}'
+    with dstore.transaction() as t:
+        worker_id = t.mutate('INSERT INTO workers VALUES (?,?)',
+                             (worker_info, int(time.time())))
+
+    total_errors = 0
+    tasks_run = 0
+    while True:
+        task = claim_task(dstore, worker_info, heartbeat_timeout,
+                          max_attempts, logger)
+        if task is None:
+            counts = get_task_state_counts(dstore)
+            if counts.get(RUNNING):
+                logger.debug(f"Waiting {poll_interval} seconds for "
+                             f"{counts[RUNNING]} running task(s) on other "
+                             "workers")
+                _beat(dstore, worker_id)
+                time.sleep(poll_interval)
+                continue
+
+            if counts.get(UNSTARTED):
+                logger.error(f"{counts[UNSTARTED]} task(s) cannot run "
+                             "because a task they depend on failed")
+                total_errors += 1
+            break
+
+        total_errors += run_task(task, wrappers[task['process']], config,
+                                  dstore, worker_id, heartbeat_interval)
+        tasks_run += 1
+
+    logger.info(f"Worker {worker_info} ran {tasks_run} task(s)")
+    return total_errors
+
+def run_task(task, wrapper, config, dstore, worker_id, heartbeat_interval):
+    """!Run a claimed task, record its products and final state.
+        A heartbeat is only recorded while the task runs if worker_id is set
+        @returns number of errors that occurred running the task"""
+    logger = config.logger
+    logger.info(f"Running task {task.taskname} (attempt {task['attempts']})")
+
+    errors_before = wrapper.errors
+    num_commands = len(wrapper.all_commands)
+
+    heartbeat = None
+    if worker_id is not None:
+        heartbeat = _Heartbeat(dstore, worker_id, task.did,
+                               heartbeat_interval)
+        heartbeat.start()
+    try:
+        task.run_wrapper(wrapper, config)
+        errors = wrapper.errors - errors_before
+    except Exception:
+        logger.exception(f"Fatal error occurred in task {task.taskname}")
+        errors = wrapper.errors - errors_before + 1
+    finally:
+        if heartbeat is not None:
+            heartbeat.stop()
+
+    product = Product(dstore, task.taskname, PRODUCT_CATEGORY)
+    product['commands'] = json.dumps(wrapper.all_commands[num_commands:])
+    output_path = wrapper.get_output_path() if wrapper.outfile else ''
+    product.set_loc_avail(output_path, not errors)
+
+    task.state = COMPLETED if not errors else FAILED
+    logger.info(f"Task {task.taskname} {task.strstate}")
+    return errors
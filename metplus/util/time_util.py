@@ -13,6 +13,12 @@ import datetime
 from dateutil.relativedelta import relativedelta
 import re
 
+# NumPy is optional. It is only used to precompute the run time grid
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 '''!@namespace TimeInfo
 @brief Utility to handle timing in METplus wrappers
 @code{.sh}
@@ -182,13 +188,173 @@ def ti_get_lead_string(lead, plural=True):
 
     return output
 
+class TimeInfo(dict):
+    """!Time information dictionary returned by ti_calculate. The formatted
+        values (today, init_fmt, da_init_fmt, valid_fmt, and lead_string) are
+        only computed when one of them is first read, which avoids calling
+        strftime and building the lead string for time information that is
+        only used to compute other times. All other values are stored as
+        normal dictionary items. The formatted values are computed before
+        now, init, valid, or da_init are changed so they keep the values
+        they would have had if they were computed by ti_calculate.
+    """
+    __slots__ = ('_lead_delta', '_lazy')
+
+    LAZY_KEYS = ('today', 'init_fmt', 'da_init_fmt', 'valid_fmt',
+                 'lead_string')
+
+    # keys that the lazy values are computed from
+    SOURCE_KEYS = frozenset(('now', 'init', 'valid', 'da_init'))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lead_delta = None
+        self._lazy = False
+
+    def _materialize(self):
+        """!Compute the formatted values that have not been read yet"""
+        if not self._lazy:
+            return
+
+        self._lazy = False
+        # once all values are set, behave exactly like a dictionary. This
+        # also lets Python copy the items directly when unpacking with **
+        self.__class__ = _CompleteTimeInfo
+
+        # values that were set by the caller are not replaced
+        if 'now' in self and 'today' not in self:
+            self['today'] = self['now'].strftime('%Y%m%d')
+        if 'init_fmt' not in self:
+            self['init_fmt'] = self['init'].strftime('%Y%m%d%H%M%S')
+        if 'da_init_fmt' not in self:
+            self['da_init_fmt'] = self['da_init'].strftime('%Y%m%d%H%M%S')
+        if 'valid_fmt' not in self:
+            self['valid_fmt'] = self['valid'].strftime('%Y%m%d%H%M%S')
+        if 'lead_string' not in self:
+            lead = self._lead_delta
+            if not isinstance(lead, relativedelta):
+                lead = relativedelta(seconds=lead)
+            self['lead_string'] = ti_get_lead_string(lead)
+
+    def __missing__(self, key):
+        if self._lazy and key in self.LAZY_KEYS:
+            self._materialize()
+            return super().__getitem__(key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if self._lazy and key in self.LAZY_KEYS:
+            self._materialize()
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        if key in self.SOURCE_KEYS:
+            self._materialize()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._materialize()
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self._materialize()
+        super().update(*args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self._materialize()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._materialize()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._materialize()
+        return super().popitem()
+
+    def keys(self):
+        self._materialize()
+        return super().keys()
+
+    def values(self):
+        self._materialize()
+        return super().values()
+
+    def items(self):
+        self._materialize()
+        return super().items()
+
+    def __iter__(self):
+        self._materialize()
+        return super().__iter__()
+
+    def __len__(self):
+        self._materialize()
+        return super().__len__()
+
+    def __eq__(self, other):
+        self._materialize()
+        if isinstance(other, TimeInfo):
+            other._materialize()
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._materialize()
+        return super().__repr__()
+
+    def copy(self):
+        self._materialize()
+        return _CompleteTimeInfo(self)
+
+    def __reduce__(self):
+        self._materialize()
+        return (_CompleteTimeInfo, (dict(self),))
+
+class _CompleteTimeInfo(TimeInfo):
+    """!TimeInfo that has computed all of its formatted values. It uses the
+        dictionary methods directly instead of checking for lazy values"""
+    __slots__ = ()
+
+    get = dict.get
+    keys = dict.keys
+    values = dict.values
+    items = dict.items
+    update = dict.update
+    setdefault = dict.setdefault
+    pop = dict.pop
+    popitem = dict.popitem
+    __contains__ = dict.__contains__
+    __setitem__ = dict.__setitem__
+    __delitem__ = dict.__delitem__
+    __iter__ = dict.__iter__
+    __len__ = dict.__len__
+    __eq__ = dict.__eq__
+    __ne__ = dict.__ne__
+    __repr__ = dict.__repr__
+
 def ti_calculate(input_dict):
+    """!Compute the init, valid, da_init, and forecast lead information from
+        the items set in the input dictionary
+        @param input_dict dictionary (or TimeInfo) containing init, valid,
+         or da_init and optionally lead, offset, now, and custom
+        @returns TimeInfo object containing the time information
+    """
     out_dict = {}
 
     # set output dictionary to input items
     if 'now' in input_dict.keys():
         out_dict['now'] = input_dict['now']
-        out_dict['today'] = out_dict['now'].strftime('%Y%m%d')
 
     # if custom is set in input dictionary, set it in the output dictionary
     if 'custom' in input_dict.keys():
@@ -199,16 +365,21 @@ def ti_calculate(input_dict):
 
     # look for forecast lead information in input
     # set forecast lead to 0 if not specified
+    # integer leads in seconds are added as a timedelta, which gives the same
+    # result as a relativedelta and is much faster to create
     if 'lead' in input_dict.keys():
         # if lead is relativedelta, pass it through
         # if lead is not, treat it as seconds
-        if isinstance(input_dict['lead'], relativedelta):
+        if isinstance(input_dict['lead'], (relativedelta, int)):
             out_dict['lead'] = input_dict['lead']
         else:
             out_dict['lead'] = relativedelta(seconds=input_dict['lead'])
 
     elif 'lead_seconds' in input_dict.keys():
-        out_dict['lead'] = relativedelta(seconds=input_dict['lead_seconds'])
+        if isinstance(input_dict['lead_seconds'], int):
+            out_dict['lead'] = input_dict['lead_seconds']
+        else:
+            out_dict['lead'] = relativedelta(seconds=input_dict['lead_seconds'])
 
     elif 'lead_minutes' in input_dict.keys():
         out_dict['lead'] = relativedelta(minutes=input_dict['lead_minutes'])
@@ -217,7 +388,13 @@ def ti_calculate(input_dict):
         out_dict['lead'] = relativedelta(hours=input_dict['lead_hours'])
 
     else:
-        out_dict['lead'] = relativedelta(seconds=0)
+        out_dict['lead'] = 0
+
+    lead = out_dict['lead']
+    if isinstance(lead, int):
+        lead_delta = datetime.timedelta(seconds=lead)
+    else:
+        lead_delta = lead
 
 
     # set offset to 0 if not specified
@@ -246,7 +423,7 @@ def ti_calculate(input_dict):
             exit(1)
 
         # compute valid from init and lead
-        out_dict['valid'] = out_dict['init'] + out_dict['lead']
+        out_dict['valid'] = out_dict['init'] + lead_delta
 
         # set loop_by to init or valid to be able to see what was set first
         out_dict['loop_by'] = 'init'
@@ -256,7 +433,7 @@ def ti_calculate(input_dict):
         out_dict['valid'] = input_dict['valid']
 
         # compute init from valid and lead
-        out_dict['init'] = out_dict['valid'] - out_dict['lead']
+        out_dict['init'] = out_dict['valid'] - lead_delta
 
         # set loop_by to init or valid to be able to see what was set first
         out_dict['loop_by'] = 'valid'
@@ -273,7 +450,7 @@ def ti_calculate(input_dict):
         out_dict['valid'] = out_dict['da_init'] - out_dict['offset']
 
         # compute init from valid and lead
-        out_dict['init'] = out_dict['valid'] - out_dict['lead']
+        out_dict['init'] = out_dict['valid'] - lead_delta
     else:
         print("ERROR: Need to specify valid, init, or da_init to time utility")
         exit(1)
@@ -281,21 +458,13 @@ def ti_calculate(input_dict):
     # calculate da_init from valid and offset
     out_dict['da_init'] = out_dict['valid'] + out_dict['offset']
 
-    # add common formatted items
-    out_dict['init_fmt'] = out_dict['init'].strftime('%Y%m%d%H%M%S')
-    out_dict['da_init_fmt'] = out_dict['da_init'].strftime('%Y%m%d%H%M%S')
-    out_dict['valid_fmt'] = out_dict['valid'].strftime('%Y%m%d%H%M%S')
-
     # get difference between valid and init to get total seconds since relativedelta
     # does not have a fixed number of seconds
     total_seconds = int((out_dict['valid'] - out_dict['init']).total_seconds())
 
-    # get string representation of forecast lead
-    out_dict['lead_string'] = ti_get_lead_string(out_dict['lead'])
-
     # change relativedelta to integer seconds unless months or years are used
     # if they are, keep lead as a relativedelta object to be handled differently
-    if out_dict['lead'].months == 0 and out_dict['lead'].years == 0:
+    if isinstance(lead, int) or (lead.months == 0 and lead.years == 0):
         out_dict['lead'] = total_seconds
 
     out_dict['offset'] = int(out_dict['offset'].total_seconds())
@@ -312,4 +481,116 @@ def ti_calculate(input_dict):
     out_dict['date'] = out_dict['da_init']
     out_dict['cycle'] = out_dict['da_init']
 
-    return out_dict
+    # today, init_fmt, da_init_fmt, valid_fmt, and lead_string are computed
+    # from the forecast lead and these items when they are first read
+    time_info = TimeInfo(out_dict)
+    time_info._lead_delta = lead
+    time_info._lazy = True
+    return time_info
+
+class RunTimeGrid:
+    """!Init and valid times of every combination of run time and forecast
+        lead, computed once per run so the time information of each task is
+        an index lookup instead of a call to ti_calculate. The times are
+        stored in a NumPy datetime64 array if NumPy is available. Forecast
+        leads that contain months or years are not included because their
+        length depends on the run time.
+    """
+    def __init__(self, run_times, leads, loop_by='init', now=None):
+        """!@param run_times list of datetime objects to process
+            @param leads list of forecast leads (relativedelta or seconds)
+            @param loop_by init or valid. Determines if the run times are the
+             init or valid times
+            @param now clock time of the run
+        """
+        self.loop_by = loop_by
+        self.now = now
+        self.run_index = {run_time: index
+                          for index, run_time in enumerate(run_times)}
+        self.lead_index = {}
+        for lead in leads:
+            seconds = self.get_lead_seconds(lead)
+            if seconds is not None and seconds not in self.lead_index:
+                self.lead_index[seconds] = len(self.lead_index)
+
+        self.lead_list = list(self.lead_index)
+        self.run_times = list(self.run_index)
+
+        # the other time is valid if looping by init and init otherwise
+        self.other_times = None
+        if numpy is not None and self.run_times and self.lead_list:
+            runs = numpy.array(self.run_times, dtype='datetime64[us]')
+            seconds = numpy.array(self.lead_list, dtype='timedelta64[s]')
+            if loop_by == 'init':
+                self.other_times = runs[:, None] + seconds[None, :]
+            else:
+                self.other_times = runs[:, None] - seconds[None, :]
+
+    @staticmethod
+    def get_lead_seconds(lead):
+        if isinstance(lead, int):
+            return lead
+        return ti_get_seconds_from_relativedelta(lead)
+
+    def get_time_info(self, input_dict):
+        """!Get the time information for the run time and forecast lead set
+            in the input dictionary
+            @param input_dict dictionary containing now, init or valid
+             (matching loop_by), and optionally lead and custom
+            @returns TimeInfo object with the same items ti_calculate would
+             return or None if the input is not in the grid
+        """
+        for key in input_dict:
+            if key not in ('now', 'lead', 'custom', self.loop_by):
+                return None
+
+        if input_dict.get('now') != self.now:
+            return None
+
+        run_index = self.run_index.get(input_dict.get(self.loop_by))
+        lead = input_dict.get('lead', 0)
+        lead_index = self.lead_index.get(self.get_lead_seconds(lead))
+        if run_index is None or lead_index is None:
+            return None
+
+        run_time = self.run_times[run_index]
+        lead_seconds = self.lead_list[lead_index]
+        if self.other_times is not None:
+            other_time = self.other_times[run_index, lead_index].item()
+        elif self.loop_by == 'init':
+            other_time = run_time + datetime.timedelta(seconds=lead_seconds)
+        else:
+            other_time = run_time - datetime.timedelta(seconds=lead_seconds)
+
+        if self.loop_by == 'init':
+            init, valid = run_time, other_time
+        else:
+            init, valid = other_time, run_time
+
+        # same items in the same order as ti_calculate with no offset
+        out_dict = {}
+        if 'now' in input_dict:
+            out_dict['now'] = input_dict['now']
+        if 'custom' in input_dict:
+            out_dict['custom'] = input_dict['custom']
+        out_dict['lead'] = lead_seconds
+        out_dict['offset'] = 0
+        if self.loop_by == 'init':
+            out_dict['init'] = init
+            out_dict['valid'] = valid
+        else:
+            out_dict['valid'] = valid
+            out_dict['init'] = init
+        out_dict['loop_by'] = self.loop_by
+        out_dict['da_init'] = valid
+        out_dict['lead_hours'] = int(lead_seconds // 3600)
+        out_dict['lead_minutes'] = int(lead_seconds // 60)
+        out_dict['lead_seconds'] = lead_seconds
+        out_dict['offset_hours'] = 0
+        out_dict['date'] = valid
+        out_dict['cycle'] = valid
+
+        time_info = TimeInfo(out_dict)
+        time_info._lead_delta = lead_seconds
+        time_info._lazy = True
+        return time_info
@@ -14,11 +14,14 @@ import sys
 import glob
 from datetime import datetime
 from abc import ABCMeta
+from concurrent.futures import ThreadPoolExecutor
 from inspect import getframeinfo, stack
 
 from .command_runner import CommandRunner
 from ..util import met_util as util
 from ..util import do_string_sub, ti_calculate, get_seconds_from_string
+from ..util.command_plan import get_command_plan, skip_input_checks
+from ..util import py_embed_cache
 
 # pylint:disable=pointless-string-statement
 '''!@namespace CommandBuilder
@@ -35,6 +38,12 @@ class CommandBuilder:
     """
     __metaclass__ = ABCMeta
 
+    # True if the commands of the wrapper can be collected into an MPMD batch
+    # (see USE_MPMD). Only set this for wrappers that do not read the output
+    # of a command during the same run time, because deferred commands do
+    # not run until the whole batch is launched
+    mpmd_supported = False
+
     def __init__(self, config, logger):
         self.isOK = True
         self.errors = 0
@@ -55,8 +64,18 @@ class CommandBuilder:
         self.c_dict = self.create_c_dict()
         self.check_for_externals()
 
-        self.cmdrunner = CommandRunner(self.config, logger=self.logger,
-                                       verbose=self.c_dict['VERBOSITY'])
+        # listings of input directories shared by the offsets and forecast
+        # leads of a run. See get_input_index
+        self.input_index = (util.get_file_catalog(config) or
+                            util.InputFileIndex(config))
+        # run time that the input index was last refreshed for
+        self.input_index_run_time = None
+
+        self.cmdrunner = CommandRunner(
+            self.config, logger=self.logger,
+            verbose=self.c_dict['VERBOSITY'],
+            wrapper_name=self.__class__.__name__.replace('Wrapper', '')
+        )
 
         # if env MET_TMP_DIR was not set, set it to config TMP_DIR
         if 'MET_TMP_DIR' not in self.env:
@@ -239,6 +258,13 @@ class CommandBuilder:
         """
         return os.path.join(self.outdir, self.outfile)
 
+    def get_input_paths(self):
+        """!Get list of input files of the command. Used to describe the
+            command in plan mode. Wrappers that set input files of the
+            command somewhere other than self.infiles can override this
+        """
+        return [item for item in self.infiles if isinstance(item, str)]
+
     def add_env_var(self, key, name):
         """!Sets an environment variable so that the MET application
         can reference it in the parameter file or the application itself
@@ -389,13 +415,18 @@ class CommandBuilder:
         # through offset list
         is_mandatory = mandatory if offsets == [0] else False
 
+        # check every offset against the same directory listings so offsets
+        # that are not available are skipped without checking the filesystem
+        file_index = self.get_input_index(time_info)
         for offset in offsets:
             time_info['offset_hours'] = offset
             time_info = ti_calculate(time_info)
-            obs_path = self.find_obs(time_info,
-                                     var_info=var_info,
-                                     mandatory=is_mandatory,
-                                     return_list=return_list)
+            obs_path = self.find_data(time_info,
+                                      var_info=var_info,
+                                      data_type='OBS',
+                                      mandatory=is_mandatory,
+                                      return_list=return_list,
+                                      file_index=file_index)
 
             if obs_path is not None:
                 return obs_path, time_info
@@ -415,7 +446,59 @@ class CommandBuilder:
 
         return None, None
 
-    def find_data(self, time_info, var_info=None, data_type='', mandatory=True, return_list=False, allow_dir=False):
+    def get_input_index(self, time_info=None):
+        """!Get the listings of input directories that are shared by the
+            offsets and forecast leads of a run. Directories that were
+            modified since they were listed are listed again the first time
+            the listings are requested for each run time
+            @param time_info optional time dictionary used to find the run
+             time. The listings are checked on every call if it is not set
+            @returns InputFileIndex or the FileCatalog of the run if enabled
+        """
+        run_time = None
+        if time_info is not None and 'loop_by' in time_info:
+            loop_by = time_info['loop_by']
+            run_time = (loop_by, time_info.get(loop_by))
+
+        if run_time is None or run_time != self.input_index_run_time:
+            self.input_index.refresh()
+            self.input_index_run_time = run_time
+
+        return self.input_index
+
+    def find_data_batch(self, time_infos, var_info=None, data_type='',
+                        mandatory=True, return_list=False, file_index=None):
+        """!Find the data files for a sequence of times, i.e. each forecast
+            lead of a run. Each input directory is listed once for the whole
+            sequence and each directory tree that is searched for files
+            within a time window is walked once instead of once per time.
+              Args:
+                @param time_infos list of time dictionaries
+                @param var_info object containing variable information
+                @param data_type type of data to find (i.e. FCST_ or OBS_)
+                @param mandatory if True, report error if not found, warning
+                 if not
+                @param return_list if True, return a list for each time even
+                 if only one file was found
+                @param file_index optional InputFileIndex to use so listings
+                 are shared by several calls. The file catalog of the run is
+                 used if it is enabled, otherwise a new index is created
+                @returns list containing the result of find_data for each
+                 time dictionary in the same order
+        """
+        if file_index is None:
+            file_index = (util.get_file_catalog(self.config) or
+                          util.InputFileIndex(self.config))
+
+        return [self.find_data(time_info,
+                               var_info=var_info,
+                               data_type=data_type,
+                               mandatory=mandatory,
+                               return_list=return_list,
+                               file_index=file_index)
+                for time_info in time_infos]
+
+    def find_data(self, time_info, var_info=None, data_type='', mandatory=True, return_list=False, allow_dir=False, file_index=None):
         """! Finds the data file to compare
               Args:
                 @param time_info dictionary containing timing information
@@ -423,6 +506,9 @@ class CommandBuilder:
                 @param data_type type of data to find (i.e. FCST_ or OBS_)
                 @param mandatory if True, report error if not found, warning if not
                   default is True
+                @param file_index optional InputFileIndex used to check if
+                  files exist with directory listings that are shared by
+                  several calls. See find_data_batch
                 @rtype string
                 @return Returns the path to an observation file
         """
@@ -459,7 +545,8 @@ class CommandBuilder:
                     'data_type': data_type_fmt,
                     'mandatory': mandatory,
                     'time_info': time_info,
-                    'return_list': return_list}
+                    'return_list': return_list,
+                    'file_index': file_index}
 
         # if looking for a file with an exact time match:
         if self.c_dict.get(data_type_fmt + 'FILE_WINDOW_BEGIN', 0) == 0 and \
@@ -470,12 +557,15 @@ class CommandBuilder:
         # if looking for a file within a time window:
         return self.find_file_in_window(**arg_dict)
 
-    def find_exact_file(self, level, data_type, time_info, mandatory=True, return_list=False, allow_dir=False):
+    def find_exact_file(self, level, data_type, time_info, mandatory=True, return_list=False, allow_dir=False, file_index=None):
         input_template = self.c_dict[f'{data_type}INPUT_TEMPLATE']
         data_dir = self.c_dict.get(f'{data_type}INPUT_DIR', '')
 
         check_file_list = []
         found_file_list = []
+        file_catalog = util.get_file_catalog(self.config)
+        if file_index is None:
+            file_index = file_catalog
 
         # check if there is a list of files provided in the template
         # process each template in the list (or single template)
@@ -506,7 +596,10 @@ class CommandBuilder:
             # if wildcard expression, get all files that match
             if '?' in full_path or '*' in full_path:
 
-                wildcard_files = sorted(glob.glob(full_path))
+                if file_index:
+                    wildcard_files = file_index.glob(full_path)
+                else:
+                    wildcard_files = sorted(glob.glob(full_path))
                 self.logger.debug(f'Wildcard file pattern: {full_path}')
                 self.logger.debug(f'{str(len(wildcard_files))} files match pattern')
 
@@ -524,13 +617,26 @@ class CommandBuilder:
             self.log_error("Multiple files found when wrapper does not support multiple files.")
             return None
 
+        # use paths without checking that they exist if requested in plan mode
+        if skip_input_checks(self.config):
+            if len(check_file_list) == 1 and not return_list:
+                return check_file_list[0]
+            return check_file_list
+
         for file_path in check_file_list:
             # check if file exists
             input_data_type = self.c_dict.get(data_type + 'INPUT_DATATYPE', '')
-            processed_path = util.preprocess_file(file_path,
-                                                  input_data_type,
-                                                  self.config,
-                                                  allow_dir=allow_dir)
+            # skip preprocessing if the listing shows the file is missing
+            staged_files = util.get_staged_files(self.config)
+            if file_index and not allow_dir and \
+                    (file_path, input_data_type) not in staged_files and \
+                    not file_index.exists(file_path):
+                processed_path = None
+            else:
+                processed_path = util.preprocess_file(file_path,
+                                                      input_data_type,
+                                                      self.config,
+                                                      allow_dir=allow_dir)
 
             # report error if file path could not be found
             if not processed_path:
@@ -542,7 +648,8 @@ class CommandBuilder:
 
                 return None
 
-            if os.path.isdir(processed_path):
+            if (file_catalog.isdir(processed_path) if file_catalog
+                    else os.path.isdir(processed_path)):
                 self.logger.debug(f"Found directory: {processed_path}")
             else:
                 self.logger.debug(f"Found file: {processed_path}")
@@ -554,7 +661,7 @@ class CommandBuilder:
 
         return found_file_list
 
-    def find_file_in_window(self, level, data_type, time_info, mandatory=True, return_list=False):
+    def find_file_in_window(self, level, data_type, time_info, mandatory=True, return_list=False, file_index=None):
         template = self.c_dict[f'{data_type}INPUT_TEMPLATE']
         data_dir = self.c_dict[f'{data_type}INPUT_DIR']
 
@@ -582,39 +689,26 @@ class CommandBuilder:
             return None
 
         # step through all files under input directory in sorted order
-        for dirpath, _, all_files in os.walk(data_dir):
-            for filename in sorted(all_files):
-                fullpath = os.path.join(dirpath, filename)
-
-                # remove input data directory to get relative path
-                rel_path = fullpath.replace(f'{data_dir}/', "")
-                # extract time information from relative path using template
-                file_time_info = util.get_time_from_file(rel_path, template, self.logger)
-                if file_time_info is None:
-                    continue
-
-                # get valid time and check if it is within the time range
-                file_valid_time = file_time_info['valid'].strftime("%Y%m%d%H%M%S")
-                # skip if could not extract valid time
-                if not file_valid_time:
-                    continue
-                file_valid_dt = datetime.strptime(file_valid_time, "%Y%m%d%H%M%S")
-                file_valid_seconds = int(file_valid_dt.strftime("%s"))
-                # skip if outside time range
-                if file_valid_seconds < lower_limit or file_valid_seconds > upper_limit:
-                    continue
-
-                # if only 1 file is allowed, check if file is
-                # closer to desired valid time than previous match
-                if not self.c_dict.get('ALLOW_MULTIPLE_FILES', False):
-                    diff = abs(valid_seconds - file_valid_seconds)
-                    if diff < closest_time:
-                        closest_time = diff
-                        del closest_files[:]
-                        closest_files.append(fullpath)
-                # if multiple files are allowed, get all files within range
-                else:
+        if file_index is None:
+            file_index = self.get_input_index(time_info)
+        file_times = file_index.get_file_times(data_dir, template, self.logger)
+        for fullpath, file_valid_dt in file_times:
+            file_valid_seconds = int(file_valid_dt.strftime("%s"))
+            # skip if outside time range
+            if file_valid_seconds < lower_limit or file_valid_seconds > upper_limit:
+                continue
+
+            # if only 1 file is allowed, check if file is
+            # closer to desired valid time than previous match
+            if not self.c_dict.get('ALLOW_MULTIPLE_FILES', False):
+                diff = abs(valid_seconds - file_valid_seconds)
+                if diff < closest_time:
+                    closest_time = diff
+                    del closest_files[:]
                     closest_files.append(fullpath)
+            # if multiple files are allowed, get all files within range
+            else:
+                closest_files.append(fullpath)
 
         if not closest_files:
             msg = f"Could not find {data_type}INPUT files under {data_dir} within range " +\
@@ -678,11 +772,20 @@ class CommandBuilder:
             self.log_error('Must specify path to output file')
             return False
 
-        # create full output dir if it doesn't already exist
-        if not os.path.exists(parent_dir):
-            os.makedirs(parent_dir)
+        # use the file catalog to check if files exist if it is enabled
+        file_catalog = util.get_file_catalog(self.config)
+        path_exists = (file_catalog.path_exists if file_catalog
+                       else os.path.exists)
 
-        if not os.path.exists(output_path) or not self.c_dict['SKIP_IF_OUTPUT_EXISTS']:
+        # create full output dir if it doesn't already exist
+        # output directories are not created in plan mode
+        if (get_command_plan(self.config) is None and
+                not path_exists(parent_dir)):
+            os.makedirs(parent_dir, exist_ok=True)
+            if file_catalog:
+                file_catalog.invalidate(parent_dir)
+
+        if not path_exists(output_path) or not self.c_dict['SKIP_IF_OUTPUT_EXISTS']:
             return True
 
         # if the output file exists and we are supposed to skip, don't run tool
@@ -787,15 +890,20 @@ class CommandBuilder:
             self.config.set('config', 'CURRENT_OBS_LEVEL',
                             field_info['obs_level'] if 'obs_level' in field_info else '')
 
-    def check_for_python_embedding(self, input_type, var_info):
+    def check_for_python_embedding(self, input_type, var_info,
+                                   file_list=None):
         """!Check if field name of given input type is a python script. If it is not, return the field name.
             If it is, check if the input datatype is a valid Python Embedding string, set the c_dict item
             that sets the file_type in the MET config file accordingly, and set the output string to 'python_embedding.
             Used to set up Python Embedding input for MET tools that support multiple input files, such as MTD, EnsembleStat,
             and SeriesAnalysis.
+            If PY_EMBED_CACHE is True and file_list is set, the script is run
+            once for each file and the result is read from the cache instead.
             Args:
               @param input_type type of field input, i.e. FCST, OBS, ENS, POINT_OBS, GRID_OBS, or BOTH
               @param var_info dictionary item containing field information for the current *_VAR<n>_* configs being handled
+              @param file_list (optional) list of input files. Items are
+               replaced with the path of the cached result if caching
               @returns field name if not a python script, 'python_embedding' if it is, and None if configuration is invalid"""
         var_input_type = input_type.lower() if input_type != 'BOTH' else 'fcst'
         # reset file type to empty string to handle if python embedding is used for one field but not for the next
@@ -814,10 +922,100 @@ class CommandBuilder:
                            f"{','.join(util.PYTHON_EMBEDDING_TYPES)}")
             return None
 
+        if file_list is not None and py_embed_cache.is_cache_enabled(self.config):
+            return self.use_python_embedding_cache(input_type, var_info,
+                                                   data_type, file_list)
+
         # set file type string to be set in MET config file to specify Python Embedding is being used for this dataset
         self.c_dict[f'{input_type}_FILE_TYPE'] = f"file_type = {data_type};"
         return file_ext
 
+    def use_python_embedding_cache(self, input_type, var_info, data_type,
+                                   file_list):
+        """!Replace each file in a list with the cached result of running the
+            Python embedding script on it and set the field information to
+            read the cached files, which are NetCDF files that MET can read
+            without Python embedding.
+            Args:
+              @param input_type type of field input, i.e. FCST, OBS or BOTH
+              @param var_info dictionary containing field information.
+               The name and level are changed to read the cached data
+              @param data_type Python embedding type, i.e. PYTHON_NUMPY
+              @param file_list list of input files that is modified in place
+              @returns name of cached field or None if a result could not be
+               created
+        """
+        var_input_type = input_type.lower() if input_type != 'BOTH' else 'fcst'
+        script = var_info[f"{var_input_type}_name"]
+        for index, input_file in enumerate(file_list):
+            command = script.replace('MET_PYTHON_INPUT_ARG', input_file)
+            cache_file = self.get_python_embedding_cache_file(data_type,
+                                                              command)
+            if cache_file is None:
+                return None
+            file_list[index] = cache_file
+
+        field_name = self.config.getstr('config', 'PY_EMBED_CACHE_FIELD_NAME',
+                                        'py_embed_data')
+        var_types = ['fcst', 'obs'] if input_type == 'BOTH' else [var_input_type]
+        for var_type in var_types:
+            var_info[f'{var_type}_name'] = field_name
+            var_info[f'{var_type}_level'] = '(*,*)'
+
+        return field_name
+
+    def get_python_embedding_cache_file(self, data_type, command):
+        """!Get the path to a NetCDF file containing the data read by a
+            Python embedding script. If it is not already in the cache, run
+            PCPCombine to write the data on its native grid.
+            Args:
+              @param data_type Python embedding type, i.e. PYTHON_NUMPY
+              @param command script and arguments to run
+              @returns path to cached file or None if it could not be created
+        """
+        field_name = self.config.getstr('config', 'PY_EMBED_CACHE_FIELD_NAME',
+                                        'py_embed_data')
+        key = py_embed_cache.get_cache_key(command, data_type, [field_name])
+        cache_path = py_embed_cache.get_cache_path(self.config, key)
+        if os.path.exists(cache_path):
+            self.logger.debug(f"Using cached Python embedding result "
+                              f"{cache_path} for {command}")
+            return cache_path
+
+        plan = get_command_plan(self.config)
+        if plan is None and not os.path.exists(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        # write to a temporary file that is renamed if pcp_combine succeeds
+        # so a partial file is never read from the cache. Commands that are
+        # not run right away write to the cache file directly
+        run_now = self.can_read_command_output()
+        out_path = f'{cache_path}.tmp{os.getpid()}' if run_now else cache_path
+
+        app_path = os.path.join(self.config.getdir('MET_BIN_DIR', ''),
+                                'pcp_combine')
+        cmd = (f"{app_path} -v {self.c_dict['VERBOSITY']} -add {data_type} "
+               f"'name=\"{command}\";' -name {field_name} {out_path}")
+        self.logger.info(f"Writing Python embedding result to cache: {command}")
+        ret, _ = self.cmdrunner.run_cmd(cmd, env=self.env,
+                                        app_name='pcp_combine',
+                                        copyable_env=self.get_env_copy(),
+                                        outputs=[cache_path])
+        if ret != 0 or (run_now and not os.path.exists(out_path)):
+            self.log_error("Could not write Python embedding result to "
+                           f"cache: {cmd}")
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            return None
+
+        if run_now:
+            os.replace(out_path, cache_path)
+            file_catalog = util.get_file_catalog(self.config)
+            if file_catalog:
+                file_catalog.invalidate(cache_path)
+
+        return cache_path
+
     def get_field_info(self, d_type, v_name, v_level='', v_thresh=[], v_extra=''):
         """! Format field information into format expected by MET config file
               Args:
@@ -993,7 +1191,8 @@ class CommandBuilder:
             self.log_error('Must specify path to output file')
             return None
 
-        if not os.path.exists(parent_dir):
+        if (get_command_plan(self.config) is None and
+                not os.path.exists(parent_dir)):
             os.makedirs(parent_dir)
 
         cmd += " " + out_path
@@ -1003,12 +1202,12 @@ class CommandBuilder:
 
         return cmd
 
-    def build_and_run_command(self):
+    def build_and_run_command(self, wait=True):
         cmd = self.get_command()
         if cmd is None:
             self.log_error("Could not generate command")
             return
-        self.build()
+        self.build(wait=wait)
 
     # Placed running of command in its own class, command_runner run_cmd().
     # This will allow the ability to still call build() as is currenly done
@@ -1017,8 +1216,13 @@ class CommandBuilder:
     # to call cmdrunner.run_cmd().
     # Make sure they have SET THE self.app_name in the subclasses constructor.
     # see regrid_data_plane_wrapper.py as an example of how to set.
-    def build(self):
-        """!Build and run command"""
+    def build(self, wait=True):
+        """!Build and run command
+            @param wait if False, submit the command to run with other
+             submitted commands when wait_for_commands is called
+            @returns False if the command could not be built or returned a
+             non-zero return code, True otherwise
+        """
         cmd = self.get_command()
         if cmd is None:
             return False
@@ -1026,8 +1230,88 @@ class CommandBuilder:
         # add command to list of all commands run
         self.all_commands.append(cmd)
 
-        ret, out_cmd = self.cmdrunner.run_cmd(cmd, self.env, app_name=self.app_name,
-                                              copyable_env=self.get_env_copy())
+        run_args = {'env': self.env,
+                    'app_name': self.app_name,
+                    'copyable_env': self.get_env_copy(),
+                    'inputs': self.get_input_paths(),
+                    'outputs': [self.get_output_path()]}
+        if not wait:
+            self.cmdrunner.submit_cmd(cmd, **run_args)
+            return True
+
+        ret, out_cmd = self.cmdrunner.run_cmd(cmd, **run_args)
+        return self.check_return_code(ret, cmd)
+
+    def can_read_command_output(self):
+        """!Check if commands run when they are built so the wrapper can
+            read their output in the same run time. Commands are not run in
+            plan mode or if DO_NOT_RUN_EXE is set, and commands added to an
+            MPMD batch do not run until the batch is launched
+            @returns True if the output of commands can be read
+        """
+        return (get_command_plan(self.config) is None and
+                not self.config.getbool('config', 'DO_NOT_RUN_EXE', False) and
+                self.cmdrunner.mpmd_batch is None)
+
+    def run_commands_in_parallel(self, jobs, max_workers):
+        """!Run a group of independent commands at the same time and wait for
+            all of them to finish. Commands are run by a pool of threads, or
+            submitted together if the asyncio backend is used.
+            Args:
+              @param jobs list of tuples of command, environment dictionary,
+               environment string to write to the log, and list of outputs
+              @param max_workers maximum number of commands to run at once
+              @returns True if all of the commands succeeded, False otherwise
+        """
+        all_ok = True
+        for ret, cmd in self.run_jobs_in_parallel(jobs, max_workers):
+            if not self.check_return_code(ret, cmd):
+                all_ok = False
+        return all_ok
+
+    def run_jobs_in_parallel(self, jobs, max_workers):
+        """!Run a group of independent commands at the same time without
+            checking the return codes. See run_commands_in_parallel
+            Args:
+              @param jobs list of tuples of command, environment dictionary,
+               environment string to write to the log, and list of outputs
+              @param max_workers maximum number of commands to run at once
+              @returns list of tuples of return code and command in the same
+               order as jobs
+        """
+        def run_job(job):
+            cmd, env, copyable_env, outputs = job
+            return self.cmdrunner.run_cmd(cmd, env=env,
+                                          app_name=self.app_name,
+                                          copyable_env=copyable_env,
+                                          outputs=outputs)
+
+        if self.cmdrunner.use_asyncio():
+            for cmd, env, copyable_env, outputs in jobs:
+                self.cmdrunner.submit_cmd(cmd, env=env, app_name=self.app_name,
+                                          copyable_env=copyable_env,
+                                          outputs=outputs)
+            results = self.cmdrunner.wait_for_cmds(max_concurrent=max_workers)
+        else:
+            max_workers = max(1, min(max_workers, len(jobs)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(run_job, jobs))
+
+        return results
+
+    def wait_for_commands(self):
+        """!Wait for the commands submitted with build(wait=False) to finish
+            @returns True if all of the commands succeeded, False otherwise
+        """
+        all_ok = True
+        for ret, cmd in self.cmdrunner.wait_for_cmds():
+            if not self.check_return_code(ret, cmd):
+                all_ok = False
+        return all_ok
+
+    def check_return_code(self, ret, cmd):
+        """!Report an error if a command returned a non-zero return code
+            @returns True if the return code is 0, False otherwise"""
         if ret != 0:
             self.log_error(f"MET command returned a non-zero return code: {cmd}")
             self.logger.info("Check the logfile for more information on why it failed: "
@@ -34,24 +34,46 @@ Output Files: N/A
 #
 
 import os
-from produtil.run import exe, run
+import sys
+import asyncio
+from produtil.run import exe, make_pipeline
 import shlex
 from datetime import datetime
 
+from ..util.command_metrics import get_file_stats, get_command_metrics
+from ..util.command_metrics import write_command_metrics
+from ..util.command_metrics import is_command_metrics_enabled
+from ..util.command_plan import get_command_plan
+from ..util.met_util import get_file_catalog
+
 class CommandRunner(object):
     """! Class for Creating and Running External Programs
     """
-    def __init__(self, config, logger=None, verbose=2):
+    def __init__(self, config, logger=None, verbose=2, wrapper_name=None):
         """!Class for Creating and Running External Programs.
             It was intended to handle the MET executables but
-            can be used by other executables."""
+            can be used by other executables.
+            @param wrapper_name name of the wrapper running the commands,
+            used to group command metrics"""
         self.logger = logger
         self.config = config
         self.verbose = verbose
+        self.wrapper_name = wrapper_name
         self.log_command_to_met_log = False
 
+        # if set to an MPMDBatch, commands are added to the batch to be run
+        # later as one MPMD job instead of being run immediately
+        self.mpmd_batch = None
+
+        # event loop, concurrency limit, and commands submitted with
+        # submit_cmd used by the asyncio backend
+        self._loop = None
+        self._semaphore = None
+        self.submitted = []
+
     def run_cmd(self, cmd, env=None, ismetcmd = True, app_name=None, run_inshell=False,
-                log_theoutput=False, copyable_env=None, **kwargs):
+                log_theoutput=False, copyable_env=None, inputs=None,
+                outputs=None, **kwargs):
         """!The command cmd is a string which is converted to a produtil
         exe Runner object and than run. Output of the command may also
         be redirected to either METplus log, MET log, or TTY.
@@ -76,6 +98,10 @@ class CommandRunner(object):
             @param log_theoutput: Used only when ismetcmd=False, will redirect
             the stderr and stdout to a the METplus log file or tty.
             DO Not set to True if the command is redirecting output to a file.
+            @param inputs list of files read by the command. Only used to
+            describe the command in plan mode
+            @param outputs list of files written by the command. Only used to
+            describe the command in plan mode
             @param kwargs Other options sent to the produtil Run constructor
         """
 
@@ -86,8 +112,37 @@ class CommandRunner(object):
         if env is None:
             env = os.environ
 
+        # run command with asyncio instead of produtil if requested
+        if self.use_asyncio():
+            return self.get_event_loop().run_until_complete(
+                self.run_cmd_async(cmd, env=env, ismetcmd=ismetcmd,
+                                   app_name=app_name, run_inshell=run_inshell,
+                                   log_theoutput=log_theoutput,
+                                   copyable_env=copyable_env,
+                                   outputs=outputs)
+            )
+
         self.logger.info("COMMAND: %s" % cmd)
 
+        # add command to the plan instead of running it if in plan mode
+        command_plan = get_command_plan(self.config)
+        if command_plan is not None:
+            if not app_name or not ismetcmd:
+                app_name = os.path.basename(cmd.split()[0])
+            command_plan.add(cmd, env, wrapper=self.wrapper_name,
+                             app=app_name, inputs=inputs, outputs=outputs)
+            return (0, cmd)
+
+        # defer command to MPMD batch unless DO_NOT_RUN_EXE is set
+        if (self.mpmd_batch is not None and
+                not self.config.getbool('config', 'DO_NOT_RUN_EXE', False)):
+            log_dest = None
+            if ismetcmd or log_theoutput:
+                cmdlog = app_name + '.log' if ismetcmd and app_name else None
+                log_dest = self.cmdlog_destination(cmdlog=cmdlog)
+            self.mpmd_batch.add(cmd, env, log_dest)
+            return (0, cmd)
+
         if ismetcmd:
 
             # self.app_name MUST be defined in the subclass' constructor,
@@ -122,20 +177,7 @@ class CommandRunner(object):
             if log_dest:
                 self.logger.debug("app_name is: %s, output sent to: %s" % (app_name, log_dest))
 
-                with open(log_dest, 'a+') as log_file_handle:
-                    # if logging MET command to its own log file, add command that was run to that log
-                    if self.log_command_to_met_log:
-                        # if environment variables were set and available, write them to MET tool log
-                        if copyable_env:
-                            log_file_handle.write("\nCOPYABLE ENVIRONMENT FOR NEXT COMMAND:\n")
-                            log_file_handle.write(f"{copyable_env}\n\n")
-                        else:
-                            log_file_handle.write('\n')
-
-                        log_file_handle.write(f"COMMAND:\n{cmd}\n\n")
-
-                    # write line to designate where MET tool output starts
-                    log_file_handle.write("MET OUTPUT:\n")
+                self.write_met_log_header(log_dest, cmd, copyable_env)
 
                 cmd_exe = exe(the_exe)[the_args].env(**env).err2out() >> log_dest
             else:
@@ -175,12 +217,25 @@ class CommandRunner(object):
         ret = 0
         # run app unless DO_NOT_RUN_EXE is set to True
         if not self.config.getbool('config', 'DO_NOT_RUN_EXE', False):
+            log_metrics = is_command_metrics_enabled(self.config)
+            if log_metrics:
+                stats_before = get_file_stats(cmd)
+
             # get current time to calculate total time to run command
             start_cmd_time = datetime.now()
 
             # run command
+            rusage = None
             try:
-                ret = run(cmd_exe, **kwargs)
+                # same as produtil.run.run, but keep the pipeline to get the
+                # resource usage of the processes after they complete
+                pipeline = make_pipeline(cmd_exe, False,
+                                         logger=kwargs.get('logger'))
+                pipeline.communicate(sleeptime=kwargs.get('sleeptime'))
+                ret = pipeline.poll()
+                rusage = pipeline.rusage()
+                if kwargs.get('logger') is not None:
+                    kwargs['logger'].info('  - exit status %d' % (int(ret),))
             except:
                 ret = -1
             else:
@@ -189,8 +244,201 @@ class CommandRunner(object):
                 total_cmd_time = end_cmd_time - start_cmd_time
                 self.logger.debug(f'Finished running {the_exe} in {total_cmd_time}')
 
+            if log_metrics:
+                app = app_name if ismetcmd else os.path.basename(the_exe)
+                metrics = get_command_metrics(cmd, ret, start_cmd_time,
+                                              datetime.now(), rusage,
+                                              stats_before,
+                                              wrapper=self.wrapper_name,
+                                              app=app)
+                write_command_metrics(self.config, metrics)
+
+        self.invalidate_outputs(outputs)
+        return (ret, cmd)
+
+    def write_met_log_header(self, log_dest, cmd, copyable_env=None):
+        """!Write the command and environment to the log file before the
+            output of a MET command if the output is logged to its own file
+            and write a line to designate where the MET output starts"""
+        with open(log_dest, 'a+') as log_file_handle:
+            # if logging MET command to its own log file, add command that was run to that log
+            if self.log_command_to_met_log:
+                # if environment variables were set and available, write them to MET tool log
+                if copyable_env:
+                    log_file_handle.write("\nCOPYABLE ENVIRONMENT FOR NEXT COMMAND:\n")
+                    log_file_handle.write(f"{copyable_env}\n\n")
+                else:
+                    log_file_handle.write('\n')
+
+                log_file_handle.write(f"COMMAND:\n{cmd}\n\n")
+
+            # write line to designate where MET tool output starts
+            log_file_handle.write("MET OUTPUT:\n")
+
+    def use_asyncio(self):
+        """!Return True if commands should be run with the asyncio backend.
+            Commands that are not run (DO_NOT_RUN_EXE, plan mode, MPMD
+            batches) always go through run_cmd"""
+        if self.config.getstr('config', 'COMMAND_RUNNER_BACKEND',
+                              'PRODUTIL').upper() != 'ASYNCIO':
+            return False
+
+        return (self.mpmd_batch is None and
+                get_command_plan(self.config) is None and
+                not self.config.getbool('config', 'DO_NOT_RUN_EXE', False))
+
+    def get_event_loop(self):
+        """!Get the event loop used to run commands with asyncio. It is
+            created the first time it is needed"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            # Python versions before 3.8 must attach the child watcher to
+            # the loop to be able to wait for subprocesses
+            if sys.version_info < (3, 8):
+                asyncio.get_child_watcher().attach_loop(self._loop)
+        return self._loop
+
+    async def run_cmd_async(self, cmd, env=None, ismetcmd=True,
+                            app_name=None, run_inshell=False,
+                            log_theoutput=False, copyable_env=None,
+                            outputs=None, **kwargs):
+        """!Coroutine that runs a command with asyncio. The output is sent
+            to the same log file as run_cmd directly from the subprocess.
+            At most COMMAND_RUNNER_MAX_CONCURRENT commands run at once.
+            Arguments and return value are the same as run_cmd. Resource
+            usage of the command is not available, so only the wall time and
+            file sizes are recorded in the command metrics.
+        """
+        if cmd is None:
+            return cmd
+
+        if env is None:
+            env = os.environ
+
+        self.logger.info("COMMAND: %s" % cmd)
+
+        the_exe = shlex.split(cmd)[0]
+        log_dest = None
+        if ismetcmd:
+            if not app_name:
+                app_name = os.path.basename(the_exe)
+                self.logger.warning('MISSING self.app_name, '
+                                    'setting name to: %s' % repr(app_name))
+            log_dest = self.cmdlog_destination(cmdlog=app_name+'.log')
+            if log_dest:
+                self.write_met_log_header(log_dest, cmd, copyable_env)
+        elif log_theoutput:
+            log_dest = self.cmdlog_destination()
+
+        if run_inshell:
+            args = ['sh', '-c', cmd]
+        else:
+            args = shlex.split(cmd)
+
+        if self._semaphore is None:
+            max_concurrent = self.config.getint('config',
+                                                'COMMAND_RUNNER_MAX_CONCURRENT',
+                                                os.cpu_count() or 1)
+            self._semaphore = asyncio.Semaphore(max(max_concurrent, 1))
+
+        log_metrics = is_command_metrics_enabled(self.config)
+        async with self._semaphore:
+            if log_metrics:
+                stats_before = get_file_stats(cmd)
+
+            start_cmd_time = datetime.now()
+            log_handle = open(log_dest, 'a') if log_dest else None
+            try:
+                # like err2out in run_cmd, send the error output of MET
+                # commands to the same place as the output
+                stdout = log_handle
+                stderr = None
+                if log_handle or ismetcmd:
+                    stderr = asyncio.subprocess.STDOUT
+                process = await asyncio.create_subprocess_exec(
+                    *args, env=dict(env), stdout=stdout, stderr=stderr
+                )
+                ret = await process.wait()
+            except OSError as err:
+                self.logger.error(f"Could not run {the_exe}: {err}")
+                ret = -1
+            finally:
+                if log_handle:
+                    log_handle.close()
+
+            end_cmd_time = datetime.now()
+
+        self.logger.debug(f'Finished running {the_exe} in '
+                          f'{end_cmd_time - start_cmd_time}')
+
+        if log_metrics:
+            app = app_name if ismetcmd else os.path.basename(the_exe)
+            metrics = get_command_metrics(cmd, ret, start_cmd_time,
+                                          end_cmd_time, None, stats_before,
+                                          wrapper=self.wrapper_name, app=app)
+            write_command_metrics(self.config, metrics)
+
+        self.invalidate_outputs(outputs)
         return (ret, cmd)
 
+    def invalidate_outputs(self, outputs):
+        """!Remove the directories of the files written by a command from the
+            file catalog so the new files are found"""
+        file_catalog = get_file_catalog(self.config)
+        if file_catalog is None:
+            return
+
+        for output in outputs or []:
+            if output:
+                file_catalog.invalidate(output)
+
+    def submit_cmd(self, cmd, **kwargs):
+        """!Submit a command to run with the same arguments as run_cmd.
+            With the asyncio backend, the command is started when
+            wait_for_cmds is called so all submitted commands run
+            concurrently. Otherwise the command is run immediately.
+            Call wait_for_cmds to get the results.
+        """
+        if self.use_asyncio():
+            # copy the environment because the command runs later
+            if kwargs.get('env') is not None:
+                kwargs['env'] = dict(kwargs['env'])
+            self.submitted.append(self.run_cmd_async(cmd, **kwargs))
+        else:
+            self.submitted.append(self.run_cmd(cmd, **kwargs))
+
+    def wait_for_cmds(self, max_concurrent=None):
+        """!Run the commands that were submitted with submit_cmd and wait
+            for them to finish
+            @param max_concurrent maximum number of these commands to run at
+             once. Commands are also limited by COMMAND_RUNNER_MAX_CONCURRENT
+            @returns list of the return values of run_cmd for each command in
+             the order they were submitted
+        """
+        submitted = self.submitted
+        self.submitted = []
+        if not any(asyncio.iscoroutine(item) for item in submitted):
+            return submitted
+
+        async def gather():
+            # create the semaphore in the coroutine so it uses the event loop
+            # that runs the commands
+            semaphore = None
+            if max_concurrent:
+                semaphore = asyncio.Semaphore(max(max_concurrent, 1))
+
+            async def limit(item):
+                if not asyncio.iscoroutine(item):
+                    return item
+                if semaphore is None:
+                    return await item
+                async with semaphore:
+                    return await item
+
+            return await asyncio.gather(*[limit(item) for item in submitted])
+
+        return list(self.get_event_loop().run_until_complete(gather()))
+
     # TODO: Refactor seriesbylead.
     # For now we are back to running through a shell.
     # Can not run its cmd string, unless we run through a shell.
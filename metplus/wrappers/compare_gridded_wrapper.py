@@ -13,7 +13,8 @@ Condition codes: 0 for success, 1 for failure
 import os
 
 from ..util import met_util as util
-from ..util import do_string_sub, ti_calculate
+from ..util import do_string_sub
+from ..util.command_plan import get_command_plan
 from . import CommandBuilder
 
 '''!@namespace CompareGriddedWrapper
@@ -171,7 +172,7 @@ that reformat gridded data
             input_dict['lead'] = lead
 
             # set current lead time config and environment variables
-            time_info = ti_calculate(input_dict)
+            time_info = util.get_time_info(self.config, input_dict)
 
             self.logger.info("Processing forecast lead {}".format(time_info['lead_string']))
 
@@ -376,7 +377,9 @@ that reformat gridded data
             out_dir = os.path.join(out_dir, extra_path)
 
         # create full output dir if it doesn't already exist
-        if not os.path.exists(out_dir):
+        # output directories are not created in plan mode
+        if (get_command_plan(self.config) is None and
+                not os.path.exists(out_dir)):
             os.makedirs(out_dir)
 
         # set output dir for wrapper
@@ -11,7 +11,6 @@ Condition codes: 0 for success, 1 for failure
 '''
 
 import os
-import glob
 
 from ..util import met_util as util
 from . import CompareGriddedWrapper
@@ -25,11 +24,17 @@ from ..util import do_string_sub
 class EnsembleStatWrapper(CompareGriddedWrapper):
     """!Wraps the MET tool ensemble_stat to compare ensemble datasets
     """
+    mpmd_supported = True
+
     def __init__(self, config, logger):
         self.app_name = 'ensemble_stat'
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
                                      self.app_name)
         super().__init__(config, logger)
+        # listings of the member directories shared by all run times
+        # use the file catalog of the run if it is enabled
+        self.member_index = (util.get_file_catalog(config) or
+                             util.InputFileIndex(config))
 
     def create_c_dict(self):
         """!Create a dictionary containing the values set in the config file
@@ -158,6 +163,9 @@ class EnsembleStatWrapper(CompareGriddedWrapper):
               Args:
                 @param time_info dictionary containing timing information
         """
+        # re-list member directories that changed since the last run time
+        self.member_index.refresh()
+
         # get ensemble model files
         fcst_file_list = self.find_model_members(time_info)
         if not fcst_file_list:
@@ -261,6 +269,10 @@ class EnsembleStatWrapper(CompareGriddedWrapper):
         # model_template is a list of 1 or more.
         ens_members_path = []
 
+        # index in ens_members_path, path, and relative path of members that
+        # must be staged
+        to_stage = []
+
         # get all files that exist
         for ens_member_template in self.c_dict['FCST_INPUT_TEMPLATE']:
             member_file = do_string_sub(ens_member_template,
@@ -269,7 +281,7 @@ class EnsembleStatWrapper(CompareGriddedWrapper):
 
             # if wildcard expression, get all files that match
             if '?' in expected_path or '*' in expected_path:
-                wildcard_files = sorted(glob.glob(expected_path))
+                wildcard_files = self.member_index.glob(expected_path)
                 self.logger.debug('Ensemble members file pattern: {}'
                                   .format(expected_path))
                 self.logger.debug('{} members match file pattern'
@@ -278,20 +290,30 @@ class EnsembleStatWrapper(CompareGriddedWrapper):
                 # add files to list of ensemble members
                 for wildcard_file in wildcard_files:
                     ens_members_path.append(wildcard_file)
+            elif self.member_index.exists(expected_path):
+                # stage file after all members are found
+                to_stage.append((len(ens_members_path), expected_path,
+                                 member_file))
+                ens_members_path.append(None)
+            else:
+                # add relative path to fake dir and add to list
+                ens_members_path.append(os.path.join(fake_dir, member_file))
+                self.logger.warning('Expected ensemble file {} not found'
+                                    .format(member_file))
+
+        # decompress or convert members at the same time
+        staged_paths = util.preprocess_files([item[1] for item in to_stage],
+                                             self.c_dict['FCST_INPUT_DATATYPE'],
+                                             self.config)
+        for (index, _, member_file), staged_path in zip(to_stage, staged_paths):
+            # if the file exists, add it to the list
+            if staged_path:
+                ens_members_path[index] = staged_path
             else:
-                # otherwise check if file exists
-                expected_path = util.preprocess_file(expected_path,
-                                                     self.c_dict['FCST_INPUT_DATATYPE'],
-                                                     self.config)
-
-                # if the file exists, add it to the list
-                if expected_path:
-                    ens_members_path.append(expected_path)
-                else:
-                    # add relative path to fake dir and add to list
-                    ens_members_path.append(os.path.join(fake_dir, member_file))
-                    self.logger.warning('Expected ensemble file {} not found'
-                                        .format(member_file))
+                # add relative path to fake dir and add to list
+                ens_members_path[index] = os.path.join(fake_dir, member_file)
+                self.logger.warning('Expected ensemble file {} not found'
+                                    .format(member_file))
 
         # if more files found than expected, error and exit
         if len(ens_members_path) > self.c_dict['N_MEMBERS']:
@@ -147,7 +147,7 @@ class ExtractTilesWrapper(CommandBuilder):
         '''
 
         tc_pairs_nc_output_regex = ".*.tcst"
-        output_files_list = util.get_files(self.tc_pairs_dir, tc_pairs_nc_output_regex, self.logger)
+        output_files_list = util.get_files(self.tc_pairs_dir, tc_pairs_nc_output_regex, self.logger, self.config)
         if len(output_files_list) == 0:
             return False
         else:
@@ -171,7 +171,7 @@ class ExtractTilesWrapper(CommandBuilder):
         # filter options defined in the config/param file.
         # Use TCStatWrapper to build up the tc_stat command and invoke
         # the MET tool tc_stat to perform the filtering.
-        tiles_list = util.get_files(self.tc_pairs_dir, ".*tcst", self.logger)
+        tiles_list = util.get_files(self.tc_pairs_dir, ".*tcst", self.logger, self.config)
         tiles_list_str = ' '.join(tiles_list)
 
         tcs = TCStatWrapper(self.config, self.logger)
@@ -75,7 +75,7 @@ class GempakToCFWrapper(CommandBuilder):
 
                 input_dict['custom'] = custom_string
 
-                time_info = time_util.ti_calculate(input_dict)
+                time_info = util.get_time_info(self.config, input_dict)
 
                 if util.skip_time(time_info, self.c_dict.get('SKIP_TIMES', {})):
                     self.logger.debug('Skipping run time')
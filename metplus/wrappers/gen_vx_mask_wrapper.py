@@ -11,11 +11,16 @@ Condition codes: 0 for success, 1 for failure
 """
 
 import os
+import shutil
+import socket
+import hashlib
+import itertools
 
 from ..util import met_util as util
 from ..util import time_util
 from . import CommandBuilder
 from ..util import do_string_sub
+from ..util.command_plan import get_command_plan
 
 '''!@namespace GenVxMaskWrapper
 @brief Wraps the GenVxMask tool to reformat ascii format to NetCDF
@@ -30,6 +35,8 @@ class GenVxMaskWrapper(CommandBuilder):
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
                                      self.app_name)
         super().__init__(config, logger)
+        # number of mask chains run, used to name temporary directories
+        self.task_counter = itertools.count()
 
     def create_c_dict(self):
         c_dict = super().create_c_dict()
@@ -93,6 +100,16 @@ class GenVxMaskWrapper(CommandBuilder):
         c_dict['MASK_FILE_WINDOW_BEGIN'] = c_dict['FILE_WINDOW_BEGIN']
         c_dict['MASK_FILE_WINDOW_END'] = c_dict['FILE_WINDOW_END']
 
+        # reuse masks that were already generated from the same inputs
+        c_dict['USE_CACHE'] = self.config.getbool('config',
+                                                  'GEN_VX_MASK_CACHE',
+                                                  False)
+        c_dict['CACHE_DIR'] = self.config.getdir(
+            'GEN_VX_MASK_CACHE_DIR',
+            os.path.join(self.config.getdir('OUTPUT_BASE'),
+                         'gen_vx_mask_cache')
+        )
+
         return c_dict
 
     def get_command(self):
@@ -144,7 +161,7 @@ class GenVxMaskWrapper(CommandBuilder):
             self.clear()
             input_dict['lead'] = lead
 
-            time_info = time_util.ti_calculate(input_dict)
+            time_info = util.get_time_info(self.config, input_dict)
 
             if util.skip_time(time_info, self.c_dict.get('SKIP_TIMES', {})):
                 self.logger.debug('Skipping run time')
@@ -169,8 +186,35 @@ class GenVxMaskWrapper(CommandBuilder):
         # there is no config file, so using CommandBuilder implementation
         self.set_environment_variables(time_info)
 
+        # masks are not cached in plan mode because they are not written
+        use_cache = (self.c_dict['USE_CACHE'] and
+                     get_command_plan(self.config) is None)
+
+        # temporary files are written to a directory that is only used by
+        # this call so runs at the same time do not overwrite each other
+        temp_dir = self.get_temp_dir()
+        try:
+            self.run_mask_chain(time_info, temp_dir, use_cache)
+        finally:
+            if (get_command_plan(self.config) is None and
+                    os.path.isdir(temp_dir)):
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def run_mask_chain(self, time_info, temp_dir, use_cache):
+        """!Call GenVxMask for each mask template. The output of each call is
+            the input of the next call. If use_cache is True, the output of
+            each call is stored in the mask cache and reused if the same
+            inputs are processed again
+            Args:
+                @param time_info time dictionary for current runtime
+                @param temp_dir directory to write temporary files
+                @param use_cache True if the mask cache should be used
+                @returns True on success, False if a command failed
+        """
         # loop over mask templates and command line args,
         temp_file = ''
+        cache_key = None
+        num_masks = len(self.c_dict['MASK_INPUT_TEMPLATES'])
         for index, (mask_template, cmd_args) in enumerate(zip(self.c_dict['MASK_INPUT_TEMPLATES'],
                                                               self.c_dict['COMMAND_OPTIONS'])):
 
@@ -180,28 +224,108 @@ class GenVxMaskWrapper(CommandBuilder):
                                       **time_info)
 
             if not self.find_input_files(time_info, temp_file):
-                return
+                return False
+
+            if use_cache:
+                cache_key = self.get_cache_key(cache_key)
 
             # break out of loop if this is the last iteration to
             # run final command that writes to the output file
-            if index+1 == len(self.c_dict['MASK_INPUT_TEMPLATES']):
+            if index+1 == num_masks:
                 break
 
+            # use mask from the cache if it was already generated
+            if use_cache:
+                cache_path = self.get_cache_path(cache_key)
+                if os.path.exists(cache_path):
+                    self.logger.debug(f"Using cached mask {cache_path}")
+                    temp_file = cache_path
+                    continue
+
             # if not the last iteration, write to temporary file
-            temp_file = os.path.join(self.config.getdir('STAGING_DIR'),
-                                     'gen_vx_mask',
-                                     f'temp_{index}.nc')
+            temp_file = os.path.join(temp_dir, f'temp_{index}.nc')
             self.set_output_path(temp_file)
 
             # run GenVxMask
-            self.build_and_run_command()
+            if not self.build():
+                return False
+
+            if use_cache and os.path.exists(temp_file):
+                temp_file = self.add_to_cache(temp_file, cache_key)
 
         # use final output path for last (or only) run
         if not self.find_and_check_output_file(time_info):
-            return
+            return True
+
+        output_path = self.get_output_path()
+        if use_cache:
+            cache_path = self.get_cache_path(cache_key)
+            if os.path.exists(cache_path):
+                self.logger.info(f"Copying cached mask {cache_path} to "
+                                 f"{output_path}")
+                self.copy_file(cache_path, output_path)
+                return True
 
         # run GenVxMask
-        self.build_and_run_command()
+        if not self.build():
+            return False
+
+        if use_cache and os.path.exists(output_path):
+            self.copy_file(output_path, self.get_cache_path(cache_key))
+
+        return True
+
+    def get_temp_dir(self):
+        """!Get a directory to write temporary files that is not used by any
+            other call, including calls from other processes or hosts that
+            share the staging directory"""
+        task_id = (f"{socket.gethostname()}_{os.getpid()}_"
+                   f"{next(self.task_counter)}")
+        return os.path.join(self.config.getdir('STAGING_DIR'),
+                            'gen_vx_mask', task_id)
+
+    @staticmethod
+    def get_file_identity(path):
+        """!Get a string that changes if a file changes. Paths that are not
+            files, i.e. named grids or lat/lon strings, are returned as is"""
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            return f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+        return path
+
+    def get_cache_key(self, previous_key=None):
+        """!Get the key of the mask generated from the current input and mask
+            files and command line arguments
+            Args:
+                @param previous_key key of the mask generated by the previous
+                 call that is the input of this call, or None if the input is
+                 the grid file
+                @returns hexadecimal SHA-256 hash
+        """
+        input_path, mask_path = self.infiles
+        input_id = (previous_key if previous_key
+                    else self.get_file_identity(input_path))
+        items = [self.app_path, input_id, self.get_file_identity(mask_path),
+                 self.args]
+        return hashlib.sha256('\0'.join(items).encode('utf-8')).hexdigest()
+
+    def get_cache_path(self, key):
+        """!Get the path of the cached mask for a key"""
+        return os.path.join(self.c_dict['CACHE_DIR'], key[:2], f'{key}.nc')
+
+    def add_to_cache(self, path, key):
+        """!Move a generated mask into the cache
+            @returns path to cached mask
+        """
+        cache_path = self.get_cache_path(key)
+        with util.write_through_tmp(cache_path) as tmp_path:
+            shutil.move(path, tmp_path)
+        return cache_path
+
+    def copy_file(self, src, dest):
+        """!Copy a file and remove it from the file catalog so it is found by
+            later lookups"""
+        util.copy_file(src, dest, catalog=util.get_file_catalog(self.config))
 
     def find_input_files(self, time_info, temp_file):
         """!Handle setting of input file list.
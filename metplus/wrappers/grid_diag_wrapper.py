@@ -18,6 +18,7 @@ from ..util import met_util as util
 from ..util import time_util
 from . import CommandBuilder
 from ..util import do_string_sub
+from ..util import histogram_merge
 
 '''!@namespace GridDiagWrapper
 @brief Wraps the Grid-Diag tool
@@ -90,6 +91,32 @@ class GridDiagWrapper(CommandBuilder):
             self.config.getraw('filename_templates',
                                'GRID_DIAG_VERIFICATION_MASK_TEMPLATE')
 
+        # split input files into chunks of forecast leads that are processed
+        # at the same time and sum the histograms
+        c_dict['CHUNK_SIZE'] = self.config.getint('config',
+                                                  'GRID_DIAG_CHUNK_SIZE', 0)
+        c_dict['CHUNK_MAX_MEMORY_MB'] = (
+            self.config.getint('config', 'GRID_DIAG_CHUNK_MAX_MEMORY_MB', 0)
+        )
+        for name in ('CHUNK_SIZE', 'CHUNK_MAX_MEMORY_MB'):
+            if c_dict[name] is None or c_dict[name] < 0:
+                self.log_error(f'GRID_DIAG_{name} must be 0 or greater')
+                c_dict[name] = 0
+
+        if ((c_dict['CHUNK_SIZE'] or c_dict['CHUNK_MAX_MEMORY_MB']) and
+                not histogram_merge.is_available()):
+            self.logger.warning('GRID_DIAG_CHUNK_SIZE and '
+                                'GRID_DIAG_CHUNK_MAX_MEMORY_MB require the '
+                                'numpy and netCDF4 Python packages. '
+                                'Processing all input files in one run')
+            c_dict['CHUNK_SIZE'] = 0
+            c_dict['CHUNK_MAX_MEMORY_MB'] = 0
+
+        c_dict['CHUNK_MAX_WORKERS'] = (
+            self.config.getint('config', 'GRID_DIAG_CHUNK_MAX_WORKERS',
+                               os.cpu_count() or 1)
+        )
+
         return c_dict
 
     def set_environment_variables(self, time_info):
@@ -199,6 +226,11 @@ class GridDiagWrapper(CommandBuilder):
         self.set_environment_variables(time_info)
 
         # build command and run
+        chunks = self.get_chunks()
+        if len(chunks) > 1:
+            self.run_chunks(time_info, chunks)
+            return
+
         self.build_and_run_command()
 
     def set_data_field(self, time_info):
@@ -241,6 +273,7 @@ class GridDiagWrapper(CommandBuilder):
                 @returns Input file list if all files were found, None if not.
         """
         self.infiles = []
+        self.c_dict['INPUT_FILE_GROUPS'] = []
         for idx, input_template in enumerate(self.c_dict['INPUT_TEMPLATES']):
             self.c_dict['INPUT_TEMPLATE'] = input_template
             list_file = self.find_input_file_list(time_info, idx)
@@ -261,8 +294,11 @@ class GridDiagWrapper(CommandBuilder):
         """
         all_input_files = []
 
+        # files found for each forecast lead, used to split into chunks
+        file_groups = {}
+
         lead_seq = util.get_lead_sequence(self.config, time_info)
-        for lead in lead_seq:
+        for lead_index, lead in enumerate(lead_seq):
             time_info['lead'] = lead
 
             time_info = time_util.ti_calculate(time_info)
@@ -273,10 +309,13 @@ class GridDiagWrapper(CommandBuilder):
                 continue
 
             all_input_files.extend(input_files)
+            file_groups[lead_index] = input_files
 
         if not all_input_files:
             return None
 
+        self.c_dict['INPUT_FILE_GROUPS'].append(file_groups)
+
         # create an ascii file with a list of the input files
         list_file = self.write_list_file(f"grid_diag_data_files_idx{idx}_{time_info['valid_fmt']}.txt",
                                          all_input_files)
@@ -288,3 +327,128 @@ class GridDiagWrapper(CommandBuilder):
         config_file = do_string_sub(self.c_dict['CONFIG_FILE'],
                                     **time_info)
         self.args.append(f"-config {config_file}")
+
+    def get_chunk_size(self, lead_indices):
+        """!Get the number of forecast leads to process in each chunk. If
+            GRID_DIAG_CHUNK_MAX_MEMORY_MB is set, the memory used by grid_diag
+            is estimated from the size of the input files of each lead
+            Args:
+                @param lead_indices indices of the leads that have input files
+                @returns number of leads in each chunk or 0 to process all
+                 input files in one run
+        """
+        chunk_size = self.c_dict['CHUNK_SIZE']
+        max_memory = self.c_dict['CHUNK_MAX_MEMORY_MB'] * 1024 * 1024
+        if not max_memory or not lead_indices:
+            return chunk_size
+
+        total_size = 0
+        for file_groups in self.c_dict['INPUT_FILE_GROUPS']:
+            for lead_index in lead_indices:
+                for input_file in file_groups.get(lead_index, []):
+                    try:
+                        total_size += os.path.getsize(input_file)
+                    except OSError:
+                        pass
+
+        lead_size = total_size / len(lead_indices)
+        if not lead_size:
+            return chunk_size
+
+        memory_size = max(1, int(max_memory // lead_size))
+        if not chunk_size:
+            return memory_size
+        return min(chunk_size, memory_size)
+
+    def get_chunks(self):
+        """!Split the forecast leads that have input files for every input
+            template into chunks. Chunks are not used if the commands are not
+            run right away (plan mode, DO_NOT_RUN_EXE or MPMD) because the
+            histograms are summed in Python
+            @returns list of lists of lead indices. The list has 1 item if
+             chunks are not used
+        """
+        file_groups = self.c_dict.get('INPUT_FILE_GROUPS', [])
+        if not file_groups:
+            return [[]]
+
+        lead_indices = sorted(set.intersection(*[set(groups)
+                                                 for groups in file_groups]))
+        if not self.can_read_command_output():
+            return [lead_indices]
+
+        if not self.c_dict['CHUNK_SIZE'] and \
+                not self.c_dict['CHUNK_MAX_MEMORY_MB']:
+            return [lead_indices]
+
+        chunk_size = self.get_chunk_size(lead_indices)
+        if not chunk_size or chunk_size >= len(lead_indices):
+            return [lead_indices]
+
+        # each chunk must have the same leads for every input template
+        skipped = set.union(*[set(groups) for groups in file_groups])
+        skipped -= set(lead_indices)
+        if skipped:
+            self.logger.warning(f'Skipping {len(skipped)} forecast lead(s) '
+                                'that do not have files for every input '
+                                'template')
+
+        return [lead_indices[index:index + chunk_size]
+                for index in range(0, len(lead_indices), chunk_size)]
+
+    def run_chunks(self, time_info, chunks):
+        """!Run grid_diag on each chunk of input files at the same time and
+            sum the histograms of the chunks into the output file.
+            Args:
+                @param time_info time dictionary of the run time
+                @param chunks list of lists of lead indices to process
+                @returns True if all chunks ran and the output was merged
+        """
+        out_path = self.get_output_path()
+        out_root, out_ext = os.path.splitext(out_path)
+        jobs = []
+        for chunk_index, lead_indices in enumerate(chunks):
+            self.infiles = []
+            for idx, file_groups in enumerate(self.c_dict['INPUT_FILE_GROUPS']):
+                chunk_files = [input_file for lead_index in lead_indices
+                               for input_file in file_groups[lead_index]]
+                list_name = (f"grid_diag_data_files_idx{idx}_"
+                             f"{time_info['valid_fmt']}_chunk{chunk_index}.txt")
+                self.infiles.append(self.write_list_file(list_name,
+                                                         chunk_files))
+
+            chunk_path = f'{out_root}_chunk{chunk_index}{out_ext}'
+            self.set_output_path(chunk_path)
+            cmd = self.get_command()
+            self.all_commands.append(cmd)
+            # copy the environment so each job keeps its own settings
+            jobs.append((cmd, dict(self.env), self.get_env_copy(),
+                         [chunk_path]))
+
+        self.set_output_path(out_path)
+        self.logger.info(f'Running {self.app_name} on {len(chunks)} chunks '
+                         'of input files')
+
+        all_ok = self.run_commands_in_parallel(
+            jobs, self.c_dict['CHUNK_MAX_WORKERS']
+        )
+
+        chunk_paths = [job[3][0] for job in jobs]
+        if all_ok:
+            try:
+                histogram_merge.sum_histograms(
+                    chunk_paths, out_path,
+                    catalog=util.get_file_catalog(self.config)
+                )
+            except (histogram_merge.HistogramError, OSError) as err:
+                self.log_error(f'Could not sum histograms: {err}')
+                all_ok = False
+            else:
+                self.logger.info(f'Summed histograms of {len(chunks)} chunks '
+                                 f'into {out_path}')
+
+        for chunk_path in chunk_paths:
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+
+        return all_ok
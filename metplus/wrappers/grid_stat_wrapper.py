@@ -24,6 +24,8 @@ from . import CompareGriddedWrapper
 class GridStatWrapper(CompareGriddedWrapper):
     '''!Wraps the MET tool grid_stat to compare gridded datasets
     '''
+    mpmd_supported = True
+
     def __init__(self, config, logger):
         self.app_name = 'grid_stat'
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
@@ -18,6 +18,8 @@ from ..util import do_string_sub
 
 class MODEWrapper(CompareGriddedWrapper):
     """!Wrapper for the mode MET tool"""
+    mpmd_supported = True
+
     def __init__(self, config, logger):
         # only set app variables if not already set by MTD (subclass)
         if not hasattr(self, 'app_name'):
@@ -151,12 +151,16 @@ class MTDWrapper(MODEWrapper):
 #        file_interval = self.c_dict['FILE_INTERVAL']
         lead_seq = util.get_lead_sequence(self.config, input_dict)
 
+        # list each input directory once for all fields and forecast leads
+        file_index = (util.get_file_catalog(self.config) or
+                      util.InputFileIndex(self.config))
+
         # if only processing a single data set (FCST or OBS) then only read that var list and process
         if self.c_dict['SINGLE_RUN']:
             var_list = util.parse_var_list(self.config, input_dict, self.c_dict['SINGLE_DATA_SRC'],
                                            met_tool=self.app_name)
             for var_info in var_list:
-                self.run_single_mode(input_dict, var_info)
+                self.run_single_mode(input_dict, var_info, file_index)
 
             return
 
@@ -182,10 +186,16 @@ class MTDWrapper(MODEWrapper):
                 time_info = time_util.ti_calculate(input_dict)
                 tasks.append(time_info)
 
-            for current_task in tasks:
-                # call find_model/obs as needed
-                model_file = self.find_model(current_task, var_info, False)
-                obs_file = self.find_obs(current_task, var_info, False)
+            # find files for all forecast leads at once
+            model_files = self.find_data_batch(tasks, var_info, 'FCST',
+                                               mandatory=False,
+                                               file_index=file_index)
+            obs_files = self.find_data_batch(tasks, var_info, 'OBS',
+                                             mandatory=False,
+                                             file_index=file_index)
+
+            for current_task, model_file, obs_file in zip(tasks, model_files,
+                                                          obs_files):
                 if model_file is None and obs_file is None:
                     continue
 
@@ -210,8 +220,10 @@ class MTDWrapper(MODEWrapper):
             time_info = time_util.ti_calculate(input_dict)
 
             # if var name is a python embedding script, check type of python input and name file list file accordingly
-            fcst_file_ext = self.check_for_python_embedding('FCST', var_info)
-            obs_file_ext = self.check_for_python_embedding('OBS', var_info)
+            fcst_file_ext = self.check_for_python_embedding('FCST', var_info,
+                                                            model_list)
+            obs_file_ext = self.check_for_python_embedding('OBS', var_info,
+                                                           obs_list)
             # if check_for_python_embedding returns None, an error occurred
             if not fcst_file_ext or not obs_file_ext:
                 return
@@ -227,21 +239,22 @@ class MTDWrapper(MODEWrapper):
             self.process_fields_one_thresh(current_task, var_info, **arg_dict)
 
 
-    def run_single_mode(self, input_dict, var_info):
+    def run_single_mode(self, input_dict, var_info, file_index=None):
         single_list = []
 
         data_src = self.c_dict['SINGLE_DATA_SRC']
-        if data_src == 'OBS':
-            find_method = self.find_obs
-        else:
-            find_method = self.find_model
+        data_type = 'OBS' if data_src == 'OBS' else 'FCST'
 
+        tasks = []
         lead_seq = util.get_lead_sequence(self.config, input_dict)
         for lead in lead_seq:
             input_dict['lead'] = lead
-            current_task = time_util.ti_calculate(input_dict)
+            tasks.append(time_util.ti_calculate(input_dict))
 
-            single_file = find_method(current_task, var_info)
+        # find files for all forecast leads at once
+        single_files = self.find_data_batch(tasks, var_info, data_type,
+                                            file_index=file_index)
+        for current_task, single_file in zip(tasks, single_files):
             if single_file is None:
                 continue
 
@@ -253,7 +266,8 @@ class MTDWrapper(MODEWrapper):
         # write ascii file with list of files to process
         input_dict['lead'] = 0
         time_info = time_util.ti_calculate(input_dict)
-        file_ext = self.check_for_python_embedding(data_src, var_info)
+        file_ext = self.check_for_python_embedding(data_src, var_info,
+                                                   single_list)
         if not file_ext:
             return
 
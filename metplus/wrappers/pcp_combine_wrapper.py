@@ -16,6 +16,8 @@ import datetime
 from ..util import met_util as util
 from ..util import time_util
 from ..util import do_string_sub
+from ..util.command_plan import get_command_plan
+from ..util import pcp_accumulation
 from . import ReformatGriddedWrapper
 
 '''!@namespace PCPCombineWrapper
@@ -53,6 +55,12 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         self.name = ""
         self.compress = -1
         self.user_command = ''
+        self.accum_seconds = None
+        self.out_name = None
+        self.file_index = ForecastFileIndex(config)
+        self.field_cache = pcp_accumulation.FieldCache(
+            self.c_dict['NUMPY_CACHE_SIZE']
+        )
 
     def create_c_dict(self):
         c_dict = super().create_c_dict()
@@ -60,6 +68,20 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                                  c_dict['VERBOSITY'])
         c_dict['SKIP_IF_OUTPUT_EXISTS'] = self.config.getbool('config', 'PCP_COMBINE_SKIP_IF_OUTPUT_EXISTS', False)
 
+        c_dict['BACKEND'] = self.config.getstr('config', 'PCP_COMBINE_BACKEND', 'MET').upper()
+        if c_dict['BACKEND'] not in ('MET', 'NUMPY'):
+            self.log_error(f"Invalid PCP_COMBINE_BACKEND: {c_dict['BACKEND']}. "
+                           "Valid options are MET or NUMPY")
+            self.isOK = False
+        elif c_dict['BACKEND'] == 'NUMPY' and not pcp_accumulation.is_available():
+            self.logger.warning("PCP_COMBINE_BACKEND is NUMPY but NumPy or netCDF4 "
+                                "is not installed. Running pcp_combine instead")
+            c_dict['BACKEND'] = 'MET'
+
+        c_dict['NUMPY_CACHE_SIZE'] = self.config.getint('config',
+                                                        'PCP_COMBINE_NUMPY_CACHE_SIZE',
+                                                        24)
+
         fcst_run = self.config.getbool('config', 'FCST_PCP_COMBINE_RUN', False)
         obs_run = self.config.getbool('config', 'OBS_PCP_COMBINE_RUN', False)
 
@@ -187,6 +209,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         self.name = ""
         self.compress = -1
         self.user_command = ''
+        self.accum_seconds = None
+        self.out_name = None
 
     def add_input_file(self, filename, addon):
         self.infiles.append(filename)
@@ -217,6 +241,21 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         if smallest_input_accum > 3600:
             smallest_input_accum = 3600
 
+        # use result of a previous search for this valid time if available
+        data_type = self.c_dict[dtype+'_INPUT_DATATYPE']
+        search_key = (self.input_dir, template, data_type,
+                      self.c_dict['CUSTOM_STRING'], valid_time,
+                      min_forecast, max_forecast, smallest_input_accum)
+        if search_key in self.file_index.lowest_forecast:
+            search_file, forecast_lead = self.file_index.lowest_forecast[search_key]
+            if search_file is None:
+                return None, 0
+
+            search_file = util.preprocess_file(search_file, data_type,
+                                               self.config)
+            if search_file is not None:
+                return search_file, forecast_lead
+
         min_forecast_string = time_util.ti_get_lead_string(min_forecast)
         max_forecast_string = time_util.ti_get_lead_string(max_forecast)
         smallest_input_accum_string = time_util.ti_get_lead_string(smallest_input_accum, plural=False)
@@ -238,14 +277,18 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
             self.logger.debug(f"Looking for {search_file}")
 
-            search_file = util.preprocess_file(search_file,
-                                self.c_dict[dtype+'_INPUT_DATATYPE'],
-                                               self.config)
+            if self.file_index.exists(search_file):
+                found_file = util.preprocess_file(search_file,
+                                                  data_type,
+                                                  self.config)
+                if found_file is not None:
+                    self.file_index.lowest_forecast[search_key] = (search_file,
+                                                                   forecast_lead)
+                    return found_file, forecast_lead
 
-            if search_file is not None:
-                return search_file, forecast_lead
             forecast_lead += smallest_input_accum
 
+        self.file_index.lowest_forecast[search_key] = (None, 0)
         return None, 0
 
     def get_daily_file(self, time_info, accum, data_src, file_template):
@@ -270,6 +313,10 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                  custom=self.c_dict['CUSTOM_STRING'])
             search_file = os.path.join(self.input_dir,
                                        dSts)
+            if not self.file_index.exists(search_file):
+                search_file = None
+                continue
+
             search_file = util.preprocess_file(search_file,
                                             self.c_dict[data_src+\
                                               '_INPUT_DATATYPE'],
@@ -369,6 +416,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                    level=int(search_accum),
                                    **time_info)
         input_path = os.path.join(self.input_dir, input_file)
+        if not self.file_index.exists(input_path):
+            return None, lead
 
         return util.preprocess_file(input_path,
                                     self.c_dict[data_src+'_INPUT_DATATYPE'],
@@ -588,6 +637,9 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         return cmd.strip()
 
     def run_at_time_once(self, time_info, var_list, data_src):
+        # re-list input directories that changed since the last run time
+        self.file_index.refresh()
+
         if not var_list:
             var_list = [None]
 
@@ -636,8 +688,53 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         # set user environment variables if needed and print all envs
         self.set_environment_variables(time_info)
 
+        if self.run_numpy_backend(time_info, data_src, cmd):
+            return True
+
         return self.build()
 
+    def run_numpy_backend(self, time_info, data_src, cmd):
+        """!Compute the accumulation in Python instead of running
+        pcp_combine if PCP_COMBINE_BACKEND is NUMPY and the inputs are
+        supported. Only ADD and SUBTRACT of NetCDF files are supported.
+        Args:
+          @param time_info dictionary containing timing information
+          @param data_src type of data (FCST or OBS)
+          @param cmd pcp_combine command that would be run
+          @rtype bool
+          @return True if output was written, False if pcp_combine should be
+           run instead"""
+        if self.c_dict['BACKEND'] != 'NUMPY':
+            return False
+
+        # commands are needed in plan mode and are not run if DO_NOT_RUN_EXE
+        if (get_command_plan(self.config) is not None or
+                self.config.getbool('config', 'DO_NOT_RUN_EXE', False)):
+            return False
+
+        if (self.method not in ('ADD', 'SUBTRACT') or
+                self.c_dict[data_src+'_INPUT_DATATYPE'] == 'GRIB' or
+                self.field_name or self.accum_seconds is None):
+            self.logger.debug(f"Running pcp_combine because {self.method} "
+                              "method or input data type is not supported "
+                              "by the NUMPY backend")
+            return False
+
+        out_path = self.get_output_path()
+        try:
+            name = pcp_accumulation.compute_accumulation(
+                self.field_cache, self.method, self.infiles, self.inaddons,
+                time_info, self.accum_seconds, out_path, self.out_name, cmd,
+                catalog=util.get_file_catalog(self.config)
+            )
+        except pcp_accumulation.AccumulationError as err:
+            self.logger.debug(f"Running pcp_combine because NUMPY backend "
+                              f"cannot compute accumulation: {err}")
+            return False
+
+        self.logger.info(f"Wrote {name} to {out_path} using NUMPY backend")
+        return True
+
     def setup_subtract_method(self, time_info, var_info, data_src):
         """!Setup pcp_combine to subtract two files to build desired accumulation
         Args:
@@ -671,6 +768,7 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                            f"{data_src}_PCP_COMBINE_OUTPUT_ACCUM")
             return None
 
+        self.accum_seconds = accum
         lead = time_info['lead_seconds']
         lead2 = lead - accum
 
@@ -868,6 +966,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                 **time_info)
         self.outfile = pcp_out
         self.args.append("-name " + field_name)
+        self.accum_seconds = int(accum_seconds)
+        self.out_name = field_name
         return self.get_command()
 
     def setup_derive_method(self, time_info, var_info, data_src):
@@ -1003,3 +1103,20 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                     'extra': extra})
 
         self.c_dict['ACCUM_DICT_LIST'] = accum_dict_list
+
+class ForecastFileIndex(util.InputFileIndex):
+    """!Input directory listings used by PCPCombine. The results of the
+        lowest forecast lead searches are also stored so they are not repeated
+        for each run time that uses the same valid time. They are cleared
+        when a directory changes.
+    """
+    def __init__(self, config):
+        super().__init__(config)
+        self.lowest_forecast = {}
+
+    def refresh(self):
+        changed = super().refresh()
+        if changed:
+            self.lowest_forecast.clear()
+
+        return changed
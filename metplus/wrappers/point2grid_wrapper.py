@@ -162,7 +162,7 @@ class Point2GridWrapper(CommandBuilder):
             self.clear()
             input_dict['lead'] = lead
 
-            time_info = time_util.ti_calculate(input_dict)
+            time_info = util.get_time_info(self.config, input_dict)
             for custom_string in self.c_dict['CUSTOM_LOOP_LIST']:
                 if custom_string:
                     self.logger.info(f"Processing custom string: {custom_string}")
@@ -19,6 +19,7 @@ from . import CompareGriddedWrapper
 
 class PointStatWrapper(CompareGriddedWrapper):
     """! Wrapper to the MET tool, Point-Stat."""
+    mpmd_supported = True
 
     def __init__(self, config, logger):
         self.app_name = 'point_stat'
@@ -18,6 +18,7 @@ from ..util import time_util
 from . import CommandBuilder
 from . import RegridDataPlaneWrapper
 from ..util import do_string_sub
+from ..util import py_embed_cache
 
 VALID_PYTHON_EMBED_TYPES = ['NUMPY', 'XARRAY', 'PANDAS']
 
@@ -95,7 +96,7 @@ class PyEmbedIngestWrapper(CommandBuilder):
             input_dict['lead'] = lead
 
             # recalculate time info items
-            time_info = time_util.ti_calculate(input_dict)
+            time_info = util.get_time_info(self.config, input_dict)
 
             for custom_string in self.c_dict['CUSTOM_LOOP_LIST']:
                 if custom_string:
@@ -128,6 +129,24 @@ class PyEmbedIngestWrapper(CommandBuilder):
                                         **time_info)
             output_path = os.path.join(ingester['output_dir'], output_file)
 
+            # copy result from cache if it was created by a previous run
+            cache_path = None
+            if py_embed_cache.is_cache_enabled(self.config):
+                key = py_embed_cache.get_cache_key(
+                    script,
+                    f"PYTHON_{ingester['input_type']}",
+                    [output_grid, ingester['output_field_name']]
+                )
+                cache_path = py_embed_cache.get_cache_path(self.config, key)
+                if os.path.exists(cache_path):
+                    self.logger.info(f'Copying cached result of PyEmbed '
+                                     f'Ingester {index} to {output_path}')
+                    util.copy_file(
+                        cache_path, output_path,
+                        catalog=util.get_file_catalog(self.config)
+                    )
+                    continue
+
             rdp.clear()
             rdp.infiles.append(f"PYTHON_{ingester['input_type']}")
             rdp.infiles.append(f'-field \'name="{script}\";\'')
@@ -148,5 +167,10 @@ class PyEmbedIngestWrapper(CommandBuilder):
             # run command and add to errors if it failed
             if not rdp.build():
                 self.errors += 1
+            elif cache_path and os.path.exists(output_path):
+                util.copy_file(
+                    output_path, cache_path,
+                    catalog=util.get_file_catalog(self.config)
+                )
 
         return True
@@ -72,7 +72,7 @@ that reformat gridded data
             for lead in lead_seq:
                 input_dict['lead'] = lead
 
-                time_info = time_util.ti_calculate(input_dict)
+                time_info = util.get_time_info(self.config, input_dict)
 
                 self.logger.info("Processing forecast lead {}".format(time_info['lead_string']))
 
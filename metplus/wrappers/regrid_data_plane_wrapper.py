@@ -25,6 +25,8 @@ from . import ReformatGriddedWrapper
 class RegridDataPlaneWrapper(ReformatGriddedWrapper):
     '''!Wraps the MET tool regrid_data_plane to reformat gridded datasets
     '''
+    mpmd_supported = True
+
     def __init__(self, config, logger):
         self.app_name = 'regrid_data_plane'
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
@@ -337,9 +339,12 @@ class RegridDataPlaneWrapper(ReformatGriddedWrapper):
             if not self.handle_output_file(time_info,
                                            field_info,
                                            data_type):
-                return
+                break
+
+            # submit commands so they can run at the same time
+            self.build_and_run_command(wait=False)
 
-            self.build_and_run_command()
+        self.wait_for_commands()
 
     def run_once_for_all_fields(self, time_info, field_info_list, data_type):
         """!Loop over fields to add each field info, then run command once to
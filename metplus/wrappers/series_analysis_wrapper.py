@@ -11,12 +11,14 @@ Condition codes: 0 for success, 1 for failure
 """
 
 import os
+import hashlib
 from datetime import datetime
 
 from ..util import met_util as util
 from ..util import time_util
 from . import CompareGriddedWrapper
 from ..util import do_string_sub
+from ..util import grid_tiles
 
 '''!@namespace SeriesAnalysisWrapper
 @brief Wraps the SeriesAnalysis tool to compare a series of gridded files
@@ -28,6 +30,10 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
         self.app_name = "series_analysis"
         self.app_path = os.path.join(config.getdir('MET_BIN_DIR', ''),
                                      self.app_name)
+        # listings of the input directories shared by all forecast leads
+        self.file_index = None
+        # MET config files that were checked for the tile mask
+        self.tile_mask_configs = {}
         super().__init__(config, logger)
 
     def create_c_dict(self):
@@ -123,12 +129,34 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
         c_dict['FCST_FILE_TYPE'] = ''
         c_dict['OBS_FILE_TYPE'] = ''
 
+        # split the grid into tiles that are processed at the same time
+        c_dict['TILE_COUNT'] = self.config.getint('config',
+                                                  'SERIES_ANALYSIS_TILE_COUNT',
+                                                  1)
+        if c_dict['TILE_COUNT'] < 1:
+            self.log_error('SERIES_ANALYSIS_TILE_COUNT must be 1 or greater')
+            self.isOK = False
+        elif c_dict['TILE_COUNT'] > 1 and not grid_tiles.is_available():
+            self.logger.warning('SERIES_ANALYSIS_TILE_COUNT requires the '
+                                'numpy and netCDF4 Python packages. '
+                                'Processing the full grid in one run')
+            c_dict['TILE_COUNT'] = 1
+
+        c_dict['TILE_MAX_WORKERS'] = (
+            self.config.getint('config', 'SERIES_ANALYSIS_TILE_MAX_WORKERS',
+                               min(max(c_dict['TILE_COUNT'], 1),
+                                   os.cpu_count() or 1))
+        )
+        c_dict['TILE_DIR'] = os.path.join(self.config.getdir('STAGING_DIR'),
+                                          'series_analysis_tiles')
+
         return c_dict
 
     def clear(self):
         super().clear()
         for data_type in ('FCST', 'OBS', 'BOTH'):
             self.c_dict[f'{data_type}_LIST_PATH'] = None
+            self.c_dict[f'{data_type}_FILES'] = []
 
     def set_environment_variables(self, fcst_field, obs_field, time_info):
         """!Set environment variables that will be read by the MET config file.
@@ -143,6 +171,7 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
         self.add_env_var("STAT_LIST", self.c_dict['STAT_LIST'])
         self.add_env_var("FCST_FIELD", fcst_field)
         self.add_env_var("OBS_FIELD", obs_field)
+        self.add_env_var("VERIF_MASK", '""')
 
         # set climatology environment variables
         self.set_climo_env_vars()
@@ -184,13 +213,18 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
         # get input time dictionary
         input_dict = self.c_dict['INPUT_TIME_DICT']
 
+        # list each input directory once for all forecast leads
+        self.file_index = (util.get_file_catalog(self.config) or
+                           util.InputFileIndex(self.config))
+
         # loop over forecast leads and process
         lead_seq = util.get_lead_sequence(self.config, input_dict)
         for lead in lead_seq:
             input_dict['lead'] = lead
+            self.file_index.refresh()
 
             # set current lead time config and environment variables
-            time_info = time_util.ti_calculate(input_dict)
+            time_info = util.get_time_info(self.config, input_dict)
 
             self.logger.info("Processing forecast lead {}".format(time_info['lead_string']))
 
@@ -225,6 +259,10 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
         # clear variables for next run
         self.clear()
 
+        # copy field info so changes made to read cached Python embedding
+        # results do not carry over to the next custom loop
+        var_info = dict(var_info)
+
         # get input files
         if not self.find_input_files(time_info, var_info):
             return
@@ -250,6 +288,10 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
             self.log_error("Could not generate command")
             return
 
+        if self.use_tiles(time_info):
+            self.run_tiles(var_info)
+            return
+
         self.build()
 
     def find_input_files(self, time_info, var_info):
@@ -271,12 +313,14 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
                                      data_type=data_type,
                                      mandatory=True,
                                      return_list=True,
+                                     file_index=self.file_index,
                                      )
 
         if not found_files:
             return False
 
-        file_ext = self.check_for_python_embedding(data_type, var_info)
+        file_ext = self.check_for_python_embedding(data_type, var_info,
+                                                   found_files)
 
         # if check_for_python_embedding returns None, an error occurred
         if not file_ext:
@@ -285,8 +329,185 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
         list_file = time_info['valid_fmt'] + f'_SA_{data_type.lower()}_' + file_ext + '.txt'
         list_path = self.write_list_file(list_file, found_files)
         self.c_dict[f'{data_type}_LIST_PATH'] = list_path
+        self.c_dict[f'{data_type}_FILES'] = found_files
         return True
 
+    def use_tiles(self, time_info=None):
+        """!Check if the grid should be split into tiles. Tiles are not used
+            if the commands are not run right away (plan mode,
+            DO_NOT_RUN_EXE or MPMD) because the output of the tiles is merged
+            in Python, if Python embedding is read directly by
+            series_analysis because the grid cannot be read without running
+            the script, or if the MET config file does not select the tile
+            with ${VERIF_MASK}
+            Args:
+              @param time_info time dictionary used to fill in the config
+               file template or None
+              @returns True if the grid should be split into tiles
+        """
+        if self.c_dict['TILE_COUNT'] < 2:
+            return False
+
+        if not self.can_read_command_output():
+            return False
+
+        if self.c_dict['FCST_FILE_TYPE'] or self.c_dict['OBS_FILE_TYPE']:
+            self.logger.warning('Cannot split grid into tiles when reading '
+                                'Python embedding input. Set '
+                                'PY_EMBED_CACHE to True to use tiles')
+            return False
+
+        config_file = self.c_dict['CONFIG_FILE']
+        if time_info:
+            config_file = do_string_sub(config_file, **time_info)
+
+        return self.config_uses_tile_mask(config_file)
+
+    def config_uses_tile_mask(self, config_file):
+        """!Check if a MET config file references ${VERIF_MASK}, which is
+            set to the data mask of each tile. Otherwise every tile would
+            process the whole grid, so a warning is logged and the grid is
+            processed in one run. Each config file is only read once
+            Args:
+              @param config_file path to the MET config file
+              @returns True if the config file references ${VERIF_MASK}
+        """
+        if config_file in self.tile_mask_configs:
+            return self.tile_mask_configs[config_file]
+
+        try:
+            with open(config_file, 'r') as file_handle:
+                uses_mask = '${VERIF_MASK}' in file_handle.read()
+        except OSError as err:
+            self.logger.warning(f'Could not read {config_file} to check for '
+                                f'${{VERIF_MASK}}: {err}')
+            uses_mask = False
+
+        if not uses_mask:
+            self.logger.warning(f'Cannot split grid into tiles because '
+                                f'{config_file} does not reference '
+                                '${VERIF_MASK}. Running on the whole grid')
+
+        self.tile_mask_configs[config_file] = uses_mask
+        return uses_mask
+
+    def get_tile_file(self, var_info):
+        """!Get the file that contains the tile index of each point of the
+            verification grid. It is created by running regrid_data_plane on
+            the first input file to write the grid to a MET NetCDF file
+            and is reused by all runs that read the same grid
+            Args:
+              @param var_info dictionary containing field information
+              @returns tuple of tile file path and number of tiles or
+               (None, 0) if the file could not be created
+        """
+        fcst_type = 'BOTH' if self.c_dict['USING_BOTH'] else 'FCST'
+        obs_type = 'BOTH' if self.c_dict['USING_BOTH'] else 'OBS'
+        input_file = self.c_dict[f'{fcst_type}_FILES'][0]
+
+        # verification grid is set by regrid.to_grid or is the fcst grid
+        to_grid = self.c_dict['REGRID_TO_GRID'].strip('"')
+        if to_grid.upper() in ('', 'NONE', 'FCST'):
+            to_grid = input_file
+        elif to_grid.upper() == 'OBS':
+            to_grid = self.c_dict[f'{obs_type}_FILES'][0]
+
+        field = self.get_field_info(v_level=var_info['fcst_level'],
+                                    v_name=var_info['fcst_name'],
+                                    v_extra=var_info['fcst_extra'],
+                                    d_type='FCST')[0]
+        field = field.strip().lstrip('{').rstrip('}').strip()
+
+        key = hashlib.sha256(
+            f"{input_file}|{to_grid}|{field}|{self.c_dict['TILE_COUNT']}"
+            .encode('utf-8')
+        ).hexdigest()[:16]
+        tile_file = os.path.join(self.c_dict['TILE_DIR'], f'{key}_tiles.nc')
+        grid_file = os.path.join(self.c_dict['TILE_DIR'], f'{key}_grid.nc')
+
+        if os.path.exists(tile_file):
+            return tile_file, len(set(grid_tiles.read_tile_ids(tile_file)
+                                      .flatten()))
+
+        if not os.path.exists(self.c_dict['TILE_DIR']):
+            os.makedirs(self.c_dict['TILE_DIR'], exist_ok=True)
+
+        rdp_path = os.path.join(self.config.getdir('MET_BIN_DIR', ''),
+                                'regrid_data_plane')
+        cmd = (f"{rdp_path} {input_file} {to_grid} {grid_file} "
+               f"-field '{field}' -name {grid_tiles.TILE_VARIABLE} "
+               f"-v {self.c_dict['VERBOSITY']}")
+        ret, _ = self.cmdrunner.run_cmd(cmd, env=self.env,
+                                        app_name='regrid_data_plane',
+                                        copyable_env=self.get_env_copy(),
+                                        inputs=[input_file],
+                                        outputs=[grid_file])
+        if not self.check_return_code(ret, cmd):
+            return None, 0
+
+        try:
+            count = grid_tiles.write_tile_file(tile_file, grid_file,
+                                               grid_tiles.TILE_VARIABLE,
+                                               self.c_dict['TILE_COUNT'])
+        except (grid_tiles.TileError, OSError) as err:
+            self.log_error(f'Could not create tile file: {err}')
+            return None, 0
+
+        return tile_file, count
+
+    def run_tiles(self, var_info):
+        """!Run series_analysis on each tile of the verification grid at the
+            same time and merge the output of the tiles into the output file.
+            Each tile is selected with a data mask that is passed to the MET
+            config file with the VERIF_MASK environment variable
+            Args:
+              @param var_info dictionary containing field information
+              @returns True if all tiles ran and the output was merged
+        """
+        tile_file, count = self.get_tile_file(var_info)
+        if not tile_file:
+            return False
+
+        out_path = self.get_output_path()
+        out_root, out_ext = os.path.splitext(out_path)
+        jobs = []
+        for index in range(count):
+            tile_path = f'{out_root}_tile{index}{out_ext}'
+            # escape quotes in the mask to set it as a MET config string
+            tile_mask = grid_tiles.get_tile_mask(tile_file, index)
+            self.add_env_var('VERIF_MASK',
+                             '"' + tile_mask.replace('"', '\\"') + '"')
+            self.set_output_path(tile_path)
+            cmd = self.get_command()
+            self.all_commands.append(cmd)
+            jobs.append((cmd, dict(self.env), self.get_env_copy(),
+                         [tile_path]))
+
+        self.set_output_path(out_path)
+        self.logger.info(f'Running {self.app_name} on {count} tiles')
+
+        all_ok = self.run_commands_in_parallel(
+            jobs, self.c_dict['TILE_MAX_WORKERS']
+        )
+
+        tile_paths = [job[3][0] for job in jobs]
+        if all_ok:
+            try:
+                grid_tiles.merge_tiles(tile_paths, tile_file, out_path,
+                                       util.get_file_catalog(self.config))
+            except (grid_tiles.TileError, OSError) as err:
+                self.log_error(f'Could not merge tile output: {err}')
+                all_ok = False
+            else:
+                self.logger.info(f'Merged output of {count} tiles into '
+                                 f'{out_path}')
+
+        for tile_path in tile_paths:
+            if os.path.exists(tile_path):
+                os.remove(tile_path)
+
+        return all_ok
+
     def set_command_line_arguments(self, time_info):
         # add input data format if set
         if self.c_dict['PAIRED']:
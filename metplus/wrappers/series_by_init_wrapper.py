@@ -110,12 +110,13 @@ class SeriesByInitWrapper(CommandBuilder):
         # And retrieve a list of init times based on the data available in
         # the extract tiles directory.
         tile_dir = self.extract_tiles_dir
-        init_times = util.get_updated_init_times(tile_dir, self.logger)
+        init_times = util.get_updated_init_times(tile_dir, self.logger,
+                                                 self.config)
 
         # Check for input tile data.
         try:
             util.check_for_tiles(tile_dir, fcst_tile_regex,
-                                 anly_tile_regex, self.logger)
+                                 anly_tile_regex, self.logger, self.config)
         except OSError:
             msg = ("Missing n x m tile files.  " +
                    "Extract tiles needs to be run")
@@ -150,7 +151,7 @@ class SeriesByInitWrapper(CommandBuilder):
                 # The tmp_fcst and tmp_anly ASCII files contain the
                 # list of files that meet the filter criteria.
                 filtered_dirs_list = util.get_files(tile_dir, ".*.",
-                                                    self.logger)
+                                                    self.logger, self.config)
                 util.create_filter_tmp_files(filtered_dirs_list,
                                              self.series_filtered_out_dir,
                                              self.logger)
@@ -373,7 +374,7 @@ class SeriesByInitWrapper(CommandBuilder):
         search_regex = ".*FCST_TILE.*.nc"
 
         files_of_interest = util.get_files(gridded_dir, search_regex,
-                                           self.logger)
+                                           self.logger, self.config)
         sorted_files = sorted(files_of_interest)
         if not files_of_interest:
             msg = ("exiting, no files found for " +
@@ -430,7 +431,8 @@ class SeriesByInitWrapper(CommandBuilder):
         # For logging
         cur_filename = sys._getframe().f_code.co_filename
         cur_function = sys._getframe().f_code.co_name
-        filter_init_times = util.get_updated_init_times(tile_dir, self.logger)
+        filter_init_times = util.get_updated_init_times(tile_dir, self.logger,
+                                                        self.config)
         sorted_filter_init = sorted(filter_init_times)
 
         for cur_init in sorted_filter_init:
@@ -452,10 +454,10 @@ class SeriesByInitWrapper(CommandBuilder):
 
                     anly_grid_files = util.get_files(tile_dir,
                                                      anly_grid_regex,
-                                                     self.logger)
+                                                     self.logger, self.config)
                     fcst_grid_files = util.get_files(tile_dir,
                                                      fcst_grid_regex,
-                                                     self.logger)
+                                                     self.logger, self.config)
 
                     # Now do some checking to make sure we aren't
                     # missing either the forecast or
@@ -170,13 +170,15 @@ class SeriesByLeadWrapper(CommandBuilder):
         # And retrieve a list of init times based on the data available in
         # the extract tiles directory.
         tile_dir = self.input_dir
-        init_times = util.get_updated_init_times(tile_dir, self.logger)
+        init_times = util.get_updated_init_times(tile_dir, self.logger,
+                                                 self.config)
 
         # Check for the existence of the storm track tiles and raise
         # an error if these are missing.
         try:
             util.check_for_tiles(tile_dir, self.fcst_tile_regex,
-                                 self.anly_tile_regex, self.logger)
+                                 self.anly_tile_regex, self.logger,
+                                 self.config)
         except OSError:
             msg = ("Missing 30x30 tile files." +
                    "  Extract tiles needs to be run")
@@ -242,7 +244,7 @@ class SeriesByLeadWrapper(CommandBuilder):
                 # Filtering produces results, assign the tile_dir to
                 # the filter output directory, series_lead_filtered_out_dir.
                 filtered_files_list = util.get_files(tile_dir, ".*.",
-                                                     self.logger)
+                                                     self.logger, self.config)
 
                 # Create the tmp_fcst and tmp_anly ASCII files containing the
                 # list of files that meet the filter criteria.
@@ -1012,34 +1014,24 @@ class SeriesByLeadWrapper(CommandBuilder):
         # Convert cur_fhr to a string that has zero padding/filling
         cur_fhr_str = (str(cur_fhr)).zfill(3)
 
-        # pylint:disable=unused-variable
-        # os.walk returns tuple, not all returned variables are used.
+        # Get the files that match the specified format. The tree is only
+        # walked again for the next forecast hour if it changed.
+        for filepath in util.find_files(filedir, filename_regex,
+                                        self.config):
+            match = re.match(filename_regex, os.path.basename(filepath))
 
-        # Walk the tree
-        for root, directories, files in os.walk(filedir):
-            for filename in files:
-                # add it to the list only if it is a match
-                # to the specified format
-                # prog = re.compile(filename_regex)
-                match = re.match(filename_regex, filename)
-                if match:
-                    # Now match based on the current forecast hour
-                    if file_type == 'FCST':
-                        match_fhr = re.match(r'.*FCST_TILE_F([0-9]{3}).*',
-                                             match.group())
+            # Now match based on the current forecast hour
+            if file_type == 'FCST':
+                match_fhr = re.match(r'.*FCST_TILE_F([0-9]{3}).*',
+                                     match.group())
 
-                    elif file_type == 'ANLY':
-                        match_fhr = re.match(r'.*ANLY_TILE_F([0-9]{3}).*',
-                                             match.group())
+            elif file_type == 'ANLY':
+                match_fhr = re.match(r'.*ANLY_TILE_F([0-9]{3}).*',
+                                     match.group())
 
-                    if match_fhr:
-                        if match_fhr.group(1) == cur_fhr_str:
-                            # Join the two strings to form the full
-                            # file path.
-                            filepath = os.path.join(root, filename)
-                            file_paths.append(filepath)
-                else:
-                    continue
+            if match_fhr:
+                if match_fhr.group(1) == cur_fhr_str:
+                    file_paths.append(filepath)
         return file_paths
 
 
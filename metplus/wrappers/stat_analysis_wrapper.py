@@ -20,6 +20,9 @@ import itertools
 
 from ..util import met_util as util
 from ..util import do_string_sub
+from ..util.command_plan import get_command_plan
+from ..util.stat_file_index import StatFileIndex, parse_stat_time
+from ..util import stat_aggregate
 from . import CommandBuilder
 
 class StatAnalysisWrapper(CommandBuilder):
@@ -136,6 +139,21 @@ class StatAnalysisWrapper(CommandBuilder):
         for time_conf in ['VALID_BEG', 'VALID_END', 'INIT_BEG', 'INIT_END']:
             c_dict[time_conf] = self.config.getstr('config', time_conf, '')
 
+        # pass only the stat files that can match each job to -lookin
+        c_dict['LOOKIN_INDEX'] = (
+            self.config.getbool('config', 'STAT_ANALYSIS_LOOKIN_INDEX', False)
+        )
+        c_dict['LOOKIN_INDEX_FILE'] = (
+            self.config.getstr('config', 'STAT_ANALYSIS_LOOKIN_INDEX_FILE',
+                               os.path.join(self.config.getdir('OUTPUT_BASE'),
+                                            'stat_analysis_lookin_index.json'))
+        )
+
+        # run supported jobs in Python instead of calling stat_analysis
+        c_dict['PYTHON_ENGINE'] = (
+            self.config.getbool('config', 'STAT_ANALYSIS_PYTHON_ENGINE', False)
+        )
+
         for job_conf in ['JOB_NAME', 'JOB_ARGS']:
             c_dict[job_conf] = self.config.getstr('config',
                                                    f'STAT_ANALYSIS_{job_conf}',
@@ -1720,6 +1738,7 @@ class StatAnalysisWrapper(CommandBuilder):
                  @param runtime_settings_dict_list list of dictionaries
                   containing information needed to run a StatAnalysis job
         """
+        stat_file_index = self.get_stat_file_index()
         for runtime_settings_dict in runtime_settings_dict_list:
 
             # Set environment variables and run stat_analysis.
@@ -1731,12 +1750,109 @@ class StatAnalysisWrapper(CommandBuilder):
 
             # set lookin dir
             self.logger.debug(f"Setting -lookindir to {runtime_settings_dict['LOOKIN_DIR']}")
-            self.lookindir = runtime_settings_dict['LOOKIN_DIR']
+            self.lookindir = self.get_lookin_paths(runtime_settings_dict,
+                                                   stat_file_index)
+            if not self.lookindir:
+                self.logger.warning("No stat files in "
+                                    f"{runtime_settings_dict['LOOKIN_DIR']} "
+                                    "match the job. Skipping")
+                self.clear()
+                continue
+
+            if self.run_python_engine(runtime_settings_dict):
+                self.clear()
+                continue
 
             self.build_and_run_command()
 
             self.clear()
 
+        if stat_file_index:
+            stat_file_index.save()
+
+    def run_python_engine(self, runtime_settings_dict):
+        """!Run a job with the Python aggregation engine if it is enabled
+            and supports the job. The engine is not used in plan mode
+            @param runtime_settings_dict dictionary containing all settings
+             used in next run
+            @returns True if the job was run, False if stat_analysis should
+             be run instead
+        """
+        if not self.c_dict['PYTHON_ENGINE']:
+            return False
+
+        if get_command_plan(self.config) is not None:
+            return False
+
+        if not stat_aggregate.is_available():
+            self.logger.warning("Cannot use Python engine without NumPy. "
+                                "Running stat_analysis")
+            return False
+
+        job = runtime_settings_dict['JOB']
+        try:
+            filters = stat_aggregate.get_filters(runtime_settings_dict)
+            out_lines = stat_aggregate.run_job(
+                job, self.lookindir.split(), filters, logger=self.logger,
+                catalog=util.get_file_catalog(self.config), config=self.config
+            )
+        except (stat_aggregate.StatAggregateError, OSError, ValueError) as err:
+            self.logger.debug(f"Running stat_analysis because the Python "
+                              f"engine cannot run job: {err}")
+            return False
+
+        self.logger.info(f"Ran job with Python engine: {job}")
+        self.logger.debug(f"Job produced {len(out_lines)} output line(s)")
+        return True
+
+    def get_stat_file_index(self):
+        """!Get the index of stat files used to prune the -lookin argument.
+            The index is not used in plan mode because the stat files may
+            not exist until the planned commands are run
+            @returns StatFileIndex or None if STAT_ANALYSIS_LOOKIN_INDEX is
+             False or plan mode is enabled
+        """
+        if not self.c_dict['LOOKIN_INDEX']:
+            return None
+
+        if get_command_plan(self.config) is not None:
+            return None
+
+        return StatFileIndex(self.c_dict['LOOKIN_INDEX_FILE'], self.logger,
+                             config=self.config)
+
+    def get_lookin_paths(self, runtime_settings_dict, stat_file_index):
+        """!Get the files and directories to pass to -lookin for a job. If a
+            stat file index is used, only the stat files that contain the
+            models and overlap the forecast valid, forecast init, and
+            observation valid windows of the job are passed
+            @param runtime_settings_dict dictionary containing all settings
+             used in next run
+            @param stat_file_index StatFileIndex or None to pass LOOKIN_DIR
+            @returns string of space separated paths
+        """
+        lookin = runtime_settings_dict['LOOKIN_DIR']
+        if stat_file_index is None:
+            return lookin
+
+        windows = {}
+        for window in ['FCST_VALID', 'FCST_INIT', 'OBS_VALID']:
+            windows[window.lower()] = [
+                parse_stat_time(runtime_settings_dict.get(f'{window}_{edge}',
+                                                          ''))
+                for edge in ['BEG', 'END']
+            ]
+
+        # don't filter by model if any model name contains a wildcard
+        models = [model.strip().strip('"')
+                  for model in runtime_settings_dict.get('MODEL', '').split(',')]
+        if any(not model or '*' in model or '?' in model for model in models):
+            models = None
+
+        return ' '.join(stat_file_index.filter_lookin(lookin.split(),
+                                                      windows,
+                                                      models))
+
     def run_all_times(self):
         date_type = self.c_dict['DATE_TYPE']
         self.c_dict['DATE_BEG'] = self.c_dict[date_type+'_BEG']
@@ -19,6 +19,7 @@ import os
 import re
 import subprocess
 import shutil
+import shlex
 
 from produtil.run import exe
 from produtil.run import checkrun
@@ -98,6 +99,11 @@ class TCMPRPlotterWrapper(CommandBuilder):
         self.no_log = self.config.getbool('config', 'TCMPR_PLOTTER_NO_LOG')
         self.save = self.config.getbool('config', 'TCMPR_PLOTTER_SAVE')
 
+        # if greater than 1, run plot_tcmpr.R for each input file, plot type
+        # and dependent variable at the same time
+        self.max_workers = self.config.getint('config',
+                                              'TCMPR_PLOTTER_MAX_WORKERS', 1)
+
     def _init_tcmpr_script(self):
         """! Called by the constructor to set up the environment variables
         used by the plot_tcmpr.R script and  to set the self.tcmpr_script
@@ -159,6 +165,11 @@ class TCMPRPlotterWrapper(CommandBuilder):
         # will be saved.
         util.mkdir_p(self.output_base_dir)
 
+        if self.max_workers > 1:
+            self.run_fan_out(cmds_dict)
+            self.logger.info("Plotting complete")
+            return
+
         # If input data is a file, create a single command and invoke R script.
         if os.path.isfile(self.input_data):
             self.logger.debug("Currently plotting " + self.input_data)
@@ -204,7 +215,7 @@ class TCMPRPlotterWrapper(CommandBuilder):
                               self.input_data)
             cmds_dict = self.retrieve_optionals()
             all_tcst_files_list = util.get_files(self.input_data, ".*.tcst",
-                                                 self.logger)
+                                                 self.logger, self.config)
             all_tcst_files = ' '.join(all_tcst_files_list)
             self.logger.debug("num of files " + str(len(all_tcst_files)))
             # Append the mandatory -lookin option to the base command.
@@ -271,6 +282,133 @@ class TCMPRPlotterWrapper(CommandBuilder):
 
         self.logger.info("Plotting complete")
 
+    def get_tcst_files(self):
+        """! Get the list of tcst files to plot from the input file or
+             directory.
+
+             Returns:
+                 list of tcst files or None if the input is neither a file
+                 nor a directory
+        """
+        if os.path.isfile(self.input_data):
+            return [self.input_data]
+
+        if os.path.isdir(self.input_data):
+            return util.get_files(self.input_data, ".*.tcst", self.logger,
+                                  self.config)
+
+        return None
+
+    def get_fan_out_jobs(self, cmds_dict, tcst_files):
+        """! Split the plots into one plot_tcmpr.R command for each input
+             file, plot type and dependent variable. Each command writes to
+             its own output subdirectory:
+             <output dir>/<tcst file name>/<plot type>/<dependent variable>
+             The plot type and dependent variable levels are left out if
+             they are not set.
+
+             Args:
+                 @param cmds_dict dictionary of optional arguments from
+                  retrieve_optionals
+                 @param tcst_files list of input tcst files
+             Returns:
+                 list of dictionaries containing the tcst file, plot type,
+                 dependent variable, output directory and list of arguments
+                 of each command
+        """
+        jobs = []
+        plot_types = cmds_dict.get('-plot') or [None]
+        dep_vars = cmds_dict.get('-dep') or [None]
+        for tcst_file in tcst_files:
+            file_dir = self.create_output_subdir(tcst_file)
+            for plot_type in plot_types:
+                for dep_var in dep_vars:
+                    out_dir = file_dir
+                    if plot_type:
+                        out_dir = os.path.join(out_dir, plot_type)
+                    if dep_var:
+                        out_dir = os.path.join(out_dir, dep_var)
+
+                    args = [self.tcmpr_script, '-lookin', tcst_file]
+                    for key, value in cmds_dict.items():
+                        if key == '-plot':
+                            value = plot_type
+                        elif key == '-dep':
+                            value = dep_var
+                        elif key in ('-tcst', '-save_data'):
+                            # write files to the output directory of the job
+                            # so commands do not write to the same file
+                            value = os.path.join(out_dir,
+                                                 os.path.basename(value))
+                        args.append(key)
+                        if value:
+                            args.append(value)
+                    args.extend(['-outdir', out_dir])
+
+                    jobs.append({'tcst_file': tcst_file,
+                                 'plot_type': plot_type,
+                                 'dep_var': dep_var,
+                                 'out_dir': out_dir,
+                                 'args': args})
+        return jobs
+
+    def run_fan_out(self, cmds_dict):
+        """! Run plot_tcmpr.R for each input file, plot type and dependent
+             variable at the same time, using up to TCMPR_PLOTTER_MAX_WORKERS
+             processes. All commands are run even if some of them fail and
+             the failed commands are reported together at the end.
+
+             Args:
+                 @param cmds_dict dictionary of optional arguments from
+                  retrieve_optionals
+             Returns:
+                 True if all of the commands succeeded, False otherwise
+        """
+        tcst_files = self.get_tcst_files()
+        if tcst_files is None:
+            self.log_error("Expected input is neither a file nor directory,"
+                           "exiting...")
+            sys.exit(1)
+
+        fan_out_jobs = self.get_fan_out_jobs(cmds_dict, tcst_files)
+        self.logger.info(f"Generating {len(fan_out_jobs)} sets of plots for "
+                         f"{len(tcst_files)} tcst files using up to "
+                         f"{self.max_workers} processes")
+
+        # plot_tcmpr.R reads MET_INSTALL_DIR from the environment
+        env = dict(self.env)
+        if 'MET_INSTALL_DIR' in os.environ:
+            env['MET_INSTALL_DIR'] = os.environ['MET_INSTALL_DIR']
+
+        jobs = []
+        for job in fan_out_jobs:
+            util.mkdir_p(job['out_dir'])
+            cmd = 'Rscript ' + ' '.join(shlex.quote(arg)
+                                        for arg in job['args'])
+            self.all_commands.append(cmd)
+            jobs.append((cmd, env, self.get_env_copy(), [job['out_dir']]))
+
+        results = self.run_jobs_in_parallel(jobs, self.max_workers)
+
+        failed = [(job, ret) for job, (ret, _) in zip(fan_out_jobs, results)
+                  if ret != 0]
+        if not failed:
+            return True
+
+        report = [f"plot_tcmpr.R returned a non-zero exit status for "
+                  f"{len(failed)} of {len(fan_out_jobs)} commands. The tcst "
+                  "files may be missing data:"]
+        for job, ret in failed:
+            report.append(f"  file={job['tcst_file']} "
+                          f"plot={job['plot_type'] or 'default'} "
+                          f"dep={job['dep_var'] or 'default'} "
+                          f"exit status={ret}")
+        self.log_error('\n'.join(report))
+        self.logger.info("Check the logfile for more information on why "
+                         "they failed: "
+                         f"{self.config.getstr('config', 'LOG_METPLUS')}")
+        return False
+
     def create_output_subdir(self, tcst_file):
         """! Extract the base portion of the tcst filename:
             eg amlqYYYYMMDDhh.gfso.nnnn in
@@ -391,14 +391,18 @@ class TCRMWWrapper(CommandBuilder):
         all_input_files = []
 
         lead_seq = util.get_lead_sequence(self.config, time_info)
-        for lead in lead_seq:
-            self.clear()
-            time_info['lead'] = lead
-
-            time_info = time_util.ti_calculate(time_info)
-
-            # get a list of the input data files, write to an ascii file if there are more than one
-            input_files = self.find_data(time_info, return_list=True)
+        self.clear()
+
+        # compute the time info for each lead from a copy of the run time so
+        # the leads do not change each other or the time info of the run
+        lead_time_infos = [
+            time_util.ti_calculate(dict(time_info, lead=lead))
+            for lead in lead_seq
+        ]
+
+        # get a list of the input data files for all forecast leads at once
+        for input_files in self.find_data_batch(lead_time_infos,
+                                                return_list=True):
             if not input_files:
                 continue
 
@@ -418,10 +422,10 @@ class TCRMWWrapper(CommandBuilder):
         # set LEAD_LIST to list of forecast leads used
         if lead_seq != [0]:
             lead_list = []
-            for lead in lead_seq:
+            for lead, lead_info in zip(lead_seq, lead_time_infos):
                 lead_hours = (
                     time_util.ti_get_seconds_from_relativedelta(lead,
-                                                                valid_time=time_info['valid'])
+                                                                valid_time=lead_info['valid'])
                     ) // 3600
                 lead_list.append(f'"{str(lead_hours).zfill(2)}"')
 
@@ -188,7 +188,12 @@ def launch(cmd, env=None, stdin=None, stdout=None, stderr=None,
     elif stderr is not ERR2OUT:
         stderrC=stderr
 
-    pid=os.fork()
+    # Hold the module lock while forking so no other thread can hold
+    # it when the process is copied.  The child inherits the lock held
+    # by this thread and releases it when it leaves the with block.
+    # Otherwise the child could wait forever for it in pclose_all.
+    with plock:
+        pid=os.fork()
     assert(pid>=0)
     if pid>0:
         # Parent process after successfull fork.
@@ -647,6 +652,44 @@ class Pipeline(object):
         self.__quads.append( (p,i,o,e) )
         self.__last_pid=p
         self.__binary=bool(binary)
+    def background(self):
+        """!Marks this Pipeline as running in the background.  The
+        processes are started by the constructor, so this only returns
+        self.  Use produtil.run.waitprocs() or a
+        produtil.run.BackgroundPool to wait for the processes and
+        handle their input and output."""
+        return self
+    def pids(self):
+        """!Returns a list of the process ids of the processes in
+        this Pipeline."""
+        return [ q[0] for q in self.__quads ]
+    def background_streams(self):
+        """!Returns the streams that must be handled while this
+        Pipeline runs in the background.
+        @returns a tuple (stdin,instring,stdout,stderr) where stdin is
+        the file descriptor to write the input string instring to, and
+        stdout and stderr are the file descriptors to read captured
+        output from.  Each file descriptor is None if it is not
+        needed."""
+        stdin = self.__stdin if self.__instring is not None else None
+        stdout = self.__stdout if self.__capture else None
+        return (stdin,self.__instring,stdout,self.__stderr)
+    def set_background_result(self,done,out=None,err=None):
+        """!Records the result of a Pipeline that ran in the
+        background so that poll(), rusage() and out work as if
+        communicate() was called.
+        @param done dict mapping from process id to the os.wait4
+          return value for that process
+        @param out bytes read from the captured stdout, or None
+        @param err bytes read from stderr, or None"""
+        if not self.__binary:
+            if out is not None: out=str(out,encoding='UTF8')
+            if err is not None: err=str(err,encoding='UTF8')
+        with self.__lock:
+            self.__out=out
+            self.__err=err
+            self.__managed=dict(done)
+            self.__children.difference_update(done)
     def send_signal(self,sig):
         """!Sends a signal to all children.
         @param sig the signal"""
@@ -698,6 +741,14 @@ class Pipeline(object):
         else:
             return -128
 
+    def rusage(self):
+        """!Returns a list of the resource usage (the third element of
+        the os.wait4 return value) of each process in the pipeline,
+        or None if the pipeline has not completed."""
+        m=self.__managed
+        if not m: return None
+        return [ r[2] for r in m.values() ]
+
     def to_string(self):
         """!Calls self.communicate(), and returns the stdout from the
         pipeline (self.outbytes).  The return value will be Null if
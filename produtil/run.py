@@ -154,7 +154,7 @@ only modify the last the command in the pipeline (or the first, for
 operations that change stdin).
 """
 
-import time, logging
+import time, logging, os, signal, threading, selectors, collections
 import produtil.mpi_impl
 import produtil.sigsafety
 import produtil.prog as prog
@@ -170,7 +170,7 @@ from produtil.prog import InvalidRunArgument,ExitStatusException
 __all__=['alias','exe','run','runstr','mpi','mpiserial','mpirun',
          'runbg','prog','mpiprog','waitprocs','runsync',
          'InvalidRunArgument','ExitStatusException','checkrun',
-         'batchexe','bigexe','openmp','make_mpi']
+         'batchexe','bigexe','openmp','make_mpi','BackgroundPool']
 
 ##@var module_logger
 # Default logger used by some functions if no logger is given
@@ -357,17 +357,13 @@ def make_pipeline(arg,capture,mpiimpl=None,**kwargs):
     return pl
 
 def runbg(arg,capture=False,**kwargs):
-    """!Not implemented: background execution
+    """!Runs the specified process in the background.
 
-    Runs the specified process in the background.  Specify
-    capture=True to capture the command's output.  Returns a
-    produtil.prog.PopenCommand.  Call poll() to determine process
-    completion, and use the stdout_data property to get the output
-    after completion, if capture=True was specified.
-
-    @bug produtil.run.runbg() is not implemented
-
-    @warning this is not implemented
+    Specify capture=True to capture the command's output.  Returns a
+    produtil.pipeline.Pipeline.  Call waitprocs() or add the Pipeline
+    to a BackgroundPool with BackgroundPool.adopt() to wait for it.
+    After completion, call poll() to get the exit status and use the
+    out property to get the output if capture=True was specified.
 
     @param arg the produtil.prog.Runner to execute (output of
       exe(), bigexe() or mpirun()
@@ -378,52 +374,476 @@ def runbg(arg,capture=False,**kwargs):
     return p
 
 def waitprocs(procs,logger=None,timeout=None,usleep=1000):
-    """!Not implemented: background process monitoring
+    """!Waits for one or more backgrounded processes to complete.
 
-    Waits for one or more backgrounded processes to complete.  Logs to
-    the specified logger while doing so.  If a timeout is specified,
-    returns False after the given time if some processes have not
-    returned.  The usleep argument is the number of microseconds to
-    sleep between checks (can be a fraction).  The first argument,
-    procs specifies the processes to check.  It must be a
-    produtil.prog.Pipeline (return value from runbg) or an iterable
-    (list or tuple) of such.
+    Logs to the specified logger while doing so.  If a timeout is
+    specified, returns False after the given time if some processes
+    have not returned.  The processes are not killed in that case, so
+    waitprocs() can be called again to continue waiting.  The first
+    argument, procs specifies the processes to check.  It must be a
+    produtil.pipeline.Pipeline (return value from runbg) or an
+    iterable (list or tuple) of such.
 
-    @bug produtil.run.waitprocs() is untested
-
-    @warning This is not tested and probably does not work.
+    The processes are waited for with a BackgroundPool, so this does
+    not poll.  The usleep argument is accepted for backward
+    compatibility and is ignored.
 
     @param procs the processes to watch
     @param logger the logging.Logger for log messages
-    @param timeout how long to wait before giving up
-    @param usleep sleep time between checks"""
-    p=set()
-    if isinstance(procs,produtil.prog.PopenCommand):
-        p.add(procs)
-    else:
-        for pp in procs:
-            p.add(pp)
-    if logger is not None: logger.info("Wait for: %s",repr(p))
-    while p: # keep looping as long as there are unfinished processes
-        p2=set()
-        for proc in p:
-            ret=proc.poll()
-            if ret is not None:
-                if logger is not None:
-                    logger.info("%s returned %s"%(repr(proc),repr(ret)))
-            elif logger is not None and usleep>4.99999e6:
-                # babble about running processes if the sleep time is long.
-                logger.info("%s is still running"%(repr(proc),))
-                p2.add(proc)
-        p=p2
-
-        if not p: break # done! no need to sleep...
-
-        if usleep>4.99999e6 and logger is not None:
-            # babble about sleeping if the sleep time is 5sec or longer:
-            logger.info("... sleep %f ..."%(float(usleep/1.e6),))
-        time.sleep(usleep/1.e6)
-    return False if(p) else True
+    @param timeout how long to wait in seconds before giving up
+    @param usleep ignored
+    @returns True if all processes completed, False otherwise"""
+    if isinstance(procs,pipeline.Pipeline):
+        procs=[procs]
+    pool=BackgroundPool(logger=logger)
+    try:
+        for proc in procs:
+            if logger is not None: logger.info("Wait for: %s",repr(proc))
+            pool.adopt(proc)
+        return pool.wait(timeout)
+    finally:
+        pool.close()
+
+##@var _reaped
+# Mapping from process id to the os.wait4 result of background
+# processes whose Pipeline has not received its result yet.  This
+# allows a process to be waited for by a later BackgroundPool if an
+# earlier one timed out after reaping part of a pipeline.
+_reaped=dict()
+
+##@var _waiters
+# Mapping from process id to the set of wakeup file descriptors of
+# the BackgroundPool objects that wait for the process.  A process is
+# in this dict while its waiter thread is running.
+_waiters=dict()
+
+##@var _reaped_lock
+# Protects _reaped and _waiters
+_reaped_lock=threading.Lock()
+
+def _wait_thread(pid):
+    """!Blocks in os.wait4 until a process exits, then records the
+    result and wakes up the BackgroundPool objects waiting for it.
+    Used when os.pidfd_open is not available.
+    @param pid the process id to wait for"""
+    try:
+        result=os.wait4(pid,0)
+    except ChildProcessError:
+        # reaped elsewhere.  Report an unknown exit status.
+        result=(pid,255<<8,None)
+    with _reaped_lock:
+        _reaped[pid]=result
+        wakeups=_waiters.pop(pid,set())
+    for fd in wakeups:
+        try:
+            os.write(fd,b'x')
+        except OSError: pass
+
+class BackgroundJob(object):
+    """!A produtil.prog.Runner run in the background by a
+    BackgroundPool.  The Pipeline is not started until the pool has a
+    free slot for it."""
+    def __init__(self,arg,capture=False,callback=None,timeout=None,
+                 **kwargs):
+        """!Creates a BackgroundJob.  Use BackgroundPool.submit()
+        instead of calling this directly.
+        @param arg the produtil.prog.Runner to execute
+        @param capture if True, capture the stdout into a string
+        @param callback function called with this job when it completes
+        @param timeout seconds after the start of the job when it is
+          terminated, or None to wait forever
+        @param kwargs additional arguments to make_pipeline()"""
+        self.arg=arg
+        self.capture=bool(capture)
+        self.callback=callback
+        self.timeout=timeout
+        self.kwargs=kwargs
+        self.pipeline=None
+        self.start_time=None
+        self.end_time=None
+        self.timed_out=False
+        self._deadline=None
+        self._exited_time=None
+        self._remaining=set()
+        self._done=dict()
+        self._fds=set()
+        self._out=bytearray()
+        self._err=bytearray()
+        self._instring=None
+    def __repr__(self):
+        return '<BackgroundJob %s>'%(repr(
+                self.arg if self.arg is not None else self.pipeline),)
+    @property
+    def started(self):
+        """!True if the processes of the job were started."""
+        return self.pipeline is not None
+    @property
+    def done(self):
+        """!True if all processes of the job exited."""
+        return self.end_time is not None
+    def poll(self):
+        """!Returns the exit status of the job, or None if it has not
+        completed."""
+        if not self.done: return None
+        return self.pipeline.poll()
+    @property
+    def out(self):
+        """!The captured output of the job, or None if output was not
+        captured or the job has not completed."""
+        if not self.done: return None
+        return self.pipeline.out
+    def rusage(self):
+        """!Returns the resource usage of the job's processes, or None
+        if the job has not completed."""
+        if not self.done: return None
+        return self.pipeline.rusage()
+    @property
+    def wall_time(self):
+        """!Seconds between the start and end of the job, or None if
+        it has not completed."""
+        if not self.done: return None
+        return self.end_time-self.start_time
+
+class BackgroundPool(object):
+    """!Runs processes in the background and waits for them.
+
+    Jobs are added with submit(), which starts the job immediately if
+    fewer than max_procs jobs are running, and queues it otherwise.
+    Pipelines that were already started with runbg() can be added
+    with adopt().  Call wait() or wait_any() to wait for the jobs.
+    Process exits, captured output and input strings are all handled
+    by one selectors.DefaultSelector, so waiting does not poll.  Each
+    process is watched with a process file descriptor from
+    os.pidfd_open where it is available.  Otherwise, one thread per
+    process blocks in os.wait4 and wakes up the selector through a
+    pipe.  Completion callbacks and job timeouts are handled by the
+    thread that calls wait() or wait_any().
+
+    The pool can be used as a context manager.  Exiting the context
+    waits for all jobs to complete."""
+    ##@var force_close_time
+    # Seconds to wait for captured output to be closed after all
+    # processes of a job exited.  Processes started in the background
+    # by the job may keep the pipes open.
+    force_close_time=2.0
+
+    def __init__(self,max_procs=None,logger=None):
+        """!Creates a BackgroundPool.
+        @param max_procs maximum number of jobs that run at once, or
+          None for no limit
+        @param logger the logging.Logger for log messages"""
+        if max_procs is not None and int(max_procs)<1:
+            raise ValueError('max_procs must be at least 1: %s'
+                             %(repr(max_procs),))
+        self.max_procs=None if max_procs is None else int(max_procs)
+        self.logger=logger
+        self._queued=collections.deque()
+        self._running=list()
+        self._finished=list()
+        self._selector=selectors.DefaultSelector()
+        (self._wakeup_read,self._wakeup_write)=os.pipe()
+        os.set_blocking(self._wakeup_read,False)
+        os.set_blocking(self._wakeup_write,False)
+        self._selector.register(self._wakeup_read,selectors.EVENT_READ,
+                                ('wakeup',None,None))
+        self._use_pidfd=hasattr(os,'pidfd_open')
+    def __enter__(self):
+        return self
+    def __exit__(self,etype,value,traceback):
+        try:
+            if etype is None:
+                self.wait()
+            else:
+                self.kill()
+        finally:
+            self.close()
+    @property
+    def running(self):
+        """!List of jobs that are running."""
+        return list(self._running)
+    @property
+    def queued(self):
+        """!List of jobs that are waiting for a free slot."""
+        return list(self._queued)
+    def submit(self,arg,capture=False,callback=None,timeout=None,
+               **kwargs):
+        """!Adds a job to the pool.  The job is started immediately if
+        there is a free slot.  Otherwise it is started after another
+        job completes.
+        @param arg the produtil.prog.Runner to execute (output of
+          exe(), bigexe() or mpirun()
+        @param capture if True, capture the stdout into a string
+        @param callback function called with the BackgroundJob when
+          it completes
+        @param timeout seconds after the start of the job when it is
+          terminated, or None to wait forever
+        @param kwargs same as for mpirun()
+        @returns the BackgroundJob"""
+        if 'logger' not in kwargs and self.logger is not None:
+            kwargs['logger']=self.logger
+        job=BackgroundJob(arg,capture,callback,timeout,**kwargs)
+        self._queued.append(job)
+        self._start_queued()
+        return job
+    def adopt(self,proc,callback=None,timeout=None):
+        """!Adds a Pipeline that is already running, such as the
+        return value of runbg(), to the pool.  Adopted pipelines count
+        towards max_procs but are never queued.
+        @param proc the produtil.pipeline.Pipeline
+        @param callback function called with the BackgroundJob when
+          it completes
+        @param timeout seconds from now when the pipeline is
+          terminated, or None to wait forever
+        @returns the BackgroundJob"""
+        job=BackgroundJob(None,callback=callback,timeout=timeout)
+        job.pipeline=proc
+        job.capture=proc.background_streams()[2] is not None
+        if proc.poll() is not None:
+            # already completed, so there is nothing to wait for
+            job.start_time=job.end_time=time.time()
+            self._finished.append(job)
+            if callback is not None:
+                callback(job)
+            return job
+        self._watch(job)
+        return job
+    def _start_queued(self):
+        """!Starts queued jobs while there are free slots."""
+        while self._queued and ( self.max_procs is None or
+                                 len(self._running)<self.max_procs ):
+            job=self._queued.popleft()
+            job.pipeline=make_pipeline(job.arg,job.capture,**job.kwargs)
+            self._watch(job)
+    def _watch(self,job):
+        """!Registers the processes and streams of a started job."""
+        job.start_time=time.time()
+        if job.timeout is not None:
+            job._deadline=job.start_time+job.timeout
+        self._running.append(job)
+        (stdin,instring,stdout,stderr)=job.pipeline.background_streams()
+        if stdin is not None:
+            if isinstance(instring,str):
+                instring=instring.encode('UTF8')
+            job._instring=memoryview(instring)
+            self._register(job,stdin,'in',selectors.EVENT_WRITE)
+        if stdout is not None:
+            self._register(job,stdout,'out',selectors.EVENT_READ)
+        if stderr is not None:
+            self._register(job,stderr,'err',selectors.EVENT_READ)
+        for pid in job.pipeline.pids():
+            job._remaining.add(pid)
+            self._watch_pid(job,pid)
+        self._check_done(job)
+    def _register(self,job,fd,kind,events):
+        os.set_blocking(fd,False)
+        job._fds.add(fd)
+        self._selector.register(fd,events,(kind,job,None))
+    def _unregister(self,job,fd):
+        self._selector.unregister(fd)
+        job._fds.discard(fd)
+        pipeline.pclose(fd)
+    def _watch_pid(self,job,pid):
+        """!Starts watching for the exit of one process."""
+        with _reaped_lock:
+            result=_reaped.get(pid,None)
+        if result is not None:
+            self._reap(job,pid,result)
+            return
+        if self._use_pidfd:
+            try:
+                fd=os.pidfd_open(pid)
+            except ProcessLookupError:
+                # process was already reaped by someone else
+                self._reap(job,pid,(pid,255<<8,None))
+                return
+            except OSError:
+                # kernel does not support process file descriptors
+                self._use_pidfd=False
+            else:
+                self._selector.register(fd,selectors.EVENT_READ,
+                                        ('pid',job,pid))
+                return
+        with _reaped_lock:
+            result=_reaped.get(pid,None)
+            start_thread = result is None and pid not in _waiters
+            if result is None:
+                _waiters.setdefault(pid,set()).add(self._wakeup_write)
+        if result is not None:
+            self._reap(job,pid,result)
+        elif start_thread:
+            thread=threading.Thread(target=_wait_thread,args=(pid,),
+                                    name='waitpid-%d'%(pid,))
+            thread.daemon=True
+            thread.start()
+    def _reap(self,job,pid,result):
+        """!Records the exit of one process of a job."""
+        with _reaped_lock:
+            _reaped[pid]=result
+        job._done[pid]=result
+        job._remaining.discard(pid)
+        if not job._remaining:
+            job._exited_time=time.time()
+    def _handle(self,key):
+        """!Handles one event from the selector."""
+        (kind,job,pid)=key.data
+        fd=key.fd
+        if kind=='wakeup':
+            try:
+                while os.read(fd,4096): pass
+            except BlockingIOError: pass
+            for running in self._running:
+                with _reaped_lock:
+                    results=[ _reaped[p] for p in running._remaining
+                              if p in _reaped ]
+                for result in results:
+                    self._reap(running,result[0],result)
+        elif kind=='pid':
+            self._selector.unregister(fd)
+            os.close(fd)
+            try:
+                result=os.wait4(pid,0)
+            except ChildProcessError:
+                with _reaped_lock:
+                    result=_reaped.get(pid,(pid,255<<8,None))
+            self._reap(job,pid,result)
+        elif kind=='in':
+            try:
+                n=os.write(fd,job._instring)
+            except BrokenPipeError:
+                n=len(job._instring)
+            except BlockingIOError:
+                n=0
+            job._instring=job._instring[n:]
+            if not job._instring:
+                self._unregister(job,fd)
+        else:
+            try:
+                data=os.read(fd,65536)
+            except BlockingIOError:
+                return
+            if data:
+                (job._out if kind=='out' else job._err).extend(data)
+            else:
+                self._unregister(job,fd)
+    def _check_timeouts(self,now):
+        """!Terminates jobs that ran past their timeouts and closes
+        output pipes that are held open after their job exited."""
+        for job in self._running:
+            if job._deadline is not None and now>=job._deadline \
+                    and job._remaining and not job.timed_out:
+                job.timed_out=True
+                if self.logger is not None:
+                    self.logger.warning('%s: timed out after %s seconds; '
+                                        'terminating'%(repr(job),
+                                                       repr(job.timeout)))
+                job.pipeline.terminate()
+            if job._exited_time is not None and job._fds and \
+                    now>=job._exited_time+self.force_close_time:
+                for fd in list(job._fds):
+                    self._unregister(job,fd)
+    def _next_event_time(self):
+        """!Returns the earliest time when _check_timeouts has work to
+        do, or None if there is no such time."""
+        times=list()
+        for job in self._running:
+            if job._deadline is not None and not job.timed_out:
+                times.append(job._deadline)
+            if job._exited_time is not None and job._fds:
+                times.append(job._exited_time+self.force_close_time)
+        return min(times) if times else None
+    def _check_done(self,job):
+        """!Finishes a job if all of its processes exited and all of
+        its streams are closed."""
+        if job._remaining or job._fds or job not in self._running:
+            return
+        job.pipeline.set_background_result(
+            job._done,
+            bytes(job._out) if job.capture else None,
+            bytes(job._err) if job._err else None)
+        with _reaped_lock:
+            for pid in job._done:
+                _reaped.pop(pid,None)
+        job.end_time=time.time()
+        self._running.remove(job)
+        self._finished.append(job)
+        if self.logger is not None:
+            self.logger.info('%s returned %s'%(repr(job),repr(job.poll())))
+        self._start_queued()
+        if job.callback is not None:
+            job.callback(job)
+    def _step(self,timeout):
+        """!Waits for events for up to timeout seconds and handles
+        them."""
+        next_time=self._next_event_time()
+        if next_time is not None:
+            wait_time=max(0,next_time-time.time())
+            if timeout is None or wait_time<timeout:
+                timeout=wait_time
+        for key,events in self._selector.select(timeout):
+            self._handle(key)
+        self._check_timeouts(time.time())
+        for job in list(self._running):
+            self._check_done(job)
+    def wait_any(self,timeout=None):
+        """!Waits until at least one job completes.
+        @param timeout maximum number of seconds to wait, or None to
+          wait until a job completes
+        @returns a list of the jobs that completed since the last call
+          to wait_any(), which is empty if the timeout was reached or
+          there are no jobs"""
+        end=None if timeout is None else time.time()+timeout
+        while not self._finished and (self._running or self._queued):
+            remaining=None
+            if end is not None:
+                remaining=end-time.time()
+                if remaining<=0: break
+            self._step(remaining)
+        finished=self._finished
+        self._finished=list()
+        return finished
+    def wait(self,timeout=None):
+        """!Waits for all jobs to complete.
+        @param timeout maximum number of seconds to wait, or None to
+          wait forever
+        @returns True if all jobs completed, False otherwise"""
+        end=None if timeout is None else time.time()+timeout
+        while self._running or self._queued:
+            remaining=None
+            if end is not None:
+                remaining=end-time.time()
+                if remaining<=0: return False
+            self._step(remaining)
+        self._finished=list()
+        return True
+    def send_signal(self,sig):
+        """!Sends a signal to all running jobs and discards queued
+        jobs."""
+        self._queued.clear()
+        for job in self._running:
+            job.pipeline.send_signal(sig)
+    def terminate(self):
+        """!Sends SIGTERM to all running jobs and discards queued
+        jobs."""
+        self.send_signal(signal.SIGTERM)
+    def kill(self):
+        """!Sends SIGKILL to all running jobs and discards queued
+        jobs."""
+        self.send_signal(signal.SIGKILL)
+    def close(self):
+        """!Releases the file descriptors used by the pool.  Running
+        jobs are no longer watched, but they can be waited for by
+        another pool or by waitprocs()."""
+        if self._selector is None: return
+        with _reaped_lock:
+            for waiters in _waiters.values():
+                waiters.discard(self._wakeup_write)
+        for key in list(self._selector.get_map().values()):
+            if key.data[0]=='pid':
+                os.close(key.fd)
+        self._selector.close()
+        self._selector=None
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
 
 def runsync(logger=None,mpiimpl=None):
     """!Runs the "sync" command as an exe()."""
@@ -28,6 +28,10 @@ import produtil.setup
 from metplus.util import metplus_check
 from metplus.util import pre_run_setup, run_metplus, post_run_cleanup
 from metplus.util import get_process_list
+from metplus.util import run_task_queue_worker
+from metplus.util import run_realtime_watcher
+from metplus.util import start_profiling
+from metplus.util import start_command_plan
 
 '''!@namespace master_metplus
 Main script the processes all the tasks in the PROCESS_LIST
@@ -43,7 +47,20 @@ def main():
     # Use config object to get the list of processes to call
     process_list = get_process_list(config)
 
-    total_errors = run_metplus(config, process_list)
+    # profile the rest of the run if requested
+    start_profiling(config)
+
+    # write commands to a plan file instead of running them if requested
+    start_command_plan(config)
+
+    # run tasks from the shared task queue if running as a worker
+    if config.getbool('config', 'TASK_QUEUE_WORKER', False):
+        total_errors = run_task_queue_worker(config, process_list)
+    # run wrappers as their input files arrive if running as a watcher
+    elif config.getbool('config', 'REALTIME_WATCH', False):
+        total_errors = run_realtime_watcher(config, process_list)
+    else:
+        total_errors = run_metplus(config, process_list)
 
     post_run_cleanup(config, 'METplus', total_errors)
 